@@ -0,0 +1,104 @@
+import pypath
+import argparse
+import socket
+import threading
+import time
+
+from pyiqfeed.buffers import RingBuffer
+import synthetic
+
+desc = """
+Throughput of the FeedConn socket reader.
+
+Pushes synthetic Q messages through a socketpair and times how long it takes
+to read and split them into messages with the old string reader and with
+RingBuffer.
+"""
+
+
+class StringReader:
+    """The FeedConn reader as it was: recv, decode, append, slice."""
+
+    def __init__(self, read_size):
+        self.read_size = read_size
+        self.recv_buf = ""
+
+    def read(self, sock) -> bool:
+        data = sock.recv(self.read_size)
+        self.recv_buf += data.decode('latin-1')
+        return len(data) > 0
+
+    def next_message(self) -> str:
+        next_delim = self.recv_buf.find('\n')
+        if next_delim != -1:
+            message = self.recv_buf[:next_delim].strip()
+            self.recv_buf = self.recv_buf[(next_delim + 1):]
+            return message
+        return ""
+
+    def messages(self):
+        message = self.next_message()
+        while "" != message:
+            yield message
+            message = self.next_message()
+
+
+class RingReader:
+    def __init__(self, read_size):
+        self.read_size = read_size
+        self.recv_buf = RingBuffer(max(4 * read_size, 1 << 20))
+
+    def read(self, sock) -> bool:
+        return self.recv_buf.recv_into(sock, self.read_size) > 0
+
+    def messages(self):
+        return self.recv_buf.pop_lines()
+
+
+def run(reader, payload: bytes) -> (int, float):
+    rsock, wsock = socket.socketpair()
+    rsock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+
+    def writer():
+        wsock.sendall(payload)
+        wsock.shutdown(socket.SHUT_WR)
+
+    num_msgs = 0
+    start = time.perf_counter()
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while reader.read(rsock):
+        for message in reader.messages():
+            message.split(',')
+            num_msgs += 1
+    elapsed = time.perf_counter() - start
+    thread.join()
+    rsock.close()
+    wsock.close()
+    return num_msgs, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=desc, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-n", "--num-msgs", type=int, default=500000)
+    parser.add_argument("-s", "--num-symbols", type=int, default=300)
+    args = parser.parse_args()
+
+    payload = "".join(
+        synthetic.quote_lines(args.num_msgs, args.num_symbols)).encode(
+        'latin-1')
+    print("%d messages, %.1f MB" % (args.num_msgs, len(payload) / 1e6))
+    cases = [("string reader, recv(1024)", StringReader(1024)),
+             ("string reader, recv(65536)", StringReader(65536)),
+             ("ring buffer, recv_into(1024)", RingReader(1024)),
+             ("ring buffer, recv_into(65536)", RingReader(65536))]
+    for label, reader in cases:
+        num_msgs, elapsed = run(reader, payload)
+        assert num_msgs == args.num_msgs
+        print("%-32s %8.3fs %12.0f msgs/sec" % (
+            label, elapsed, num_msgs / elapsed))
+
+
+if __name__ == "__main__":
+    main()
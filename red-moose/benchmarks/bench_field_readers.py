@@ -0,0 +1,161 @@
+import pypath
+import argparse
+import datetime
+import time
+
+import numpy as np
+from pyiqfeed import column_readers as cr
+from pyiqfeed import field_readers as fr
+from pyiqfeed.conn import QuoteConn
+from pyiqfeed.exceptions import UnexpectedField
+
+desc = """
+Speed of the field readers used by QuoteConn.quote_msg_map.
+
+For every reader in quote_msg_map times the reader as it was (building a
+numpy scalar per field, parsing every date and time from scratch), the
+current field reader and the column reader FieldsetParser.parse_many uses,
+on a column of realistic values, in ns per field. Checks all three give
+the same values.
+"""
+
+
+def old_read_uint8(field: str) -> np.uint8:
+    return np.uint8(field) if field != "" else 0
+
+
+def old_read_uint16(field: str) -> np.uint16:
+    return np.uint16(field) if field != "" else 0
+
+
+def old_read_uint64(field: str) -> np.uint64:
+    return np.uint64(field) if field != "" else 0
+
+
+def old_read_float64(field: str) -> np.float64:
+    return np.float64(field) if field != "" else np.nan
+
+
+def old_read_hhmmssus(field: str) -> int:
+    if field != "":
+        hour = int(field[0:2])
+        minute = int(field[3:5])
+        second = int(field[6:8])
+        micro = int(field[9:])
+        return (1000000 * ((3600 * hour) + (60 * minute) + second)) + micro
+    else:
+        return 0
+
+
+def old_read_mmddccyy(field: str) -> np.datetime64:
+    if field != "":
+        month = int(field[0:2])
+        day = int(field[3:5])
+        year = int(field[6:10])
+        return np.datetime64(
+            datetime.date(year=year, month=month, day=day), 'D')
+    else:
+        return np.datetime64(datetime.date(year=1, month=1, day=1), 'D')
+
+
+def old_read_tick_direction(field: str) -> np.int8:
+    if field != "":
+        field_as_int = int(field)
+        if field_as_int == 173:
+            return np.int8(1)
+        if field_as_int == 175:
+            return np.int8(-1)
+        if field_as_int == 183:
+            return np.int8(0)
+        else:
+            raise UnexpectedField(
+                "Unknown value in Tick Direction Field: %s" % field)
+    else:
+        return np.int8(0)
+
+
+old_readers = {
+    fr.read_uint8: old_read_uint8,
+    fr.read_uint16: old_read_uint16,
+    fr.read_uint64: old_read_uint64,
+    fr.read_float64: old_read_float64,
+    fr.read_hhmmssus: old_read_hhmmssus,
+    fr.read_mmddccyy: old_read_mmddccyy,
+    fr.read_tick_direction: old_read_tick_direction,
+}
+
+
+def sample_column(reader, num: int, rs: np.random.RandomState) -> list:
+    """num fields of the kind reader reads, with some blanks."""
+    if reader in (fr.read_uint8, fr.read_hex):
+        col = ["%d" % v for v in rs.randint(0, 100, num)]
+    elif reader is fr.read_uint16:
+        col = ["%d" % v for v in rs.randint(0, 60000, num)]
+    elif reader is fr.read_uint64:
+        col = ["%d" % v for v in rs.randint(0, 10 ** 9, num)]
+    elif reader is fr.read_float64:
+        col = ["%.2f" % v for v in 10 + 500 * rs.rand(num)]
+    elif reader is fr.read_hhmmssus:
+        # An hour of the day, so many fields share a second as in the feed.
+        us = 34200000000 + np.sort(rs.randint(0, 3600000000, num))
+        col = []
+        for val in us:
+            secs, micro = divmod(int(val), 1000000)
+            col.append("%.2d:%.2d:%.2d.%.6d" % (
+                secs // 3600, secs // 60 % 60, secs % 60, micro))
+    elif reader is fr.read_mmddccyy:
+        col = ["10/%.2d/2020" % (12 + v) for v in rs.randint(0, 2, num)]
+    elif reader is fr.read_is_market_open:
+        col = ["%d" % v for v in rs.randint(0, 2, num)]
+    elif reader is fr.read_tick_direction:
+        col = [["173", "175", "183"][v] for v in rs.randint(0, 3, num)]
+    elif reader is fr.read_is_short_restricted:
+        col = [["N", "Y"][v] for v in rs.randint(0, 2, num)]
+    else:
+        col = ["SYM%d" % v for v in rs.randint(0, 300, num)]
+    for pos in rs.randint(0, num, num // 100):
+        col[pos] = ""
+    return col
+
+
+def ns_per_field(func, column: list, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(column)
+        best = min(best, time.perf_counter() - start)
+    return 1e9 * best / len(column)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=desc, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-n", "--num-fields", type=int, default=100000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rs = np.random.RandomState(17)
+    readers = {}
+    for field_name, dtype, reader in QuoteConn.quote_msg_map.values():
+        readers.setdefault(reader, (reader.__name__, dtype, field_name))
+    print("%-22s %-4s %10s %10s %10s" % ("reader", "type", "as it was",
+                                         "field", "column"))
+    for reader, (name, dtype, field_name) in readers.items():
+        column = sample_column(reader, args.num_fields, rs)
+        old = old_readers.get(reader, reader)
+        col_reader = cr.column_reader(dtype, reader)
+        old_vals = np.array([old(f) for f in column], dtype=dtype)
+        new_vals = np.array([reader(f) for f in column], dtype=dtype)
+        col_vals = col_reader(column).astype(dtype)
+        assert np.array_equal(old_vals, new_vals, equal_nan=dtype[0] == 'f')
+        assert np.array_equal(old_vals, col_vals, equal_nan=dtype[0] == 'f')
+        times = [ns_per_field(lambda c, f=func: [f(x) for x in c], column,
+                              args.repeat) for func in (old, reader)]
+        times.append(ns_per_field(col_reader, column, args.repeat))
+        label = name if name != "<lambda>" else "(as is: %s)" % field_name
+        print("%-22s %-4s %8.0fns %8.0fns %8.0fns" % (
+            label[:22], dtype, *times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import pypath
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+from pyiqfeed import field_readers as fr
+from pyiqfeed.conn import HistoryConn
+import synthetic
+
+desc = """
+Decoding speed of HistoryConn tick and bar responses.
+
+Decodes synthetic tick and bar lines with the old row by row loop and with
+the columnar decoder HistoryConn now uses, and checks both give the same
+array.
+"""
+
+
+def rowwise_ticks(raw_data: deque) -> np.array:
+    """HistoryConn._read_ticks as it was."""
+    num_pts = len(raw_data)
+    data = np.empty(num_pts, HistoryConn.tick_type)
+    line_num = 0
+    while raw_data and (line_num < num_pts):
+        dl = raw_data.popleft()
+        (dt, tm) = fr.read_posix_ts_us(dl[1])
+        data[line_num]['date'] = dt
+        data[line_num]['time'] = tm
+        data[line_num]['last'] = np.float64(dl[2])
+        data[line_num]['last_sz'] = np.uint64(dl[3])
+        data[line_num]['tot_vlm'] = np.uint64(dl[4])
+        data[line_num]['bid'] = np.float64(dl[5])
+        data[line_num]['ask'] = np.float64(dl[6])
+        data[line_num]['tick_id'] = np.uint64(dl[7])
+        data[line_num]['last_type'] = dl[8]
+        data[line_num]['mkt_ctr'] = np.uint32(dl[9])
+        cond_str = dl[10]
+        num_cond = len(cond_str) / 2
+        for cond_num in range(4):
+            name = 'cond%d' % (cond_num + 1)
+            if num_cond > cond_num:
+                data[line_num][name] = np.uint8(
+                    int(cond_str[2 * cond_num:2 * cond_num + 2], 16))
+            else:
+                data[line_num][name] = 0
+        line_num += 1
+    return data
+
+
+def rowwise_bars(raw_data: deque) -> np.array:
+    """HistoryConn._read_bars as it was."""
+    num_pts = len(raw_data)
+    data = np.empty(num_pts, HistoryConn.bar_type)
+    line_num = 0
+    while raw_data and (line_num < num_pts):
+        dl = raw_data.popleft()
+        (dt, tm) = fr.read_posix_ts(dl[1])
+        data[line_num]['date'] = dt
+        data[line_num]['time'] = tm
+        data[line_num]['high_p'] = np.float64(dl[2])
+        data[line_num]['low_p'] = np.float64(dl[3])
+        data[line_num]['open_p'] = np.float64(dl[4])
+        data[line_num]['close_p'] = np.float64(dl[5])
+        data[line_num]['tot_vlm'] = np.int64(dl[6])
+        data[line_num]['prd_vlm'] = np.int64(dl[7])
+        data[line_num]['num_trds'] = np.int64(dl[8])
+        line_num += 1
+    return data
+
+
+def split(lines):
+    return [line.strip().split(',') for line in lines]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=desc, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-t", "--num-ticks", type=int, default=1000000)
+    parser.add_argument("-b", "--num-bars", type=int, default=200000)
+    args = parser.parse_args()
+
+    cases = [("ticks", split(synthetic.tick_lines(args.num_ticks)),
+              rowwise_ticks, HistoryConn._decode_ticks),
+             ("bars", split(synthetic.bar_lines(args.num_bars)),
+              rowwise_bars, HistoryConn._decode_bars)]
+    for label, rows, old, new in cases:
+        old_data, old_secs = timed(old, deque(rows))
+        new_data, new_secs = timed(new, rows)
+        assert np.array_equal(old_data, new_data)
+        print("%-6s %9d rows  row by row %7.2fs %10.0f rows/sec" % (
+            label, len(rows), old_secs, len(rows) / old_secs))
+        print("%-6s %9d rows  columnar   %7.2fs %10.0f rows/sec  (%.1fx)" % (
+            label, len(rows), new_secs, len(rows) / new_secs,
+            old_secs / new_secs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import pypath
+import argparse
+import resource
+import socket
+import time
+
+import pyiqfeed as iq
+import synthetic
+
+desc = """
+Reader threads vs one FeedReactor for several QuoteConns.
+
+Feeds synthetic Q messages to a number of QuoteConns over socketpairs, a
+few messages per connection at a time with a short pause between rounds
+the way IQFeed trickles data in during the day, and reports the CPU time
+and context switches the process used to get them all to the listeners,
+first with a reader thread per connection and then with all of them on
+one FeedReactor.
+"""
+
+
+class CountingListener(iq.SilentQuoteListener):
+    def __init__(self, name):
+        super().__init__(name)
+        self.num_updates = 0
+
+    def process_update(self, update):
+        self.num_updates += 1
+
+    def process_update_batch(self, updates):
+        self.num_updates += len(updates)
+
+
+def run(num_conns: int, rounds: list, num_msgs: int, pause: float,
+        reactor) -> dict:
+    conns, feeds, listeners = [], [], []
+    for conn_num in range(num_conns):
+        conn = iq.QuoteConn(name="bench-%d" % conn_num)
+        conn._update_parser = iq.conn.FieldsetParser(
+            [iq.QuoteConn.quote_msg_map[f] for f in synthetic.quote_fields()])
+        conn.set_batch_mode(True)
+        listener = CountingListener("bench")
+        conn.add_listener(listener)
+        conn._sock, feed = socket.socketpair()
+        conn.set_reactor(reactor)
+        conns.append(conn)
+        feeds.append(feed)
+        listeners.append(listener)
+    for conn in conns:
+        conn.start_runner()
+    expected = num_conns * num_msgs
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = time.process_time()
+    start = time.perf_counter()
+    for burst in rounds:
+        for feed in feeds:
+            feed.sendall(burst)
+        time.sleep(pause)
+    while sum(l.num_updates for l in listeners) < expected:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    after = resource.getrusage(resource.RUSAGE_SELF)
+
+    for conn, feed in zip(conns, feeds):
+        conn.stop_runner()
+        feed.close()
+        conn._sock.close()
+    if reactor is not None:
+        reactor.stop()
+    return dict(elapsed=elapsed, cpu=cpu,
+                vol_cs=after.ru_nvcsw - usage.ru_nvcsw,
+                invol_cs=after.ru_nivcsw - usage.ru_nivcsw)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=desc, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-c", "--num-conns", type=int, default=4)
+    parser.add_argument("-n", "--num-msgs", type=int, default=20000,
+                        help="messages per connection")
+    parser.add_argument("-b", "--burst", type=int, default=5,
+                        help="messages per connection per round")
+    parser.add_argument("-p", "--pause", type=float, default=0.0005,
+                        help="seconds between rounds")
+    args = parser.parse_args()
+
+    lines = synthetic.quote_lines(args.num_msgs)
+    rounds = ["".join(lines[i:i + args.burst]).encode('latin-1')
+              for i in range(0, len(lines), args.burst)]
+    print("%d connections, %d messages each in bursts of %d" % (
+        args.num_conns, args.num_msgs, args.burst))
+    for label, reactor in [("thread per conn", None),
+                           ("FeedReactor", iq.FeedReactor("bench"))]:
+        res = run(args.num_conns, rounds, args.num_msgs, args.pause,
+                  reactor)
+        print("%-16s wall %6.2fs  cpu %6.2fs  voluntary cs %8d  "
+              "involuntary cs %6d" % (label, res['elapsed'], res['cpu'],
+                                      res['vol_cs'], res['invol_cs']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import pypath
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pyiqfeed as iq
+from pyiqfeed.replay import write_recording
+from red_moose.common import Quote
+from red_moose.iqfeed.listeners import update_to_quote
+import synthetic
+
+desc = """
+End to end throughput and latency through a real socket, using ReplayServer.
+
+Writes synthetic recordings for the quote, derivative (bars) and lookup
+(history) ports, plays them with a ReplayServer to a QuoteConn, a BarConn,
+a HistoryConn and a QuoteConn relaying every update the way
+IQFeedRelayListener does (Quote then JSON, without the AMQP publish), and
+reports messages per second at max speed and, with --speed, the latency
+from when each chunk was due to be sent until its last message reached the
+listener.
+
+Pass -r to replay your own recordings (made with FeedConn.set_recorder)
+instead, e.g. -r quote=quotes.rec.
+"""
+
+
+class Listener(iq.SilentQuoteListener, iq.SilentBarListener):
+    """Counts messages and notes when each arrived."""
+
+    def __init__(self, name, relay=False, symbols=None):
+        super().__init__(name)
+        self.relay = relay
+        self.symbols = symbols
+        self.arrivals = []
+        self.num_msgs = 0
+
+    def _arrived(self, num: int):
+        self.num_msgs += num
+        self.arrivals.append((self.num_msgs, time.perf_counter()))
+
+    def process_update_batch(self, updates):
+        if self.relay:
+            for update in updates:
+                update_to_quote(update, self.symbols).to_json()
+        self._arrived(len(updates))
+
+    def process_bar_batch(self, bar_data):
+        self._arrived(len(bar_data))
+
+
+def make_recordings(tmp_dir: str, args) -> dict:
+    fieldnames = "S,CURRENT UPDATE FIELDNAMES,%s\r\n"
+    quotes = [fieldnames % ",".join(synthetic.quote_fields())]
+    quotes += synthetic.quote_lines(args.num_msgs)
+    relay = [fieldnames % ",".join(Quote.iqfeed_fields())]
+    relay += synthetic.relay_quote_lines(args.num_msgs)
+    bars = synthetic.live_bar_lines(args.num_msgs)
+    ticks = synthetic.tick_lines(args.num_msgs) + ["H_0000000000,!ENDMSG!,\r\n"]
+    paths = {}
+    for kind, lines in (("quote", quotes), ("bar", bars), ("history", ticks),
+                        ("relay", relay)):
+        paths[kind] = os.path.join(tmp_dir, "%s.rec" % kind)
+        write_recording(paths[kind], lines, args.lines_per_record,
+                        args.interval)
+    return paths
+
+
+def due_times(path: str, speed: float) -> list:
+    """(messages sent so far, seconds after start it is sent) per record"""
+    due = []
+    first_ns = None
+    num_msgs = 0
+    for time_ns, data in iq.read_recording(path):
+        first_ns = time_ns if first_ns is None else first_ns
+        num_msgs += data.count(b"\n")
+        due.append((num_msgs, (time_ns - first_ns) / 1e9 / (speed or 1e12)))
+    return due
+
+
+def latencies(listener: Listener, due: list, start: float) -> np.array:
+    """Seconds from each record being due to the listener seeing it."""
+    arrivals = np.array(listener.arrivals)
+    if not len(arrivals):
+        return np.array([np.nan])
+    due = np.array(due)
+    idx = np.searchsorted(arrivals[:, 0], due[:, 0])
+    idx = np.minimum(idx, len(arrivals) - 1)
+    return arrivals[idx, 1] - (start + due[:, 1])
+
+
+def run_feed(kind: str, path: str, speed: float, expected: int) -> tuple:
+    port = {"quote": iq.FeedConn.quote_port, "relay": iq.FeedConn.quote_port,
+            "bar": iq.FeedConn.deriv_port}[kind]
+    reactor = iq.FeedReactor(name="bench")
+    with iq.ReplayServer({port: path}, speed=speed, free_ports=True) as server:
+        cls = iq.BarConn if kind == "bar" else iq.QuoteConn
+        conn = cls(name="bench", port=server.port_for(port))
+        if kind == "relay":
+            conn.set_compact_updates()
+        listener = Listener("bench", relay=kind == "relay",
+                            symbols=conn.symbol_table() if kind == "relay"
+                            else None)
+        conn.add_listener(listener)
+        conn.set_batch_mode(True)
+        conn.set_reactor(reactor)
+        start = time.perf_counter()
+        conn.connect()
+        while listener.num_msgs < expected:
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        conn.disconnect()
+    reactor.stop()
+    return elapsed, latencies(listener, due_times(path, speed), start)
+
+
+def run_history(path: str, speed: float, expected: int) -> tuple:
+    reactor = iq.FeedReactor(name="bench")
+    port = iq.FeedConn.lookup_port
+    with iq.ReplayServer({port: path}, speed=speed, free_ports=True) as server:
+        conn = iq.HistoryConn(name="bench", port=server.port_for(port))
+        conn.set_reactor(reactor)
+        conn.connect()
+        start = time.perf_counter()
+        data = conn.request_ticks("SYM0", max_ticks=expected, timeout=600)
+        elapsed = time.perf_counter() - start
+        conn.disconnect()
+    reactor.stop()
+    assert len(data) == expected
+    # The whole response arrives at once, the latency is the elapsed time.
+    return elapsed, np.array([elapsed])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=desc, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-n", "--num-msgs", type=int, default=200000)
+    parser.add_argument("-l", "--lines-per-record", type=int, default=50)
+    parser.add_argument("-i", "--interval", type=float, default=0.001,
+                        help="seconds between records in the synthetic "
+                             "recordings")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="replay speed, 0 for as fast as possible")
+    parser.add_argument("-r", "--recording", action="append", default=[],
+                        help="kind=path of a recording to use, kind is "
+                             "quote, bar, history or relay (quotes in the "
+                             "Quote.iqfeed_fields fieldset)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = make_recordings(tmp_dir, args)
+        for rec in args.recording:
+            kind, path = rec.split("=", 1)
+            paths[kind] = path
+        print("%-8s %10s %9s %14s %10s %10s" % (
+            "feed", "messages", "seconds", "msgs/sec", "p50 lat", "p99 lat"))
+        for kind in ("quote", "bar", "history", "relay"):
+            path = paths[kind]
+            expected = sum(data.count(b"\n") for _, data in
+                           iq.read_recording(path))
+            if kind in ("quote", "relay"):
+                expected -= 1  # the fieldnames message
+            if kind == "history":
+                expected -= 1  # !ENDMSG!
+                elapsed, lat = run_history(path, args.speed, expected)
+            else:
+                elapsed, lat = run_feed(kind, path, args.speed, expected)
+            print("%-8s %10d %9.3f %14.0f %8.2fms %8.2fms" % (
+                kind, expected, elapsed, expected / elapsed,
+                1000 * np.percentile(lat, 50), 1000 * np.percentile(lat, 99)))
+
+
+if __name__ == "__main__":
+    main()
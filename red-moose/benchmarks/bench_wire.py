@@ -0,0 +1,70 @@
+import pypath
+import argparse
+import json
+import time
+
+import numpy as np
+from kombu import serialization
+from red_moose.common import Quote
+from red_moose.messaging import wire
+from red_moose.messaging.coalescing_publisher import quotes_to_json
+from red_moose.rm_enums import ContentType
+
+desc = """
+JSON against the rm_records binary wire format for batches of quotes.
+
+Encodes batches of Quotes the way the relay publishes them
+(quotes_to_json against wire.encode) and decodes them the way consumers
+do, through kombu's registered serializers: json.loads then Quote.from_dict
+for JSON, a structured array view for binary, and optionally Quote
+objects from the records for consumers that still want them.
+"""
+
+
+def make_quotes(num_quotes: int, seed: int = 7):
+    rs = np.random.RandomState(seed)
+    px = 10.0 + 500.0 * rs.rand(num_quotes)
+    sizes = rs.randint(1, 5000, num_quotes)
+    return [Quote(Symbol="SYM%d" % i, Bid=round(px[i] - 0.01, 2), Ask=round(px[i] + 0.01, 2),
+                  Last=round(px[i], 2), Open=round(px[i] - 1, 2), High=round(px[i] + 1, 2),
+                  Low=round(px[i] - 2, 2), BidSize=sizes[i], AskSize=sizes[i] // 2,
+                  LastSize=sizes[i] // 3, LastTime=34200000000 + i, TotalVolume=1000 + i)
+            for i in range(num_quotes)]
+
+
+def timed(func, reps: int):
+    start = time.perf_counter()
+    for _ in range(reps):
+        result = func()
+    return result, (time.perf_counter() - start) / reps
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=desc, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-b", "--batch", type=int, default=500, help="quotes per message")
+    parser.add_argument("-n", "--reps", type=int, default=200)
+    args = parser.parse_args()
+
+    quotes = make_quotes(args.batch)
+    accept = serialization.prepare_accept_content({'json', wire.SERIALIZER})
+
+    json_msg, json_enc = timed(lambda: quotes_to_json(quotes).encode(), args.reps)
+    _, json_dec = timed(lambda: [Quote.from_dict(q) for q in serialization.loads(
+        json_msg, 'application/json', 'utf-8', accept=accept)], args.reps)
+    bin_msg, bin_enc = timed(lambda: wire.encode(quotes), args.reps)
+    records, bin_dec = timed(lambda: serialization.loads(
+        bin_msg, ContentType.RM_RECORDS.value, 'binary', accept=accept), args.reps)
+    _, bin_obj = timed(lambda: wire.records_to_quotes(serialization.loads(
+        bin_msg, ContentType.RM_RECORDS.value, 'binary', accept=accept)), args.reps)
+    assert wire.records_to_quotes(records) == [Quote.from_dict(q) for q in json.loads(json_msg)]
+
+    print("%d quotes per message" % args.batch)
+    print("%-22s %9s %12s %12s" % ("format", "bytes", "encode us", "decode us"))
+    print("%-22s %9d %12.1f %12.1f" % ("json -> Quote", len(json_msg), json_enc * 1e6, json_dec * 1e6))
+    print("%-22s %9d %12.1f %12.1f" % ("records -> array", len(bin_msg), bin_enc * 1e6, bin_dec * 1e6))
+    print("%-22s %9d %12.1f %12.1f" % ("records -> Quote", len(bin_msg), bin_enc * 1e6, bin_obj * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+
+import os, sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), "../lib"))
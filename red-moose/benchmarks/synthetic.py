@@ -0,0 +1,121 @@
+"""
+Synthetic IQFeed protocol data for the benchmarks.
+
+Everything is generated from a seeded RandomState so runs are comparable.
+"""
+import numpy as np
+
+
+def symbols(num_symbols: int):
+    return ["SYM%d" % i for i in range(num_symbols)]
+
+
+def quote_lines(num_lines: int, num_symbols: int = 300, seed: int = 7):
+    """
+    Q messages in the red-moose default fieldset plus trade details:
+    Symbol, Most Recent Trade, Most Recent Trade Size, Most Recent Trade Time,
+    Most Recent Trade Market Center, Total Volume, Bid, Bid Size, Ask,
+    Ask Size, Open, High, Low, Close, Message Contents,
+    Most Recent Trade Conditions
+    """
+    rs = np.random.RandomState(seed)
+    syms = symbols(num_symbols)
+    sym_idx = rs.randint(0, num_symbols, num_lines)
+    mids = 10.0 + 500.0 * rs.rand(num_symbols)
+    px = mids[sym_idx] + rs.randn(num_lines) * 0.05
+    sizes = rs.randint(1, 5000, num_lines)
+    us = 34200000000 + np.sort(rs.randint(0, 23400000000, num_lines))
+    lines = []
+    for i in range(num_lines):
+        secs, micro = divmod(int(us[i]), 1000000)
+        hh, rem = divmod(secs, 3600)
+        mm, ss = divmod(rem, 60)
+        p = px[i]
+        lines.append(
+            "Q,%s,%.2f,%d,%.2d:%.2d:%.2d.%.6d,%d,%d,%.2f,%d,%.2f,%d,"
+            "%.2f,%.2f,%.2f,%.2f,Cbasob,3D87,\r\n" % (
+                syms[sym_idx[i]], p, sizes[i], hh, mm, ss, micro, 11,
+                1000 + i, p - 0.01, sizes[i] // 2, p + 0.01, sizes[i] // 3,
+                p - 1, p + 1, p - 2, p - 0.5))
+    return lines
+
+
+def quote_fields():
+    return ["Symbol", "Most Recent Trade", "Most Recent Trade Size",
+            "Most Recent Trade Time", "Most Recent Trade Market Center",
+            "Total Volume", "Bid", "Bid Size", "Ask", "Ask Size", "Open",
+            "High", "Low", "Close", "Message Contents",
+            "Most Recent Trade Conditions"]
+
+
+def tick_lines(num_lines: int, req_id: str = "H_0000000000",
+               seed: int = 11):
+    """HistoryConn tick lines (HTX/HTD/HTT) as they come off the socket."""
+    rs = np.random.RandomState(seed)
+    px = 100.0 + np.cumsum(rs.randn(num_lines) * 0.01)
+    sizes = rs.randint(1, 1000, num_lines)
+    us = 34200000000 + np.sort(rs.randint(0, 23400000000, num_lines))
+    days = ["2020-10-%.2d" % (12 + i % 5) for i in range(5)]
+    conds = ["", "3D", "3D87", "1787", "3D8717", "01020304"]
+    lines = []
+    vlm = 0
+    for i in range(num_lines):
+        secs, micro = divmod(int(us[i]), 1000000)
+        hh, rem = divmod(secs, 3600)
+        mm, ss = divmod(rem, 60)
+        vlm += int(sizes[i])
+        lines.append(
+            "%s,%s %.2d:%.2d:%.2d.%.6d,%.2f,%d,%d,%.2f,%.2f,%d,O,%d,%s,\r\n" % (
+                req_id, days[i * 5 // num_lines], hh, mm, ss, micro, px[i],
+                sizes[i], vlm, px[i] - 0.01, px[i] + 0.01, 1000 + i,
+                5 + i % 20, conds[i % len(conds)]))
+    return lines
+
+
+def bar_lines(num_lines: int, req_id: str = "H_0000000000", seed: int = 13):
+    """HistoryConn 60 second bar lines (HIX/HID/HIT)."""
+    rs = np.random.RandomState(seed)
+    px = 100.0 + np.cumsum(rs.randn(num_lines) * 0.1)
+    lines = []
+    for i in range(num_lines):
+        day, minute = divmod(i, 390)
+        secs = 34260 + 60 * minute
+        hh, rem = divmod(secs, 3600)
+        mm, ss = divmod(rem, 60)
+        lines.append(
+            "%s,%s %.2d:%.2d:%.2d,%.2f,%.2f,%.2f,%.2f,%d,%d,%d,\r\n" % (
+                req_id, str(np.datetime64('2020-01-01') + day), hh, mm, ss,
+                px[i] + 0.1, px[i] - 0.1, px[i], px[i] + 0.05,
+                1000 * (minute + 1), 1000, 17))
+    return lines
+
+
+def live_bar_lines(num_lines: int, num_symbols: int = 300, seed: int = 17):
+    """BarConn completed bar (BC) lines, a minute of bars per symbol at a time."""
+    rs = np.random.RandomState(seed)
+    syms = symbols(num_symbols)
+    px = 10.0 + 500.0 * rs.rand(num_symbols)
+    lines = []
+    for i in range(num_lines):
+        minute, sym = divmod(i, num_symbols)
+        secs = 34260 + 60 * minute
+        hh, rem = divmod(secs, 3600)
+        mm, ss = divmod(rem, 60)
+        p = px[sym] + 0.01 * minute
+        lines.append(
+            "B-%s,BC,%s,2020-10-13 %.2d:%.2d:%.2d,%.2f,%.2f,%.2f,%.2f,%d,%d,%d,"
+            "\r\n" % (syms[sym], syms[sym], hh, mm, ss, p, p + 0.1, p - 0.1,
+                      p + 0.05, 1000 * (minute + 1), 1000, 17))
+    return lines
+
+
+def relay_quote_lines(num_lines: int, num_symbols: int = 300, seed: int = 7):
+    """Q messages in the fieldset IQFeedClient selects, Quote.iqfeed_fields."""
+    rs = np.random.RandomState(seed)
+    syms = symbols(num_symbols)
+    sym_idx = rs.randint(0, num_symbols, num_lines)
+    mids = 10.0 + 500.0 * rs.rand(num_symbols)
+    px = mids[sym_idx] + rs.randn(num_lines) * 0.05
+    return ["Q,%s,%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,\r\n" % (
+        syms[sym_idx[i]], px[i] - 0.01, px[i] + 0.01, px[i], px[i] - 1,
+        px[i] + 1, px[i] - 2) for i in range(num_lines)]
@@ -2,10 +2,17 @@
 """Export only the names below when you import pyiqfeed"""
 
 from .conn import QuoteConn, AdminConn, HistoryConn, TableConn, LookupConn
-from .conn import BarConn, NewsConn
+from .conn import BarConn, NewsConn, HistoryConnPool
 from .conn import FeedConn
+from .aio import AsyncQuoteConn, AsyncBarConn, AsyncHistoryConn
 
 from .connector import ConnConnector
+from .reactor import FeedReactor
+from .symbol_table import SymbolTable
+from .story_cache import StoryCache
+from .bar_builder import BarBuilder
+from .dispatch import ConflatingDispatcher
+from .replay import FeedRecorder, ReplayServer, read_recording
 
 from .listeners import SilentIQFeedListener, SilentQuoteListener
 from .listeners import SilentAdminListener, SilentBarListener
@@ -0,0 +1,581 @@
+# coding=utf-8
+
+"""
+asyncio versions of QuoteConn, BarConn and HistoryConn.
+
+The XXXConn classes in conn.py each run a reader thread that waits on its
+socket in select. The AsyncXXXConn classes here read their socket with
+asyncio streams on the event loop instead, so one loop (for example the
+one ib_insync runs on) can drive every feed with no extra threads and no
+handing data from one thread to another.
+
+Messages are parsed and listeners called exactly as in the threaded
+classes, just on the event loop, so existing listeners work unchanged as
+long as they don't block. On top of that:
+
+AsyncQuoteConn.updates() and AsyncBarConn.bars() return async iterators of
+the numpy arrays the listener callbacks would receive.
+
+AsyncHistoryConn's request_* methods are coroutines returning the same
+arrays and raising the same exceptions as the HistoryConn versions.
+
+Commands like watch() only write to the socket's buffer so they remain
+plain (non async) methods. Call await conn.drain() to wait for IQFeed to
+take them if you send a lot at once.
+
+"""
+
+import asyncio
+import collections
+import datetime
+import time
+from typing import Callable, Dict, Sequence
+
+import numpy as np
+from .conn import FeedConn, QuoteConn, BarConn, HistoryConn
+from .exceptions import NoDataError, UnauthorizedError, UnexpectedField
+from .exceptions import UnexpectedMessage, UnexpectedProtocol
+from .listeners import SilentQuoteListener, SilentBarListener
+
+
+class _AsyncFeed:
+    """
+    Replaces FeedConn's socket and reader thread with asyncio streams.
+
+    Mixed in ahead of a FeedConn subclass. connect and disconnect become
+    coroutines and the reader thread is a task on the running loop.
+
+    """
+
+    def _init_async(self) -> None:
+        # FeedConn.__init__ made a socket we never use.
+        self._sock.close()
+        self._sock = None
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._read_error = None
+        self._streams = set()
+
+    async def connect(self) -> None:
+        """
+        Connect to IQFeed and start reading on the running event loop.
+
+        """
+        self._reader, self._writer = await asyncio.open_connection(
+            self._host, self._port)
+        self._set_protocol(FeedConn.protocol)
+        self._set_client_name(self.name())
+        self._send_connect_message()
+        self._read_task = asyncio.get_running_loop().create_task(
+            self._read_loop())
+
+    async def disconnect(self) -> None:
+        """
+        Stop reading and close the connection to IQFeed.
+
+        """
+        if self._read_task is not None:
+            self._read_task.cancel()
+            await asyncio.gather(self._read_task, return_exceptions=True)
+            self._read_task = None
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._writer = None
+
+    def start_runner(self) -> None:
+        raise RuntimeError("%s is read by the event loop, use connect()" %
+                           self.name())
+
+    def stop_runner(self) -> None:
+        raise RuntimeError("%s is read by the event loop, use disconnect()" %
+                           self.name())
+
+    def reader_running(self) -> bool:
+        """True if the task reading from IQFeed is running."""
+        return self._read_task is not None and not self._read_task.done()
+
+    def read_error(self) -> Exception:
+        """Why reading stopped, if it stopped other than by disconnect()"""
+        return self._read_error
+
+    def _send_cmd(self, cmd: str) -> None:
+        self._writer.write(cmd.encode(encoding='latin-1'))
+
+    def _send_cmds(self, cmds: Sequence[str]) -> int:
+        """The StreamWriter buffers, so this is always one write."""
+        self._writer.write("".join(cmds).encode(encoding='latin-1'))
+        return 1
+
+    async def drain(self) -> None:
+        """Wait until commands sent so far have been handed to the OS."""
+        await self._writer.drain()
+
+    async def _read_loop(self) -> None:
+        """The asyncio equivalent of FeedConn.__call__"""
+        error = None
+        try:
+            while True:
+                data = await self._reader.read(self.read_size)
+                if not data:
+                    error = ConnectionError(
+                        "IQFeed closed the connection: %s" % self.name())
+                    break
+                start = time.perf_counter_ns()
+                self._recv_buf.feed(data)
+                self._stats.record_read(len(data), len(self._recv_buf), start)
+                if self._recorder is not None:
+                    self._recorder.record(data)
+                self._process_messages()
+        except asyncio.CancelledError:
+            raise
+        except (Exception, UnexpectedField, UnexpectedMessage,
+                UnexpectedProtocol) as err:
+            # Reported through streams, pending requests and read_error
+            # rather than as an exception nobody retrieves from the task.
+            error = err
+        finally:
+            self._read_error = error
+            self._reading_stopped(error)
+
+    def _reading_stopped(self, error: Exception) -> None:
+        """Nothing more will arrive, end every stream."""
+        for stream in list(self._streams):
+            stream._finish(error)
+
+
+class _ListenerStream:
+    """
+    Async iterator over the arrays a listener is sent.
+
+    :param conn: Conn to listen to.
+    :param maxsize: Most arrays to queue if the consumer falls behind. The
+        oldest is dropped when a new one arrives and the queue is full and
+        dropped counts how many were. 0 means no limit.
+
+    Listens from creation until close(), or the end of an async with block.
+    Iteration ends when the conn stops reading, raising the error that
+    stopped it if there was one.
+
+    """
+
+    def __init__(self, conn: _AsyncFeed, maxsize: int):
+        self._conn = conn
+        self._maxsize = maxsize
+        self._queue = collections.deque()
+        self._waiter = None
+        self._done = False
+        self._error = None
+        self.dropped = 0
+        conn._streams.add(self)
+        conn.add_listener(self)
+
+    def _put(self, data: np.array) -> None:
+        if self._done:
+            return
+        if self._maxsize and len(self._queue) >= self._maxsize:
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append(data)
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _finish(self, error: Exception = None) -> None:
+        if not self._done:
+            self._done = True
+            self._error = error
+        self._wake()
+
+    def close(self) -> None:
+        """Stop listening. Arrays already queued can still be read."""
+        self._conn.remove_listener(self)
+        self._conn._streams.discard(self)
+        self._finish()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> np.array:
+        while not self._queue:
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                raise StopAsyncIteration
+            self._waiter = asyncio.get_running_loop().create_future()
+            await self._waiter
+            self._waiter = None
+        return self._queue.popleft()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _UpdateStream(_ListenerStream, SilentQuoteListener):
+    """Stream of the arrays of updates sent to quote listeners."""
+
+    def __init__(self, conn: "AsyncQuoteConn", maxsize: int):
+        SilentQuoteListener.__init__(self, "%s-updates" % conn.name())
+        _ListenerStream.__init__(self, conn, maxsize)
+
+    def process_update(self, update: np.array) -> None:
+        self._put(update)
+
+    def process_update_batch(self, updates: np.array) -> None:
+        self._put(updates)
+
+
+class _BarStream(_ListenerStream, SilentBarListener):
+    """Stream of the arrays of complete bars sent to bar listeners."""
+
+    def __init__(self, conn: "AsyncBarConn", maxsize: int, history: bool):
+        SilentBarListener.__init__(self, "%s-bars" % conn.name())
+        _ListenerStream.__init__(self, conn, maxsize)
+        self._history = history
+
+    def process_live_bar(self, bar_data: np.array) -> None:
+        # BarConn reuses the array for single bars.
+        self._put(bar_data.copy())
+
+    def process_bar_batch(self, bar_data: np.array) -> None:
+        self._put(bar_data)
+
+    def process_history_bar(self, bar_data: np.array) -> None:
+        if self._history:
+            self._put(bar_data.copy())
+
+
+class AsyncQuoteConn(_AsyncFeed, QuoteConn):
+    """
+    QuoteConn read by the asyncio event loop.
+
+    Use like QuoteConn except that connect and disconnect are coroutines.
+    Updates can be read with async for from updates() as well as through
+    listeners.
+
+    """
+
+    def __init__(self, name: str = "AsyncQuoteConn",
+                 host: str = FeedConn.host, port: int = QuoteConn.port):
+        super().__init__(name, host, port)
+        self._init_async()
+
+    async def connect(self) -> None:
+        """
+        Connect, start reading and make the initialization requests.
+
+        """
+        await super().connect()
+        self._request_fundamental_fieldnames()
+        self._request_all_update_fieldnames()
+        self._request_current_update_fieldnames()
+
+    def updates(self, maxsize: int = 0) -> _UpdateStream:
+        """
+        Async iterator over quote updates.
+
+        :param maxsize: Most arrays to buffer, oldest dropped first. 0 means
+            no limit.
+        :return: Stream yielding the arrays process_update and
+            process_update_batch are sent, one row per update.
+
+        async with conn.updates() as updates:
+            async for update in updates:
+                ...
+
+        Start iterating before watching symbols to see their first updates.
+
+        """
+        return _UpdateStream(self, maxsize)
+
+
+class AsyncBarConn(_AsyncFeed, BarConn):
+    """
+    BarConn read by the asyncio event loop.
+
+    Use like BarConn except that connect and disconnect are coroutines.
+    Complete bars can be read with async for from bars() as well as through
+    listeners.
+
+    """
+
+    def __init__(self, name: str = "AsyncBarConn",
+                 host: str = FeedConn.host, port: int = BarConn.port):
+        super().__init__(name, host, port)
+        self._init_async()
+
+    def bars(self, maxsize: int = 0, history: bool = True) -> _BarStream:
+        """
+        Async iterator over complete bars.
+
+        :param maxsize: Most arrays to buffer, oldest dropped first. 0 means
+            no limit.
+        :param history: Include back-fill bars sent after a watch.
+        :return: Stream yielding arrays of dtype BarConn.interval_data_type.
+
+        Updates to the bar still in progress are not included.
+
+        """
+        return _BarStream(self, maxsize, history)
+
+
+class _FutureDone:
+    """Stands in for the done queue of _iter_pipelined for one request."""
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+
+    def put(self, item) -> None:
+        if not self.future.done():
+            self.future.set_result(item)
+
+
+class AsyncHistoryConn(_AsyncFeed, HistoryConn):
+    """
+    HistoryConn read by the asyncio event loop.
+
+    The request_* methods are coroutines which take the same arguments and
+    return or raise the same things as the HistoryConn methods. Any number
+    of requests can be awaited at the same time, IQFeed answers them in
+    parallel.
+
+    Streaming (iter_*) and the blocking *_many methods of HistoryConn are not
+    available, use request_bars_many and request_ticks_many here instead.
+
+    """
+
+    def __init__(self, name: str = "AsyncHistoryConn",
+                 host: str = FeedConn.host, port: int = HistoryConn.port):
+        super().__init__(name, host, port)
+        self._init_async()
+
+    def _reading_stopped(self, error: Exception) -> None:
+        super()._reading_stopped(error)
+        with self._req_lock:
+            waiting = list(self._req_done.values())
+        for done in waiting:
+            if isinstance(done, _FutureDone) and not done.future.done():
+                done.future.set_exception(error or ConnectionError(
+                    "%s disconnected" % self.name()))
+
+    async def _request(self, make_cmd: Callable[[str], str], read_name: str,
+                       timeout: float) -> np.array:
+        """
+        Send a request and wait for the whole response.
+
+        :param make_cmd: Takes a req_id and returns the request.
+        :param read_name: _read_* method that converts the response.
+        :param timeout: Wait upto timeout seconds. None means forever.
+
+        """
+        if not self.reader_running():
+            raise RuntimeError("%s is not connected" % self.name())
+        req_id = self._get_next_req_id()
+        self._setup_request_data(req_id)
+        future = asyncio.get_running_loop().create_future()
+        self._req_done[req_id] = _FutureDone(future)
+        req_cmd = make_cmd(req_id)
+        self._send_cmd(req_cmd)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._cancel_request(req_id)
+            raise RuntimeError("Request: %s, Error: Timed out" % req_cmd)
+        except BaseException:
+            self._cancel_request(req_id)
+            raise
+        data = getattr(self, read_name)(req_id)
+        with self._req_lock:
+            self._req_event.pop(req_id, None)
+        if data.dtype == object:
+            self._raise_request_error(req_cmd, str(data[0]))
+        return data
+
+    async def request_ticks(self, ticker: str, max_ticks: int,
+                            ascend: bool = False,
+                            timeout: float = None) -> np.array:
+        """See HistoryConn.request_ticks."""
+        return await self._request(
+            lambda req_id: self._ticks_cmd(ticker, max_ticks, ascend, req_id),
+            '_read_ticks', timeout)
+
+    async def request_ticks_for_days(self, ticker: str, num_days: int,
+                                     bgn_flt: datetime.time = None,
+                                     end_flt: datetime.time = None,
+                                     ascend: bool = False,
+                                     max_ticks: int = None,
+                                     timeout: float = None) -> np.array:
+        """See HistoryConn.request_ticks_for_days."""
+        return await self._request(
+            lambda req_id: self._ticks_for_days_cmd(
+                ticker, num_days, bgn_flt, end_flt, ascend, max_ticks,
+                req_id), '_read_ticks', timeout)
+
+    async def request_ticks_in_period(self, ticker: str,
+                                      bgn_prd: datetime.datetime,
+                                      end_prd: datetime.datetime,
+                                      bgn_flt: datetime.time = None,
+                                      end_flt: datetime.time = None,
+                                      ascend: bool = False,
+                                      max_ticks: int = None,
+                                      timeout: float = None) -> np.array:
+        """See HistoryConn.request_ticks_in_period."""
+        return await self._request(
+            lambda req_id: self._ticks_in_period_cmd(
+                ticker, bgn_prd, end_prd, bgn_flt, end_flt, ascend,
+                max_ticks, req_id), '_read_ticks', timeout)
+
+    async def request_bars(self, ticker: str, interval_len: int,
+                           interval_type: str, max_bars: int,
+                           ascend: bool = False, label_at_begin=False,
+                           timeout: float = None) -> np.array:
+        """See HistoryConn.request_bars."""
+        return await self._request(
+            lambda req_id: self._bars_cmd(
+                ticker, interval_len, interval_type, max_bars, ascend,
+                label_at_begin, req_id), '_read_bars', timeout)
+
+    async def request_bars_for_days(self, ticker: str, interval_len: int,
+                                    interval_type: str, days: int,
+                                    bgn_flt: datetime.time = None,
+                                    end_flt: datetime.time = None,
+                                    ascend: bool = False,
+                                    max_bars: int = None,
+                                    label_at_begin: bool = False,
+                                    timeout: float = None) -> np.array:
+        """See HistoryConn.request_bars_for_days."""
+        return await self._request(
+            lambda req_id: self._bars_for_days_cmd(
+                ticker, interval_len, interval_type, days, bgn_flt, end_flt,
+                ascend, max_bars, label_at_begin, req_id),
+            '_read_bars', timeout)
+
+    async def request_bars_in_period(self, ticker: str, interval_len: int,
+                                     interval_type: str,
+                                     bgn_prd: datetime.datetime,
+                                     end_prd: datetime.datetime,
+                                     bgn_flt: datetime.time = None,
+                                     end_flt: datetime.time = None,
+                                     ascend: bool = False,
+                                     max_bars: int = None,
+                                     label_at_beginning: bool = False,
+                                     timeout: float = None) -> np.array:
+        """See HistoryConn.request_bars_in_period."""
+        return await self._request(
+            lambda req_id: self._bars_in_period_cmd(
+                ticker, interval_len, interval_type, bgn_prd, end_prd,
+                bgn_flt, end_flt, ascend, max_bars, label_at_beginning,
+                req_id), '_read_bars', timeout)
+
+    async def request_daily_data(self, ticker: str, num_days: int,
+                                 ascend: bool = False,
+                                 timeout: float = None) -> np.array:
+        """See HistoryConn.request_daily_data."""
+        return await self._request(
+            lambda req_id: self._daily_cmd("HDX", ticker, num_days, ascend,
+                                           req_id),
+            '_read_daily_data', timeout)
+
+    async def request_daily_data_for_dates(self, ticker: str,
+                                           bgn_dt: datetime.date,
+                                           end_dt: datetime.date,
+                                           ascend: bool = False,
+                                           max_days: int = None,
+                                           timeout: float = None) -> np.array:
+        """See HistoryConn.request_daily_data_for_dates."""
+        return await self._request(
+            lambda req_id: self._daily_for_dates_cmd(
+                ticker, bgn_dt, end_dt, ascend, max_days, req_id),
+            '_read_daily_data', timeout)
+
+    async def request_weekly_data(self, ticker: str, num_weeks: int,
+                                  ascend: bool = False,
+                                  timeout: float = None) -> np.array:
+        """See HistoryConn.request_weekly_data."""
+        return await self._request(
+            lambda req_id: self._daily_cmd("HWX", ticker, num_weeks, ascend,
+                                           req_id),
+            '_read_daily_data', timeout)
+
+    async def request_monthly_data(self, ticker: str, num_months: int,
+                                   ascend: bool = False,
+                                   timeout: float = None) -> np.array:
+        """See HistoryConn.request_monthly_data."""
+        return await self._request(
+            lambda req_id: self._daily_cmd("HMX", ticker, num_months, ascend,
+                                           req_id),
+            '_read_daily_data', timeout)
+
+    async def _request_many(self, jobs, max_in_flight: int,
+                            timeout: float) -> Dict[str, np.array]:
+        """
+        Run jobs from _bar_jobs or _tick_jobs, max_in_flight at a time.
+
+        Same results as HistoryConn._iter_pipelined: an empty array if IQFeed
+        had no data, the exception for any other error.
+
+        """
+        assert max_in_flight > 0
+        slots = asyncio.Semaphore(max_in_flight)
+
+        async def run(key, make_cmd, read_name, dtype):
+            async with slots:
+                try:
+                    return key, await self._request(make_cmd, read_name,
+                                                    timeout)
+                except NoDataError:
+                    return key, np.zeros(0, dtype=dtype)
+                except (UnauthorizedError, RuntimeError) as err:
+                    return key, err
+        return dict(await asyncio.gather(*(run(*job) for job in jobs)))
+
+    async def request_bars_many(self, tickers: Sequence[str],
+                                interval_len: int, interval_type: str,
+                                max_bars: int = None,
+                                bgn_prd: datetime.datetime = None,
+                                end_prd: datetime.datetime = None,
+                                ascend: bool = False,
+                                label_at_begin: bool = False,
+                                max_in_flight: int = 4,
+                                timeout: float = None) -> Dict[str, np.array]:
+        """See HistoryConn.request_bars_many."""
+        return await self._request_many(HistoryConn._bar_jobs(
+            tickers, interval_len, interval_type, max_bars, bgn_prd, end_prd,
+            ascend, label_at_begin), max_in_flight, timeout)
+
+    async def request_ticks_many(self, tickers: Sequence[str],
+                                 max_ticks: int = None,
+                                 bgn_prd: datetime.datetime = None,
+                                 end_prd: datetime.datetime = None,
+                                 ascend: bool = False,
+                                 max_in_flight: int = 4,
+                                 timeout: float = None) -> Dict[str, np.array]:
+        """See HistoryConn.request_ticks_many."""
+        return await self._request_many(HistoryConn._tick_jobs(
+            tickers, max_ticks, bgn_prd, end_prd, ascend), max_in_flight,
+            timeout)
+
+    def iter_ticks_in_period(self, *args, **kwargs):
+        raise RuntimeError("%s is read by the event loop, use await "
+                           "request_ticks_in_period()" % self.name())
+
+    def iter_bars_in_period(self, *args, **kwargs):
+        raise RuntimeError("%s is read by the event loop, use await "
+                           "request_bars_in_period()" % self.name())
+
+    def iter_bars_many(self, *args, **kwargs):
+        raise RuntimeError("%s is read by the event loop, use await "
+                           "request_bars_many()" % self.name())
+
+    def iter_ticks_many(self, *args, **kwargs):
+        raise RuntimeError("%s is read by the event loop, use await "
+                           "request_ticks_many()" % self.name())
@@ -0,0 +1,445 @@
+# coding=utf-8
+
+"""
+Build interval bars locally from the trades in QuoteConn updates.
+
+BarConn needs one watch per symbol per kind of bar and each of those counts
+against the IQFeed symbol limit. A BarBuilder is a QuoteConn listener that
+builds time, tick and volume bars for any number of intervals from the
+trades in the updates of one watch (or trades_watch) per symbol, and sends
+them to SilentBarListeners with the same callbacks and the same dtype
+(BarConn.interval_data_type) BarConn uses, so a bar listener works the
+same whichever of the two it is attached to.
+
+The bars being built are kept in numpy arrays with one slot per symbol for
+each interval and a batch of updates is added to them with a handful of
+numpy operations per interval, so put the QuoteConn in batch mode.
+
+builder = BarBuilder("bars", [(60, 's'), (1000, 'v'), (50, 't')])
+builder.add_listener(minute_listener, 60, 's')
+quote_conn.add_listener(builder)
+quote_conn.select_update_fieldnames(BarBuilder.update_fields)
+quote_conn.trades_watch("SPY")
+
+Only trades flagged as last qualified ('C' in Message Contents) are used,
+as for IQFeed's own bars. Time bars are labelled with the time they end at
+and bars with no trades are skipped. A time bar is complete when a later
+trade in the same symbol arrives or a timestamp message (sent every second
+by IQFeed) says its time is up, whichever is first. Trades that arrive late
+for a bar that is already complete go into the next bar. Tick and volume
+bars are complete with the trade that takes them to interval_len trades or
+shares and are labelled with the time of their last trade.
+
+"""
+
+import threading
+from typing import List, Sequence, Tuple
+import numpy as np
+
+from .conn import BarConn, FeedConn
+from .listeners import SilentQuoteListener, SilentBarListener
+from .symbol_table import SymbolTable
+
+_us_per_day = 86400 * 1000000
+
+
+class _OpenBars:
+    """The bar being built for each symbol for one interval."""
+
+    dtype = np.dtype([('active', '?'), ('key', 'i8'), ('open_p', 'f8'),
+                      ('high_p', 'f8'), ('low_p', 'f8'), ('close_p', 'f8'),
+                      ('tot_vlm', 'u8'), ('prd_vlm', 'u8'),
+                      ('num_trds', 'u8'), ('last_ts', 'i8'),
+                      ('sent_ts', 'i8')])
+
+    def __init__(self, interval_len: int, interval_type: str):
+        self.interval_len = interval_len
+        self.interval_type = interval_type
+        self.len_us = interval_len * 1000000
+        # For time bars key is the number of the interval (time since the
+        # epoch // interval length) of the open bar, or of the earliest bar
+        # a trade may go into when no bar is open.
+        self.bars = np.zeros(0, dtype=_OpenBars.dtype)
+
+    def grow(self, num_symbols: int) -> None:
+        """Make room for symbol ids below num_symbols."""
+        num_slots = len(self.bars)
+        if num_symbols > num_slots:
+            bars = np.zeros(max(num_symbols, 2 * num_slots),
+                            dtype=_OpenBars.dtype)
+            bars[:num_slots] = self.bars
+            bars['sent_ts'][num_slots:] = np.iinfo(np.int64).min // 2
+            self.bars = bars
+
+
+class BarBuilder(SilentQuoteListener):
+    """
+    QuoteConn listener that builds time, tick and volume bars from trades.
+
+    :param name: Name of the listener.
+    :param intervals: (interval_len, interval_type) of each kind of bar to
+        build. interval_type is 's' (seconds), 't' (trades) or 'v'
+        (volume) as for BarConn.watch.
+    :param update: Send process_latest_bar_update for a symbol's current
+        bar at most every update seconds of trade time. 0 sends one for
+        every batch of updates that changes the bar, None (the default)
+        never sends them.
+    :param symbols: The QuoteConn's symbol_table() if the QuoteConn sends
+        compact updates.
+
+    Listeners are added for one interval or for all of them. The bars sent
+    to a listener don't say which interval they are for so a listener that
+    gets several intervals can't tell them apart, same as when watching a
+    symbol more than once on BarConn.
+
+    """
+
+    # Fields a QuoteConn feeding a BarBuilder needs in its updates.
+    update_fields = ["Symbol", "Most Recent Trade", "Most Recent Trade Size",
+                     "Most Recent Trade Time", "Most Recent Trade Date",
+                     "Total Volume", "Message Contents"]
+
+    def __init__(self, name: str, intervals: Sequence[Tuple[int, str]],
+                 update: float = None, symbols: SymbolTable = None):
+        super().__init__(name)
+        for interval_len, interval_type in intervals:
+            assert interval_type in ('s', 't', 'v')
+            assert interval_len > 0
+        self._open = [_OpenBars(*interval) for interval in intervals]
+        self._update_us = None if update is None else int(update * 1000000)
+        self._compact = symbols is not None
+        self._symbols = symbols if symbols is not None else SymbolTable()
+        self._bar_listeners = []
+        self._batch_mode = False
+        self._today = None
+        self._lock = threading.RLock()
+
+    def add_listener(self, listener: SilentBarListener,
+                     interval_len: int = None,
+                     interval_type: str = None) -> None:
+        """
+        Send bars to listener.
+
+        :param listener: A SilentBarListener.
+        :param interval_len: With interval_type, the interval listener gets
+            bars for. Leave both None to get bars for all intervals.
+        :param interval_type: 's', 't' or 'v'.
+
+        """
+        interval = None
+        if interval_len is not None:
+            interval = (interval_len, interval_type)
+            assert interval in self.intervals()
+        with self._lock:
+            self._bar_listeners.append((listener, interval))
+
+    def remove_listener(self, listener: SilentBarListener) -> None:
+        """Stop sending bars to listener, for all intervals."""
+        with self._lock:
+            self._bar_listeners = [(lstn, interval) for lstn, interval
+                                   in self._bar_listeners
+                                   if lstn is not listener]
+
+    def set_batch_mode(self, batch_mode: bool) -> None:
+        """
+        Send the bars completed by a batch of updates in one call.
+
+        :param batch_mode: If True complete bars are sent with
+            process_bar_batch, all the bars for an interval completed by a
+            batch of updates or a timestamp in one call. If False (the
+            default) each is sent with its own process_live_bar call.
+
+        """
+        self._batch_mode = batch_mode
+
+    def intervals(self) -> List[Tuple[int, str]]:
+        """(interval_len, interval_type) of every interval being built."""
+        return [(ob.interval_len, ob.interval_type) for ob in self._open]
+
+    def symbol_table(self) -> SymbolTable:
+        """Table of the ids used for symbols internally."""
+        return self._symbols
+
+    def current_bar(self, symbol: str, interval_len: int,
+                    interval_type: str) -> np.array:
+        """
+        The bar being built for symbol, as sent to listeners.
+
+        :return: Array of length 1 or 0 if no bar is being built.
+
+        """
+        with self._lock:
+            ob = self._open[self.intervals().index(
+                (interval_len, interval_type))]
+            sym_id = self._symbol_id(symbol)
+            if sym_id is None or sym_id >= len(ob.bars) or not (
+                    ob.bars['active'][sym_id]):
+                return np.zeros(0, dtype=BarConn.interval_data_type)
+            return self._state_bars(ob, np.array([sym_id]))
+
+    def _symbol_id(self, symbol: str):
+        if self._compact:
+            return self._symbols.id_of(symbol)
+        sym_id = self._symbols.id_of(symbol.encode())
+        return sym_id if sym_id is not None else self._symbols.id_of(symbol)
+
+    def process_update(self, update: np.array) -> None:
+        self.process_update_batch(update)
+
+    def process_update_batch(self, updates: np.array) -> None:
+        """Add the trades in a batch of updates to the bars being built."""
+        if len(updates) == 0:
+            return
+        names = updates.dtype.names
+        is_trade = updates['Most Recent Trade Size'] > 0
+        if 'Message Contents' in names:
+            is_trade &= np.char.find(updates['Message Contents'], b'C') >= 0
+        trades = updates[is_trade]
+        if len(trades) == 0:
+            return
+        with self._lock:
+            if self._compact:
+                sym = trades['Symbol'].astype(np.int64)
+            else:
+                sym = self._symbols.intern_column(
+                    trades['Symbol']).astype(np.int64)
+            if 'Most Recent Trade Date' in names:
+                days = trades['Most Recent Trade Date'].astype(np.int64)
+            else:
+                days = self._today_days()
+            ts = (days * _us_per_day +
+                  trades['Most Recent Trade Time'].astype(np.int64))
+            order = np.argsort(sym, kind='stable')
+            sym = sym[order]
+            ts = ts[order]
+            px = trades['Most Recent Trade'][order].astype(np.float64)
+            size = trades['Most Recent Trade Size'][order].astype(np.uint64)
+            tot = trades['Total Volume'][order].astype(np.uint64)
+            group_start = np.flatnonzero(
+                np.concatenate(([True], sym[1:] != sym[:-1])))
+            for ob in self._open:
+                ob.grow(len(self._symbols))
+                if ob.interval_type == 's':
+                    segs = self._time_segments(ob, sym, ts, group_start)
+                else:
+                    segs = self._count_segments(ob, sym, size, group_start)
+                done, latest = self._add_segments(ob, sym, ts, px, size, tot,
+                                                  *segs)
+                self._send(ob, done, latest)
+
+    def process_timestamp(self, time_val: FeedConn.TimeStampMsg) -> None:
+        """Complete the time bars whose time is up."""
+        self._today = time_val.date
+        now = (time_val.date.astype(np.int64) * _us_per_day +
+               int(time_val.time))
+        with self._lock:
+            for ob in self._open:
+                if ob.interval_type != 's' or len(ob.bars) == 0:
+                    continue
+                bars = ob.bars
+                ended = np.flatnonzero(
+                    bars['active'] & ((bars['key'] + 1) * ob.len_us <= now))
+                if len(ended):
+                    done = self._state_bars(ob, ended)
+                    bars['active'][ended] = False
+                    bars['key'][ended] += 1
+                    self._send(ob, done, None)
+
+    def _today_days(self) -> int:
+        if self._today is None:
+            self._today = np.datetime64('today', 'D')
+        return self._today.astype(np.int64)
+
+    @staticmethod
+    def _time_segments(ob: _OpenBars, sym: np.array, ts: np.array,
+                       group_start: np.array):
+        """Split sorted trades into runs in the same symbol and interval."""
+        num = len(sym)
+        key = np.maximum(ts // ob.len_us, ob.bars['key'][sym])
+        # Trades are in time order within a symbol but a late one can't go
+        # into a bar before one that's already been started.
+        group = np.zeros(num, dtype=np.int64)
+        group[group_start] = 1
+        group = np.cumsum(group) << 42
+        key = np.maximum.accumulate(key + group) - group
+        new = np.ones(num, dtype=bool)
+        new[1:] = (key[1:] != key[:-1]) | (sym[1:] != sym[:-1])
+        starts = np.flatnonzero(new)
+        ends = np.append(starts[1:], num)
+        complete = np.zeros(len(starts), dtype=bool)
+        complete[:-1] = sym[starts[1:]] == sym[starts[:-1]]
+        return starts, ends, complete, key[starts]
+
+    @staticmethod
+    def _count_segments(ob: _OpenBars, sym: np.array, size: np.array,
+                        group_start: np.array):
+        """Split sorted trades into runs making up tick or volume bars."""
+        num = len(sym)
+        if ob.interval_type == 't':
+            weight, so_far = np.ones(num, dtype=np.int64), 'num_trds'
+        else:
+            weight, so_far = size.astype(np.int64), 'prd_vlm'
+        bars = ob.bars
+        group_end = np.append(group_start[1:], num)
+        carried = np.where(bars['active'][sym[group_start]],
+                           bars[so_far][sym[group_start]], 0).astype(np.int64)
+        # Only symbols that complete a bar need to be split up.
+        completes = (np.add.reduceat(weight, group_start) + carried >=
+                     ob.interval_len)
+        starts = list(group_start[~completes])
+        ends = list(group_end[~completes])
+        complete = [False] * len(starts)
+        for bgn, end, so_far_sym in zip(group_start[completes],
+                                        group_end[completes],
+                                        carried[completes]):
+            cum = np.cumsum(weight[bgn:end]) + so_far_sym
+            base = pos = 0
+            while pos < end - bgn:
+                last = np.searchsorted(cum, base + ob.interval_len)
+                if last >= end - bgn:
+                    break
+                starts.append(bgn + pos)
+                ends.append(bgn + last + 1)
+                complete.append(True)
+                base = cum[last]
+                pos = last + 1
+            if pos < end - bgn:
+                starts.append(bgn + pos)
+                ends.append(end)
+                complete.append(False)
+        order = np.argsort(starts)
+        return (np.array(starts, dtype=np.int64)[order],
+                np.array(ends, dtype=np.int64)[order],
+                np.array(complete, dtype=bool)[order], None)
+
+    def _add_segments(self, ob: _OpenBars, sym, ts, px, size, tot,
+                      starts, ends, complete, key):
+        """
+        Merge runs of trades into the open bars.
+
+        :return: (complete bars, ids of symbols with an updated open bar).
+
+        """
+        bars = ob.bars
+        seg_sym = sym[starts]
+        first = np.ones(len(starts), dtype=bool)
+        first[1:] = seg_sym[1:] != seg_sym[:-1]
+        last = np.ones(len(starts), dtype=bool)
+        last[:-1] = first[1:]
+
+        open_p = px[starts]
+        high_p = np.maximum.reduceat(px, starts)
+        low_p = np.minimum.reduceat(px, starts)
+        close_p = px[ends - 1]
+        prd_vlm = np.add.reduceat(size, starts)
+        num_trds = (ends - starts).astype(np.uint64)
+        tot_vlm = tot[ends - 1]
+        last_ts = ts[ends - 1]
+
+        done = []
+        was_open = first & bars['active'][seg_sym]
+        if key is not None:
+            # A time bar left open by an earlier batch, complete now that
+            # there's a trade in a later interval.
+            stale = np.flatnonzero(was_open & (bars['key'][seg_sym] != key))
+            if len(stale):
+                done.append(self._state_bars(ob, seg_sym[stale]))
+            was_open &= bars['key'][seg_sym] == key
+        merge = np.flatnonzero(was_open)
+        merge_sym = seg_sym[merge]
+        open_p[merge] = bars['open_p'][merge_sym]
+        high_p[merge] = np.maximum(high_p[merge], bars['high_p'][merge_sym])
+        low_p[merge] = np.minimum(low_p[merge], bars['low_p'][merge_sym])
+        prd_vlm[merge] += bars['prd_vlm'][merge_sym]
+        num_trds[merge] += bars['num_trds'][merge_sym]
+
+        ready = np.flatnonzero(complete)
+        if len(ready):
+            done.append(self._make_bars(
+                ob, seg_sym[ready], None if key is None else key[ready],
+                last_ts[ready], open_p[ready], high_p[ready], low_p[ready],
+                close_p[ready], tot_vlm[ready], prd_vlm[ready],
+                num_trds[ready]))
+
+        ends_open = np.flatnonzero(last & ~complete)
+        ends_done = np.flatnonzero(last & complete)
+        bars['active'][seg_sym[ends_done]] = False
+        if key is not None:
+            bars['key'][seg_sym[ends_done]] = key[ends_done] + 1
+        open_sym = seg_sym[ends_open]
+        bars['active'][open_sym] = True
+        if key is not None:
+            bars['key'][open_sym] = key[ends_open]
+        for field, vals in [('open_p', open_p), ('high_p', high_p),
+                            ('low_p', low_p), ('close_p', close_p),
+                            ('tot_vlm', tot_vlm), ('prd_vlm', prd_vlm),
+                            ('num_trds', num_trds), ('last_ts', last_ts)]:
+            bars[field][open_sym] = vals[ends_open]
+
+        if len(done) == 0:
+            done = None
+        elif len(done) == 1:
+            done = done[0]
+        else:
+            done = np.concatenate(done)
+        latest = None
+        if self._update_us is not None and len(open_sym):
+            due = open_sym[bars['last_ts'][open_sym] - bars['sent_ts'][
+                open_sym] >= self._update_us]
+            bars['sent_ts'][due] = bars['last_ts'][due]
+            latest = due
+        return done, latest
+
+    def _state_bars(self, ob: _OpenBars, sym_ids: np.array) -> np.array:
+        """Open bars of symbols sym_ids as BarConn bars."""
+        bars = ob.bars[sym_ids]
+        key = bars['key'] if ob.interval_type == 's' else None
+        return self._make_bars(ob, sym_ids, key, bars['last_ts'],
+                               bars['open_p'], bars['high_p'],
+                               bars['low_p'], bars['close_p'],
+                               bars['tot_vlm'], bars['prd_vlm'],
+                               bars['num_trds'])
+
+    def _make_bars(self, ob: _OpenBars, sym_ids, key, last_ts, open_p,
+                   high_p, low_p, close_p, tot_vlm, prd_vlm,
+                   num_trds) -> np.array:
+        bars = np.zeros(len(sym_ids), dtype=BarConn.interval_data_type)
+        names = self._symbols.names(sym_ids)
+        bars['symbol'] = [name if isinstance(name, bytes) else name.encode()
+                          for name in names]
+        if key is not None:
+            # Labelled with the end of the interval, on the day it started.
+            start = key * ob.len_us
+            days = start // _us_per_day
+            bars['time'] = start + ob.len_us - days * _us_per_day
+        else:
+            days = last_ts // _us_per_day
+            bars['time'] = last_ts - days * _us_per_day
+        bars['date'] = days.astype('M8[D]')
+        bars['open_p'] = open_p
+        bars['high_p'] = high_p
+        bars['low_p'] = low_p
+        bars['close_p'] = close_p
+        bars['tot_vlm'] = tot_vlm
+        bars['prd_vlm'] = prd_vlm
+        bars['num_trds'] = num_trds
+        return bars
+
+    def _send(self, ob: _OpenBars, done: np.array, latest: np.array) -> None:
+        interval = (ob.interval_len, ob.interval_type)
+        listeners = [listener for listener, for_interval
+                     in self._bar_listeners
+                     if for_interval is None or for_interval == interval]
+        if done is not None and len(done):
+            for listener in listeners:
+                if self._batch_mode:
+                    listener.process_bar_batch(done)
+                else:
+                    for bar_num in range(len(done)):
+                        listener.process_live_bar(done[bar_num:bar_num + 1])
+        if latest is not None and len(latest) and listeners:
+            bars = self._state_bars(ob, latest)
+            for bar_num in range(len(bars)):
+                for listener in listeners:
+                    listener.process_latest_bar_update(
+                        bars[bar_num:bar_num + 1])
@@ -0,0 +1,124 @@
+# coding=utf-8
+
+"""
+Receive buffer used by the FeedConn reader.
+
+IQFeed sends newline delimited messages. The old reader decoded every
+recv into a str and appended it to a growing string, then sliced one message
+at a time off the front of that string, which copies everything left in the
+buffer once per message. With a few hundred watched symbols at the open that
+is quadratic in the amount of data received per read.
+
+RingBuffer keeps a single preallocated bytearray. Data is received
+directly into it with socket.recv_into through a memoryview, so no
+intermediate bytes objects are created. All complete lines are split out of
+the buffer in one pass per read. Only the trailing partial line, if any, is
+ever moved, and only when the free space at the end of the buffer is less
+than the read size. Rather than wrapping a line around the end of the buffer
+the partial line is rewound to the front, which keeps every line contiguous
+so it can be decoded without stitching.
+
+"""
+
+import socket
+from typing import List
+
+
+class RingBuffer:
+    """
+    Byte buffer that socket data is received into and lines are split out of.
+
+    :param capacity: Initial size of the buffer in bytes.
+
+    The buffer grows (doubling) if a single line is longer than the space
+    available, so capacity is a starting point not a hard limit.
+
+    """
+
+    def __init__(self, capacity: int = 1 << 20):
+        assert capacity > 0
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        """Number of bytes received but not yet returned as lines."""
+        return self._end - self._start
+
+    def capacity(self) -> int:
+        """Current size of the underlying bytearray."""
+        return len(self._buf)
+
+    def clear(self) -> None:
+        """Throw away everything in the buffer."""
+        self._start = 0
+        self._end = 0
+
+    def _reserve(self, num_bytes: int) -> None:
+        """Make sure there are at least num_bytes free at the end."""
+        if len(self._buf) - self._end >= num_bytes:
+            return
+        pending = self._end - self._start
+        if pending + num_bytes > len(self._buf):
+            new_capacity = len(self._buf)
+            while pending + num_bytes > new_capacity:
+                new_capacity *= 2
+            new_buf = bytearray(new_capacity)
+            new_buf[:pending] = self._view[self._start:self._end]
+            self._view.release()
+            self._buf = new_buf
+            self._view = memoryview(self._buf)
+        else:
+            # Source and destination may overlap so copy out first. This is
+            # only ever the tail of a single partial line.
+            self._buf[:pending] = bytes(self._view[self._start:self._end])
+        self._start = 0
+        self._end = pending
+
+    def recv_into(self, sock: socket.socket, num_bytes: int) -> int:
+        """
+        Receive upto num_bytes from sock directly into the buffer.
+
+        :param sock: A connected socket that is ready for reading.
+        :param num_bytes: Maximum number of bytes to read.
+        :return: Number of bytes read. 0 means the peer closed the socket.
+
+        """
+        self._reserve(num_bytes)
+        num_read = sock.recv_into(
+            self._view[self._end:self._end + num_bytes], num_bytes)
+        self._end += num_read
+        return num_read
+
+    def last(self, num_bytes: int) -> memoryview:
+        """The last num_bytes added to the buffer, valid until it changes."""
+        return self._view[self._end - num_bytes:self._end]
+
+    def feed(self, data: bytes) -> None:
+        """Copy data that was received some other way into the buffer."""
+        num_bytes = len(data)
+        self._reserve(num_bytes)
+        self._buf[self._end:self._end + num_bytes] = data
+        self._end += num_bytes
+
+    def pop_lines(self) -> List[str]:
+        """
+        Return all complete lines in the buffer and remove them from it.
+
+        Lines are decoded as latin-1 and stripped of surrounding whitespace
+        (including the <CR> IQFeed sends before each <LF>). Blank lines are
+        dropped. An incomplete trailing line stays in the buffer until the
+        rest of it is received.
+
+        """
+        last_delim = self._buf.rfind(b'\n', self._start, self._end)
+        if last_delim == -1:
+            return []
+        text = str(self._view[self._start:last_delim], 'latin-1')
+        if last_delim + 1 == self._end:
+            self._start = 0
+            self._end = 0
+        else:
+            self._start = last_delim + 1
+        return [line for line in map(str.strip, text.split('\n')) if line]
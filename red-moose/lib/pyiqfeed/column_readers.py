@@ -0,0 +1,321 @@
+# coding=utf-8
+
+"""
+Parse a whole column of a batch of messages at once.
+
+The functions in field_readers parse one field of one message. When many
+messages with the same layout are parsed together (a batch of updates from
+QuoteConn for example) it is much cheaper to transpose the batch into
+columns and let numpy convert each column in one call than to call a Python
+function per field per message.
+
+Each column reader takes a sequence of strings (one column of the batch) and
+returns a numpy array. If a column contains something the fast path cannot
+handle, the column is parsed again one field at a time with the matching
+function from field_readers, so results and exceptions are the same as
+parsing message by message.
+
+"""
+
+import itertools
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+from . import field_readers as fr
+
+
+def _read_each(reader: Callable, column: Sequence[str],
+               dtype: str) -> np.array:
+    """Parse a column one field at a time with a field_readers function."""
+    return np.array([reader(field) for field in column], dtype=dtype)
+
+
+def read_float64_column(column: Sequence[str]) -> np.array:
+    """Read a column of float64s. Blanks are read as NaN."""
+    if "" in column:
+        column = [field or "nan" for field in column]
+    try:
+        return np.array(column, dtype=np.float64)
+    except ValueError:
+        return _read_each(fr.read_float64, column, 'f8')
+
+
+def _uint_column_reader(reader: Callable, dtype: str) -> Callable:
+    """Column reader for unsigned ints of dtype. Blanks are read as 0."""
+    def read_column(column: Sequence[str]) -> np.array:
+        if "" in column:
+            column = [field or "0" for field in column]
+        try:
+            return np.array(column, dtype=dtype)
+        except (ValueError, OverflowError):
+            return _read_each(reader, column, dtype)
+    return read_column
+
+
+read_uint8_column = _uint_column_reader(fr.read_uint8, 'u1')
+read_uint16_column = _uint_column_reader(fr.read_uint16, 'u2')
+read_uint32_column = _uint_column_reader(fr.read_uint32, 'u4')
+read_uint64_column = _uint_column_reader(fr.read_uint64, 'u8')
+
+
+def _char_matrix(column: Sequence[str], width: int) -> Optional[np.array]:
+    """
+    Column as a (rows, width) array of character codes.
+
+    Returns None unless every field is exactly width ASCII characters long.
+
+    """
+    num_rows = len(column)
+    lengths = np.fromiter(map(len, column), dtype=np.int64, count=num_rows)
+    if num_rows == 0 or not np.all(lengths == width):
+        return None
+    try:
+        as_bytes = np.array(column, dtype='S%d' % width)
+    except UnicodeEncodeError:
+        return None
+    return as_bytes.view(np.uint8).reshape(num_rows, width)
+
+
+def _read_digits(chars: np.array, bgn: int, end: int) -> Optional[np.array]:
+    """
+    Integer value of the decimal digits in chars[:, bgn:end].
+
+    Returns None if any of those characters is not a digit.
+
+    """
+    digits = chars[:, bgn:end].astype(np.int64) - ord('0')
+    if np.any((digits < 0) | (digits > 9)):
+        return None
+    return digits @ (10 ** np.arange(end - bgn - 1, -1, -1, dtype=np.int64))
+
+
+def _days_from_chars(chars: np.array) -> Optional[np.array]:
+    """Read CCYY-MM-DD in the first 10 chars as np.datetime64('D')."""
+    year = _read_digits(chars, 0, 4)
+    month = _read_digits(chars, 5, 7)
+    day = _read_digits(chars, 8, 10)
+    if year is None or month is None or day is None:
+        return None
+    if np.any((month < 1) | (month > 12) | (day < 1) | (day > 31)):
+        return None
+    months = ((year - 1970) * 12 + month - 1).astype('M8[M]')
+    return months.astype('M8[D]') + (day - 1).astype('m8[D]')
+
+
+def _us_from_chars(chars: np.array, bgn: int,
+                   with_us: bool) -> Optional[np.array]:
+    """Read HH:MM:SS[.us] starting at char bgn as us since midnight."""
+    hour = _read_digits(chars, bgn, bgn + 2)
+    minute = _read_digits(chars, bgn + 3, bgn + 5)
+    second = _read_digits(chars, bgn + 6, bgn + 8)
+    if hour is None or minute is None or second is None:
+        return None
+    micro = 0
+    if with_us:
+        micro = _read_digits(chars, bgn + 9, bgn + 15)
+        if micro is None:
+            return None
+    return 1000000 * (3600 * hour + 60 * minute + second) + micro
+
+
+def read_hhmmssus_column(column: Sequence[str]) -> np.array:
+    """Read a column of HH:MM:SS.us fields as us since midnight."""
+    if "" in column:
+        # Blank reads as 0, same as midnight.
+        column = [field or "00:00:00.000000" for field in column]
+    chars = _char_matrix(column, 15)
+    us = None if chars is None else _us_from_chars(chars, 0, True)
+    if us is None:
+        return _read_each(fr.read_hhmmssus, column, 'u8')
+    return us.astype(np.uint64)
+
+
+def read_date_column(column: Sequence[str]) -> np.array:
+    """Read a column of CCYY-MM-DD fields as np.datetime64('D')."""
+    chars = _char_matrix(column, 10)
+    days = None if chars is None else _days_from_chars(chars)
+    if days is None:
+        return np.array(column, dtype='M8[D]')
+    return days
+
+
+def _posix_ts_column(column: Sequence[str], reader: Callable,
+                     with_us: bool) -> Tuple[np.array, np.array]:
+    """Shared implementation of the read_posix_ts_*column functions."""
+    chars = _char_matrix(column, 26 if with_us else 19)
+    days = us = None
+    if chars is not None:
+        days = _days_from_chars(chars)
+        us = _us_from_chars(chars, 11, with_us)
+    if days is None or us is None:
+        pairs = [reader(field) for field in column]
+        days = np.array([pair[0] for pair in pairs], dtype='M8[D]')
+        us = np.array([pair[1] for pair in pairs], dtype=np.int64)
+    return days, us.astype('m8[us]')
+
+
+def read_posix_ts_column(
+        column: Sequence[str]) -> Tuple[np.array, np.array]:
+    """Read a column of CCYY-MM-DD HH:MM:SS fields as (dates, times)."""
+    return _posix_ts_column(column, fr.read_posix_ts, False)
+
+
+def read_posix_ts_us_column(
+        column: Sequence[str]) -> Tuple[np.array, np.array]:
+    """Read a column of CCYY-MM-DD HH:MM:SS.us fields as (dates, times)."""
+    return _posix_ts_column(column, fr.read_posix_ts_us, True)
+
+
+# Value of each ASCII hex digit, 255 for anything else. 0 (padding added when
+# a short field is stored in a fixed width array) reads as 0.
+_hex_values = np.full(256, 255, dtype=np.uint8)
+_hex_values[0] = 0
+_hex_values[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+_hex_values[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+_hex_values[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+
+
+def read_trade_conditions_column(column: Sequence[str]) -> np.array:
+    """
+    Read a column of trade condition fields.
+
+    :return: A (rows, 4) uint8 array. Column i is condition i + 1 or 0.
+
+    Each field is upto 4 conditions, each 2 hex digits, run together.
+
+    """
+    num_rows = len(column)
+    lengths = np.fromiter(map(len, column), dtype=np.int64, count=num_rows)
+    if np.all((lengths % 2 == 0) & (lengths <= 8)):
+        try:
+            chars = np.array(column, dtype='S8').view(np.uint8).reshape(
+                num_rows, 8)
+        except UnicodeEncodeError:
+            chars = None
+        if chars is not None:
+            nibbles = _hex_values[chars]
+            if not np.any(nibbles == 255):
+                return (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+    return np.array([fr.read_trade_conditions(field) for field in column],
+                    dtype=np.uint8).reshape(num_rows, 4)
+
+
+def _distinct_column_reader(reader: Callable, dtype: str) -> Callable:
+    """
+    Column reader for fields that take only a few distinct values.
+
+    Each distinct value is parsed once with reader and the column is filled
+    in from those, so a batch of updates that all have the same date or
+    market open flag costs one parse rather than one per message.
+
+    """
+    def read_column(column: Sequence[str]) -> np.array:
+        parsed = {field: reader(field) for field in set(column)}
+        return np.array([parsed[field] for field in column], dtype=dtype)
+    return read_column
+
+
+read_mmddccyy_column = _distinct_column_reader(fr.read_mmddccyy, 'M8[D]')
+read_hex_column = _distinct_column_reader(fr.read_hex, 'u1')
+read_is_market_open_column = _distinct_column_reader(fr.read_is_market_open,
+                                                     'b1')
+read_tick_direction_column = _distinct_column_reader(fr.read_tick_direction,
+                                                     'i1')
+
+
+_column_readers = {
+    fr.read_float64: read_float64_column,
+    fr.read_uint8: read_uint8_column,
+    fr.read_uint16: read_uint16_column,
+    fr.read_uint64: read_uint64_column,
+    fr.read_hhmmssus: read_hhmmssus_column,
+    fr.read_mmddccyy: read_mmddccyy_column,
+    fr.read_hex: read_hex_column,
+    fr.read_is_market_open: read_is_market_open_column,
+    fr.read_tick_direction: read_tick_direction_column,
+}
+
+
+def column_reader(dtype: str, reader: Callable) -> Callable:
+    """
+    Return a function that parses a column of fields read by reader.
+
+    :param dtype: numpy dtype the column is stored as.
+    :param reader: field_readers function that reads one field.
+    :return: A function taking a sequence of strings returning an np.array.
+
+    Fields stored as byte strings that are not parsed (reader returns the
+    field unchanged) are just encoded. Any reader without a vectorized
+    version is applied one field at a time.
+
+    """
+    if reader in _column_readers:
+        return _column_readers[reader]
+    if np.dtype(dtype).kind == 'S':
+        return lambda column: np.array(column, dtype=dtype)
+    return lambda column: _read_each(reader, column, dtype)
+
+
+class FieldsetParser:
+    """
+    Parser for messages with one fixed set of fields.
+
+    :param fields: (name, dtype, reader) for each field in the order the
+        fields appear in the message, as in QuoteConn.quote_msg_map. A
+        field may have a fourth element, the function parse_many uses to
+        read its column instead of the one column_reader picks.
+    :param first_field: Index of the first field in each message. Fields
+        before that (the message type for example) are skipped.
+
+    Every call returns a newly allocated array so the result can be kept or
+    handed to another thread without being overwritten by the next message.
+
+    """
+
+    min_column_rows = 4
+
+    def __init__(self, fields: Sequence[Tuple[str, str, Callable]],
+                 first_field: int = 1):
+        self.names = [field[0] for field in fields]
+        self.dtype = np.dtype([(field[0], field[1]) for field in fields])
+        self.num_fields = len(fields)
+        self._first_field = first_field
+        self._readers = [field[2] for field in fields]
+        self._col_readers = [field[3] if len(field) > 3 else
+                             column_reader(field[1], field[2])
+                             for field in fields]
+
+    def parse_one(self, fields: Sequence[str]) -> np.array:
+        """Parse one message into a structured array of length 1."""
+        msg = np.zeros(1, dtype=self.dtype)
+        for field_num, field in enumerate(fields[self._first_field:]):
+            if field_num >= self.num_fields and field == "":
+                break
+            msg[self.names[field_num]] = self._readers[field_num](field)
+        return msg
+
+    def parse_many(self, rows: List[Sequence[str]]) -> np.array:
+        """
+        Parse several messages into a structured array with a row for each.
+
+        Rows are transposed into columns and each column is converted in one
+        go. Batches smaller than min_column_rows, where the fixed cost of
+        building the columns is more than it saves, are parsed row by row. Fields missing from the end of a short message are read as blanks.
+
+        """
+        msgs = np.zeros(len(rows), dtype=self.dtype)
+        if len(rows) < self.min_column_rows:
+            for row_num, fields in enumerate(rows):
+                msg = msgs[row_num]
+                for field_num, field in enumerate(fields[self._first_field:]):
+                    if field_num >= self.num_fields:
+                        break
+                    msg[self.names[field_num]] = self._readers[field_num](
+                        field)
+            return msgs
+        columns = list(itertools.zip_longest(*rows, fillvalue=""))
+        last_col = min(len(columns), self._first_field + self.num_fields)
+        for col_num in range(self._first_field, last_col):
+            field_num = col_num - self._first_field
+            msgs[self.names[field_num]] = self._col_readers[field_num](
+                columns[col_num])
+        return msgs
@@ -47,19 +47,29 @@ See http://www.iqfeed.net/dev/main.cfm for more information.
 
 import os
 import datetime
+import functools
 import itertools
+import queue
+import re
 import select
 import socket
 import threading
 import time
 
 from collections import deque, namedtuple
-from typing import Sequence, List
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, Sequence, List, Tuple
 import xml.etree.ElementTree as ElementTree
 
 import numpy as np
 from .exceptions import NoDataError, UnexpectedField, UnexpectedMessage
 from .exceptions import UnexpectedProtocol, UnauthorizedError
+from .buffers import RingBuffer
+from .column_readers import FieldsetParser
+from .symbol_table import SymbolTable
+from .story_cache import StoryCache
+from .stats import FeedStats, TimedListener
+from . import column_readers as cr
 from . import field_readers as fr
 
 
@@ -84,6 +94,11 @@ class FeedConn:
     host = iqfeed_host
     port = quote_port
 
+    # Maximum number of bytes read from the socket in one recv. Large reads
+    # mean fewer trips through select and the dispatch loop when IQFeed is
+    # busy. Override per instance by setting read_size before connecting.
+    read_size = int(os.getenv('IQFEED_READ_SIZE', 65536))
+
     databuf = namedtuple(
         "databuf", ('failed', 'err_msg', 'num_pts', 'raw_data'))
 
@@ -98,10 +113,17 @@ class FeedConn:
         self._reconnect_failed = False
         self._pf_dict = {}
         self._sm_dict = {}
+        self._batch_dict = {}
+        self._batch_mode = False
+        self._reactor = None
+        self._recorder = None
+        self._stats = FeedStats()
+        self._stats_interval = None
+        self._next_stats = float('inf')
         self._listeners = []
         self._buf_lock = threading.RLock()
         self._send_lock = threading.RLock()
-        self._recv_buf = ""
+        self._recv_buf = RingBuffer(max(4 * self.read_size, 1 << 20))
         self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._read_thread = threading.Thread(group=None, target=self,
                                              name="%s-reader" % self._name,
@@ -123,12 +145,46 @@ class FeedConn:
         self._send_connect_message()
         self.start_runner()
 
+    def set_reactor(self, reactor) -> None:
+        """
+        Read this connection from a shared FeedReactor's thread.
+
+        :param reactor: A FeedReactor, or None to use this connection's own
+            reading thread (the default).
+
+        Call before connect(). See reactor.py for when sharing a thread is
+        and isn't a good idea.
+
+        """
+        with self._start_lock:
+            if self.reader_running():
+                raise RuntimeError(
+                    "%s: set_reactor called after connect" % self.name())
+            self._reactor = reactor
+
+    def set_recorder(self, recorder) -> None:
+        """
+        Write everything read from the socket to a recorder.
+
+        :param recorder: A FeedRecorder (see replay.py), or None to stop.
+
+        The bytes are recorded exactly as received, with the time they were
+        received, so a ReplayServer can play them back to this kind of
+        connection later.
+
+        """
+        with self._buf_lock:
+            self._recorder = recorder
+
     def start_runner(self) -> None:
         """Called to start the reading thread."""
         with self._start_lock:
             self._stop.clear()
             if not self.reader_running():
-                self._read_thread.start()
+                if self._reactor is not None:
+                    self._reactor.register(self)
+                else:
+                    self._read_thread.start()
 
     def disconnect(self) -> None:
         """
@@ -147,7 +203,9 @@ class FeedConn:
         """Called to stop the reading and message processing thread."""
         with self._start_lock:
             self._stop.set()
-            if self.reader_running():
+            if self._reactor is not None:
+                self._reactor.unregister(self)
+            elif self.reader_running():
                 self._read_thread.join(30)
 
     def reader_running(self) -> bool:
@@ -158,7 +216,12 @@ class FeedConn:
         function.  Mainly useful for debugging during development of the
         library.  If the reader thread is crashing, there is likely a bug
         in the library or something else is going very wrong.
+
+        With a FeedReactor this is True while the reactor is reading this
+        connection.
         """
+        if self._reactor is not None:
+            return self._reactor.is_registered(self)
         return self._read_thread.is_alive()
 
     def connected(self) -> bool:
@@ -182,6 +245,38 @@ class FeedConn:
         with self._send_lock:
             self._sock.sendall(cmd.encode(encoding='latin-1'))
 
+    # Most bytes of commands _send_cmds puts in one write.
+    max_cmd_write = 65536
+
+    def _send_cmds(self, cmds: Sequence[str]) -> int:
+        """
+        Send many commands with as few socket writes as possible.
+
+        :param cmds: Commands, each ending in \\r\\n.
+        :return: The number of writes.
+
+        Commands are joined into writes of up to max_cmd_write bytes
+        instead of one sendall per command, so watching 1000 symbols is a
+        handful of syscalls and IQFeed reads them in a few gulps.
+
+        """
+        writes = 0
+        chunk = []
+        chunk_len = 0
+        with self._send_lock:
+            for cmd in cmds:
+                if chunk and chunk_len + len(cmd) > self.max_cmd_write:
+                    self._sock.sendall("".join(chunk).encode('latin-1'))
+                    writes += 1
+                    chunk = []
+                    chunk_len = 0
+                chunk.append(cmd)
+                chunk_len += len(cmd)
+            if chunk:
+                self._sock.sendall("".join(chunk).encode('latin-1'))
+                writes += 1
+        return writes
+
     def reconnect_failed(self) -> bool:
         """
         Returns true if IQClient.exe failed to reconnect to DTN's servers.
@@ -201,29 +296,70 @@ class FeedConn:
                 self._process_messages()
 
     def _read_messages(self) -> bool:
-        """Read raw text sent by IQFeed on socket"""
+        """Read raw bytes sent by IQFeed on socket into the receive buffer"""
         ready_list = select.select([self._sock], [], [self._sock], 5)
         if ready_list[2]:
             raise RuntimeError(
                     "Error condition on socket connection to IQFeed: %s,"
                     "" % self.name())
         if ready_list[0]:
-            data_recvd = self._sock.recv(1024).decode('latin-1')
-            with self._buf_lock:
-                self._recv_buf += data_recvd
-                return True
+            return self._recv_into_buffer() > 0
         return False
 
-    def _next_message(self) -> str:
-        """Next complete message from buffer of delimited messages"""
+    def _recv_into_buffer(self) -> int:
+        """Read once from the socket into the buffer, teeing to the recorder."""
+        start = time.perf_counter_ns()
         with self._buf_lock:
-            next_delim = self._recv_buf.find('\n')
-            if next_delim != -1:
-                message = self._recv_buf[:next_delim].strip()
-                self._recv_buf = self._recv_buf[(next_delim + 1):]
-                return message
-            else:
-                return ""
+            num_read = self._recv_buf.recv_into(self._sock, self.read_size)
+            if num_read and self._recorder is not None:
+                self._recorder.record(self._recv_buf.last(num_read))
+            self._stats.record_read(num_read, len(self._recv_buf), start)
+        return num_read
+
+    def stats(self) -> dict:
+        """
+        Snapshot of what this connection has measured about itself.
+
+        A dict with bytes_read, reads, messages (count per message type),
+        parse_ns (histogram per message type), dispatch_ns (time in
+        listener callbacks), idle_ns (waiting for data between reads) and
+        buffer_depth (bytes left in the buffer after each read). Histograms
+        are dicts of count, mean, p50, p90, p99 and max. See stats.py.
+
+        """
+        return self._stats.snapshot(self.name())
+
+    def reset_stats(self) -> None:
+        """Start measuring from scratch."""
+        self._stats = FeedStats()
+        for listener in self._listeners:
+            listener._stats = self._stats
+
+    def set_stats_interval(self, interval: float = None) -> None:
+        """
+        Call listeners' process_feed_stats with stats() periodically.
+
+        :param interval: Seconds between calls, None to stop.
+
+        The check is made after processing messages from the socket so
+        the calls are made by the reading thread, and not at all while no
+        data is arriving.
+
+        """
+        self._stats_interval = interval
+        self._next_stats = float('inf') if interval is None else (
+            time.perf_counter_ns() + int(interval * 1e9))
+
+    def _send_stats(self, now: int) -> None:
+        self._next_stats = now + int(self._stats_interval * 1e9)
+        stats = self.stats()
+        for listener in self._listeners:
+            listener.process_feed_stats(stats)
+
+    def _next_messages(self) -> List[str]:
+        """All complete messages in the buffer of delimited messages"""
+        with self._buf_lock:
+            return self._recv_buf.pop_lines()
 
     def _set_message_mappings(self) -> None:
         """Creates map of message names to processing functions."""
@@ -239,14 +375,97 @@ class FeedConn:
         self._sm_dict["CURRENT PROTOCOL"] = self._process_current_protocol
         self._sm_dict["STATS"] = self._process_conn_stats
 
+    def set_batch_mode(self, batch_mode: bool = True) -> None:
+        """
+        Turn batched dispatch of high volume messages on or off.
+
+        :param batch_mode: True to dispatch batches, False for one at a time.
+
+        In batch mode every run of consecutive messages of a type that
+        supports batching (updates in QuoteConn, completed bars in BarConn)
+        received in one read from the socket is parsed into a single
+        numpy structured array with one row per message and sent to the
+        listeners' batch callback (process_update_batch, process_bar_batch)
+        with one call instead of one call per message. Messages of other
+        types are still processed one at a time, in the order received.
+
+        """
+        self._batch_mode = batch_mode
+
     def _process_messages(self) -> None:
-        """Process the next complete message waiting to be processed"""
-        message = self._next_message()
-        while "" != message:
+        """Process all complete messages waiting to be processed"""
+        messages = self._next_messages()
+        stats = self._stats
+        if self._batch_mode:
+            self._process_message_batches(messages)
+        else:
+            # Timed per run of messages of one type, not per message, which
+            # would cost about as much as parsing a short message.
+            run_func = None
+            run_len = mark = start = 0
+            for message in messages:
+                fields = message.split(',')
+                handle_func = self._processing_function(fields)
+                if handle_func != run_func:
+                    if run_len:
+                        stats.record_messages(
+                            run_func, run_len,
+                            time.perf_counter_ns() - start, mark)
+                    run_func = handle_func
+                    run_len = 0
+                    mark = stats.dispatch_total
+                    start = time.perf_counter_ns()
+                handle_func(fields)
+                run_len += 1
+            if run_len:
+                stats.record_messages(run_func, run_len,
+                                      time.perf_counter_ns() - start, mark)
+        stats.last_done = now = time.perf_counter_ns()
+        if now >= self._next_stats:
+            self._send_stats(now)
+
+    def _process_message_batches(self, messages: List[str]) -> None:
+        """Process messages, grouping consecutive batchable ones."""
+        batch_key = None
+        batch = []
+        stats = self._stats
+        perf_counter_ns = time.perf_counter_ns
+        for message in messages:
             fields = message.split(',')
-            handle_func = self._processing_function(fields)
-            handle_func(fields)
-            message = self._next_message()
+            key = self._batch_key(fields)
+            if key in self._batch_dict:
+                if key != batch_key and batch:
+                    self._process_batch(batch_key, batch)
+                    batch = []
+                batch_key = key
+                batch.append(fields)
+            else:
+                if batch:
+                    self._process_batch(batch_key, batch)
+                    batch = []
+                    batch_key = None
+                handle_func = self._processing_function(fields)
+                mark = stats.dispatch_total
+                start = perf_counter_ns()
+                handle_func(fields)
+                stats.record_messages(handle_func, 1,
+                                      perf_counter_ns() - start, mark)
+        if batch:
+            self._process_batch(batch_key, batch)
+
+    def _process_batch(self, batch_key: str,
+                       batch: List[Sequence[str]]) -> None:
+        stats = self._stats
+        batch_func = self._batch_dict[batch_key]
+        mark = stats.dispatch_total
+        start = time.perf_counter_ns()
+        batch_func(batch)
+        stats.record_messages(batch_func, len(batch),
+                              time.perf_counter_ns() - start, mark)
+
+    def _batch_key(self, fields: Sequence[str]) -> str:
+        """Key in _batch_dict for this message's batch processing function."""
+        return fields[0]
 
     def _processing_function(self, fields):
         """Returns the processing function for this specific message."""
@@ -426,7 +645,8 @@ class FeedConn:
 
         """
         if listener not in self._listeners:
-            self._listeners.append(listener)
+            # Wrapped to time its callbacks, see stats().
+            self._listeners.append(TimedListener(listener, self._stats))
 
     def remove_listener(self, listener) -> None:
         """
@@ -724,6 +944,9 @@ class QuoteConn(FeedConn):
         self._update_names = []
         self._update_dtype = []
         self._update_reader = []
+        self._symbols = SymbolTable()
+        self._compact = False
+        self._float_dtype = 'f8'
         self._set_message_mappings()
         self._current_update_fields = ["Symbol", "Most Recent Trade",
                                        "Most Recent Trade Size",
@@ -760,6 +983,7 @@ class QuoteConn(FeedConn):
         self._pf_dict['P'] = self._process_summary
         self._pf_dict['Q'] = self._process_update
         self._pf_dict['F'] = self._process_fundamentals
+        self._batch_dict['Q'] = self._process_update_batch
 
         self._sm_dict["KEY"] = self._process_auth_key
         self._sm_dict["KEYOK"] = self._process_keyok
@@ -809,7 +1033,10 @@ class QuoteConn(FeedConn):
         assert len(fields) > 11
         assert fields[0] == "R"
         rgn_quote = self._empty_regional_msg
-        rgn_quote["Symbol"] = fields[1]
+        if self._compact:
+            rgn_quote["Symbol"] = self._symbols.intern(fields[1])
+        else:
+            rgn_quote["Symbol"] = fields[1]
         rgn_quote["Regional Bid"] = fr.read_float64(fields[3])
         rgn_quote["Regional BidSize"] = fr.read_uint64(fields[4])
         rgn_quote["Regional BidTime"] = fr.read_hhmmss(fields[5])
@@ -838,15 +1065,19 @@ class QuoteConn(FeedConn):
         for listener in self._listeners:
             listener.process_update(update)
 
+    def _process_update_batch(self, rows: List[Sequence[str]]) -> None:
+        """Process consecutive symbol update messages as one batch."""
+        updates = self._create_update_batch(rows)
+        for listener in self._listeners:
+            listener.process_update_batch(updates)
+
+    def _create_update_batch(self, rows: List[Sequence[str]]) -> np.array:
+        """Create an update array with one row per update message."""
+        return self._update_parser.parse_many(rows)
+
     def _create_update(self, fields: Sequence[str]) -> np.array:
         """Create an update message."""
-        update = self._empty_update_msg
-        for field_num, field in enumerate(fields[1:]):
-            if field_num >= self._num_update_fields and field == "":
-                break
-            update[self._update_names[field_num]] = self._update_reader[
-                field_num](field)
-        return update
+        return self._update_parser.parse_one(fields)
 
     def _process_fundamentals(self, fields: Sequence[str]):
         """Process a fundamental data message."""
@@ -1065,7 +1296,10 @@ class QuoteConn(FeedConn):
         This function is where that magic happens. We update the np.dtype that
         an update message is encoded as when sent to listeners. We update a
         list of field reading functions that read each field in the update
-        messages, the number of expected update fields etc.
+        messages, the number of expected update fields etc. and compile a
+        FieldsetParser for the new fieldset. It parses single messages field
+        by field and batches column by column, always into a newly allocated
+        array, so listeners can keep the arrays they are sent.
 
         There does not seem to be a speed penalty relative to creating a
         separate QuoteConn derivative class with a separate update message
@@ -1095,7 +1329,68 @@ class QuoteConn(FeedConn):
         self._update_reader = new_update_reader
         self._num_update_fields = len(new_update_fields)
 
-        self._empty_update_msg = np.zeros(1, dtype=self._update_dtype)
+        parser_fields = [QuoteConn.quote_msg_map[field] for field in fields]
+        if self._compact:
+            parser_fields = [self._compact_field(*field)
+                             for field in parser_fields]
+            self._update_dtype = [field[:2] for field in parser_fields]
+        self._update_parser = FieldsetParser(parser_fields)
+
+    def _compact_field(self, name: str, dtype: str, reader: Callable):
+        """quote_msg_map entry as parsed in compact mode."""
+        if name == "Symbol":
+            return (name, 'u4', self._symbols.intern,
+                    self._symbols.intern_column)
+        if dtype == 'f8':
+            return name, self._float_dtype, reader
+        return name, dtype, reader
+
+    def _compact_regional_type(self) -> np.dtype:
+        """regional_type with the Symbol and floats as in compact updates."""
+        return np.dtype([self._compact_field(name, dtype.str[1:], None)[:2]
+                         for name, (dtype, _) in
+                         QuoteConn.regional_type.fields.items()])
+
+    def set_compact_updates(self, compact: bool = True,
+                            float_dtype: str = 'f4') -> None:
+        """
+        Send updates and regional quotes in a smaller dtype.
+
+        :param compact: True for compact updates, False for the normal ones.
+        :param float_dtype: dtype of prices and other floats in compact
+            updates. f4 keeps about 7 significant digits, enough for prices
+            under 100,000 quoted in cents. Use 'f8' to only compact symbols.
+
+        In compact mode the Symbol field of updates, summaries and regional
+        quotes is a u4 id from symbol_table() instead of the symbol. Ids are
+        stable for the life of the QuoteConn so listeners can keep state in
+        arrays indexed by id. The default 16 field update shrinks from 250 to
+        98 bytes (f4 floats) or 126 bytes (f8 floats).
+
+        Takes effect for the next message parsed. Listeners that handle
+        both kinds should check the dtype of the Symbol field.
+
+        """
+        assert float_dtype in ('f4', 'f8')
+        self._compact = compact
+        self._float_dtype = float_dtype
+        self._set_current_update_structs(self._current_update_fields)
+        self._empty_regional_msg = np.zeros(
+            1, dtype=(self._compact_regional_type() if compact
+                      else QuoteConn.regional_type))
+
+    def compact_updates(self) -> bool:
+        """True if updates are sent in the compact dtype."""
+        return self._compact
+
+    def symbol_table(self) -> SymbolTable:
+        """
+        Table mapping the symbol ids in compact updates to symbols.
+
+        Shared by every listener of this QuoteConn and only ever grows.
+
+        """
+        return self._symbols
 
     def _request_fundamental_fieldnames(self) -> None:
         """
@@ -1286,6 +1581,28 @@ class QuoteConn(FeedConn):
         """
         self._send_cmd("f%s\r\n" % symbol)
 
+    def watch_many(self, symbols: Sequence[str]) -> int:
+        """
+        watch every symbol in symbols, in as few socket writes as possible.
+
+        :param symbols: Valid symbols for securities or derivatives.
+        :return: The number of socket writes.
+
+        """
+        return self._send_cmds(["w%s\r\n" % symbol for symbol in symbols])
+
+    def trades_watch_many(self, symbols: Sequence[str]) -> int:
+        """trades_watch every symbol in symbols. Returns the writes."""
+        return self._send_cmds(["t%s\r\n" % symbol for symbol in symbols])
+
+    def unwatch_many(self, symbols: Sequence[str]) -> int:
+        """unwatch every symbol in symbols. Returns the writes."""
+        return self._send_cmds(["r%s\r\n" % symbol for symbol in symbols])
+
+    def refresh_many(self, symbols: Sequence[str]) -> int:
+        """refresh every symbol in symbols. Returns the writes."""
+        return self._send_cmds(["f%s\r\n" % symbol for symbol in symbols])
+
     def request_watches(self) -> None:
         """
         Request a current watches message.
@@ -1637,7 +1954,151 @@ class AdminConn(FeedConn):
         self.save_login_info(save_info)
 
 
-class HistoryConn(FeedConn):
+class _RequestStream:
+    """
+    Chunks of response lines for one streaming lookup request.
+
+    The reading thread appends lines to rows and moves them to chunks every
+    chunk_size lines. chunks holds at most max_chunks chunks so if the
+    consumer falls behind the reading thread blocks until there is room
+    instead of buffering the whole response.
+
+    Each item in chunks is a list of lines, an error message string from
+    IQFeed or None when the response is complete.
+
+    Once the consumer cancels, the reading thread drops the rest of the
+    response instead of putting it in chunks, where nobody would take it.
+
+    """
+
+    def __init__(self, chunk_size: int, max_chunks: int):
+        assert chunk_size > 0
+        assert max_chunks > 0
+        self.chunk_size = chunk_size
+        self.rows = []
+        self.chunks = queue.Queue(max_chunks)
+        self.cancelled = False
+
+    def add(self, line) -> None:
+        """Add a line of the response. Called in the reading thread."""
+        if self.cancelled:
+            return
+        self.rows.append(line)
+        if len(self.rows) >= self.chunk_size:
+            self._put(self.rows)
+            self.rows = []
+
+    def fail(self, err_msg: str) -> None:
+        """Pass on an error message. Called in the reading thread."""
+        self._put(err_msg)
+
+    def end(self) -> None:
+        """Pass on the last rows and the end. Called in the reading thread."""
+        if self.rows:
+            self._put(self.rows)
+            self.rows = []
+        self._put(None)
+
+    def _put(self, item) -> None:
+        # cancel sets cancelled before it empties chunks, so at most one put
+        # that got past this check can still be waiting and it finds room.
+        if not self.cancelled:
+            self.chunks.put(item)
+
+    def cancel(self) -> None:
+        """Stop taking chunks. Called in the consumer's thread."""
+        self.cancelled = True
+        # Unblock the reading thread if it is waiting for space.
+        while not self.chunks.empty():
+            self.chunks.get_nowait()
+
+
+class _StreamingRequests:
+    """
+    Streaming (iter_*) requests for lookup connections.
+
+    Mixed into connections that keep their requests in _req_stream under
+    _req_lock. A response line is handed to _process_stream_datum by the
+    connection's _process_*_datum and the consumer reads chunks of lines
+    from _iter_stream.
+
+    """
+
+    # Streaming requests queue at most this many chunks of lines before the
+    # reading thread waits for the consumer to catch up.
+    stream_max_chunks = int(os.getenv('IQFEED_STREAM_MAX_CHUNKS', 4))
+
+    def _stream_line(self, fields: Sequence[str]):
+        """What is kept in a chunk for a response line."""
+        return fields
+
+    def _process_stream_datum(self, req_id: str, stream: _RequestStream,
+                              fields: Sequence[str]) -> None:
+        """
+        Add a line of a streaming request to its stream.
+
+        Called in the reading thread. Blocks when the stream is full, which
+        stops this connection reading from the socket until the consumer
+        takes a chunk.
+
+        """
+        if 'E' == fields[1]:
+            err_msg = "Unknown Error"
+            if len(fields) > 2:
+                if fields[2] != "":
+                    err_msg = fields[2]
+            stream.fail(err_msg)
+        elif '!ENDMSG!' == fields[1]:
+            with self._req_lock:
+                self._req_stream.pop(req_id, None)
+            stream.end()
+        else:
+            stream.add(self._stream_line(fields))
+
+    @staticmethod
+    def _raise_request_error(req_cmd: str, iqfeed_err: str) -> None:
+        """Raise the exception for an error message from IQFeed."""
+        raise RuntimeError("Request: %s, Error: %s" % (req_cmd, iqfeed_err))
+
+    def _iter_stream(self, req_cmd: str, req_id: str, chunk_size: int,
+                     timeout: int) -> Iterator[list]:
+        """
+        Send req_cmd and yield the response in chunks of lines as it arrives.
+
+        :param req_cmd: Request with req_id as its RequestID.
+        :param req_id: From _get_next_req_id.
+        :param chunk_size: Number of lines in each chunk.
+        :param timeout: Wait upto timeout seconds for each chunk.
+
+        If the consumer stops early (breaks out of the loop or closes the
+        generator) the rest of the response is read and thrown away.
+
+        """
+        stream = _RequestStream(chunk_size, self.stream_max_chunks)
+        with self._req_lock:
+            self._req_stream[req_id] = stream
+        finished = False
+        try:
+            self._send_cmd(req_cmd)
+            while True:
+                try:
+                    chunk = stream.chunks.get(timeout=timeout)
+                except queue.Empty:
+                    raise RuntimeError("Request: %s, Error: Timed out" %
+                                       req_cmd)
+                if chunk is None:
+                    finished = True
+                    return
+                if isinstance(chunk, str):
+                    finished = True
+                    self._raise_request_error(req_cmd, chunk)
+                yield chunk
+        finally:
+            if not finished:
+                stream.cancel()
+
+
+class HistoryConn(_StreamingRequests, FeedConn):
     """
     HistoryConn is used to get historical data from IQFeed's lookup socket.
 
@@ -1707,6 +2168,9 @@ class HistoryConn(FeedConn):
         self._req_event = {}
         self._req_failed = {}
         self._req_err = {}
+        self._req_stream = {}
+        self._req_cancelled = set()
+        self._req_done = {}
         self._req_lock = threading.RLock()
         self._req_num_lock = threading.RLock()
 
@@ -1721,19 +2185,156 @@ class HistoryConn(FeedConn):
 
     def _process_datum(self, fields: Sequence[str]) -> None:
         req_id = fields[0]
-        if 'E' == fields[1]:
-            # Error
-            self._req_failed[req_id] = True
-            err_msg = "Unknown Error"
-            if len(fields) > 2:
-                if fields[2] != "":
-                    err_msg = fields[2]
-            self._req_err[req_id] = err_msg
-        elif '!ENDMSG!' == fields[1]:
-            self._req_event[req_id].set()
+        stream = self._req_stream.get(req_id)
+        if stream is not None:
+            self._process_stream_datum(req_id, stream, fields)
+            return
+        done = None
+        # Under the lock so _cancel_request can't run between the check and
+        # the branch it picks.
+        with self._req_lock:
+            if req_id in self._req_cancelled:
+                # Rest of a request nobody is waiting for any more.
+                if '!ENDMSG!' == fields[1]:
+                    self._req_cancelled.discard(req_id)
+                    if req_id in self._req_buf:
+                        self._cleanup_request_data(req_id)
+                        self._req_event.pop(req_id, None)
+            elif 'E' == fields[1]:
+                # Error
+                self._req_failed[req_id] = True
+                err_msg = "Unknown Error"
+                if len(fields) > 2:
+                    if fields[2] != "":
+                        err_msg = fields[2]
+                self._req_err[req_id] = err_msg
+            elif '!ENDMSG!' == fields[1]:
+                self._req_event[req_id].set()
+                done = self._req_done.pop(req_id, None)
+            else:
+                self._req_buf[req_id].append(fields)
+                self._req_numlines[req_id] += 1
+        if done is not None:
+            done.put((self, req_id))
+
+    def _iter_request(self, req_cmd: str, req_id: str, chunk_size: int,
+                      decode: Callable, timeout: int) -> Iterator[np.array]:
+        """
+        Send req_cmd and yield the response in decoded chunks as it arrives.
+
+        :param req_cmd: Request with req_id as its RequestID.
+        :param req_id: From _get_next_req_id.
+        :param chunk_size: Number of lines in each chunk.
+        :param decode: Converts a list of lines to a numpy array.
+        :param timeout: Wait upto timeout seconds for each chunk.
+
+        Chunks are decoded here, in the consumer's thread, not in the reading
+        thread. If the consumer stops early (breaks out of the loop or closes
+        the generator) the rest of the response is read and thrown away.
+
+        """
+        chunks = self._iter_stream(req_cmd, req_id, chunk_size, timeout)
+        try:
+            for chunk in chunks:
+                yield decode(chunk)
+        finally:
+            chunks.close()
+
+    @staticmethod
+    def _raise_request_error(req_cmd: str, iqfeed_err: str) -> None:
+        """Raise the exception matching an error message from IQFeed."""
+        err_msg = "Request: %s, Error: %s" % (req_cmd, iqfeed_err)
+        if iqfeed_err == '!NO_DATA!':
+            raise NoDataError(err_msg)
+        elif iqfeed_err == "Unauthorized user ID.":
+            raise UnauthorizedError(err_msg)
         else:
-            self._req_buf[req_id].append(fields)
-            self._req_numlines[req_id] += 1
+            raise RuntimeError(err_msg)
+
+    def _cancel_request(self, req_id: str) -> None:
+        """Stop waiting for a request sent by _iter_pipelined."""
+        with self._req_lock:
+            self._req_done.pop(req_id, None)
+            if self._req_event[req_id].is_set():
+                self._cleanup_request_data(req_id)
+                self._req_event.pop(req_id, None)
+            else:
+                self._req_cancelled.add(req_id)
+
+    @staticmethod
+    def _iter_pipelined(conns: Sequence["HistoryConn"], jobs: Iterator,
+                        max_in_flight: int, timeout: int) -> Iterator:
+        """
+        Run many requests with several in flight at a time.
+
+        :param conns: Connected HistoryConns to send the requests on.
+        :param jobs: Iterable of (key, make_cmd, read_name, dtype). make_cmd
+            takes a req_id and returns the request, read_name is the _read_*
+            method that converts the response and dtype is that of the data.
+        :param max_in_flight: Most requests outstanding on each connection.
+        :param timeout: Wait upto timeout seconds for the next response.
+        :return: Generator of (key, data) in the order requests complete.
+
+        Requests are sent to whichever connection has fewest outstanding.
+        As soon as one completes the next is sent, before the completed one
+        is converted and yielded, so IQFeed is never idle waiting for us.
+
+        data is the array the equivalent request_* function would return, an
+        empty array of dtype if IQFeed had no data or the exception the
+        request_* function would have raised for any other error. If the
+        consumer stops early the requests still in flight are abandoned.
+
+        """
+        assert max_in_flight > 0
+        done = queue.Queue()
+        pending = iter(jobs)
+        in_flight = {}
+        load = {conn: 0 for conn in conns}
+
+        def send_next() -> bool:
+            try:
+                key, make_cmd, read_name, dtype = next(pending)
+            except StopIteration:
+                return False
+            conn = min(conns, key=load.__getitem__)
+            req_id = conn._get_next_req_id()
+            conn._setup_request_data(req_id)
+            conn._req_done[req_id] = done
+            req_cmd = make_cmd(req_id)
+            in_flight[(conn, req_id)] = (key, req_cmd, read_name, dtype)
+            load[conn] += 1
+            conn._send_cmd(req_cmd)
+            return True
+
+        try:
+            while (len(in_flight) < max_in_flight * len(conns) and
+                   send_next()):
+                pass
+            while in_flight:
+                try:
+                    conn, req_id = done.get(timeout=timeout)
+                except queue.Empty:
+                    raise RuntimeError(
+                        "Timed out waiting for %d history requests" %
+                        len(in_flight))
+                key, req_cmd, read_name, dtype = in_flight.pop(
+                    (conn, req_id))
+                load[conn] -= 1
+                send_next()
+                data = getattr(conn, read_name)(req_id)
+                with conn._req_lock:
+                    conn._req_event.pop(req_id, None)
+                if data.dtype == object:
+                    try:
+                        conn._raise_request_error(req_cmd, str(data[0]))
+                    except NoDataError:
+                        data = np.zeros(0, dtype=dtype)
+                    except (UnauthorizedError, RuntimeError) as err:
+                        data = err
+                yield key, data
+        finally:
+            for conn, req_id in in_flight:
+                conn._cancel_request(req_id)
 
     def _get_next_req_id(self) -> str:
         with self._req_num_lock:
@@ -1774,50 +2375,64 @@ class HistoryConn(FeedConn):
         if res.failed:
             return np.array([res.err_msg], dtype='object')
         else:
-            data = np.empty(res.num_pts, HistoryConn.tick_type)
-            line_num = 0
-            while res.raw_data and (line_num < res.num_pts):
-                dl = res.raw_data.popleft()
-                (dt, tm) = fr.read_posix_ts_us(dl[1])
-                data[line_num]['date'] = dt
-                data[line_num]['time'] = tm
-                data[line_num]['last'] = np.float64(dl[2])
-                data[line_num]['last_sz'] = np.uint64(dl[3])
-                data[line_num]['tot_vlm'] = np.uint64(dl[4])
-                data[line_num]['bid'] = np.float64(dl[5])
-                data[line_num]['ask'] = np.float64(dl[6])
-                data[line_num]['tick_id'] = np.uint64(dl[7])
-                data[line_num]['last_type'] = dl[8]
-                data[line_num]['mkt_ctr'] = np.uint32(dl[9])
-
-                cond_str = dl[10]
-                num_cond = len(cond_str) / 2
-                if num_cond > 0:
-                    data[line_num]['cond1'] = np.uint8(int(cond_str[0:2], 16))
-                else:
-                    data[line_num]['cond1'] = 0
+            assert len(res.raw_data) == res.num_pts
+            return self._decode_ticks(list(res.raw_data))
 
-                if num_cond > 1:
-                    data[line_num]['cond2'] = np.uint8(int(cond_str[2:4], 16))
-                else:
-                    data[line_num]['cond2'] = 0
+    @staticmethod
+    def _columns(rows: Sequence[Sequence[str]], num_cols: int) -> List:
+        """Transpose rows into the first num_cols columns."""
+        row_lens = set(map(len, rows))
+        min_len = min(row_lens)
+        if min_len < num_cols:
+            raise UnexpectedField("Expected %d fields per line, got %d" % (
+                num_cols, min_len))
+        if len(row_lens) == 1:
+            # All rows the same length, so every column is a strided slice
+            # of all the fields laid end to end.
+            flat = list(itertools.chain.from_iterable(rows))
+            return [flat[col_num::min_len] for col_num in range(num_cols)]
+        return [list(map(itemgetter(col_num), rows))
+                for col_num in range(num_cols)]
 
-                if num_cond > 2:
-                    data[line_num]['cond3'] = np.uint8(int(cond_str[4:6], 16))
-                else:
-                    data[line_num]['cond3'] = 0
+    @staticmethod
+    def _decode_ticks(rows: Sequence[Sequence[str]]) -> np.array:
+        """
+        Convert lines of tick data to a numpy array of ticks.
 
-                if num_cond > 3:
-                    data[line_num]['cond4'] = np.uint8(int(cond_str[6:8], 16))
-                else:
-                    data[line_num]['cond4'] = 0
+        :param rows: Each line of the response, split into fields.
+        :return: A numpy array of dtype HistoryConn.tick_type
 
-                line_num += 1
-                if line_num >= res.num_pts:
-                    assert len(res.raw_data) == 0
-                if len(res.raw_data) == 0:
-                    assert line_num >= res.num_pts
+        The lines are transposed into columns and each column is converted
+        in one go with the column_readers functions.
+
+        """
+        data = np.zeros(len(rows), HistoryConn.tick_type)
+        if not rows:
             return data
+        cols = HistoryConn._columns(rows, 11)
+        data['date'], data['time'] = cr.read_posix_ts_us_column(cols[1])
+        data['last'] = cr.read_float64_column(cols[2])
+        data['last_sz'] = cr.read_uint64_column(cols[3])
+        data['tot_vlm'] = cr.read_uint64_column(cols[4])
+        data['bid'] = cr.read_float64_column(cols[5])
+        data['ask'] = cr.read_float64_column(cols[6])
+        data['tick_id'] = cr.read_uint64_column(cols[7])
+        data['last_type'] = np.array(cols[8], dtype='S1')
+        data['mkt_ctr'] = cr.read_uint32_column(cols[9])
+        conds = cr.read_trade_conditions_column(cols[10])
+        data['cond1'] = conds[:, 0]
+        data['cond2'] = conds[:, 1]
+        data['cond3'] = conds[:, 2]
+        data['cond4'] = conds[:, 3]
+        return data
+
+    @staticmethod
+    def _ticks_cmd(ticker: str, max_ticks: int, ascend: bool,
+                   req_id: str) -> str:
+        """Build the HTX command for request_ticks."""
+        pts_per_batch = min((max_ticks, 100))
+        return ("HTX,%s,%d,%d,%s,%d\r\n" % (
+            ticker, max_ticks, ascend, req_id, pts_per_batch))
 
     def request_ticks(self, ticker: str, max_ticks: int, ascend: bool = False,
                       timeout: int = None) -> np.array:
@@ -1836,9 +2451,7 @@ class HistoryConn(FeedConn):
         """
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        pts_per_batch = min((max_ticks, 100))
-        req_cmd = ("HTX,%s,%d,%d,%s,%d\r\n" % (
-            ticker, max_ticks, ascend, req_id, pts_per_batch))
+        req_cmd = self._ticks_cmd(ticker, max_ticks, ascend, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_ticks(req_id)
@@ -1854,6 +2467,21 @@ class HistoryConn(FeedConn):
         else:
             return data
 
+    @staticmethod
+    def _ticks_for_days_cmd(ticker: str, num_days: int,
+                            bgn_flt: datetime.time, end_flt: datetime.time,
+                            ascend: bool, max_ticks: int, req_id: str) -> str:
+        """Build the HTD command for request_ticks_for_days."""
+        bf_str = fr.time_to_hhmmss(bgn_flt)
+        ef_str = fr.time_to_hhmmss(end_flt)
+        mt_str = fr.blob_to_str(max_ticks)
+        pts_per_batch = 100
+        if max_ticks is not None:
+            pts_per_batch = min((max_ticks, 100))
+        return ("HTD,%s,%d,%s,%s,%s,%d,%s,%d\r\n" % (
+            ticker, num_days, mt_str, bf_str, ef_str, ascend, req_id,
+            pts_per_batch))
+
     def request_ticks_for_days(self, ticker: str, num_days: int,
                                bgn_flt: datetime.time = None,
                                end_flt: datetime.time = None,
@@ -1877,15 +2505,8 @@ class HistoryConn(FeedConn):
         """
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        bf_str = fr.time_to_hhmmss(bgn_flt)
-        ef_str = fr.time_to_hhmmss(end_flt)
-        mt_str = fr.blob_to_str(max_ticks)
-        pts_per_batch = 100
-        if max_ticks is not None:
-            pts_per_batch = min((max_ticks, 100))
-        req_cmd = ("HTD,%s,%d,%s,%s,%s,%d,%s,%d\r\n" % (
-            ticker, num_days, mt_str, bf_str, ef_str, ascend, req_id,
-            pts_per_batch))
+        req_cmd = self._ticks_for_days_cmd(ticker, num_days, bgn_flt, end_flt,
+                                           ascend, max_ticks, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_ticks(req_id)
@@ -1901,6 +2522,25 @@ class HistoryConn(FeedConn):
         else:
             return data
 
+    @staticmethod
+    def _ticks_in_period_cmd(ticker: str, bgn_prd: datetime.datetime,
+                             end_prd: datetime.datetime,
+                             bgn_flt: datetime.time, end_flt: datetime.time,
+                             ascend: bool, max_ticks: int,
+                             req_id: str) -> str:
+        """Build the HTT command for request/iter_ticks_in_period."""
+        bp_str = fr.datetime_to_yyyymmdd_hhmmss(bgn_prd)
+        ep_str = fr.datetime_to_yyyymmdd_hhmmss(end_prd)
+        bf_str = fr.time_to_hhmmss(bgn_flt)
+        ef_str = fr.time_to_hhmmss(end_flt)
+        mt_str = fr.blob_to_str(max_ticks)
+        pts_per_batch = 100
+        if max_ticks is not None:
+            pts_per_batch = min((max_ticks, 100))
+        return ("HTT,%s,%s,%s,%s,%s,%s,%d,%s,%d\r\n" % (
+            ticker, bp_str, ep_str, mt_str, bf_str, ef_str, ascend, req_id,
+            pts_per_batch))
+
     def request_ticks_in_period(self, ticker: str, bgn_prd: datetime.datetime,
                                 end_prd: datetime.datetime,
                                 bgn_flt: datetime.time = None,
@@ -1927,17 +2567,8 @@ class HistoryConn(FeedConn):
         """
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        bp_str = fr.datetime_to_yyyymmdd_hhmmss(bgn_prd)
-        ep_str = fr.datetime_to_yyyymmdd_hhmmss(end_prd)
-        bf_str = fr.time_to_hhmmss(bgn_flt)
-        ef_str = fr.time_to_hhmmss(end_flt)
-        mt_str = fr.blob_to_str(max_ticks)
-        pts_per_batch = 100
-        if max_ticks is not None:
-            pts_per_batch = min((max_ticks, 100))
-        req_cmd = ("HTT,%s,%s,%s,%s,%s,%s,%d,%s,%d\r\n" % (
-            ticker, bp_str, ep_str, mt_str, bf_str, ef_str, ascend, req_id,
-            pts_per_batch))
+        req_cmd = self._ticks_in_period_cmd(ticker, bgn_prd, end_prd, bgn_flt,
+                                            end_flt, ascend, max_ticks, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_ticks(req_id)
@@ -1953,32 +2584,81 @@ class HistoryConn(FeedConn):
         else:
             return data
 
+    def iter_ticks_in_period(self, ticker: str, bgn_prd: datetime.datetime,
+                             end_prd: datetime.datetime,
+                             bgn_flt: datetime.time = None,
+                             end_flt: datetime.time = None,
+                             ascend: bool = False, max_ticks: int = None,
+                             chunk_size: int = 100000,
+                             timeout: int = None) -> Iterator[np.array]:
+        """
+        Stream tickdata in a certain period in chunks.
+
+        :param ticker: Ticker symbol.
+        :param bgn_prd: Start of the period.
+        :param end_prd: End of the period.
+        :param bgn_flt: Each day's data starting at bgn_flt
+        :param end_flt: Each day's data no later than end_flt
+        :param ascend: True means sorted oldest to latest, False opposite
+        :param max_ticks: Only the most recent max_ticks trades. Default None
+        :param chunk_size: Number of ticks in each chunk. The last chunk may
+            be shorter.
+        :param timeout: Wait upto timeout seconds for each chunk.
+        :return: Generator of numpy arrays of dtype HistoryConn.tick_type
+
+        Same request as request_ticks_in_period but chunks are yielded as
+        soon as they arrive, so memory use is bounded by chunk_size and
+        stream_max_chunks instead of growing with the length of the period.
+        The request is sent when iteration starts. While the consumer is
+        behind, this HistoryConn stops reading from IQFeed so other requests
+        on the same HistoryConn wait too.
+
+        Raises the same exceptions as request_ticks_in_period, possibly after
+        some chunks have been yielded. Times out with a RuntimeError.
+
+        """
+        req_id = self._get_next_req_id()
+        req_cmd = self._ticks_in_period_cmd(ticker, bgn_prd, end_prd, bgn_flt,
+                                            end_flt, ascend, max_ticks, req_id)
+        return self._iter_request(req_cmd, req_id, chunk_size,
+                                  self._decode_ticks, timeout)
+
     def _read_bars(self, req_id: str) -> np.array:
         """Get buffer for req_id and transform to a numpy array of bars."""
         res = self._get_data_buf(req_id)
         if res.failed:
             return np.array([res.err_msg], dtype='object')
         else:
-            data = np.empty(res.num_pts, HistoryConn.bar_type)
-            line_num = 0
-            while res.raw_data and (line_num < res.num_pts):
-                dl = res.raw_data.popleft()
-                (dt, tm) = fr.read_posix_ts(dl[1])
-                data[line_num]['date'] = dt
-                data[line_num]['time'] = tm
-                data[line_num]['high_p'] = np.float64(dl[2])
-                data[line_num]['low_p'] = np.float64(dl[3])
-                data[line_num]['open_p'] = np.float64(dl[4])
-                data[line_num]['close_p'] = np.float64(dl[5])
-                data[line_num]['tot_vlm'] = np.int64(dl[6])
-                data[line_num]['prd_vlm'] = np.int64(dl[7])
-                data[line_num]['num_trds'] = np.int64(dl[8])
-                line_num += 1
-                if line_num >= res.num_pts:
-                    assert len(res.raw_data) == 0
-                if len(res.raw_data) == 0:
-                    assert line_num >= res.num_pts
+            assert len(res.raw_data) == res.num_pts
+            return self._decode_bars(list(res.raw_data))
+
+    @staticmethod
+    def _decode_bars(rows: Sequence[Sequence[str]]) -> np.array:
+        """Convert lines of bar data to a numpy array of bars."""
+        data = np.zeros(len(rows), HistoryConn.bar_type)
+        if not rows:
             return data
+        cols = HistoryConn._columns(rows, 9)
+        data['date'], data['time'] = cr.read_posix_ts_column(cols[1])
+        data['high_p'] = cr.read_float64_column(cols[2])
+        data['low_p'] = cr.read_float64_column(cols[3])
+        data['open_p'] = cr.read_float64_column(cols[4])
+        data['close_p'] = cr.read_float64_column(cols[5])
+        data['tot_vlm'] = cr.read_uint64_column(cols[6])
+        data['prd_vlm'] = cr.read_uint64_column(cols[7])
+        data['num_trds'] = cr.read_uint64_column(cols[8])
+        return data
+
+    @staticmethod
+    def _bars_cmd(ticker: str, interval_len: int, interval_type: str,
+                  max_bars: int, ascend: bool, label_at_begin: bool,
+                  req_id: str) -> str:
+        """Build the HIX command for request_bars."""
+        assert interval_type in ('s', 'v', 't')
+        bars_per_batch = min((100, max_bars))
+        return ("HIX,%s,%d,%d,%d,%s,%d,%s,%d\r\n" % (
+            ticker, interval_len, max_bars, ascend, req_id, bars_per_batch,
+            interval_type, label_at_begin))
 
     def request_bars(self,
                      ticker: str,
@@ -2012,13 +2692,10 @@ class HistoryConn(FeedConn):
         [DatapointsPerSend],[IntervalType],[LabelAtBeginning]<CR><LF>
 
         """
-        assert interval_type in ('s', 'v', 't')
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        bars_per_batch = min((100, max_bars))
-        req_cmd = ("HIX,%s,%d,%d,%d,%s,%d,%s,%d\r\n" % (
-            ticker, interval_len, max_bars, ascend, req_id, bars_per_batch,
-            interval_type, label_at_begin))
+        req_cmd = self._bars_cmd(ticker, interval_len, interval_type,
+                                 max_bars, ascend, label_at_begin, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_bars(req_id)
@@ -2034,6 +2711,24 @@ class HistoryConn(FeedConn):
         else:
             return data
 
+    @staticmethod
+    def _bars_for_days_cmd(ticker: str, interval_len: int, interval_type: str,
+                           days: int, bgn_flt: datetime.time,
+                           end_flt: datetime.time, ascend: bool,
+                           max_bars: int, label_at_begin: bool,
+                           req_id: str) -> str:
+        """Build the HID command for request_bars_for_days."""
+        assert interval_type in ('s', 'v', 't')
+        bf_str = fr.time_to_hhmmss(bgn_flt)
+        ef_str = fr.time_to_hhmmss(end_flt)
+        mb_str = fr.blob_to_str(max_bars)
+        bars_per_batch = 100
+        if max_bars is not None:
+            bars_per_batch = min((100, max_bars))
+        return "HID,%s,%d,%d,%s,%s,%s,%d,%s,%d,%s,%d\r\n" % (
+            ticker, interval_len, days, mb_str, bf_str, ef_str, ascend, req_id,
+            bars_per_batch, interval_type, label_at_begin)
+
     def request_bars_for_days(self, ticker: str,
                               interval_len: int,
                               interval_type: str,
@@ -2072,18 +2767,11 @@ class HistoryConn(FeedConn):
         [IntervalType],[LabelAtBeginning]<CR><LF>
 
         """
-        assert interval_type in ('s', 'v', 't')
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        bf_str = fr.time_to_hhmmss(bgn_flt)
-        ef_str = fr.time_to_hhmmss(end_flt)
-        mb_str = fr.blob_to_str(max_bars)
-        bars_per_batch = 100
-        if max_bars is not None:
-            bars_per_batch = min((100, max_bars))
-        req_cmd = "HID,%s,%d,%d,%s,%s,%s,%d,%s,%d,%s,%d\r\n" % (
-            ticker, interval_len, days, mb_str, bf_str, ef_str, ascend, req_id,
-            bars_per_batch, interval_type, label_at_begin)
+        req_cmd = self._bars_for_days_cmd(ticker, interval_len, interval_type,
+                                          days, bgn_flt, end_flt, ascend,
+                                          max_bars, label_at_begin, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_bars(req_id)
@@ -2099,6 +2787,27 @@ class HistoryConn(FeedConn):
         else:
             return data
 
+    @staticmethod
+    def _bars_in_period_cmd(ticker: str, interval_len: int,
+                            interval_type: str, bgn_prd: datetime.datetime,
+                            end_prd: datetime.datetime,
+                            bgn_flt: datetime.time, end_flt: datetime.time,
+                            ascend: bool, max_bars: int,
+                            label_at_beginning: bool, req_id: str) -> str:
+        """Build the HIT command for request/iter_bars_in_period."""
+        assert interval_type in ('s', 'v', 't')
+        bp_str = fr.datetime_to_yyyymmdd_hhmmss(bgn_prd)
+        ep_str = fr.datetime_to_yyyymmdd_hhmmss(end_prd)
+        bf_str = fr.time_to_hhmmss(bgn_flt)
+        ef_str = fr.time_to_hhmmss(end_flt)
+        mb_str = fr.blob_to_str(max_bars)
+        bars_per_batch = 100
+        if max_bars is not None:
+            bars_per_batch = min((100, max_bars))
+        return ("HIT,%s,%d,%s,%s,%s,%s,%s,%d,%s,%d,%s,%d\r\n" % (
+            ticker, interval_len, bp_str, ep_str, mb_str, bf_str, ef_str,
+            ascend, req_id, bars_per_batch, interval_type, label_at_beginning))
+
     def request_bars_in_period(self, ticker: str, interval_len: int,
                                interval_type: str, bgn_prd: datetime.datetime,
                                end_prd: datetime.datetime,
@@ -2137,20 +2846,12 @@ class HistoryConn(FeedConn):
         [LabelAtBeginning]<CR><LF>
 
         """
-        assert interval_type in ('s', 'v', 't')
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        bp_str = fr.datetime_to_yyyymmdd_hhmmss(bgn_prd)
-        ep_str = fr.datetime_to_yyyymmdd_hhmmss(end_prd)
-        bf_str = fr.time_to_hhmmss(bgn_flt)
-        ef_str = fr.time_to_hhmmss(end_flt)
-        mb_str = fr.blob_to_str(max_bars)
-        bars_per_batch = 100
-        if max_bars is not None:
-            bars_per_batch = min((100, max_bars))
-        req_cmd = ("HIT,%s,%d,%s,%s,%s,%s,%s,%d,%s,%d,%s,%d\r\n" % (
-            ticker, interval_len, bp_str, ep_str, mb_str, bf_str, ef_str,
-            ascend, req_id, bars_per_batch, interval_type, label_at_beginning))
+        req_cmd = self._bars_in_period_cmd(ticker, interval_len, interval_type,
+                                           bgn_prd, end_prd, bgn_flt, end_flt,
+                                           ascend, max_bars,
+                                           label_at_beginning, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_bars(req_id)
@@ -2166,29 +2867,223 @@ class HistoryConn(FeedConn):
         else:
             return data
 
+    def iter_bars_in_period(self, ticker: str, interval_len: int,
+                            interval_type: str, bgn_prd: datetime.datetime,
+                            end_prd: datetime.datetime,
+                            bgn_flt: datetime.time = None,
+                            end_flt: datetime.time = None,
+                            ascend: bool = False, max_bars: int = None,
+                            label_at_beginning: bool = False,
+                            chunk_size: int = 100000,
+                            timeout: int = None) -> Iterator[np.array]:
+        """
+        Stream bars for a specific period in chunks.
+
+        :param ticker:  Ticker symbol
+        :param interval_len: Length of each bar interval in interval_type units
+        :param interval_type: 's' = secs, 'v' = volume, 't' = ticks
+        :param bgn_prd: Start of the period
+        :param end_prd: End of the period
+        :param bgn_flt: Each day's data starting at bgn_flt
+        :param end_flt: Each day's data no later than end_flt
+        :param ascend: True means oldest to latest, False opposite.
+        :param max_bars: Only the most recent max_bars bars. Default None.
+        :param label_at_beginning: Is the timestamp the begin or end of the bar
+        :param chunk_size: Number of bars in each chunk. The last chunk may
+            be shorter.
+        :param timeout: Wait upto timeout seconds for each chunk.
+        :return: Generator of numpy arrays of dtype HistoryConn.bar_type
+
+        Streaming version of request_bars_in_period. See iter_ticks_in_period.
+
+        """
+        req_id = self._get_next_req_id()
+        req_cmd = self._bars_in_period_cmd(ticker, interval_len, interval_type,
+                                           bgn_prd, end_prd, bgn_flt, end_flt,
+                                           ascend, max_bars,
+                                           label_at_beginning, req_id)
+        return self._iter_request(req_cmd, req_id, chunk_size,
+                                  self._decode_bars, timeout)
+
+    @staticmethod
+    def _bar_jobs(tickers: Sequence[str], interval_len: int,
+                  interval_type: str, max_bars: int,
+                  bgn_prd: datetime.datetime, end_prd: datetime.datetime,
+                  ascend: bool, label_at_begin: bool) -> Iterator:
+        """Jobs for _iter_pipelined requesting bars for each ticker."""
+        assert max_bars is not None or bgn_prd is not None
+        for ticker in tickers:
+            if bgn_prd is None:
+                make_cmd = functools.partial(
+                    HistoryConn._bars_cmd, ticker, interval_len,
+                    interval_type, max_bars, ascend, label_at_begin)
+            else:
+                make_cmd = functools.partial(
+                    HistoryConn._bars_in_period_cmd, ticker, interval_len,
+                    interval_type, bgn_prd, end_prd, None, None, ascend,
+                    max_bars, label_at_begin)
+            yield ticker, make_cmd, '_read_bars', HistoryConn.bar_type
+
+    def iter_bars_many(self, tickers: Sequence[str], interval_len: int,
+                       interval_type: str, max_bars: int = None,
+                       bgn_prd: datetime.datetime = None,
+                       end_prd: datetime.datetime = None,
+                       ascend: bool = False, label_at_begin: bool = False,
+                       max_in_flight: int = 4,
+                       timeout: int = None) -> Iterator[Tuple[str, np.array]]:
+        """
+        Get bars for many tickers with several requests in flight at once.
+
+        :param tickers: Ticker symbols.
+        :param interval_len: Length of each bar interval in interval_type units
+        :param interval_type: 's' = secs, 'v' = volume, 't' = ticks
+        :param max_bars: Only the most recent max_bars bars for each ticker.
+        :param bgn_prd: Start of the period. None means use max_bars only.
+        :param end_prd: End of the period.
+        :param ascend: True means oldest to latest, False opposite.
+        :param label_at_begin: Is the timestamp the beginning or end of the bar
+        :param max_in_flight: Most requests outstanding at any one time.
+        :param timeout: Wait no more than timeout secs for each response.
+        :return: Generator of (ticker, data) in the order responses arrive.
+
+        Sends the same request as request_bars (or request_bars_in_period if
+        bgn_prd is set) for every ticker, but keeps max_in_flight of them
+        outstanding on this connection instead of waiting for each response
+        before sending the next request.
+
+        data is an array with dtype HistoryConn.bar_type, empty if IQFeed
+        has no data for the ticker. If the request for a ticker fails for
+        any other reason data is the exception request_bars would have
+        raised, so one bad ticker doesn't stop the rest.
+
+        """
+        return HistoryConn._iter_pipelined(
+            [self], HistoryConn._bar_jobs(
+                tickers, interval_len, interval_type, max_bars, bgn_prd,
+                end_prd, ascend, label_at_begin), max_in_flight, timeout)
+
+    def request_bars_many(self, tickers: Sequence[str], interval_len: int,
+                          interval_type: str, max_bars: int = None,
+                          bgn_prd: datetime.datetime = None,
+                          end_prd: datetime.datetime = None,
+                          ascend: bool = False, label_at_begin: bool = False,
+                          max_in_flight: int = 4,
+                          timeout: int = None) -> Dict[str, np.array]:
+        """
+        Same as iter_bars_many but returns a dict of ticker: data.
+
+        See iter_bars_many for the parameters and what data can be.
+
+        """
+        return dict(self.iter_bars_many(
+            tickers, interval_len, interval_type, max_bars, bgn_prd, end_prd,
+            ascend, label_at_begin, max_in_flight, timeout))
+
+    @staticmethod
+    def _tick_jobs(tickers: Sequence[str], max_ticks: int,
+                   bgn_prd: datetime.datetime, end_prd: datetime.datetime,
+                   ascend: bool) -> Iterator:
+        """Jobs for _iter_pipelined requesting ticks for each ticker."""
+        assert max_ticks is not None or bgn_prd is not None
+        for ticker in tickers:
+            if bgn_prd is None:
+                make_cmd = functools.partial(
+                    HistoryConn._ticks_cmd, ticker, max_ticks, ascend)
+            else:
+                make_cmd = functools.partial(
+                    HistoryConn._ticks_in_period_cmd, ticker, bgn_prd,
+                    end_prd, None, None, ascend, max_ticks)
+            yield ticker, make_cmd, '_read_ticks', HistoryConn.tick_type
+
+    def iter_ticks_many(self, tickers: Sequence[str], max_ticks: int = None,
+                        bgn_prd: datetime.datetime = None,
+                        end_prd: datetime.datetime = None,
+                        ascend: bool = False, max_in_flight: int = 4,
+                        timeout: int = None) -> Iterator[Tuple[str, np.array]]:
+        """
+        Get tickdata for many tickers with several requests in flight at once.
+
+        :param tickers: Ticker symbols.
+        :param max_ticks: Only the most recent max_ticks trades per ticker.
+        :param bgn_prd: Start of the period. None means use max_ticks only.
+        :param end_prd: End of the period.
+        :param ascend: True means sorted oldest to latest, False opposite
+        :param max_in_flight: Most requests outstanding at any one time.
+        :param timeout: Wait upto timeout seconds for each response.
+        :return: Generator of (ticker, data) in the order responses arrive.
+
+        Tickdata version of iter_bars_many. data is an array of dtype
+        HistoryConn.tick_type or the exception request_ticks would have
+        raised.
+
+        """
+        return HistoryConn._iter_pipelined(
+            [self], HistoryConn._tick_jobs(
+                tickers, max_ticks, bgn_prd, end_prd, ascend),
+            max_in_flight, timeout)
+
+    def request_ticks_many(self, tickers: Sequence[str], max_ticks: int = None,
+                           bgn_prd: datetime.datetime = None,
+                           end_prd: datetime.datetime = None,
+                           ascend: bool = False, max_in_flight: int = 4,
+                           timeout: int = None) -> Dict[str, np.array]:
+        """
+        Same as iter_ticks_many but returns a dict of ticker: data.
+
+        See iter_ticks_many for the parameters and what data can be.
+
+        """
+        return dict(self.iter_ticks_many(tickers, max_ticks, bgn_prd, end_prd,
+                                         ascend, max_in_flight, timeout))
+
     def _read_daily_data(self, req_id: str) -> np.array:
         """Get buffer for req_id and convert to a numpy array of daily data."""
         res = self._get_data_buf(req_id)
         if res.failed:
             return np.array([res.err_msg], dtype='object')
         else:
-            data = np.empty(res.num_pts, HistoryConn.daily_type)
-            line_num = 0
-            while res.raw_data and (line_num < res.num_pts):
-                dl = res.raw_data.popleft()
-                data[line_num]['date'] = np.datetime64(dl[1], 'D')
-                data[line_num]['high_p'] = np.float64(dl[2])
-                data[line_num]['low_p'] = np.float64(dl[3])
-                data[line_num]['open_p'] = np.float64(dl[4])
-                data[line_num]['close_p'] = np.float64(dl[5])
-                data[line_num]['prd_vlm'] = np.uint64(dl[6])
-                data[line_num]['open_int'] = np.uint64(dl[7])
-                line_num += 1
-                if line_num >= res.num_pts:
-                    assert len(res.raw_data) == 0
-                if len(res.raw_data) == 0:
-                    assert line_num >= res.num_pts
+            assert len(res.raw_data) == res.num_pts
+            return self._decode_daily(list(res.raw_data))
+
+    @staticmethod
+    def _decode_daily(rows: Sequence[Sequence[str]]) -> np.array:
+        """Convert lines of daily data to a numpy array of daily data."""
+        data = np.zeros(len(rows), HistoryConn.daily_type)
+        if not rows:
             return data
+        cols = HistoryConn._columns(rows, 8)
+        data['date'] = cr.read_date_column(cols[1])
+        data['high_p'] = cr.read_float64_column(cols[2])
+        data['low_p'] = cr.read_float64_column(cols[3])
+        data['open_p'] = cr.read_float64_column(cols[4])
+        data['close_p'] = cr.read_float64_column(cols[5])
+        data['prd_vlm'] = cr.read_uint64_column(cols[6])
+        data['open_int'] = cr.read_uint64_column(cols[7])
+        return data
+
+    @staticmethod
+    def _daily_cmd(cmd: str, ticker: str, num_pts: int, ascend: bool,
+                   req_id: str) -> str:
+        """Build the HDX, HWX or HMX command for request_daily_data,
+        request_weekly_data or request_monthly_data."""
+        assert cmd in ('HDX', 'HWX', 'HMX')
+        pts_per_batch = min((100, num_pts))
+        return ("%s,%s,%d,%d,%s,%d\r\n" % (
+            cmd, ticker, num_pts, ascend, req_id, pts_per_batch))
+
+    @staticmethod
+    def _daily_for_dates_cmd(ticker: str, bgn_dt: datetime.date,
+                             end_dt: datetime.date, ascend: bool,
+                             max_days: int, req_id: str) -> str:
+        """Build the HDT command for request_daily_data_for_dates."""
+        bgn_str = fr.date_to_yyyymmdd(bgn_dt)
+        end_str = fr.date_to_yyyymmdd(end_dt)
+        md_str = fr.blob_to_str(max_days)
+        pts_per_batch = 100
+        if max_days is not None:
+            pts_per_batch = min((100, max_days))
+        return ("HDT,%s,%s,%s,%s,%d,%s,%d\r\n" % (
+            ticker, bgn_str, end_str, md_str, ascend, req_id, pts_per_batch))
 
     def request_daily_data(self, ticker: str, num_days: int,
                            ascend: bool = False, timeout: int = None):
@@ -2207,9 +3102,7 @@ class HistoryConn(FeedConn):
         """
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        pts_per_batch = min((100, num_days))
-        req_cmd = ("HDX,%s,%d,%d,%s,%d\r\n" % (
-            ticker, num_days, ascend, req_id, pts_per_batch))
+        req_cmd = self._daily_cmd("HDX", ticker, num_days, ascend, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_daily_data(req_id)
@@ -2247,14 +3140,8 @@ class HistoryConn(FeedConn):
         """
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        bgn_str = fr.date_to_yyyymmdd(bgn_dt)
-        end_str = fr.date_to_yyyymmdd(end_dt)
-        md_str = fr.blob_to_str(max_days)
-        pts_per_batch = 100
-        if max_days is not None:
-            pts_per_batch = min((100, max_days))
-        req_cmd = ("HDT,%s,%s,%s,%s,%d,%s,%d\r\n" % (
-            ticker, bgn_str, end_str, md_str, ascend, req_id, pts_per_batch))
+        req_cmd = self._daily_for_dates_cmd(ticker, bgn_dt, end_dt, ascend,
+                                            max_days, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_daily_data(req_id)
@@ -2287,9 +3174,7 @@ class HistoryConn(FeedConn):
         """
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        pts_per_batch = min((100, num_weeks))
-        req_cmd = ("HWX,%s,%d,%d,%s,%d\r\n" % (
-            ticker, num_weeks, ascend, req_id, pts_per_batch))
+        req_cmd = self._daily_cmd("HWX", ticker, num_weeks, ascend, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_daily_data(req_id)
@@ -2322,9 +3207,7 @@ class HistoryConn(FeedConn):
         """
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
-        pts_per_batch = min((100, num_months))
-        req_cmd = ("HMX,%s,%d,%d,%s,%d\r\n" % (
-            ticker, num_months, ascend, req_id, pts_per_batch))
+        req_cmd = self._daily_cmd("HMX", ticker, num_months, ascend, req_id)
         self._send_cmd(req_cmd)
         self._req_event[req_id].wait(timeout=timeout)
         data = self._read_daily_data(req_id)
@@ -2341,6 +3224,107 @@ class HistoryConn(FeedConn):
             return data
 
 
+class HistoryConnPool:
+    """
+    A few HistoryConns used together to fetch history for many tickers.
+
+    :param num_conns: Number of lookup sockets to open.
+    :param name: Each connection is named name-N.
+    :param host: Host IQFeed.exe is running on.
+    :param port: IQFeed lookup port.
+
+    IQFeed works on requests on different lookup sockets in parallel, so
+    spreading a large backfill over a handful of connections, each with a
+    few requests in flight, is much faster than one request at a time. The
+    *_many methods take the same arguments as the HistoryConn versions with
+    max_in_flight being per connection.
+
+    Use connect() and disconnect() or pass conns() to ConnConnector.
+
+    """
+
+    def __init__(self, num_conns: int = 2, name: str = "HistoryConnPool",
+                 host: str = FeedConn.host, port: int = HistoryConn.port):
+        assert num_conns > 0
+        self._conns = [HistoryConn(name="%s-%d" % (name, conn_num),
+                                   host=host, port=port)
+                       for conn_num in range(num_conns)]
+
+    def conns(self) -> List[HistoryConn]:
+        """The HistoryConns in the pool."""
+        return list(self._conns)
+
+    def connect(self) -> None:
+        """Connect every HistoryConn in the pool."""
+        for conn in self._conns:
+            conn.connect()
+
+    def disconnect(self) -> None:
+        """Disconnect every HistoryConn in the pool."""
+        for conn in self._conns:
+            conn.disconnect()
+
+    def set_reactor(self, reactor) -> None:
+        """Read every HistoryConn in the pool from reactor's thread."""
+        for conn in self._conns:
+            conn.set_reactor(reactor)
+
+    def add_listener(self, listener) -> None:
+        """Add listener to every HistoryConn in the pool."""
+        for conn in self._conns:
+            conn.add_listener(listener)
+
+    def remove_listener(self, listener) -> None:
+        """Remove listener from every HistoryConn in the pool."""
+        for conn in self._conns:
+            conn.remove_listener(listener)
+
+    def iter_bars_many(self, tickers: Sequence[str], interval_len: int,
+                       interval_type: str, max_bars: int = None,
+                       bgn_prd: datetime.datetime = None,
+                       end_prd: datetime.datetime = None,
+                       ascend: bool = False, label_at_begin: bool = False,
+                       max_in_flight: int = 4,
+                       timeout: int = None) -> Iterator[Tuple[str, np.array]]:
+        """See HistoryConn.iter_bars_many."""
+        return HistoryConn._iter_pipelined(
+            self._conns, HistoryConn._bar_jobs(
+                tickers, interval_len, interval_type, max_bars, bgn_prd,
+                end_prd, ascend, label_at_begin), max_in_flight, timeout)
+
+    def request_bars_many(self, tickers: Sequence[str], interval_len: int,
+                          interval_type: str, max_bars: int = None,
+                          bgn_prd: datetime.datetime = None,
+                          end_prd: datetime.datetime = None,
+                          ascend: bool = False, label_at_begin: bool = False,
+                          max_in_flight: int = 4,
+                          timeout: int = None) -> Dict[str, np.array]:
+        """See HistoryConn.request_bars_many."""
+        return dict(self.iter_bars_many(
+            tickers, interval_len, interval_type, max_bars, bgn_prd, end_prd,
+            ascend, label_at_begin, max_in_flight, timeout))
+
+    def iter_ticks_many(self, tickers: Sequence[str], max_ticks: int = None,
+                        bgn_prd: datetime.datetime = None,
+                        end_prd: datetime.datetime = None,
+                        ascend: bool = False, max_in_flight: int = 4,
+                        timeout: int = None) -> Iterator[Tuple[str, np.array]]:
+        """See HistoryConn.iter_ticks_many."""
+        return HistoryConn._iter_pipelined(
+            self._conns, HistoryConn._tick_jobs(
+                tickers, max_ticks, bgn_prd, end_prd, ascend),
+            max_in_flight, timeout)
+
+    def request_ticks_many(self, tickers: Sequence[str], max_ticks: int = None,
+                           bgn_prd: datetime.datetime = None,
+                           end_prd: datetime.datetime = None,
+                           ascend: bool = False, max_in_flight: int = 4,
+                           timeout: int = None) -> Dict[str, np.array]:
+        """See HistoryConn.request_ticks_many."""
+        return dict(self.iter_ticks_many(tickers, max_ticks, bgn_prd, end_prd,
+                                         ascend, max_in_flight, timeout))
+
+
 class TableConn(FeedConn):
     """
     TableConn is used to get type data from IQFeed's lookup socket.
@@ -2383,6 +3367,16 @@ class TableConn(FeedConn):
 
     naic_type = np.dtype([('naic', 'u8'), ('name', 'S128')])
 
+    # Bump when a table dtype changes so old snapshots are not loaded.
+    snapshot_version = 1
+
+    # (attribute, dtype, id field) of each table, in update order.
+    _tables = (('markets', mkt_type, 'mkt_id'),
+               ('security_types', security_type, 'sec_type'),
+               ('trade_conds', tcond_type, 'tcond_id'),
+               ('sics', sic_type, 'sic'),
+               ('naics', naic_type, 'naic'))
+
     def __init__(self, name: str = "TableConn", host: str = FeedConn.host,
                  port: int = port):
         super().__init__(name, host, port)
@@ -2398,6 +3392,9 @@ class TableConn(FeedConn):
         self._lookup_done = False
 
         self._update_lock = threading.RLock()
+        self._indexes = {}
+        self._refresh_thread = None
+        self.refresh_error = None
 
     def _send_connect_message(self):
         # The lookup/history socket does not accept connect messages
@@ -2462,6 +3459,168 @@ class TableConn(FeedConn):
             raise RuntimeError("Update tables before requesting data")
         return self.naics
 
+    def is_loaded(self) -> bool:
+        """True once the tables have been updated or loaded from a snapshot."""
+        return self._lookup_done
+
+    @staticmethod
+    def _snapshot_dir(path: str) -> str:
+        return os.path.join(path, "v%d" % TableConn.snapshot_version)
+
+    def save_snapshot(self, path: str) -> None:
+        """
+        Save the tables to disk so load_snapshot can use them at startup.
+
+        :param path: Directory to keep snapshots in. Created if necessary.
+
+        Each table is saved as a .npy file in a subdirectory for the
+        current snapshot_version. Files are written under a temporary name
+        and renamed into place, so a process that has the previous snapshot
+        mapped keeps seeing it and one loading at the same time never sees
+        a half written table.
+
+        """
+        if not self._lookup_done:
+            raise RuntimeError("Update tables before saving them")
+        snap_dir = TableConn._snapshot_dir(path)
+        os.makedirs(snap_dir, exist_ok=True)
+        with self._update_lock:
+            tables = [(attr, getattr(self, attr))
+                      for attr, _, _ in TableConn._tables]
+        for attr, table in tables + [("saved", np.array([time.time()]))]:
+            tmp_name = os.path.join(snap_dir, ".%s.%d.npy" % (attr,
+                                                              os.getpid()))
+            np.save(tmp_name, np.ascontiguousarray(table))
+            os.replace(tmp_name, os.path.join(snap_dir, "%s.npy" % attr))
+
+    def load_snapshot(self, path: str) -> bool:
+        """
+        Use tables saved by save_snapshot instead of asking IQFeed.
+
+        :param path: Directory given to save_snapshot.
+        :return: True if a complete snapshot of the current version was
+            loaded, False (and nothing changed) otherwise.
+
+        The tables are memory mapped read-only, so this takes about as
+        long as opening five files. The get_xxx functions and lookups
+        work right away, without connecting. Call refresh_in_background
+        to bring them up to date while the process gets on with starting.
+
+        """
+        snap_dir = TableConn._snapshot_dir(path)
+        loaded = {}
+        try:
+            for attr, dtype, _ in TableConn._tables:
+                table = np.load(os.path.join(snap_dir, "%s.npy" % attr),
+                                mmap_mode='r')
+                if table.dtype != dtype:
+                    return False
+                loaded[attr] = table
+        except (OSError, ValueError):
+            return False
+        with self._update_lock:
+            for attr, table in loaded.items():
+                setattr(self, attr, table)
+            self._lookup_done = True
+        return True
+
+    @staticmethod
+    def snapshot_age(path: str) -> float:
+        """Seconds since the snapshot in path was saved, inf if there's none."""
+        try:
+            saved = np.load(os.path.join(TableConn._snapshot_dir(path),
+                                         "saved.npy"))
+            return time.time() - float(saved[0])
+        except (OSError, ValueError, IndexError):
+            return float('inf')
+
+    def refresh_in_background(self,
+                              snapshot_path: str = None) -> threading.Thread:
+        """
+        Call update_tables in a background thread.
+
+        :param snapshot_path: If given, save_snapshot to this directory once
+            the tables have been updated.
+        :return: The thread doing the refresh.
+
+        The connection must already be connected. Each table is swapped in
+        whole when it has been read, so the getters and lookups keep
+        returning the old (snapshot) data until then. If the refresh fails
+        the exception is kept in refresh_error.
+
+        """
+        if self._refresh_thread is not None and (
+                self._refresh_thread.is_alive()):
+            return self._refresh_thread
+
+        def refresh():
+            try:
+                self.update_tables()
+                if snapshot_path is not None:
+                    self.save_snapshot(snapshot_path)
+                self.refresh_error = None
+            except (Exception, UnexpectedField, UnexpectedMessage,
+                    UnexpectedProtocol) as err:
+                self.refresh_error = err
+
+        self._refresh_thread = threading.Thread(
+            target=refresh, name="%s-refresh" % self.name(), daemon=True)
+        self._refresh_thread.start()
+        return self._refresh_thread
+
+    def _index(self, attr: str) -> Dict[int, int]:
+        """Map from id to row number of a table, rebuilt when it changes."""
+        table = getattr(self, attr)
+        if table is None:
+            raise RuntimeError("Update tables before requesting data")
+        cached = self._indexes.get(attr)
+        if cached is None or cached[0] is not table:
+            id_field = [tbl[2] for tbl in TableConn._tables
+                        if tbl[0] == attr][0]
+            cached = (table, {int(key): row for row, key in
+                              enumerate(table[id_field])})
+            self._indexes[attr] = cached
+        return cached[1]
+
+    def _lookup(self, attr: str, key: int):
+        row = self._index(attr).get(int(key))
+        return None if row is None else getattr(self, attr)[row]
+
+    def get_market(self, mkt_id: int):
+        """Row of get_markets() for market id mkt_id or None."""
+        return self._lookup('markets', mkt_id)
+
+    def get_security_type(self, sec_type: int):
+        """Row of get_security_types() for sec_type or None."""
+        return self._lookup('security_types', sec_type)
+
+    def get_trade_condition(self, tcond_id: int):
+        """Row of get_trade_conditions() for tcond_id or None."""
+        return self._lookup('trade_conds', tcond_id)
+
+    def get_sic_code(self, sic: int):
+        """Row of get_sic_codes() for sic or None."""
+        return self._lookup('sics', sic)
+
+    def get_naic_code(self, naic: int):
+        """Row of get_naic_codes() for naic or None."""
+        return self._lookup('naics', naic)
+
+    def market_names(self) -> np.array:
+        """
+        Market short names in an array indexed by market id.
+
+        Ids without a market have b''. Use it to name a whole column of
+        market center ids at once, for example
+        table_conn.market_names()[updates['Most Recent Trade Market Center']]
+
+        """
+        markets = self.get_markets()
+        names = np.zeros(int(markets['mkt_id'].max(initial=0)) + 1,
+                         dtype=markets.dtype['short_name'])
+        names[markets['mkt_id']] = markets['short_name']
+        return names
+
     def _update_markets(self):
         with self._update_lock:
             self._current_deque.clear()
@@ -2470,22 +3629,23 @@ class TableConn(FeedConn):
             self._current_event.wait(120)
             if self._current_event.is_set():
                 num_pts = len(self._current_deque)
-                self.markets = np.empty(num_pts, TableConn.mkt_type)
+                markets = np.empty(num_pts, TableConn.mkt_type)
                 line_num = 0
                 while self._current_deque and (line_num < num_pts):
                     data_list = self._current_deque.popleft()
-                    self.markets[line_num]['mkt_id'] = fr.read_uint64(
+                    markets[line_num]['mkt_id'] = fr.read_uint64(
                             data_list[0])
-                    self.markets[line_num]['short_name'] = data_list[1]
-                    self.markets[line_num]['name'] = data_list[2]
-                    self.markets[line_num]['group_id'] = fr.read_uint64(
+                    markets[line_num]['short_name'] = data_list[1]
+                    markets[line_num]['name'] = data_list[2]
+                    markets[line_num]['group_id'] = fr.read_uint64(
                             data_list[3])
-                    self.markets[line_num]['group'] = data_list[4]
+                    markets[line_num]['group'] = data_list[4]
                     line_num += 1
                     if line_num >= num_pts:
                         assert len(self._current_deque) == 0
                     if len(self._current_deque) == 0:
                         assert line_num >= num_pts
+                self.markets = markets
             else:
                 raise RuntimeError("Update Market Types timed out")
 
@@ -2497,19 +3657,20 @@ class TableConn(FeedConn):
             self._current_event.wait(120)
             if self._current_event.is_set():
                 num_pts = len(self._current_deque)
-                self.security_types = np.empty(num_pts, TableConn.security_type)
+                security_types = np.empty(num_pts, TableConn.security_type)
                 line_num = 0
                 while self._current_deque and (line_num < num_pts):
                     data_list = self._current_deque.popleft()
-                    self.security_types[line_num]['sec_type'] = fr.read_uint64(
+                    security_types[line_num]['sec_type'] = fr.read_uint64(
                             data_list[0])
-                    self.security_types[line_num]['short_name'] = data_list[1]
-                    self.security_types[line_num]['name'] = data_list[2]
+                    security_types[line_num]['short_name'] = data_list[1]
+                    security_types[line_num]['name'] = data_list[2]
                     line_num += 1
                     if line_num >= num_pts:
                         assert len(self._current_deque) == 0
                     if len(self._current_deque) == 0:
                         assert line_num >= num_pts
+                self.security_types = security_types
             else:
                 raise RuntimeError("Update Security Types timed out")
 
@@ -2521,19 +3682,20 @@ class TableConn(FeedConn):
             self._current_event.wait(120)
             if self._current_event.is_set():
                 num_pts = len(self._current_deque)
-                self.trade_conds = np.empty(num_pts, TableConn.tcond_type)
+                trade_conds = np.empty(num_pts, TableConn.tcond_type)
                 line_num = 0
                 while self._current_deque and (line_num < num_pts):
                     data_list = self._current_deque.popleft()
-                    self.trade_conds[line_num]['tcond_id'] = fr.read_uint64(
+                    trade_conds[line_num]['tcond_id'] = fr.read_uint64(
                             data_list[0])
-                    self.trade_conds[line_num]['short_name'] = data_list[1]
-                    self.trade_conds[line_num]['name'] = data_list[2]
+                    trade_conds[line_num]['short_name'] = data_list[1]
+                    trade_conds[line_num]['name'] = data_list[2]
                     line_num += 1
                     if line_num >= num_pts:
                         assert len(self._current_deque) == 0
                     if len(self._current_deque) == 0:
                         assert line_num >= num_pts
+                self.trade_conds = trade_conds
             else:
                 raise RuntimeError("Update Trade Conditions timed out")
 
@@ -2545,17 +3707,18 @@ class TableConn(FeedConn):
             self._current_event.wait(120)
             if self._current_event.is_set():
                 num_pts = len(self._current_deque)
-                self.sics = np.empty(num_pts, TableConn.sic_type)
+                sics = np.empty(num_pts, TableConn.sic_type)
                 line_num = 0
                 while self._current_deque and (line_num < num_pts):
                     data_list = self._current_deque.popleft()
-                    self.sics[line_num]['sic'] = fr.read_uint64(data_list[0])
-                    self.sics[line_num]['name'] = ",".join(data_list[1:])
+                    sics[line_num]['sic'] = fr.read_uint64(data_list[0])
+                    sics[line_num]['name'] = ",".join(data_list[1:])
                     line_num += 1
                     if line_num >= num_pts:
                         assert len(self._current_deque) == 0
                     if len(self._current_deque) == 0:
                         assert line_num >= num_pts
+                self.sics = sics
             else:
                 raise RuntimeError("Update SIC codes timed out")
 
@@ -2567,17 +3730,18 @@ class TableConn(FeedConn):
             self._current_event.wait(120)
             if self._current_event.is_set():
                 num_pts = len(self._current_deque)
-                self.naics = np.empty(num_pts, TableConn.naic_type)
+                naics = np.empty(num_pts, TableConn.naic_type)
                 line_num = 0
                 while self._current_deque and (line_num < num_pts):
                     data_list = self._current_deque.popleft()
-                    self.naics[line_num]['naic'] = fr.read_uint64(data_list[0])
-                    self.naics[line_num]['name'] = ",".join(data_list[1:])
+                    naics[line_num]['naic'] = fr.read_uint64(data_list[0])
+                    naics[line_num]['name'] = ",".join(data_list[1:])
                     line_num += 1
                     if line_num >= num_pts:
                         assert len(self._current_deque) == 0
                     if len(self._current_deque) == 0:
                         assert line_num >= num_pts
+                self.naics = naics
             else:
                 raise RuntimeError("Update NAIC codes timed out")
 
@@ -2623,6 +3787,13 @@ class LookupConn(FeedConn):
             [('symbol', 'S128'), ('market', 'u1'), ('security_type', 'u1'),
              ('name', 'S128'), ('sector', 'u8')])
 
+    # Type of numpy structured array read_option_symbols returns.
+    option_type = np.dtype([('symbol', 'S32'), ('expiry', 'M8[D]'),
+                            ('strike', 'f8'), ('right', 'S1')])
+
+    # [Root][YY][DD][Month code][Strike], month code A-L calls, M-X puts.
+    _option_symbol_re = re.compile(r"^(.+)(\d\d)(\d\d)([A-X])(\d+\.?\d*)$")
+
     def __init__(self, name: str = "SymbolSearchConn",
                  host: str = FeedConn.host, port: int = port):
         super().__init__(name, host, port)
@@ -2936,6 +4107,38 @@ class LookupConn(FeedConn):
                     put_symbols = put_symbols[:-1]
             return {"c": call_symbols, "p": put_symbols}
 
+    @staticmethod
+    def read_option_symbols(symbols: Sequence[str]) -> np.array:
+        """
+        Parse equity option symbols into an array of dtype option_type.
+
+        :param symbols: Option symbols as returned by
+            request_equity_option_chain, calls and puts in any order.
+        :return: numpy structured array with a row for each symbol that
+            looks like an option symbol, in the order given.
+
+        The expiry, strike and right (b'C' or b'P') are read from the
+        symbol itself. Symbols that don't follow the usual
+        [Root][YY][DD][Month code][Strike] layout (binary options for
+        example) are left out.
+
+        """
+        parsed = []
+        for symbol in symbols:
+            match = LookupConn._option_symbol_re.match(symbol)
+            if match is None:
+                continue
+            month_code = ord(match.group(4)) - ord('A')
+            try:
+                expiry = datetime.date(2000 + int(match.group(2)),
+                                       month_code % 12 + 1,
+                                       int(match.group(3)))
+            except ValueError:
+                continue
+            parsed.append((symbol, expiry, float(match.group(5)),
+                           'C' if month_code < 12 else 'P'))
+        return np.array(parsed, dtype=LookupConn.option_type)
+
     def request_futures_option_chain(self, symbol: str, opt_type: str = 'pc',
                                      month_codes: str = None, years: str =
                                      None,
@@ -3129,6 +4332,7 @@ class BarConn(FeedConn):
         super()._set_message_mappings()
         self._pf_dict['n'] = self._process_invalid_symbol
         self._pf_dict['B'] = self._process_bars
+        self._batch_dict['BC'] = self._process_live_bar_batch
         self._sm_dict["REPLACED PREVIOUS WATCH"] = self._process_replaced_watch
         self._sm_dict[
             "SYMBOL LIMIT REACHED"] = self._process_symbol_limit_reached
@@ -3173,12 +4377,17 @@ class BarConn(FeedConn):
         for listener in self._listeners:
             listener.process_watch(symbol, interval, request_id)
 
-    def _process_bars(self, fields: Sequence[str]):
-        """Parse bar data and call appropriate callback."""
+    def _batch_key(self, fields: Sequence[str]) -> str:
+        """Bar messages are keyed by bar type, the field after the req id."""
+        if fields[0][:1] == "B" and len(fields) > 1:
+            return fields[1]
+        return fields[0]
+
+    @staticmethod
+    def _read_bar(interval_data: np.array, fields: Sequence[str]) -> None:
+        """Read the fields of one bar message into interval_data."""
         assert len(fields) > 10
         assert fields[0][0] == "B" and fields[1][0] == "B"
-
-        interval_data = self._empty_interval_msg
         interval_data['symbol'] = fields[2]
         interval_data['date'], interval_data['time'] = fr.read_posix_ts(
                 fields[3])
@@ -3191,6 +4400,11 @@ class BarConn(FeedConn):
         interval_data['num_trds'] = (
             np.float64(fields[10]) if fields[10] != "" else 0)
 
+    def _process_bars(self, fields: Sequence[str]):
+        """Parse bar data and call appropriate callback."""
+        interval_data = self._empty_interval_msg
+        self._read_bar(interval_data, fields)
+
         bar_type = fields[1][1]
         if bar_type == 'U':
             for listener in self._listeners:
@@ -3204,6 +4418,14 @@ class BarConn(FeedConn):
         else:
             raise UnexpectedField("Bad bar type in BarConn")
 
+    def _process_live_bar_batch(self, rows: List[Sequence[str]]) -> None:
+        """Parse consecutive completed bars and send them as one batch."""
+        bars = np.zeros(len(rows), dtype=BarConn.interval_data_type)
+        for row_num, fields in enumerate(rows):
+            self._read_bar(bars[row_num], fields)
+        for listener in self._listeners:
+            listener.process_bar_batch(bars)
+
     def watch(self, symbol: str, interval_len: int, interval_type: str = None,
               bgn_flt: datetime.time = None, end_flt: datetime.time = None,
               update: int = None, bgn_bars: datetime.datetime = None,
@@ -3222,6 +4444,7 @@ class BarConn(FeedConn):
         :param lookback_bars: Get lookback_bars of backfill data
 
         Only one of bgn_bars, lookback_days or lookback_bars should be set.
+        watch_many sends the same request for many symbols at once.
 
         Requests live interval data. You can also request some backfill data.
         When you call this function:
@@ -3238,6 +4461,34 @@ class BarConn(FeedConn):
               [Interval Type],[Reserved],[UpdateInterval]
 
         """
+        self._send_cmd(self._watch_cmd(
+            symbol, interval_len, interval_type, bgn_flt, end_flt, update,
+            bgn_bars, lookback_days, lookback_bars))
+
+    def watch_many(self, symbols: Sequence[str], interval_len: int,
+                   interval_type: str = None, **kwargs) -> int:
+        """
+        watch every symbol in symbols with the same bars.
+
+        :param symbols: Symbols to request live interval data for.
+        :param interval_len: Interval length in interval_type units
+        :param interval_type: 's' = secs, 'v' = volume, 't' = ticks
+        :param kwargs: Any other argument of watch.
+        :return: The number of socket writes.
+
+        """
+        return self._send_cmds(
+            [self._watch_cmd(symbol, interval_len, interval_type, **kwargs)
+             for symbol in symbols])
+
+    @staticmethod
+    def _watch_cmd(symbol: str, interval_len: int, interval_type: str = None,
+                   bgn_flt: datetime.time = None,
+                   end_flt: datetime.time = None, update: int = None,
+                   bgn_bars: datetime.datetime = None,
+                   lookback_days: int = None,
+                   lookback_bars: int = None) -> str:
+        """The BW command watch sends."""
         assert interval_type in ('s', 'v', 't')
         bgn_bar_set = int(bgn_bars is not None)
         lookback_days_set = int(lookback_days is not None)
@@ -3253,15 +4504,18 @@ class BarConn(FeedConn):
 
         request_id = "B-%s-%0.4d-%s" % (symbol, interval_len, interval_type)
 
-        bar_cmd = "BW,%s,%s,%s,%s,%s,%s,%s,%s,%s,'',%s\r\n" % (
+        return "BW,%s,%s,%s,%s,%s,%s,%s,%s,%s,'',%s\r\n" % (
             symbol, interval_len, bgn_bar_str, lookback_days_str,
             lookback_bars_str,
             bf_str, ef_str, request_id, interval_type, update_str)
-        self._send_cmd(bar_cmd)
 
     def unwatch(self, symbol: str):
         """Unwatch a specific symbol"""
-        self._send_cmd("BR,%s" % symbol)
+        self._send_cmd("BR,%s\r\n" % symbol)
+
+    def unwatch_many(self, symbols: Sequence[str]) -> int:
+        """unwatch every symbol in symbols. Returns the writes."""
+        return self._send_cmds(["BR,%s\r\n" % symbol for symbol in symbols])
 
     def unwatch_all(self) -> None:
         """Unwatch all symbols."""
@@ -3272,7 +4526,7 @@ class BarConn(FeedConn):
         self._send_cmd("S,REQUEST WATCHES\r\n")
 
 
-class NewsConn(FeedConn):
+class NewsConn(_StreamingRequests, FeedConn):
     """
     NewsConn lets you do news lookups.
 
@@ -3302,7 +4556,7 @@ class NewsConn(FeedConn):
     NewsCountMsg = namedtuple("NewsCountMsg", ("symbol", "count"))
 
     def __init__(self, name: str = "NewsConn", host: str = FeedConn.host,
-                 port: int = port):
+                 port: int = port, story_cache: StoryCache = None):
         super().__init__(name, host, port)
         self._set_message_mappings()
         self._req_num = 0
@@ -3311,7 +4565,10 @@ class NewsConn(FeedConn):
         self._req_event = {}
         self._req_failed = {}
         self._req_err = {}
+        self._req_stream = {}
         self._req_lock = threading.RLock()
+        self.story_cache = story_cache if story_cache is not None else (
+            StoryCache())
 
     def _set_message_mappings(self) -> None:
         super()._set_message_mappings()
@@ -3323,6 +4580,10 @@ class NewsConn(FeedConn):
 
     def _process_news_datum(self, fields: Sequence[str]) -> None:
         req_id = fields[0]
+        stream = self._req_stream.get(req_id)
+        if stream is not None:
+            self._process_stream_datum(req_id, stream, fields)
+            return
         if 'E' == fields[1]:
             # Error
             self._req_failed[req_id] = True
@@ -3337,6 +4598,15 @@ class NewsConn(FeedConn):
             self._req_buf[req_id].append(fields)
             self._req_numlines[req_id] += 1
 
+    def _stream_line(self, fields: Sequence[str]) -> str:
+        """Lines are kept as the text IQFeed sent, ready for an XML parser."""
+        return NewsConn._xml_text(fields)
+
+    @staticmethod
+    def _xml_text(fields: Sequence[str]) -> str:
+        """The XML in a response line, with the commas split off put back."""
+        return ','.join(fields[1:])
+
     def _get_next_req_id(self) -> str:
         with self._req_lock:
             req_id = "N_%.10d" % self._req_num
@@ -3374,7 +4644,8 @@ class NewsConn(FeedConn):
         if res.failed:
             return np.array([res.err_msg], dtype='object')
         else:
-            raw_text = '\n'.join([''.join(line[1:]) for line in res.raw_data])
+            raw_text = '\n'.join([NewsConn._xml_text(line)
+                                  for line in res.raw_data])
             return ElementTree.fromstring(raw_text)
 
     def _create_config_structure(self, xml_data: ElementTree.Element) -> dict:
@@ -3414,40 +4685,115 @@ class NewsConn(FeedConn):
                 raise RuntimeError(err_msg)
         return self._create_config_structure(xml_data)
 
+    @staticmethod
+    def _create_headline(cur_headline: ElementTree.Element) -> NewsMsg:
+        """Parse one headline formatted as XML."""
+        story_id = None
+        distributor = None
+        symbol_list = []
+        story_date = None
+        story_time = None
+        headline = None
+        for item in cur_headline:
+            if "id" == item.tag:
+                story_id = item.text
+            elif "source" == item.tag:
+                distributor = item.text
+            elif "symbols" == item.tag:
+                symbol_list = item.text.split(":")
+                if len(symbol_list) > 0:
+                    symbol_list = [sym for sym in symbol_list if sym != '']
+            elif "timestamp" == item.tag:
+                story_date, story_time = fr.read_hist_news_timestamp(
+                        item.text)
+            elif "text" == item.tag:
+                headline = item.text
+
+        return NewsConn.NewsMsg(story_id=story_id,
+                                distributor=distributor,
+                                symbol_list=symbol_list,
+                                story_date=story_date,
+                                story_time=story_time,
+                                headline=headline)
+
     @staticmethod
     def _create_headline_list(xml_data: ElementTree.Element) -> List[NewsMsg]:
         """Parse Headlines formatted as XML."""
-        news_headlines = []
-        for cur_headline in xml_data:
-            story_id = None
-            distributor = None
-            symbol_list = []
-            story_date = None
-            story_time = None
-            headline = None
-            for item in cur_headline:
-                if "id" == item.tag:
-                    story_id = item.text
-                elif "source" == item.tag:
-                    distributor = item.text
-                elif "symbols" == item.tag:
-                    symbol_list = item.text.split(":")
-                    if len(symbol_list) > 0:
-                        symbol_list = [sym for sym in symbol_list if sym != '']
-                elif "timestamp" == item.tag:
-                    story_date, story_time = fr.read_hist_news_timestamp(
-                            item.text)
-                elif "text" == item.tag:
-                    headline = item.text
-
-            news_headlines.append(
-                    NewsConn.NewsMsg(story_id=story_id,
-                                     distributor=distributor,
-                                     symbol_list=symbol_list,
-                                     story_date=story_date,
-                                     story_time=story_time,
-                                     headline=headline))
-        return news_headlines
+        return [NewsConn._create_headline(cur_headline)
+                for cur_headline in xml_data]
+
+    @staticmethod
+    def _news_headlines_cmd(sources: List[str], symbols: List[str],
+                            date: datetime.date, limit: int,
+                            req_id: str) -> str:
+        """Build the NHL command for request_news_headlines."""
+        sources_str = ''
+        if sources is not None:
+            sources_str = ":".join(sources)
+
+        symbols_str = ''
+        if symbols is not None:
+            symbols_str = ":".join(symbols)
+
+        date_str = ''
+        if date is not None:
+            date_str = fr.date_to_yyyymmdd(date)
+
+        return "NHL,%s,%s,%s,%d,%s,%s\r\n" % (
+            sources_str, symbols_str, 'x', limit, date_str, req_id)
+
+    def iter_news_headlines(self, sources: List[str] = None,
+                            symbols: List[str] = None,
+                            date: datetime.date = None, limit: int = 1000,
+                            chunk_lines: int = 100,
+                            timeout: int = None) -> Iterator[NewsMsg]:
+        """
+        Stream news headlines, yielding each one as soon as it is parsed.
+
+        :param sources: Filter news sources to query. Default all sources.
+        :param symbols: Filter symbols you want news for. Default all symbols.
+        :param date: Filter News only for date. Default no date filter
+        :param limit: Only limit stories. Default 1000
+        :param chunk_lines: Lines of XML handed from the reading thread to
+            the parser at a time.
+        :param timeout: Wait upto timeout seconds for each chunk.
+        :return: Generator of NewsMsg, one for each story.
+
+        Same request as request_news_headlines, but the XML is parsed
+        incrementally as it arrives and each headline element is thrown away
+        once it has been turned into a NewsMsg. So the first headline is
+        available long before the last one has arrived and memory use does
+        not grow with limit. The request is sent when iteration starts.
+        While the consumer is behind this NewsConn stops reading.
+
+        Raises RuntimeError on errors from IQFeed or timeouts, possibly
+        after some headlines have been yielded.
+
+        """
+        req_id = self._get_next_req_id()
+        req_cmd = self._news_headlines_cmd(sources, symbols, date, limit,
+                                           req_id)
+        chunks = self._iter_stream(req_cmd, req_id, chunk_lines, timeout)
+        parser = ElementTree.XMLPullParser(events=("start", "end"))
+        root = None
+        depth = 0
+        try:
+            for chunk in chunks:
+                parser.feed('\n'.join(chunk) + '\n')
+                for event, elem in parser.read_events():
+                    if "start" == event:
+                        if 0 == depth:
+                            root = elem
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if 1 == depth:
+                        # A whole headline, a child of the root element.
+                        yield self._create_headline(elem)
+                        root.remove(elem)
+            parser.close()
+        finally:
+            chunks.close()
 
     def request_news_headlines(self, sources: List[str] = None,
                                symbols: List[str] = None,
@@ -3482,32 +4828,13 @@ class NewsConn(FeedConn):
 
         NHL,[Sources],[Symbols],[XML/Text],[Limit],[Date],[RequestID]<CR><LF>
 
-        """
-        req_id = self._get_next_req_id()
-        self._setup_request_data(req_id)
-
-        sources_str = ''
-        if sources is not None:
-            sources_str = ":".join(sources)
+        The response is parsed as it arrives by iter_news_headlines, use
+        that to process headlines before the last one has arrived.
 
-        symbols_str = ''
-        if symbols is not None:
-            symbols_str = ":".join(symbols)
-
-        date_str = ''
-        if date is not None:
-            date_str = fr.date_to_yyyymmdd(date)
-
-        req_cmd = "NHL,%s,%s,%s,%d,%s,%s\r\n" % (
-            sources_str, symbols_str, 'x', limit, date_str, req_id)
-        self._send_cmd(req_cmd)
-        self._req_event[req_id].wait(timeout=timeout)
-        xml_data = self._get_xml_message(req_id)
-        if hasattr(xml_data, 'dtype'):
-            if xml_data.dtype == object:
-                err_msg = "Request: %s, Error: %s" % (req_cmd, str(xml_data[0]))
-                raise RuntimeError(err_msg)
-        return self._create_headline_list(xml_data)
+        """
+        return list(self.iter_news_headlines(sources=sources, symbols=symbols,
+                                             date=date, limit=limit,
+                                             timeout=timeout))
 
     @staticmethod
     def _create_news_story(xml_data: ElementTree.Element) -> NewsStoryMsg:
@@ -3535,10 +4862,16 @@ class NewsConn(FeedConn):
         is_link: Is the story linked
         story: Text of the story
 
+        Stories are kept in story_cache, so asking for a story again does
+        not go to IQFeed.
+
         NSY,[ID],[XML/Text/Email],[DeliverTo],[RequestID]<CR><LF>
 
         """
         assert story_id is not None
+        cached = self.story_cache.get(story_id)
+        if cached is not None:
+            return NewsConn.NewsStoryMsg(story=cached[0], is_link=cached[1])
         req_id = self._get_next_req_id()
         self._setup_request_data(req_id)
 
@@ -3550,7 +4883,9 @@ class NewsConn(FeedConn):
             if xml_data.dtype == object:
                 err_msg = "Request: %s, Error: %s" % (req_cmd, str(xml_data[0]))
                 raise RuntimeError(err_msg)
-        return self._create_news_story(xml_data)
+        story = self._create_news_story(xml_data)
+        self.story_cache.put(story_id, story.story, story.is_link)
+        return story
 
     def email_news_story(self, story_id: str, address: str) -> None:
         """
@@ -0,0 +1,223 @@
+# coding=utf-8
+
+"""
+Run listener callbacks on a worker thread instead of the reading thread.
+
+FeedConn calls its listeners from the thread reading the socket. A listener
+that takes longer than IQFeed takes to send the next message stops the
+connection reading, IQFeed buffers the difference and eventually gives up
+and disconnects. ConflatingDispatcher sits between a FeedConn and a
+listener: the reading thread only queues callbacks, a worker thread makes
+them.
+
+Quote updates are conflated per symbol: while the worker is busy only the
+latest update for each symbol is kept, which is what a consumer that can't
+keep up with every tick wants anyway. Everything else (news, summaries,
+bars, admin messages etc) goes through a bounded queue in order and is
+dropped if the queue is full.
+
+"""
+
+import collections
+import threading
+import time
+from typing import Dict
+
+import numpy as np
+
+
+class ConflatingDispatcher:
+    """
+    Listener that hands callbacks to another listener on a worker thread.
+
+    Add the dispatcher to a FeedConn instead of the listener:
+
+        dispatcher = ConflatingDispatcher(listener)
+        quote_conn.add_listener(dispatcher)
+        dispatcher.start()
+
+    Updates (process_update and process_update_batch) are delivered to the
+    listener as batches of the latest update of each symbol with updates
+    since the last batch, in the order the symbols were first seen, by
+    process_update_batch or, if deliver_batches is False, one at a time by
+    process_update. Any other callback the listener has is queued and
+    called with the same arguments. Queued callbacks are delivered before
+    the updates that arrived with them, so the relative order of updates
+    and other messages is not kept.
+
+    Exceptions raised by the listener are counted and kept in last_error
+    so one bad message doesn't stop the worker.
+
+    """
+
+    def __init__(self, listener, max_symbols: int = 100000,
+                 max_events: int = 10000, symbol_field: str = "Symbol",
+                 deliver_batches: bool = True, name: str = None):
+        """
+        :param listener: Listener the callbacks are made on.
+        :param max_symbols: Most symbols with updates waiting. Updates for
+            new symbols beyond this are dropped.
+        :param max_events: Most other callbacks waiting. Callbacks beyond
+            this are dropped.
+        :param symbol_field: Field of the update dtype updates are
+            conflated on.
+        :param deliver_batches: Call process_update_batch, not process_update.
+        :param name: Name of the worker thread.
+
+        """
+        assert max_symbols > 0 and max_events > 0
+        self._listener = listener
+        self._name = name if name is not None else (
+            "%s-dispatch" % getattr(listener, "_name", "listener"))
+        self.max_symbols = max_symbols
+        self.max_events = max_events
+        self.symbol_field = symbol_field
+        self.deliver_batches = deliver_batches
+        self._latest = {}
+        self._events = collections.deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self._busy = False
+        self.received = 0
+        self.delivered = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+
+    def __getattr__(self, name: str):
+        """Queue any other callback the listener has."""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        callback = getattr(self._listener, name)
+        if not callable(callback):
+            return callback
+
+        def enqueue(*args, **kwargs):
+            self._enqueue(name, args, kwargs)
+        return enqueue
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name=self._name,
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """Deliver what is waiting, then stop the worker thread."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def drain(self, timeout: float = None) -> bool:
+        """
+        Wait until everything queued has been delivered.
+
+        :param timeout: Give up after timeout seconds.
+        :return: False if it timed out.
+
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._latest or self._events or self._busy:
+                remaining = None if deadline is None else (
+                    deadline - time.monotonic())
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def pending(self) -> int:
+        """Symbols and callbacks waiting for the worker."""
+        return len(self._latest) + len(self._events)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters since the dispatcher was created."""
+        return {"received": self.received,
+                "delivered": self.delivered,
+                "conflated": self.conflated,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "pending": self.pending()}
+
+    def process_update(self, update: np.array) -> None:
+        self.process_update_batch(update)
+
+    def process_update_batch(self, updates: np.array) -> None:
+        """Keep the latest update of each symbol until the worker runs."""
+        symbols = updates[self.symbol_field].tolist()
+        with self._cond:
+            latest = self._latest
+            was_empty = not latest
+            for symbol, update in zip(symbols, updates):
+                if symbol in latest:
+                    self.conflated += 1
+                elif len(latest) >= self.max_symbols:
+                    self.dropped += 1
+                    continue
+                latest[symbol] = update
+            self.received += len(symbols)
+            if was_empty:
+                self._cond.notify()
+
+    def _enqueue(self, name: str, args: tuple, kwargs: dict) -> None:
+        with self._cond:
+            self.received += 1
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._events.append((name, args, kwargs))
+            self._cond.notify()
+
+    def _run(self) -> None:
+        """Worker thread."""
+        while True:
+            with self._cond:
+                while not (self._latest or self._events or self._stop):
+                    self._cond.wait()
+                if self._stop and not (self._latest or self._events):
+                    return
+                events = self._events
+                latest = self._latest
+                self._events = collections.deque()
+                self._latest = {}
+                self._busy = True
+            try:
+                for name, args, kwargs in events:
+                    self._call(getattr(self._listener, name), *args, **kwargs)
+                if latest:
+                    self._deliver_updates(list(latest.values()))
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self.delivered += len(events) + len(latest)
+                    self._cond.notify_all()
+
+    def _deliver_updates(self, rows: list) -> None:
+        # Updates from before and after the fields changed have different
+        # dtypes, so each dtype gets an array of its own.
+        by_dtype = {}
+        for row in rows:
+            by_dtype.setdefault(row.dtype, []).append(row)
+        for dtype, dtype_rows in by_dtype.items():
+            updates = np.array(dtype_rows, dtype=dtype)
+            if self.deliver_batches:
+                self._call(self._listener.process_update_batch, updates)
+            else:
+                for idx in range(len(updates)):
+                    self._call(self._listener.process_update,
+                               updates[idx:idx + 1])
+
+    def _call(self, callback, *args, **kwargs) -> None:
+        try:
+            callback(*args, **kwargs)
+        except Exception as err:
+            self.errors += 1
+            self.last_error = err
@@ -3,10 +3,20 @@
 """
 Functions used to parse individual fields in the feed.
 
+These run once per field per message so they avoid numpy scalars, which
+are several times slower to build from a string than a Python int or float
+and are converted again anyway when stored in a structured array. Dates
+and the HH:MM:SS part of times are the same for many messages in a row so
+their parsed values are memoized.
+
+column_readers has versions of the commonly used readers that parse a
+whole column of a batch of messages at once.
+
 """
 
 from typing import Union, Tuple
 import datetime
+import functools
 import numpy as np
 from pyiqfeed.exceptions import UnexpectedField
 
@@ -43,25 +53,22 @@ def read_is_short_restricted(field: str) -> bool:
         return False
 
 
-def read_tick_direction(field: str) -> np.int8:
+_tick_directions = {"173": 1, "175": -1, "183": 0, "": 0}
+
+
+def read_tick_direction(field: str) -> int:
     """
     1 if last tick was an uptick, -1 for downtick, 0 for zero-tick.
 
-    Throws a BadField exception if
+    Throws an UnexpectedField exception if the field is something else.
     """
-    if field != "":
-        field_as_int = int(field)
-        if field_as_int == 173:
-            return np.int8(1)
-        if field_as_int == 175:
-            return np.int8(-1)
-        if field_as_int == 183:
-            return np.int8(0)
-        else:
-            raise UnexpectedField(
-                "Unknown value in Tick Direction Field: %s" % field)
-    else:
-        return np.int8(0)
+    try:
+        return _tick_directions[field]
+    except KeyError:
+        if field.strip() in _tick_directions:
+            return _tick_directions[field.strip()]
+        raise UnexpectedField(
+            "Unknown value in Tick Direction Field: %s" % field) from None
 
 
 def read_int(field: str) -> int:
@@ -74,19 +81,50 @@ def read_hex(field: str) -> int:
     return int(field, 16) if field != "" else 0
 
 
-def read_uint8(field: str) -> np.uint8:
+def _out_of_bounds(val: int, type_name: str) -> OverflowError:
+    """The error numpy raises for an int that doesn't fit in type_name."""
+    return OverflowError("Python integer %d out of bounds for %s" % (
+        val, type_name))
+
+
+def read_uint8(field: str) -> int:
     """Read a uint8."""
-    return np.uint8(field) if field != "" else 0
+    if field == "":
+        return 0
+    val = int(field)
+    if not 0 <= val <= 0xff:
+        raise _out_of_bounds(val, "uint8")
+    return val
 
 
-def read_uint16(field: str) -> np.uint16:
+def read_uint16(field: str) -> int:
     """Read a uint16."""
-    return np.uint16(field) if field != "" else 0
+    if field == "":
+        return 0
+    val = int(field)
+    if not 0 <= val <= 0xffff:
+        raise _out_of_bounds(val, "uint16")
+    return val
+
+
+def read_uint32(field: str) -> int:
+    """Read a uint32."""
+    if field == "":
+        return 0
+    val = int(field)
+    if not 0 <= val <= 0xffffffff:
+        raise _out_of_bounds(val, "uint32")
+    return val
 
 
-def read_uint64(field: str) -> np.uint64:
+def read_uint64(field: str) -> int:
     """Read a uint64."""
-    return np.uint64(field) if field != "" else 0
+    if field == "":
+        return 0
+    val = int(field)
+    if not 0 <= val <= 0xffffffffffffffff:
+        raise _out_of_bounds(val, "uint64")
+    return val
 
 
 def read_float(field: str) -> float:
@@ -94,9 +132,17 @@ def read_float(field: str) -> float:
     return float(field) if field != "" else float('nan')
 
 
-def read_float64(field: str) -> np.float64:
-    """Read a float64."""
-    return np.float64(field) if field != "" else np.nan
+def read_float64(field: str) -> float:
+    """Read a float64. Same as read_float."""
+    return float(field) if field != "" else float('nan')
+
+
+def read_trade_conditions(field: str) -> Tuple[int, int, int, int]:
+    """Read upto 4 trade conditions, 2 hex digits each. Missing ones are 0."""
+    conds = [0, 0, 0, 0]
+    for cond_num in range(min(4, (len(field) + 1) // 2)):
+        conds[cond_num] = int(field[2 * cond_num:2 * cond_num + 2], 16)
+    return conds[0], conds[1], conds[2], conds[3]
 
 
 def read_split_string(split_str: str) -> Tuple[np.float64, np.datetime64]:
@@ -121,13 +167,19 @@ def read_hhmmss_no_colon(field: str) -> int:
         return 0
 
 
+@functools.lru_cache(maxsize=1 << 17)
+def _hhmmss_to_us(hhmmss: str) -> int:
+    """us since midnight of the HH:MM:SS at the start of a time field."""
+    hour = int(hhmmss[0:2])
+    minute = int(hhmmss[3:5])
+    second = int(hhmmss[6:8])
+    return 1000000 * ((3600 * hour) + (60 * minute) + second)
+
+
 def read_hhmmss(field: str) -> int:
     """Read a HH:MM:SS field and return us since midnight."""
     if field != "":
-        hour = int(field[0:2])
-        minute = int(field[3:5])
-        second = int(field[6:8])
-        return 1000000 * ((3600 * hour) + (60 * minute) + second)
+        return _hhmmss_to_us(field[0:8])
     else:
         return 0
 
@@ -135,12 +187,7 @@ def read_hhmmss(field: str) -> int:
 def read_hhmmssmil(field: str) -> int:
     """Read a HH:MM:SS:MILL field and return us since midnight."""
     if field != "":
-        hour = int(field[0:2])
-        minute = int(field[3:5])
-        second = int(field[6:8])
-        msecs = int(field[9:])
-        return ((1000000 * ((3600 * hour) + (60 * minute) + second)) +
-                (1000 * msecs))
+        return _hhmmss_to_us(field[0:8]) + 1000 * int(field[9:])
     else:
         return 0
 
@@ -148,37 +195,51 @@ def read_hhmmssmil(field: str) -> int:
 def read_hhmmssus(field: str) -> int:
     """Read a HH:MM:SS.us field and return us since midnight."""
     if field != "":
-        hour = int(field[0:2])
-        minute = int(field[3:5])
-        second = int(field[6:8])
-        micro = int(field[9:])
-        return (1000000 * ((3600 * hour) + (60 * minute) + second)) + micro
+        return _hhmmss_to_us(field[0:8]) + int(field[9:])
     else:
         return 0
 
 
+# What blank dates are read as.
+_no_date = np.datetime64(datetime.date(year=1, month=1, day=1), 'D')
+
+
+@functools.lru_cache(maxsize=4096)
+def _mmddccyy_to_date(field: str) -> np.datetime64:
+    month = int(field[0:2])
+    day = int(field[3:5])
+    year = int(field[6:10])
+    return np.datetime64(datetime.date(year=year, month=month, day=day), 'D')
+
+
 def read_mmddccyy(field: str) -> np.datetime64:
     """Read a MM-DD-CCYY field and return a np.datetime64('D') type."""
     if field != "":
-        month = int(field[0:2])
-        day = int(field[3:5])
-        year = int(field[6:10])
-        return np.datetime64(
-            datetime.date(year=year, month=month, day=day), 'D')
+        return _mmddccyy_to_date(field)
     else:
-        return np.datetime64(datetime.date(year=1, month=1, day=1), 'D')
+        return _no_date
+
+
+@functools.lru_cache(maxsize=4096)
+def _ccyymmdd_to_date(field: str) -> np.datetime64:
+    year = int(field[0:4])
+    month = int(field[4:6])
+    day = int(field[6:8])
+    return np.datetime64(datetime.date(year=year, month=month, day=day), 'D')
 
 
 def read_ccyymmdd(field: str) -> np.datetime64:
     """Read a CCYYMMDD field and return a np.datetime64('D') type."""
     if field != "":
-        year = int(field[0:4])
-        month = int(field[4:6])
-        day = int(field[6:8])
-        return np.datetime64(
-            datetime.date(year=year, month=month, day=day), 'D')
+        return _ccyymmdd_to_date(field)
     else:
-        return np.datetime64(datetime.date(year=1, month=1, day=1), 'D')
+        return _no_date
+
+
+@functools.lru_cache(maxsize=4096)
+def _posix_date(date_str: str) -> np.datetime64:
+    """A CCYY-MM-DD date as np.datetime64('D')."""
+    return np.datetime64(date_str, 'D')
 
 
 def read_timestamp_msg(dt_tm: str) -> Tuple[np.datetime64, int]:
@@ -189,7 +250,7 @@ def read_timestamp_msg(dt_tm: str) -> Tuple[np.datetime64, int]:
         tm = read_hhmmss(time_str)
         return dt, tm
     else:
-        return np.datetime64(datetime.date(year=1, month=1, day=1), 'D'), 0
+        return _no_date, 0
 
 
 def read_live_news_timestamp(dt_tm: str) -> Tuple[np.datetime64, int]:
@@ -200,7 +261,7 @@ def read_live_news_timestamp(dt_tm: str) -> Tuple[np.datetime64, int]:
         tm = read_hhmmss_no_colon(time_str)
         return dt, tm
     else:
-        return np.datetime64(datetime.date(year=1, month=1, day=1), 'D'), 0
+        return _no_date, 0
 
 
 def read_hist_news_timestamp(dt_tm: str) -> Tuple[np.datetime64, int]:
@@ -212,40 +273,40 @@ def read_hist_news_timestamp(dt_tm: str) -> Tuple[np.datetime64, int]:
         tm = read_hhmmss_no_colon(time_str)
         return dt, tm
     else:
-        return np.datetime64(datetime.date(year=1, month=1, day=1), 'D'), 0
+        return _no_date, 0
 
 
 def read_posix_ts_mil(dt_tm_str: str) -> Tuple[np.datetime64, int]:
     """ Read a POSIX-Date HH:MM:SS:MILL field."""
     if dt_tm_str != "":
         (date_str, time_str) = dt_tm_str.split(" ")
-        dt = np.datetime64(date_str, 'D')
+        dt = _posix_date(date_str)
         tm = read_hhmmssmil(time_str)
         return dt, tm
     else:
-        return np.datetime64(datetime.date(year=1, month=1, day=1), 'D'), 0
+        return _no_date, 0
 
 
 def read_posix_ts_us(dt_tm_str: str) -> Tuple[np.datetime64, int]:
     """ Read a POSIX-Date HH:MM:SS:us field."""
     if dt_tm_str != "":
         (date_str, time_str) = dt_tm_str.split(" ")
-        dt = np.datetime64(date_str, 'D')
+        dt = _posix_date(date_str)
         tm = read_hhmmssus(time_str)
         return dt, tm
     else:
-        return np.datetime64(datetime.date(year=1, month=1, day=1), 'D'), 0
+        return _no_date, 0
 
 
 def read_posix_ts(dt_tm_str: str) -> Tuple[np.datetime64, int]:
     """Read a POSIX-DATE HH:MM:SS field."""
     if dt_tm_str != "":
         (date_str, time_str) = dt_tm_str.split(" ")
-        dt = np.datetime64(date_str, 'D')
+        dt = _posix_date(date_str)
         tm = read_hhmmss(time_str)
         return dt, tm
     else:
-        return np.datetime64(datetime.date(year=1, month=1, day=1), 'D'), 0
+        return _no_date, 0
 
 
 def str_or_blank(val) -> str:
@@ -78,6 +78,16 @@ class SilentIQFeedListener:
         """
         pass
 
+    def process_feed_stats(self, stats: dict) -> None:
+        """
+        FeedConn.stats() every FeedConn.set_stats_interval seconds.
+
+        What this process measured about the connection, as opposed to
+        process_conn_stats which is what IQFeed says about it.
+
+        """
+        pass
+
     def process_timestamp(self, time_val: FeedConn.TimeStampMsg) -> None:
         """Timestamp when you have requested timestamps."""
         pass
@@ -170,9 +180,27 @@ class SilentQuoteListener(SilentIQFeedListener):
         different for each QuoteConn depending on the last call to
         select_update_fieldnames.
 
+        Each update is a newly allocated array so it is safe to keep it.
+
         """
         pass
 
+    def process_update_batch(self, updates: np.array) -> None:
+        """
+        Several consecutive updates, only sent if the QuoteConn is in batch mode.
+
+        :param updates: numpy structured array with one row per update.
+
+        Same dtype as the array passed to process_update. The array is newly
+        allocated for each batch so it is safe to keep a reference to it.
+
+        The default calls process_update once for each row so listeners that
+        only implement process_update work unchanged in batch mode.
+
+        """
+        for row_num in range(len(updates)):
+            self.process_update(updates[row_num:row_num + 1])
+
     def process_fundamentals(self, fund: np.array) -> None:
         """
         Message with information about symbol which does not change.
@@ -365,6 +393,22 @@ class SilentBarListener(SilentIQFeedListener):
         """
         pass
 
+    def process_bar_batch(self, bar_data: np.array) -> None:
+        """
+        Several complete bars, only sent if the BarConn is in batch mode.
+
+        :param bar_data: numpy structured array of dtype
+            BarConn.interval_data_type with one row per complete bar.
+
+        The array is newly allocated for each batch so it is safe to keep a
+        reference to it. The default calls process_live_bar once for each
+        row so listeners that only implement process_live_bar work unchanged
+        in batch mode.
+
+        """
+        for row_num in range(len(bar_data)):
+            self.process_live_bar(bar_data[row_num:row_num + 1])
+
     def process_history_bar(self, bar_data: np.array) -> None:
         """
         Bar update for a historical bar.
@@ -453,6 +497,10 @@ class VerboseIQFeedListener:
         print("%s: Connection Stats:" % self._name)
         print(stats)
 
+    def process_feed_stats(self, stats: dict) -> None:
+        print("%s: Feed Stats:" % self._name)
+        print(stats)
+
     def process_timestamp(self, time_val: FeedConn.TimeStampMsg):
         print("%s: Timestamp:" % self._name)
         print(time_val)
@@ -493,6 +541,10 @@ class VerboseQuoteListener(VerboseIQFeedListener):
         print("%s: Data Update" % self._name)
         print(update)
 
+    def process_update_batch(self, updates: np.array) -> None:
+        print("%s: Data Update Batch" % self._name)
+        print(updates)
+
     def process_fundamentals(self, fund: np.array) -> None:
         print("%s: Fundamentals Received:" % self._name)
         print(fund)
@@ -583,6 +635,10 @@ class VerboseBarListener(VerboseIQFeedListener):
         print("%s: Process live bar:" % self._name)
         print(bar_data)
 
+    def process_bar_batch(self, bar_data: np.array) -> None:
+        print("%s: Process bar batch:" % self._name)
+        print(bar_data)
+
     def process_history_bar(self, bar_data: np.array) -> None:
         print("%s: Process history bar:" % self._name)
         print(bar_data)
@@ -0,0 +1,225 @@
+# coding=utf-8
+
+"""
+Read many FeedConns from one thread.
+
+Every XXXConn normally has its own reader thread which sits in select on
+its one socket, waking up at least every 5 seconds even when nothing
+arrives. A process with a QuoteConn, a BarConn, a HistoryConn and a
+LookupConn has four such threads and every message that arrives means a
+thread switch and a fight for the GIL with the others.
+
+A FeedReactor has a single thread that waits on all the sockets of the
+connections given to it with one selectors.DefaultSelector (epoll on
+Linux). When a socket is readable it reads it into that connection's
+receive buffer and runs the connection's normal message processing, so
+listeners are called exactly as they would be from the connection's own
+thread, just always from the reactor's thread.
+
+Connections that are not given a reactor keep their own thread. Give a
+busy QuoteConn its own thread if its listeners are slow, since while one
+connection's listener runs the reactor isn't reading the others. For the
+same reason don't use a HistoryConn's iter_* streaming requests on a
+reactor: a stream that is full blocks the reading thread until the
+consumer catches up.
+
+reactor = FeedReactor()
+hist_conn.set_reactor(reactor)
+lookup_conn.set_reactor(reactor)
+with ConnConnector([hist_conn, lookup_conn, quote_conn]):
+    ...
+
+"""
+
+import logging
+import selectors
+import socket
+import threading
+from typing import Dict, List
+
+from .exceptions import UnexpectedField, UnexpectedMessage
+from .exceptions import UnexpectedProtocol
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class FeedReactor:
+    """
+    One thread reading the sockets of several FeedConns.
+
+    :param name: Name of the reactor's thread.
+    :param timeout: Longest time, in seconds, the thread waits in select
+        before checking if it has been stopped.
+
+    Connections are added by FeedConn.start_runner (called from connect)
+    and removed by FeedConn.stop_runner (called from disconnect) once
+    set_reactor has been called on them, so normally you don't call
+    register or unregister yourself. The thread starts when the first
+    connection is registered and runs until stop().
+
+    If processing a connection's messages raises an exception the
+    connection is dropped from the reactor (its reader_running becomes
+    False), the exception is logged with its traceback and kept in
+    errors(). The other connections
+    carry on.
+
+    """
+
+    def __init__(self, name: str = "FeedReactor", timeout: float = 5):
+        self._name = name
+        self._timeout = timeout
+        self._selector = selectors.DefaultSelector()
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        self._selector.register(self._wake_recv, selectors.EVENT_READ, None)
+        self._lock = threading.Lock()
+        self._changes = []
+        self._members = set()
+        self._conns = set()
+        self._errors = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.num_wakeups = 0
+
+    def name(self) -> str:
+        """Name given in the constructor."""
+        return self._name
+
+    def running(self) -> bool:
+        """True if the reactor's thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def register(self, conn) -> None:
+        """
+        Start reading conn's socket. Starts the thread if necessary.
+
+        :param conn: A FeedConn whose socket is connected.
+
+        """
+        with self._lock:
+            self._members.add(conn)
+            self._errors.pop(conn, None)
+            self._changes.append((conn, True, None))
+            if not self.running():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self, name=self._name, daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def unregister(self, conn) -> None:
+        """
+        Stop reading conn's socket.
+
+        :param conn: A registered FeedConn.
+
+        Returns once the reactor is no longer using conn so it is then
+        safe to close its socket.
+
+        """
+        done = threading.Event()
+        with self._lock:
+            self._members.discard(conn)
+            self._changes.append((conn, False, done))
+        if threading.current_thread() is self._thread:
+            # A listener disconnecting from inside the reactor's thread.
+            self._apply_changes()
+        elif self.running():
+            self._wake()
+            done.wait(30)
+
+    def is_registered(self, conn) -> bool:
+        """True if conn is being read by this reactor."""
+        with self._lock:
+            return conn in self._members and self.running()
+
+    def conns(self) -> List:
+        """Connections currently registered."""
+        with self._lock:
+            return list(self._members)
+
+    def errors(self) -> Dict:
+        """Exception that made the reactor drop each connection it dropped."""
+        with self._lock:
+            return dict(self._errors)
+
+    def stop(self) -> None:
+        """Stop the thread. Connections still registered stop being read."""
+        self._stop.set()
+        self._wake()
+        if self.running() and threading.current_thread() is not self._thread:
+            self._thread.join(30)
+
+    def _wake(self) -> None:
+        try:
+            self._wake_send.send(b'\0')
+        except BlockingIOError:
+            # Already more wakeups pending than the socket buffer holds.
+            pass
+
+    def _apply_changes(self) -> None:
+        """Register and unregister sockets. Only in the reactor's thread."""
+        with self._lock:
+            changes = self._changes
+            self._changes = []
+        for conn, add, done in changes:
+            if add and conn not in self._conns:
+                self._selector.register(conn._sock, selectors.EVENT_READ,
+                                        conn)
+                self._conns.add(conn)
+            elif not add and conn in self._conns:
+                self._selector.unregister(conn._sock)
+                self._conns.discard(conn)
+            if done is not None:
+                done.set()
+
+    def _drop(self, conn, err: Exception) -> None:
+        with self._lock:
+            self._members.discard(conn)
+            self._errors[conn] = err
+        self._selector.unregister(conn._sock)
+        self._conns.discard(conn)
+
+    def __call__(self):
+        """The reactor's thread runs this until stop() is called."""
+        try:
+            while not self._stop.is_set():
+                events = self._selector.select(self._timeout)
+                self.num_wakeups += 1
+                for key, _ in events:
+                    conn = key.data
+                    if conn is None:
+                        try:
+                            while self._wake_recv.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                        self._apply_changes()
+                    elif conn in self._conns:
+                        self._read(conn)
+        finally:
+            for conn in list(self._conns):
+                self._selector.unregister(conn._sock)
+            self._conns.clear()
+            with self._lock:
+                self._members.clear()
+                changes = self._changes
+                self._changes = []
+            for _, _, done in changes:
+                if done is not None:
+                    done.set()
+
+    def _read(self, conn) -> None:
+        """What conn's own reader thread would do when its socket is ready."""
+        try:
+            num_read = conn._recv_into_buffer()
+            if num_read == 0:
+                raise ConnectionError(
+                    "IQFeed closed the connection: %s" % conn.name())
+            conn._process_messages()
+        except (Exception, UnexpectedField, UnexpectedMessage,
+                UnexpectedProtocol) as err:
+            log.exception("Dropping %s from %s", conn.name(), self._name)
+            self._drop(conn, err)
@@ -0,0 +1,281 @@
+# coding=utf-8
+
+"""
+Record what IQFeed sends and play it back without IQFeed.
+
+FeedRecorder is given to FeedConn.set_recorder and writes every chunk of
+bytes read from the connection's socket to a file, with the time it was
+read. ReplayServer listens on the quote, lookup and derivative ports (or
+any ports you like) and plays recordings back to whatever connects, at the
+speed they were recorded, N times faster, or as fast as the socket goes.
+Point a FeedConn at it with host and port and it can't tell the
+difference, so parsing, listeners and everything downstream can be
+load tested and benchmarked on a machine without IQConnect.
+
+A recording is a header line followed by records of a little endian
+int64 time in ns since the epoch, a uint32 length and that many bytes.
+
+"""
+
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from .conn import FeedConn
+
+
+class FeedRecorder:
+    """
+    Writes chunks of bytes read from a FeedConn to a file.
+
+    Thread-safe, so one recorder can be shared, but the replay of a
+    recording shared by several connections is all of their data mixed.
+    Use one recorder per connection.
+
+    """
+
+    header = b"IQFEED RECORDING 1\n"
+    record_head = struct.Struct("<qI")
+
+    def __init__(self, path: str):
+        """:param path: File to write. Overwritten if it exists."""
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(FeedRecorder.header)
+        self._lock = threading.Lock()
+        self.num_bytes = 0
+        self.num_records = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record(self, data) -> None:
+        """Append data (bytes or a memoryview) with the current time."""
+        head = FeedRecorder.record_head.pack(time.time_ns(), len(data))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(head)
+            self._file.write(data)
+            self.num_bytes += len(data)
+            self.num_records += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_recording(path: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    Records in a file written by FeedRecorder.
+
+    :param path: The recording.
+    :return: Generator of (time in ns since the epoch, data) tuples.
+
+    """
+    head = FeedRecorder.record_head
+    with open(path, "rb") as rec_file:
+        if rec_file.readline() != FeedRecorder.header:
+            raise ValueError("%s is not a FeedRecorder recording" % path)
+        while True:
+            head_bytes = rec_file.read(head.size)
+            if len(head_bytes) < head.size:
+                return
+            time_ns, num_bytes = head.unpack(head_bytes)
+            data = rec_file.read(num_bytes)
+            if len(data) < num_bytes:
+                return
+            yield time_ns, data
+
+
+def write_recording(path: str, lines: List[str],
+                    lines_per_record: int = 100,
+                    interval: float = 0.0) -> None:
+    """
+    Write a recording of protocol lines, for tests and benchmarks.
+
+    :param path: File to write.
+    :param lines: Messages, each ending in \\r\\n, as IQFeed sends them.
+    :param lines_per_record: Lines in each chunk.
+    :param interval: Seconds between chunks.
+
+    """
+    head = FeedRecorder.record_head
+    start_ns = time.time_ns()
+    with open(path, "wb") as rec_file:
+        rec_file.write(FeedRecorder.header)
+        for rec_num, pos in enumerate(range(0, len(lines),
+                                            lines_per_record)):
+            data = "".join(lines[pos:pos + lines_per_record]).encode(
+                'latin-1')
+            rec_file.write(head.pack(start_ns + int(rec_num * interval * 1e9),
+                                     len(data)))
+            rec_file.write(data)
+
+
+class ReplayServer:
+    """
+    TCP server that plays recordings to the connections it accepts.
+
+    Every connection accepted on a port gets the whole recording for that
+    port, paced by speed. On ports in wait_for_request (by default the
+    lookup port) playback starts when the client sends its first request,
+    as IQFeed only answers lookups once asked. Request ids in a lookup
+    recording are only matched if the client makes the same requests in
+    the same order as when it was recorded, which a new HistoryConn etc
+    does. Commands clients send are otherwise read and kept in commands,
+    not acted on.
+
+    """
+
+    def __init__(self, recordings: Dict[int, str], host: str = "127.0.0.1",
+                 speed: float = 1.0, wait_for_request=(FeedConn.lookup_port,),
+                 free_ports: bool = False):
+        """
+        :param recordings: Recording to play for each port to listen on.
+            For example {FeedConn.quote_port: "quotes.rec"}.
+        :param host: Address to listen on.
+        :param speed: 1 plays in real time, 10 ten times faster and None or
+            0 as fast as possible.
+        :param wait_for_request: Ports that wait for a request before
+            playing.
+        :param free_ports: Listen on free ports chosen by the OS instead,
+            so a real IQConnect or another test can keep the usual ones.
+            port_for tells you which.
+
+        """
+        self.host = host
+        self.speed = speed
+        self.wait_for_request = set(wait_for_request)
+        self.commands = []
+        self._stop = threading.Event()
+        self._threads = []
+        self._clients = []
+        self._listeners = {}
+        self._ports = {}
+        for port, path in recordings.items():
+            listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listen_sock.bind((host, 0 if free_ports else port))
+            listen_sock.listen(8)
+            listen_sock.settimeout(0.2)
+            self._listeners[listen_sock] = (port, path)
+            self._ports[port] = listen_sock.getsockname()[1]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def port_for(self, port: int) -> int:
+        """Port actually listened on for the recording given for port."""
+        return self._ports[port]
+
+    def start(self) -> None:
+        for listen_sock, (port, path) in self._listeners.items():
+            self._spawn(self._accept, listen_sock, port, path)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for client in self._clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for thread in self._threads:
+            thread.join(5)
+        for listen_sock in self._listeners:
+            listen_sock.close()
+
+    def _spawn(self, target, *args) -> None:
+        thread = threading.Thread(target=target, args=args, daemon=True,
+                                  name="replay-%d" % len(self._threads))
+        self._threads.append(thread)
+        thread.start()
+
+    def _accept(self, listen_sock: socket.socket, port: int,
+                path: str) -> None:
+        while not self._stop.is_set():
+            try:
+                client, _ = listen_sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            client.settimeout(None)
+            self._clients.append(client)
+            requested = threading.Event()
+            closed = threading.Event()
+            if port not in self.wait_for_request:
+                requested.set()
+            self._spawn(self._read_commands, client, requested, closed)
+            self._spawn(self._play, client, path, requested, closed)
+
+    def _read_commands(self, client: socket.socket,
+                       requested: threading.Event,
+                       closed: threading.Event) -> None:
+        """Keep the commands the client sends, note the first request."""
+        pending = b""
+        try:
+            while not self._stop.is_set():
+                data = client.recv(65536)
+                if not data:
+                    break
+                pending += data
+                *lines, pending = pending.split(b"\r\n")
+                for line in lines:
+                    cmd = line.decode('latin-1')
+                    self.commands.append(cmd)
+                    if not cmd.startswith("S,"):
+                        requested.set()
+        except OSError:
+            pass
+        finally:
+            # Client went away, let the player finish.
+            closed.set()
+            requested.set()
+
+    def _play(self, client: socket.socket, path: str,
+              requested: threading.Event, closed: threading.Event) -> None:
+        try:
+            while not requested.wait(0.2):
+                if self._stop.is_set():
+                    return
+            start = time.perf_counter()
+            first_ns = None
+            for time_ns, data in read_recording(path):
+                if self._stop.is_set() or closed.is_set():
+                    return
+                if first_ns is None:
+                    first_ns = time_ns
+                if self.speed:
+                    due = (time_ns - first_ns) / 1e9 / self.speed
+                    delay = due - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+                client.sendall(data)
+            # Stay connected like IQFeed does until the client leaves.
+            while not (self._stop.is_set() or closed.wait(0.2)):
+                pass
+        except OSError:
+            pass
+        finally:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.close()
@@ -0,0 +1,197 @@
+# coding=utf-8
+
+"""
+Counters and histograms a FeedConn keeps about itself.
+
+ConnStatsMsg tells you what IQFeed thinks of a connection. FeedStats
+tells you what this process is doing with it: how many bytes and messages
+of each type it has read, how long parsing each type of message and
+calling listeners takes, how long the connection sat waiting for data and
+how much unprocessed data was left in the receive buffer after each read.
+
+Everything is recorded by the one thread reading the connection, with a
+couple of perf_counter_ns calls and integer increments per run of
+consecutive messages of a type (or per batch in batch mode) and per
+listener callback, so it can be left on. Times are in ns. Use
+FeedConn.stats() for a snapshot and FeedConn.set_stats_interval to have
+listeners' process_feed_stats called with one periodically.
+
+"""
+
+import time
+from typing import Dict
+
+
+class Histogram:
+    """
+    Power of 2 histogram of non-negative integers.
+
+    Bucket i counts values v with v.bit_length() == i, that is
+    2**(i-1) <= v < 2**i, so percentiles are accurate to a factor of 2,
+    which is plenty to tell a 1us parse from a 1ms one.
+
+    """
+
+    num_buckets = 48
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * Histogram.num_buckets
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        if value < 0:
+            value = 0
+        self.counts[min(value.bit_length(), Histogram.num_buckets - 1)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct: float) -> int:
+        """Upper bound of the bucket holding the pct'th percentile."""
+        if not self.count:
+            return 0
+        rank = pct / 100 * self.count
+        seen = 0
+        for bucket, num in enumerate(self.counts):
+            seen += num
+            if seen >= rank and num:
+                return min((1 << bucket) - 1, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, int]:
+        """count, mean, p50, p90, p99 and max."""
+        return {"count": self.count,
+                "mean": self.total // self.count if self.count else 0,
+                "p50": self.percentile(50),
+                "p90": self.percentile(90),
+                "p99": self.percentile(99),
+                "max": self.max}
+
+
+class FeedStats:
+    """
+    Everything a FeedConn measures about itself.
+
+    Message types are named after the FeedConn function processing them,
+    "update" or "update_batch" for QuoteConn updates for example.
+    parse_ns has a Histogram per message type of the mean time to process
+    one message over each run of consecutive messages of the type, not
+    counting time spent in listeners, which is in dispatch_ns (one value
+    per listener callback).
+    idle_ns is the time between finishing with one read and the next read
+    and buffer_depth the bytes left unprocessed in the receive buffer
+    after each read.
+
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.bytes_read = 0
+        self.reads = 0
+        self.messages = {}
+        self.parse_ns = {}
+        self._type_names = {}
+        self.dispatch_ns = Histogram()
+        self.idle_ns = Histogram()
+        self.buffer_depth = Histogram()
+        # Running total of dispatch_ns, to take it out of parse times.
+        self.dispatch_total = 0
+        self.last_done = 0
+
+    def record_read(self, num_bytes: int, buffered: int, start: int) -> None:
+        """A read of num_bytes, leaving buffered bytes, started at start."""
+        self.bytes_read += num_bytes
+        self.reads += 1
+        if self.last_done:
+            self.idle_ns.record(start - self.last_done)
+        self.buffer_depth.record(buffered)
+
+    def _type_name(self, process_func) -> str:
+        name = self._type_names.get(process_func)
+        if name is None:
+            name = process_func.__name__
+            if name.startswith("_process_"):
+                name = name[len("_process_"):]
+            self._type_names[process_func] = name
+        return name
+
+    def record_messages(self, process_func, num_msgs: int, elapsed: int,
+                        dispatch_mark: int) -> None:
+        """
+        num_msgs messages processed by process_func in elapsed ns.
+
+        :param dispatch_mark: dispatch_total when processing started.
+
+        """
+        msg_type = self._type_name(process_func)
+        self.messages[msg_type] = self.messages.get(msg_type, 0) + num_msgs
+        hist = self.parse_ns.get(msg_type)
+        if hist is None:
+            hist = self.parse_ns[msg_type] = Histogram()
+        hist.record((elapsed - (self.dispatch_total - dispatch_mark)) //
+                    num_msgs)
+
+    def record_dispatch(self, elapsed: int) -> None:
+        self.dispatch_total += elapsed
+        self.dispatch_ns.record(elapsed)
+
+    def snapshot(self, name: str) -> dict:
+        """Plain dict of everything, safe to keep or send elsewhere."""
+        return {"name": name,
+                "time": time.time(),
+                "started": self.started,
+                "bytes_read": self.bytes_read,
+                "reads": self.reads,
+                "messages": dict(self.messages),
+                "parse_ns": {msg_type: hist.snapshot() for msg_type, hist
+                             in self.parse_ns.items()},
+                "dispatch_ns": self.dispatch_ns.snapshot(),
+                "idle_ns": self.idle_ns.snapshot(),
+                "buffer_depth": self.buffer_depth.snapshot()}
+
+
+class TimedListener:
+    """
+    Wraps a listener so the time spent in its callbacks is recorded.
+
+    FeedConn.add_listener wraps listeners in one of these. It compares
+    equal to the listener it wraps, so remove_listener and the "not in"
+    test in add_listener work with the original listener.
+
+    """
+
+    def __init__(self, listener, stats: FeedStats):
+        self.listener = listener
+        self._stats = stats
+
+    def __eq__(self, other):
+        return other is self or other is self.listener or (
+            isinstance(other, TimedListener) and
+            other.listener is self.listener)
+
+    def __hash__(self):
+        return hash(self.listener)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.listener, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        listener = self.listener
+        perf_counter_ns = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                # Looked up each time in case the listener replaces it.
+                return getattr(listener, name)(*args, **kwargs)
+            finally:
+                # Not captured, FeedConn.reset_stats replaces _stats.
+                self._stats.record_dispatch(perf_counter_ns() - start)
+        # Later lookups find it in __dict__ without calling __getattr__.
+        self.__dict__[name] = timed
+        return timed
@@ -0,0 +1,107 @@
+# coding=utf-8
+
+"""
+Cache of news stories by story id.
+
+A story never changes once IQFeed has sent its headline, so
+NewsConn.request_news_story only needs to ask IQFeed for a story once.
+StoryCache keeps the most recently used stories in memory and, if given a
+directory, every story it sees on disk so they survive restarts and can be
+shared between processes.
+
+"""
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class StoryCache:
+    """
+    Bounded LRU cache of (story, is_link) keyed by story_id.
+
+    Thread-safe. Stories evicted from memory are still found on disk if
+    the cache has a directory.
+
+    """
+
+    # Story ids are alphanumeric. Anything else is not used as a file name.
+    _safe_id_re = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+    def __init__(self, max_stories: int = 1000, directory: str = None):
+        """
+        :param max_stories: Number of stories kept in memory.
+        :param directory: If not None, stories are also saved here, one
+            json file per story. Created if necessary.
+
+        """
+        assert max_stories > 0
+        self.max_stories = max_stories
+        self.directory = directory
+        self._stories = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._stories)
+
+    def _path(self, story_id: str) -> Optional[str]:
+        if self.directory is None or not self._safe_id_re.match(story_id):
+            return None
+        return os.path.join(self.directory, "%s.json" % story_id)
+
+    def _remember(self, story_id: str, story: Tuple[str, str]) -> None:
+        with self._lock:
+            self._stories[story_id] = story
+            self._stories.move_to_end(story_id)
+            while len(self._stories) > self.max_stories:
+                self._stories.popitem(last=False)
+
+    def get(self, story_id: str) -> Optional[Tuple[str, str]]:
+        """
+        (story, is_link) for story_id or None if it isn't cached.
+
+        :param story_id: Story id from a headline.
+
+        """
+        with self._lock:
+            story = self._stories.get(story_id)
+            if story is not None:
+                self._stories.move_to_end(story_id)
+                self.hits += 1
+                return story
+        path = self._path(story_id)
+        if path is not None:
+            try:
+                with open(path, "r", encoding="utf-8") as story_file:
+                    saved = json.load(story_file)
+                story = (saved["story"], saved["is_link"])
+            except (OSError, ValueError, KeyError):
+                pass
+        if story is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(story_id, story)
+        return story
+
+    def put(self, story_id: str, story: str, is_link: str) -> None:
+        """Add a story to the cache, and to the directory if there is one."""
+        self._remember(story_id, (story, is_link))
+        path = self._path(story_id)
+        if path is not None:
+            tmp_path = "%s.%d.tmp" % (path, os.getpid())
+            with open(tmp_path, "w", encoding="utf-8") as story_file:
+                json.dump({"story": story, "is_link": is_link}, story_file)
+            os.replace(tmp_path, path)
+
+    def clear(self) -> None:
+        """Forget the stories in memory. Saved stories are left alone."""
+        with self._lock:
+            self._stories.clear()
@@ -0,0 +1,88 @@
+# coding=utf-8
+
+"""
+Small integer ids for symbols.
+
+A QuoteConn in compact mode sends updates with a u4 symbol id instead of
+the symbol as an S128. The SymbolTable it keeps maps ids back to symbols.
+Ids are handed out in the order symbols are first seen, starting at 0,
+and never change or get reused for the life of the table, so listeners
+can index lists or numpy arrays by id instead of hashing symbol names.
+
+The symbol names returned by the table are always the same str objects,
+so Python's cached str hash makes dict lookups with them cheap compared
+to decoding the bytes in an update to a new str every time.
+
+"""
+
+import threading
+from typing import List, Optional, Sequence
+import numpy as np
+
+
+class SymbolTable:
+    """
+    Two way mapping between symbols and small integer ids.
+
+    Adding symbols is thread-safe. Lookups don't take a lock.
+
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._names = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._ids
+
+    def intern(self, symbol: str) -> int:
+        """
+        Id of symbol, adding it to the table if it is new.
+
+        :param symbol: Symbol as it comes from IQFeed.
+        :return: The id of symbol.
+
+        """
+        try:
+            return self._ids[symbol]
+        except KeyError:
+            with self._lock:
+                if symbol not in self._ids:
+                    self._ids[symbol] = len(self._names)
+                    self._names.append(symbol)
+                return self._ids[symbol]
+
+    def intern_column(self, column: Sequence[str]) -> np.array:
+        """Ids of a column of symbols as a u4 array. Adds new symbols."""
+        ids = self._ids
+        intern = self.intern
+        return np.fromiter(
+            (ids[symbol] if symbol in ids else intern(symbol)
+             for symbol in column), dtype=np.uint32, count=len(column))
+
+    def id_of(self, symbol: str) -> Optional[int]:
+        """Id of symbol or None if it isn't in the table."""
+        return self._ids.get(symbol)
+
+    def name(self, sym_id: int) -> str:
+        """
+        Symbol with id sym_id.
+
+        :param sym_id: An id returned by intern.
+        :return: The symbol. Raises IndexError for an unknown id.
+
+        """
+        return self._names[sym_id]
+
+    def names(self, sym_ids: Sequence[int]) -> List[str]:
+        """Symbols for a sequence (or numpy array) of ids."""
+        names = self._names
+        return [names[sym_id] for sym_id in sym_ids]
+
+    def symbols(self) -> List[str]:
+        """Every symbol in the table, in id order."""
+        return list(self._names)
@@ -5,7 +5,9 @@ import ib_insync
 from kombu import Exchange
 
 from red_moose.common import AppContext, Quote
+from red_moose.market_data.quote_batch import QuoteBatch
 from red_moose.market_data.top_of_book import TWSTopOfBook
+from red_moose.messaging import wire
 from red_moose.messaging.rabbit_producer import SimpleProducer
 from red_moose.rm_enums import ContentType
 
@@ -14,14 +16,24 @@ log = logging.getLogger(__name__)
 
 
 class IBPriceFeedPublisher:
-    def __init__(self, ib_TopOfBook: TWSTopOfBook):
+    def __init__(self, ib_TopOfBook: TWSTopOfBook, binary: bool = False):
+        """
+        Args:
+            ib_TopOfBook: tickers to publish
+            binary: publish each pendingTickers event as one ContentType.RM_RECORDS
+                message of QUOTE_DTYPE records instead of a JSON message per ticker
+        """
         self.ib_TopOfBook = ib_TopOfBook
+        self.binary = binary
         self.ib_TopOfBook += self.IB_listener
         context = AppContext()
         self.producer = SimpleProducer(connection_url=context.rabbit_env_url(),
                                        exchange=Exchange("twspricefeed", type="fanout"))
 
     def IB_listener(self, data: typing.Set[ib_insync.Ticker]):
+        if self.binary:
+            self._publish_batch(data)
+            return
         for ticker in data:
             mid = (ticker.bid + ticker.ask) / 2.
             log.info(f"TWS_listener IBPriceFeedPublisher {ticker.contract.localSymbol} {mid} ")
@@ -38,3 +50,13 @@ class IBPriceFeedPublisher:
                 exchange=ticker.contract.exchange
             )
             self.producer.publish(quote.to_json(), content_type=ContentType.JSON.value)
+
+    def _publish_batch(self, data: typing.Set[ib_insync.Ticker]):
+        """Publish the pending tickers as one message of QUOTE_DTYPE records"""
+        batch = QuoteBatch.from_tickers(data)
+        if not len(batch):
+            return
+        log.info("TWS_listener IBPriceFeedPublisher %d tickers", len(batch))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(dict(zip(batch.symbol_names(), batch.Mid.tolist())))
+        self.producer.publish(wire.encode(batch.to_records()), content_type=ContentType.RM_RECORDS.value)
@@ -1,11 +1,16 @@
 import attr
 import datetime
+import functools
 import logging
+import os
+import threading
 import time
 import typing
 import pyiqfeed as iq
 from ib_insync import Contract, Option
 from red_moose.common import AppContext, Quote
+from red_moose.iqfeed.history_cache import HistoryCache
+from red_moose.iqfeed.option_chains import OptionChain, OptionChainService
 from red_moose.rm_types import IQFeedListener, Symbol, ContractId
 from red_moose.rm_enums import IBSecType
 
@@ -26,9 +31,26 @@ class OptionMonthSymbol:
             return None
 
 
+# TWS future symbols whose IQFeed root is not @ + symbol
+TWS2IQ_FUTURES = {
+    'NG': 'NGT',
+    'CL': 'QCL',
+    'GC': 'QGC',
+}
+
+
 class IQFeedClient:
     def __init__(self):
         self.iq_feed_conf = AppContext().iq_feed_conf
+        self.history_cache = HistoryCache()
+        # Lookup and history connections opened by the methods below are
+        # all read by this one thread instead of a thread each.
+        self.reactor = iq.FeedReactor(name="red_moose-reactor")
+        self._option_chains = None
+        self._option_chains_lock = threading.Lock()
+        self._table_conn = None
+        self._reference_refresh = None
+        self._reference_lock = threading.Lock()
         try:
             self.launch()
         except Exception as e:
@@ -48,6 +70,7 @@ class IQFeedClient:
 
     def get_daily_data(self, ticker: Symbol, num_days: int):
         hist_conn = iq.HistoryConn(name="red_moose-daily-data")
+        hist_conn.set_reactor(self.reactor)
         hist_listener = iq.VerboseIQFeedListener("History Bar Listener")
         hist_conn.add_listener(hist_listener)
 
@@ -62,6 +85,7 @@ class IQFeedClient:
                                  num_bars: int):
         """Shows how to get interval bars."""
         hist_conn = iq.HistoryConn(name="red_moose-historical-bars")
+        hist_conn.set_reactor(self.reactor)
         hist_listener = iq.VerboseBarListener("History Bar Listener")
         hist_conn.add_listener(hist_listener)
 
@@ -102,6 +126,7 @@ class IQFeedClient:
                                 num_bars: int):
         """Shows how to get interval bars."""
         hist_conn = iq.HistoryConn(name="red_moose-historical-bars")
+        hist_conn.set_reactor(self.reactor)
         hist_listener = iq.VerboseBarListener("History Bar Listener")
         hist_conn.add_listener(hist_listener)
 
@@ -119,6 +144,59 @@ class IQFeedClient:
                 log.info("No data returned because {0}".format(err))
             return bars
 
+    def get_cached_bars_in_period(self, ticker: Symbol, bar_len: int,
+                                  bar_unit: str, bgn_prd: datetime.datetime,
+                                  end_prd: datetime.datetime):
+        """Interval bars for a period, only fetching what isn't cached on disk."""
+        kind = HistoryCache.bars_kind(bar_len, bar_unit)
+        if self.history_cache.is_covered(kind, ticker, bgn_prd, end_prd):
+            return self.history_cache.bars_in_period(
+                None, ticker, bar_len, bar_unit, bgn_prd, end_prd)
+        hist_conn = iq.HistoryConn(name="red_moose-historical-bars")
+        hist_conn.set_reactor(self.reactor)
+        with iq.ConnConnector([hist_conn]):
+            return self.history_cache.bars_in_period(
+                hist_conn, ticker, bar_len, bar_unit, bgn_prd, end_prd)
+
+    def get_cached_ticks_in_period(self, ticker: Symbol,
+                                   bgn_prd: datetime.datetime,
+                                   end_prd: datetime.datetime):
+        """Tick-data for a period, only fetching what isn't cached on disk."""
+        if self.history_cache.is_covered("ticks", ticker, bgn_prd, end_prd):
+            return self.history_cache.ticks_in_period(
+                None, ticker, bgn_prd, end_prd)
+        hist_conn = iq.HistoryConn(name="red_moose-tickdata")
+        hist_conn.set_reactor(self.reactor)
+        with iq.ConnConnector([hist_conn]):
+            return self.history_cache.ticks_in_period(
+                hist_conn, ticker, bgn_prd, end_prd)
+
+    def get_historical_bar_data_many(self, tickers: typing.List[Symbol],
+                                     bar_len: int, bar_unit: str,
+                                     num_bars: int, num_conns: int = 2,
+                                     max_in_flight: int = 4):
+        """Interval bars for many tickers, several requests in flight at once.
+
+        Returns a dict of ticker: bars. Tickers IQFeed has no data for map to
+        an empty array, tickers whose request failed are logged and left out.
+        """
+        pool = iq.HistoryConnPool(num_conns=num_conns,
+                                  name="red_moose-historical-bars")
+        pool.set_reactor(self.reactor)
+        all_bars = {}
+        with iq.ConnConnector(pool.conns()):
+            for ticker, bars in pool.iter_bars_many(tickers,
+                                                    interval_len=bar_len,
+                                                    interval_type=bar_unit,
+                                                    max_bars=num_bars,
+                                                    max_in_flight=max_in_flight):
+                if isinstance(bars, Exception):
+                    log.info("No data returned for {0} because {1}".format(
+                        ticker, bars))
+                else:
+                    all_bars[ticker] = bars
+        return all_bars
+
     def get_level_1_quotes_and_trades(self,
                                       quote_conn: iq.QuoteConn,
                                       tickers: typing.List[Symbol],
@@ -133,17 +211,16 @@ class IQFeedClient:
             # all_fields = sorted(list(iq.QuoteConn.quote_msg_map.keys()))
             # quote_conn.select_update_fieldnames(all_fields)
             quote_conn.select_update_fieldnames(Quote.iqfeed_fields())
-            for ticker in tickers:
-                quote_conn.watch(ticker)
+            quote_conn.watch_many(tickers)
             time.sleep(seconds)
-            for ticker in tickers:
-                quote_conn.unwatch(ticker)
+            quote_conn.unwatch_many(tickers)
             quote_conn.remove_listener(listener)
 
     def get_regional_quotes(self, ticker: Symbol, seconds: int):
         """Get level 1 quotes and trades for ticker for seconds seconds."""
 
         quote_conn = iq.QuoteConn(name="red_moose-regional")
+        quote_conn.set_reactor(self.reactor)
         quote_listener = iq.VerboseQuoteListener("Regional Listener")
         quote_conn.add_listener(quote_listener)
 
@@ -156,15 +233,14 @@ class IQFeedClient:
                         quote_conn: iq.QuoteConn,
                         tickers: typing.List[Symbol],
                         seconds: int,
-                        listener: IQFeedListener):
+                        listener: IQFeedListener,
+                        fields: typing.List[str] = None):
         quote_conn.add_listener(listener)
         with iq.ConnConnector([quote_conn]):
-            quote_conn.select_update_fieldnames(Quote.iqfeed_fields())
-            for ticker in tickers:
-                quote_conn.trades_watch(ticker)
+            quote_conn.select_update_fieldnames(list(fields or Quote.iqfeed_fields()))
+            quote_conn.trades_watch_many(tickers)
             time.sleep(seconds)
-            for ticker in tickers:
-                quote_conn.unwatch(ticker)
+            quote_conn.unwatch_many(tickers)
             quote_conn.remove_listener(listener)
 
     def get_live_interval_bars(self,
@@ -179,18 +255,18 @@ class IQFeedClient:
         bar_conn.add_listener(bar_listener)
 
         with iq.ConnConnector([bar_conn]):
-            for ticker in tickers:
-                bar_conn.watch(symbol=ticker,
-                               interval_len=bar_len,
-                               interval_type='s',
-                               update=1,
-                               lookback_bars=10)
+            bar_conn.watch_many(tickers,
+                                interval_len=bar_len,
+                                interval_type='s',
+                                update=1,
+                                lookback_bars=10)
             time.sleep(seconds)
 
     def get_tickdata(self, ticker: Symbol, max_ticks: int, num_days: int):
         """Show how to read tick-data"""
 
         hist_conn = iq.HistoryConn(name="red_moose-tickdata")
+        hist_conn.set_reactor(self.reactor)
         hist_listener = iq.VerboseIQFeedListener("History Tick Listener")
         hist_conn.add_listener(hist_listener)
 
@@ -241,36 +317,75 @@ class IQFeedClient:
             except (iq.NoDataError, iq.UnauthorizedError) as err:
                 log.exception("No data returned because {0}".format(err))
 
-    def get_reference_data(self):
-        """Markets, SecTypes, Trade Conditions etc"""
-        table_conn = iq.TableConn(name="red_moose-reference-data")
-        table_listener = iq.VerboseIQFeedListener("Reference Data Listener")
-        table_conn.add_listener(table_listener)
-        with iq.ConnConnector([table_conn]):
-            table_conn.update_tables()
-            log.debug("Markets:")
-            log.debug(table_conn.get_markets())
-            log.debug("")
-
-            log.debug("Security Types:")
-            log.debug(table_conn.get_security_types())
-            log.debug("")
-
-            log.debug("Trade Conditions:")
-            log.debug(table_conn.get_trade_conditions())
-            log.debug("")
+    def get_reference_data(self, snapshot_dir: str = None, max_age: float = 24 * 60 * 60) -> iq.TableConn:
+        """Markets, SecTypes, Trade Conditions etc
 
-            log.debug("SIC Codes:")
-            log.debug(table_conn.get_sic_codes())
-            log.debug("")
+        The tables are memory mapped from a snapshot saved by an earlier call
+        when there is one, so this returns right away. If the snapshot is
+        older than max_age, or there is none, the tables are downloaded in the
+        background and the snapshot saved again; until then the TableConn
+        answers from the old snapshot. Only one refresh runs at a time.
 
-            log.debug("NAIC Codes:")
-            log.debug(table_conn.get_naic_codes())
-            log.debug("")
-            table_conn.remove_listener(table_listener)
+        Args:
+            snapshot_dir: where snapshots are kept. Default $REDMOOSE_REFERENCE_DATA
+                or ~/.red_moose/reference
+            max_age: seconds before a snapshot is refreshed from IQFeed
+        Returns:
+            TableConn, use get_market(mkt_id), market_names() etc
+        """
+        if snapshot_dir is None:
+            snapshot_dir = os.environ.get(
+                'REDMOOSE_REFERENCE_DATA',
+                os.path.join(os.path.expanduser('~'), '.red_moose', 'reference'))
+        with self._reference_lock:
+            if self._table_conn is None:
+                self._table_conn = iq.TableConn(name="red_moose-reference-data")
+                loaded = self._table_conn.load_snapshot(snapshot_dir)
+                log.debug("Reference data snapshot in %s %s", snapshot_dir,
+                          "loaded" if loaded else "not found")
+            table_conn = self._table_conn
+            if iq.TableConn.snapshot_age(snapshot_dir) < max_age:
+                return table_conn
+            refresh_thread = self._reference_refresh
+            if refresh_thread is None or not refresh_thread.is_alive():
+                refresh_thread = threading.Thread(target=self._refresh_reference_data,
+                                                  args=(table_conn, snapshot_dir),
+                                                  name="red_moose-reference-refresh", daemon=True)
+                self._reference_refresh = refresh_thread
+                refresh_thread.start()
+        if not table_conn.is_loaded():
+            # nothing to answer from yet, wait for IQFeed
+            refresh_thread.join()
+        return table_conn
+
+    def _refresh_reference_data(self, table_conn: iq.TableConn, snapshot_dir: str):
+        """Download the tables on a TableConn of its own and swap them into table_conn
+
+        A connection can't be connected again once ConnConnector has
+        disconnected it, so each refresh uses a new one. The tables come
+        back to table_conn through the snapshot it just saved.
+        """
+        refresh_conn = iq.TableConn(name="red_moose-reference-refresh")
+        refresh_conn.set_reactor(self.reactor)
+        try:
+            with iq.ConnConnector([refresh_conn]):
+                refresh_conn.refresh_in_background(snapshot_dir).join()
+        except Exception as e:
+            log.exception(f"Reference data refresh failed: {e}")
+            return
+        if refresh_conn.refresh_error is not None:
+            log.error("Reference data refresh failed: %s", refresh_conn.refresh_error)
+        elif not table_conn.load_snapshot(snapshot_dir):
+            log.error("Reference data refreshed but the snapshot in %s could not be loaded", snapshot_dir)
+        else:
+            log.debug("Reference data refreshed: %d markets, %d security types, "
+                      "%d trade conditions", len(table_conn.get_markets()),
+                      len(table_conn.get_security_types()),
+                      len(table_conn.get_trade_conditions()))
 
     def get_ticker_lookups(self, ticker: Symbol):
         lookup_conn = iq.LookupConn(name="red_moose-Ticker-Lookups")
+        lookup_conn.set_reactor(self.reactor)
         lookup_listener = iq.VerboseIQFeedListener("TickerLookupListener")
         lookup_conn.add_listener(lookup_listener)
 
@@ -292,26 +407,26 @@ class IQFeedClient:
             log.debug("")
             lookup_conn.remove_listener(lookup_listener)
 
-    def get_equity_option_chain(self, ticker: Symbol):
-        lookup_conn = iq.LookupConn(name="red_moose-Eq-Option-Chain")
-        lookup_listener = iq.VerboseIQFeedListener("EqOptionListener")
-        lookup_conn.add_listener(lookup_listener)
-        with iq.ConnConnector([lookup_conn]):
-            # noinspection PyArgumentEqualDefault
-            e_opt = lookup_conn.request_equity_option_chain(
-                symbol=ticker,
-                opt_type='pc',
-                month_codes="".join(iq.LookupConn.call_month_letters +
-                                    iq.LookupConn.put_month_letters),
-                near_months=None,
-                include_binary=True,
-                filt_type=0, filt_val_1=None, filt_val_2=None)
-            log.debug("Currently trading options for %s" % ticker)
-            log.debug(e_opt)
-            lookup_conn.remove_listener(lookup_listener)
+    def option_chains(self) -> OptionChainService:
+        """Shared OptionChainService, connected on first use"""
+        with self._option_chains_lock:
+            if self._option_chains is None:
+                lookup_conn = iq.LookupConn(name="red_moose-Option-Chains")
+                lookup_conn.set_reactor(self.reactor)
+                lookup_conn.connect()
+                self._option_chains = OptionChainService(lookup_conn)
+            return self._option_chains
+
+    def get_equity_option_chain(self, ticker: Symbol) -> OptionChain:
+        """Cached chain for ticker, see OptionChainService for when it is refreshed"""
+        chain = self.option_chains().chain(ticker)
+        log.debug("Currently trading options for %s" % ticker)
+        log.debug(chain.options)
+        return chain
 
     def get_futures_chain(self, ticker: Symbol):
         lookup_conn = iq.LookupConn(name="red_moose-Futures-Chain")
+        lookup_conn.set_reactor(self.reactor)
         lookup_listener = iq.VerboseIQFeedListener("FuturesChainLookupListener")
         lookup_conn.add_listener(lookup_listener)
         with iq.ConnConnector([lookup_conn]):
@@ -327,6 +442,7 @@ class IQFeedClient:
 
     def get_futures_spread_chain(self, ticker: Symbol):
         lookup_conn = iq.LookupConn(name="red_moose-Futures-Spread-Lookup")
+        lookup_conn.set_reactor(self.reactor)
         lookup_listener = iq.VerboseIQFeedListener("FuturesSpreadLookupListener")
         lookup_conn.add_listener(lookup_listener)
         with iq.ConnConnector([lookup_conn]):
@@ -342,6 +458,7 @@ class IQFeedClient:
 
     def get_futures_options_chain(self, ticker: Symbol):
         lookup_conn = iq.LookupConn(name="red_moose-Futures-Options-Chain")
+        lookup_conn.set_reactor(self.reactor)
         lookup_listener = iq.VerboseIQFeedListener("FuturesOptionLookupListener")
         lookup_conn.add_listener(lookup_listener)
         with iq.ConnConnector([lookup_conn]):
@@ -358,6 +475,7 @@ class IQFeedClient:
 
     def get_news(self):
         news_conn = iq.NewsConn("red_moose-News-Conn")
+        news_conn.set_reactor(self.reactor)
         news_listener = iq.VerboseIQFeedListener("NewsListener")
         news_conn.add_listener(news_listener)
 
@@ -395,19 +513,13 @@ class IQFeedClient:
         Args:
             contract:
 
-        Returns: IQFeed symbol
+        Returns: IQFeed symbol. Computed every call, use SymbologyIndex to look them up
         """
-        tws2iq_contratcs = {
-            'NG': 'NGT',
-            'CL': 'QCL',
-            'GC': 'QGC',
-        }
-
         if contract.secType == IBSecType.STK.name:
             return contract.symbol
         elif contract.secType == IBSecType.FUT.name:
-            if contract.symbol in tws2iq_contratcs:
-                code = tws2iq_contratcs[contract.symbol] + contract.localSymbol[-2:]
+            if contract.symbol in TWS2IQ_FUTURES:
+                code = TWS2IQ_FUTURES[contract.symbol] + contract.localSymbol[-2:]
             else:
                 code = '@' + contract.localSymbol
             if code[-1] == '9':
@@ -428,6 +540,7 @@ class IQFeedClient:
         return {contract.conId: IQFeedClient.get_iq_ticker(contract) for contract in contracts}
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def option_months_table() -> typing.Tuple[OptionMonthSymbol, ...]:
         """http://www.iqfeed.net/symbolguide/index.cfm
         tuple index is the month number
@@ -454,9 +567,10 @@ class IQFeedClient:
 
         strike = ib_opt.strike
         ticker = ib_opt.symbol
-        expiry = datetime.datetime.strptime(ib_opt.lastTradeDateOrContractMonth, "%Y%m%d")
-        month_label = iq_opt_month_labels[expiry.month].lookup_by_right(ib_opt.right)
-        year = expiry.year % 100
-        day = expiry.day
+        # YYYYMMDD, sliced rather than strptime'd
+        expiry = ib_opt.lastTradeDateOrContractMonth
+        month_label = iq_opt_month_labels[int(expiry[4:6])].lookup_by_right(ib_opt.right)
+        year = int(expiry[2:4])
+        day = int(expiry[6:8])
         strike = int(strike) if strike % 1 == 0 else strike
         return f"{ticker}{year}{day}{month_label}{strike}"
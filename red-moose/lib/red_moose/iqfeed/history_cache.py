@@ -0,0 +1,260 @@
+import datetime
+import json
+import logging
+import os
+import re
+import tempfile
+import typing
+
+import numpy as np
+import pyiqfeed as iq
+from red_moose.rm_types import Symbol
+
+log = logging.getLogger(__name__)
+
+# (bgn, end) in us since midnight, both inclusive
+Span = typing.Tuple[int, int]
+
+US_PER_DAY = 86400 * 1000000
+
+
+def subtract_spans(span: Span, covered: typing.List[Span]) -> typing.List[Span]:
+    """Parts of span not in any of the sorted, non overlapping covered spans"""
+    bgn, end = span
+    missing = []
+    for cov_bgn, cov_end in covered:
+        if cov_end < bgn:
+            continue
+        if cov_bgn > end:
+            break
+        if cov_bgn > bgn:
+            missing.append((bgn, cov_bgn - 1))
+        bgn = max(bgn, cov_end + 1)
+        if bgn > end:
+            return missing
+    missing.append((bgn, end))
+    return missing
+
+
+def add_span(covered: typing.List[Span], span: Span) -> typing.List[Span]:
+    """covered with span added, overlapping and touching spans merged"""
+    merged = []
+    bgn, end = span
+    for cov_bgn, cov_end in sorted(covered):
+        if cov_end + 1 < bgn or cov_bgn > end + 1:
+            merged.append((cov_bgn, cov_end))
+        else:
+            bgn, end = min(bgn, cov_bgn), max(end, cov_end)
+    merged.append((bgn, end))
+    return sorted(merged)
+
+
+def _to_us(dt: datetime.datetime) -> int:
+    return ((dt.hour * 3600 + dt.minute * 60 + dt.second) * 1000000 +
+            dt.microsecond)
+
+
+def _from_us(day: datetime.date, us: int) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time()) + \
+        datetime.timedelta(microseconds=us)
+
+
+def _ceil_second(dt: datetime.datetime) -> datetime.datetime:
+    if dt.microsecond == 0:
+        return dt
+    return dt.replace(microsecond=0) + datetime.timedelta(seconds=1)
+
+
+class HistoryCache:
+    """On disk cache of HistoryConn bars and ticks with gap filling.
+
+    Data is kept as one .npy file per symbol, data kind and day:
+
+        root/bars_60s/SPY/2020-10-13.npy
+        root/ticks/SPY/2020-10-13.npy
+
+    holding HistoryConn.bar_type / tick_type arrays sorted by time. Next to
+    them coverage.json records, for each day, which spans of the day have
+    already been fetched from IQFeed (a span with no data is still covered).
+
+    A request for a period works out which parts of it are not covered yet,
+    fetches only those (one request per contiguous missing range), merges
+    them into the day files and then answers from disk. A period that is
+    fully covered never touches IQFeed.
+
+    Nothing later than now - settle is marked covered, so the most recent
+    data, which IQFeed may still correct or complete, is always fetched
+    again. Timestamps are IQFeed's (US/Eastern) so now should be too.
+    """
+
+    def __init__(self, root: str = None,
+                 settle: datetime.timedelta = datetime.timedelta(minutes=15),
+                 now: typing.Callable[[], datetime.datetime] = datetime.datetime.now):
+        """
+        Args:
+            root: directory to keep the cache in. Default $REDMOOSE_HISTORY_CACHE
+                or ~/.red_moose/history
+            settle: how old data has to be before it is treated as final
+            now: current time in IQFeed's time zone
+        """
+        self.root = root or os.getenv(
+            'REDMOOSE_HISTORY_CACHE',
+            os.path.join(os.path.expanduser('~'), '.red_moose', 'history'))
+        self.settle = settle
+        self.now = now
+
+    def bars_in_period(self, hist_conn: iq.HistoryConn, ticker: Symbol,
+                       interval_len: int, interval_type: str,
+                       bgn_prd: datetime.datetime,
+                       end_prd: datetime.datetime) -> np.array:
+        """Bars from bgn_prd to end_prd, oldest first, like
+        HistoryConn.request_bars_in_period(..., ascend=True)"""
+        kind = self.bars_kind(interval_len, interval_type)
+
+        def fetch(bgn, end):
+            return hist_conn.request_bars_in_period(
+                ticker=ticker, interval_len=interval_len,
+                interval_type=interval_type, bgn_prd=bgn, end_prd=end,
+                ascend=True)
+        return self._get(kind, ticker, bgn_prd, end_prd, fetch,
+                         iq.HistoryConn.bar_type, 'time')
+
+    def ticks_in_period(self, hist_conn: iq.HistoryConn, ticker: Symbol,
+                        bgn_prd: datetime.datetime,
+                        end_prd: datetime.datetime) -> np.array:
+        """Ticks from bgn_prd to end_prd, oldest first, like
+        HistoryConn.request_ticks_in_period(..., ascend=True)"""
+        def fetch(bgn, end):
+            return hist_conn.request_ticks_in_period(
+                ticker=ticker, bgn_prd=bgn, end_prd=end, ascend=True)
+        return self._get("ticks", ticker, bgn_prd, end_prd, fetch,
+                         iq.HistoryConn.tick_type, 'tick_id')
+
+    @staticmethod
+    def bars_kind(interval_len: int, interval_type: str) -> str:
+        """Name the cache uses for bars of this interval, e.g. bars_60s"""
+        return "bars_%d%s" % (interval_len, interval_type)
+
+    def is_covered(self, kind: str, ticker: Symbol, bgn_prd: datetime.datetime,
+                   end_prd: datetime.datetime) -> bool:
+        """True if bgn_prd to end_prd can be answered without IQFeed, in which
+        case the *_in_period methods don't use hist_conn and it can be None"""
+        return not self._missing(self.coverage(kind, ticker), bgn_prd, end_prd)
+
+    def coverage(self, kind: str, ticker: Symbol) -> typing.Dict[str, typing.List[Span]]:
+        """Covered spans of each day, keyed by CCYY-MM-DD"""
+        path = os.path.join(self._dir(kind, ticker), "coverage.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return {day: [tuple(span) for span in spans]
+                    for day, spans in json.load(f).items()}
+
+    def _get(self, kind: str, ticker: Symbol, bgn_prd: datetime.datetime,
+             end_prd: datetime.datetime, fetch: typing.Callable,
+             dtype: np.dtype, key: str) -> np.array:
+        coverage = self.coverage(kind, ticker)
+        for bgn, end in self._missing(coverage, bgn_prd, end_prd):
+            log.debug("%s %s: fetching %s - %s", ticker, kind, bgn, end)
+            try:
+                # Requests only have whole seconds, round out and let the
+                # merge drop what was already there.
+                data = fetch(bgn, _ceil_second(end))
+            except iq.NoDataError:
+                data = np.zeros(0, dtype=dtype)
+            self._store(kind, ticker, data, key)
+            settled = self.now() - self.settle
+            if bgn <= settled:
+                for day, span in self._day_spans(bgn, min(end, settled)):
+                    coverage[day.isoformat()] = add_span(
+                        coverage.get(day.isoformat(), []), span)
+            self._write_coverage(kind, ticker, coverage)
+        return self._load(kind, ticker, bgn_prd, end_prd, dtype)
+
+    @staticmethod
+    def _day_spans(bgn: datetime.datetime,
+                   end: datetime.datetime) -> typing.Iterator[typing.Tuple[datetime.date, Span]]:
+        """Split bgn to end into a span for each day"""
+        day = bgn.date()
+        while day <= end.date():
+            day_bgn = _to_us(bgn) if day == bgn.date() else 0
+            day_end = _to_us(end) if day == end.date() else US_PER_DAY - 1
+            if day_bgn <= day_end:
+                yield day, (day_bgn, day_end)
+            day += datetime.timedelta(days=1)
+
+    def _missing(self, coverage: typing.Dict[str, typing.List[Span]],
+                 bgn_prd: datetime.datetime,
+                 end_prd: datetime.datetime) -> typing.List[typing.Tuple[datetime.datetime, datetime.datetime]]:
+        """Ranges of bgn_prd to end_prd not covered yet, contiguous missing
+        spans on consecutive days joined into one range"""
+        ranges = []
+        for day, span in self._day_spans(bgn_prd, end_prd):
+            for gap_bgn, gap_end in subtract_spans(
+                    span, coverage.get(day.isoformat(), [])):
+                bgn, end = _from_us(day, gap_bgn), _from_us(day, gap_end)
+                if ranges and bgn - ranges[-1][1] == datetime.timedelta(microseconds=1):
+                    ranges[-1] = (ranges[-1][0], end)
+                else:
+                    ranges.append((bgn, end))
+        return ranges
+
+    def _dir(self, kind: str, ticker: Symbol) -> str:
+        return os.path.join(self.root, kind, re.sub(r'[^\w.@#+-]', '_', ticker))
+
+    def _day_path(self, kind: str, ticker: Symbol, day: str) -> str:
+        return os.path.join(self._dir(kind, ticker), "%s.npy" % day)
+
+    def _store(self, kind: str, ticker: Symbol, data: np.array, key: str):
+        """Merge data into the day files, dropping duplicates by key
+
+        Fetched rows replace cached rows with the same key, so refetched
+        unsettled data brings in corrections and completed bars.
+        """
+        if len(data) == 0:
+            return
+        for day in np.unique(data['date']):
+            new = data[data['date'] == day]
+            path = self._day_path(kind, ticker, str(day))
+            if os.path.exists(path):
+                # np.unique keeps the first occurrence of each key
+                new = np.concatenate([new, np.load(path)])
+            _, first = np.unique(new[key], return_index=True)
+            new = new[first]
+            new = new[np.argsort(new['time'], kind='stable')]
+            self._atomic_write(path, lambda f: np.save(f, new))
+
+    def _write_coverage(self, kind: str, ticker: Symbol,
+                        coverage: typing.Dict[str, typing.List[Span]]):
+        path = os.path.join(self._dir(kind, ticker), "coverage.json")
+        self._atomic_write(path, lambda f: f.write(
+            json.dumps(coverage, sort_keys=True).encode()))
+
+    @staticmethod
+    def _atomic_write(path: str, write: typing.Callable):
+        """Write to a temp file and rename so readers never see half a file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _load(self, kind: str, ticker: Symbol, bgn_prd: datetime.datetime,
+              end_prd: datetime.datetime, dtype: np.dtype) -> np.array:
+        chunks = []
+        for day, (bgn, end) in self._day_spans(bgn_prd, end_prd):
+            path = self._day_path(kind, ticker, day.isoformat())
+            if not os.path.exists(path):
+                continue
+            data = np.load(path, mmap_mode='r')
+            times = data['time'].astype(np.int64)
+            lo = np.searchsorted(times, bgn, side='left')
+            hi = np.searchsorted(times, end, side='right')
+            chunks.append(np.array(data[lo:hi]))
+        if not chunks:
+            return np.zeros(0, dtype=dtype)
+        return np.concatenate(chunks)
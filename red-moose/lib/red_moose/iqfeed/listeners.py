@@ -1,5 +1,6 @@
 import logging
 import time
+import typing
 
 import numpy as np
 from typing import Sequence
@@ -7,33 +8,66 @@ import pyiqfeed as iq
 from red_moose.rm_enums import ContentType
 from red_moose.common import AppContext
 from red_moose.common import Quote
+from red_moose.market_data.quote_batch import QuoteBatch
 from red_moose.market_data.top_of_book import IQTopOfBook
+from red_moose.messaging.coalescing_publisher import CoalescingPublisher, quotes_to_json
+from red_moose.messaging.fanout_publisher import FanoutPublisher, FanoutTarget
 from red_moose.messaging.rabbit_producer import SimpleProducer
+from red_moose.messaging import wire
 
 log = logging.getLogger(__name__)
 
 
+def update_to_quote(update: np.void, symbols: iq.SymbolTable = None) -> Quote:
+    """Quote from one row of a QuoteConn update
+
+    Args:
+        update: row of a normal or compact QuoteConn update array
+        symbols: QuoteConn.symbol_table(), needed for compact updates whose
+            Symbol is an id. Symbols from the table are always the same str
+            objects so their hashes are cached for the book.
+    """
+    if symbols is None:
+        return Quote(*update)
+    fields = tuple(update)
+    return Quote(symbols.name(fields[0]), *fields[1:])
+
+
 class QuoteListener(iq.SilentQuoteListener):
     def __init__(self, name: str, **kwargs):
         """
         :param name:
         :param kwargs:
             interval:  sleep between quotes
+            symbols: QuoteConn.symbol_table() if the QuoteConn sends compact updates
         """
         self.interval = kwargs.get('interval', 0.5)
+        self.symbols = kwargs.get('symbols')
         self._topofbook = IQTopOfBook()
         super().__init__(name)
 
     def process_update(self, update: np.array) -> None:
         log.info("%s: Data Update" % self._name)
         try:
-            q = Quote(*update[0])
+            q = update_to_quote(update[0], self.symbols)
             log.info(q)
             self._topofbook.addQuote(q)
             time.sleep(self.interval)
         except TypeError as t:
             log.exception(t)
 
+    def process_update_batch(self, updates: np.array) -> None:
+        """Add every quote in the batch, then sleep once for the batch."""
+        log.info("%s: Data Update Batch of %d" % (self._name, len(updates)))
+        for update in updates:
+            try:
+                q = update_to_quote(update, self.symbols)
+                log.info(q)
+                self._topofbook.addQuote(q)
+            except TypeError as t:
+                log.exception(t)
+        time.sleep(self.interval)
+
     def process_watched_symbols(self, symbols: Sequence[str]) -> None:
         """List of all watched symbols when requested."""
         log.info(symbols)
@@ -42,28 +76,73 @@ class QuoteListener(iq.SilentQuoteListener):
 class IQFeedRelayListener(iq.SilentQuoteListener, iq.SilentBarListener):
     def __init__(self, name: str, **kwargs):
         """Relay quotes to rabbitmq
+
+        Quotes are not published as they arrive. The latest quote of each symbol
+        is kept and every flush_interval seconds (or once max_batch symbols are
+        waiting) they are published as one message, a JSON list of quotes, so
+        the relay sheds load when IQFeed is busy instead of sleeping.
+        With binary=True messages are QUOTE_DTYPE records (see
+        red_moose.messaging.wire) instead of JSON.
+
+        Args:
+            name:
+            kwargs:
+                flush_interval: seconds between batches, default 0.05
+                    (interval is still accepted for it)
+                max_batch: most quotes in one batch, default 500
+                binary: publish ContentType.RM_RECORDS instead of JSON, default False
+                bar_store: MemmapStore completed live bars are also appended to
+                symbols: QuoteConn.symbol_table() if the QuoteConn sends compact updates
         """
         context = AppContext()
-        self.dev_producer = SimpleProducer(connection_url=context.rabbit_dev_url())
-        self.prod_producer = SimpleProducer(connection_url=context.rabbit_prod_url())
-        self.staging_producer = SimpleProducer(connection_url=context.rabbit_staging_url())
-        self.interval = kwargs.get('interval', 0.05)
+        self.binary = kwargs.get('binary', False)
+        # each environment gets its own queue and thread so prod never waits
+        # for dev or staging, see FanoutPublisher
+        self.fanout = FanoutPublisher(
+            [FanoutTarget('prod', SimpleProducer(connection_url=context.rabbit_prod_url(), confirm_publish=True),
+                          priority=FanoutPublisher.critical_priority),
+             FanoutTarget('dev', SimpleProducer(connection_url=context.rabbit_dev_url(), confirm_publish=True),
+                          max_pending=1000),
+             FanoutTarget('staging', SimpleProducer(connection_url=context.rabbit_staging_url(), confirm_publish=True),
+                          max_pending=1000)],
+            content_type=ContentType.RM_RECORDS.value if self.binary else ContentType.JSON.value)
+        self.bar_store = kwargs.get('bar_store')
+        self.symbols = kwargs.get('symbols')
+        self.coalescer = CoalescingPublisher(
+            self._publish_batch,
+            flush_interval=kwargs.get('flush_interval', kwargs.get('interval', 0.05)),
+            max_batch=kwargs.get('max_batch', 500),
+            name="%s-publisher" % name)
         super().__init__(name)
 
     def process_update(self, update: np.array) -> None:
         log.debug("%s: Data Update" % self._name)
         try:
-            q = Quote(*update[0])
-            self._publish(q)
-            time.sleep(self.interval)
+            self.coalescer.add(update_to_quote(update[0], self.symbols))
+        except TypeError as t:
+            log.exception(t)
+
+    def process_update_batch(self, updates: np.array) -> None:
+        """Hand the batch to the coalescer, which only makes a Quote per symbol"""
+        log.debug("%s: Data Update Batch of %d" % (self._name, len(updates)))
+        try:
+            self.coalescer.add_batch(QuoteBatch.from_update(updates, self.symbols))
         except TypeError as t:
             log.exception(t)
 
+    def close(self):
+        """Publish what is waiting and stop the publishing threads"""
+        self.coalescer.close()
+        self.fanout.close()
+
+    def _send(self, msg: str):
+        self.fanout.publish(msg)
+
     def _publish(self, quote: Quote):
-        msg = quote.to_json()
-        self.dev_producer.publish(msg, content_type=ContentType.JSON.value)
-        self.prod_producer.publish(msg, content_type=ContentType.JSON.value)
-        self.staging_producer.publish(msg, content_type=ContentType.JSON.value)
+        self._send(wire.encode(quote) if self.binary else quote.to_json())
+
+    def _publish_batch(self, quotes: typing.List[Quote]):
+        self._send(wire.encode(quotes) if self.binary else quotes_to_json(quotes))
 
     def process_watched_symbols(self, symbols: Sequence[str]) -> None:
         """List of all watched symbols when requested."""
@@ -90,5 +169,19 @@ class IQFeedRelayListener(iq.SilentQuoteListener, iq.SilentBarListener):
                 self._publish(q)
             except Exception as e:
                 log.exception(e)
+        if self.bar_store is not None:
+            self._store_bars(bar_data)
 
         log.debug(bar_data)
+
+    def _store_bars(self, bar_data: np.array) -> None:
+        for symbol in np.unique(bar_data['symbol']):
+            try:
+                self.bar_store.append(symbol.decode(),
+                                      bar_data[bar_data['symbol'] == symbol])
+            except (OSError, ValueError) as e:
+                log.exception(e)
+
+    def process_bar_batch(self, bar_data: np.array) -> None:
+        """process_live_bar already handles any number of bars."""
+        self.process_live_bar(bar_data)
@@ -0,0 +1,177 @@
+import datetime
+import logging
+import threading
+import time
+import typing
+
+import numpy as np
+import pyiqfeed as iq
+from red_moose.rm_types import Symbol
+
+log = logging.getLogger(__name__)
+
+ALL_MONTHS = "".join(iq.LookupConn.call_month_letters + iq.LookupConn.put_month_letters)
+
+
+class OptionChain:
+    """Options on one underlying indexed by expiry, right and strike
+
+    options is a LookupConn.option_type array sorted by expiry, then right
+    (b'C' before b'P'), then strike, so every lookup is a binary search on
+    the arrays below and takes microseconds even for chains with tens of
+    thousands of options.
+    """
+
+    def __init__(self, underlying: Symbol, options: np.array, fetched: float):
+        """
+        Args:
+            underlying: IQFeed symbol of the underlying
+            options: LookupConn.option_type array, any order
+            fetched: time.time() the chain was last refreshed
+        """
+        order = np.lexsort((options['strike'], options['right'], options['expiry']))
+        self.underlying = underlying
+        self.options = options[order]
+        self.fetched = fetched
+        # expiry in days * 2 + 1 for puts, non decreasing
+        self._keys = self.options['expiry'].astype(np.int64) * 2 + (self.options['right'] == b'P')
+
+    def __len__(self):
+        return len(self.options)
+
+    @staticmethod
+    def _key(expiry: datetime.date, right: str) -> int:
+        return int(np.datetime64(expiry, 'D').astype(np.int64)) * 2 + (right.upper() == 'P')
+
+    def expiries(self) -> np.array:
+        """Every expiry in the chain, ascending"""
+        return np.unique(self.options['expiry'])
+
+    def options_for(self, expiry: datetime.date, right: str) -> np.array:
+        """Options with expiry and right ('C' or 'P'), by strike. A view, don't modify it"""
+        key = self._key(expiry, right)
+        bgn = np.searchsorted(self._keys, key, 'left')
+        end = np.searchsorted(self._keys, key, 'right')
+        return self.options[bgn:end]
+
+    def strikes(self, expiry: datetime.date, right: str) -> np.array:
+        return self.options_for(expiry, right)['strike']
+
+    def symbol(self, expiry: datetime.date, strike: float, right: str) -> typing.Optional[Symbol]:
+        """IQFeed symbol of one option or None if it isn't in the chain"""
+        options = self.options_for(expiry, right)
+        idx = np.searchsorted(options['strike'], strike)
+        if idx < len(options) and abs(options['strike'][idx] - strike) < 1e-6:
+            return options['symbol'][idx].decode()
+        return None
+
+    def nearest_strike(self, expiry: datetime.date, right: str, price: float) -> typing.Optional[float]:
+        """Strike closest to price for expiry and right, None if there are none"""
+        strikes = self.strikes(expiry, right)
+        if len(strikes) == 0:
+            return None
+        idx = np.searchsorted(strikes, price)
+        candidates = strikes[max(idx - 1, 0):idx + 1]
+        return float(candidates[np.argmin(np.abs(candidates - price))])
+
+
+class OptionChainService:
+    """Equity option chains from IQFeed cached in memory
+
+    The first request for an underlying downloads its whole chain. After
+    ttl seconds the next request only re-requests the near months, which is
+    where weeklies and new strikes get listed, and merges them into the
+    cached chain, dropping expired options. The whole chain is downloaded
+    again after full_ttl seconds.
+
+    A single LookupConn is used for every request, so the service can be
+    shared by symbol mapping and risk code. Only requests for the same
+    underlying wait for each other, a slow download never holds up lookups
+    of other chains. Chains returned are never modified, a refresh makes a
+    new OptionChain.
+    """
+
+    def __init__(self, lookup_conn: iq.LookupConn, ttl: float = 15 * 60,
+                 full_ttl: float = 24 * 60 * 60, near_months: int = 1,
+                 timeout: float = 30):
+        """
+        Args:
+            lookup_conn: connected LookupConn
+            ttl: seconds a chain is used for before refreshing the near months
+            full_ttl: seconds before the whole chain is downloaded again
+            near_months: number of near months an incremental refresh requests
+            timeout: seconds to wait for IQFeed on each request
+        """
+        self.lookup_conn = lookup_conn
+        self.ttl = ttl
+        self.full_ttl = full_ttl
+        self.near_months = near_months
+        self.timeout = timeout
+        self._chains: typing.Dict[Symbol, OptionChain] = {}
+        self._full_fetch: typing.Dict[Symbol, float] = {}
+        # held around reads and writes of the dicts, never during a request
+        self._lock = threading.Lock()
+        # one per underlying, held while its chain is refreshed
+        self._fetch_locks: typing.Dict[Symbol, threading.Lock] = {}
+
+    def chain(self, underlying: Symbol) -> OptionChain:
+        """Cached chain for underlying, refreshed first if it is older than ttl"""
+        with self._lock:
+            cached = self._chains.get(underlying)
+            if cached is not None and time.time() - cached.fetched < self.ttl:
+                return cached
+            fetch_lock = self._fetch_locks.setdefault(underlying, threading.Lock())
+        with fetch_lock:
+            with self._lock:
+                # refreshed by another thread while this one waited?
+                cached = self._chains.get(underlying)
+                full_fetch = self._full_fetch.get(underlying)
+            now = time.time()
+            if cached is not None and now - cached.fetched < self.ttl:
+                return cached
+            if cached is None or full_fetch is None or now - full_fetch >= self.full_ttl:
+                options = self._request(underlying, month_codes=ALL_MONTHS)
+                full_fetch = now
+            else:
+                options = self._merge(cached.options,
+                                      self._request(underlying, near_months=self.near_months))
+            chain = OptionChain(underlying, options, now)
+            with self._lock:
+                self._chains[underlying] = chain
+                self._full_fetch[underlying] = full_fetch
+            return chain
+
+    def symbol(self, underlying: Symbol, expiry: datetime.date, strike: float,
+               right: str) -> typing.Optional[Symbol]:
+        return self.chain(underlying).symbol(expiry, strike, right)
+
+    def invalidate(self, underlying: Symbol = None):
+        """Forget the cached chain for underlying, or all of them"""
+        with self._lock:
+            if underlying is None:
+                self._chains.clear()
+                self._full_fetch.clear()
+            else:
+                self._chains.pop(underlying, None)
+                self._full_fetch.pop(underlying, None)
+
+    def _request(self, underlying: Symbol, month_codes: str = None,
+                 near_months: int = None) -> np.array:
+        start = time.perf_counter()
+        chain = self.lookup_conn.request_equity_option_chain(
+            symbol=underlying, opt_type='pc', month_codes=month_codes,
+            near_months=near_months, include_binary=False,
+            timeout=self.timeout)
+        options = iq.LookupConn.read_option_symbols(chain['c'] + chain['p'])
+        log.debug("%d options for %s (%s) in %.3fs", len(options), underlying,
+                  "all months" if month_codes else "%d near months" % near_months,
+                  time.perf_counter() - start)
+        return options
+
+    @staticmethod
+    def _merge(cached: np.array, near: np.array) -> np.array:
+        """cached with the near months replaced by near and expired options dropped"""
+        keep = cached['expiry'] >= np.datetime64(datetime.date.today(), 'D')
+        if len(near):
+            keep &= cached['expiry'] > near['expiry'].max()
+        return np.concatenate([cached[keep], near])
@@ -1,19 +1,30 @@
 import abc
-from typing import Union
+import logging
+import threading
+from typing import Iterable, List, Optional, Set, Tuple, Union
 
+from pyiqfeed.bar_builder import BarBuilder
 from pyiqfeed.conn import QuoteConn, BarConn
 from pyiqfeed.listeners import SilentQuoteListener, SilentBarListener
 from red_moose.iqfeed.client import IQFeedClient
 from red_moose.rm_enums import IQFeedSubscription
 
+log = logging.getLogger(__name__)
+
 
 class RMBaseConnection(abc.ABC):
     def __init__(self, feedCon: Union[QuoteConn, BarConn], **kwargs):
         """ Common Interface for iqfeed *Conn objects
         Args:
             feedCon:
+            batch_mode: dispatch runs of updates/bars to listeners in batches,
+                process_update_batch/process_bar_batch instead of one call each. Default False
+            reactor: pyiqfeed.FeedReactor to read feedCon from, default is
+                feedCon's own thread
         """
         self.conn = feedCon
+        self.conn.set_batch_mode(kwargs.get('batch_mode', False))
+        self.conn.set_reactor(kwargs.get('reactor'))
         self.watching = set()
         self.bar_kwargs = kwargs.get('bar_kwargs', {})
         self.run_for = 60 * 60 * 24 * 3
@@ -22,29 +33,125 @@ class RMBaseConnection(abc.ABC):
     def watch(self, ticker, **kwargs):
         pass
 
+    @abc.abstractmethod
+    def _send_watches(self, tickers: List[str]):
+        """Watch tickers on the connection in batched socket writes"""
+
+    def _send_unwatches(self, tickers: List[str]):
+        self.conn.unwatch_many(tickers)
+
+    def watch_many(self, tickers: Iterable[str]) -> List[str]:
+        """Watch every ticker not already watched, in as few socket writes as possible
+        Args:
+            tickers:
+
+        Returns: the tickers newly watched
+        """
+        new = [ticker for ticker in dict.fromkeys(tickers) if ticker not in self.watching]
+        if new:
+            self._send_watches(new)
+            self.watching.update(new)
+        return new
+
+    def unwatch_many(self, tickers: Iterable[str]) -> List[str]:
+        """Unwatch every ticker that is watched
+        Returns: the tickers unwatched
+        """
+        old = [ticker for ticker in dict.fromkeys(tickers) if ticker in self.watching]
+        if old:
+            self._send_unwatches(old)
+            self.watching.difference_update(old)
+        return old
+
+    def sync_watchlist(self, target_set: Iterable[str], confirm: bool = False) -> Tuple[List[str], List[str]]:
+        """Make the watchlist target_set, sending only the watches and unwatches that changes
+        Args:
+            target_set: tickers that should be watched afterwards
+            confirm: first ask IQFeed what is watched (confirm_watches) and diff against that
+                instead of what this connection thinks it has watched
+
+        Returns: (tickers watched, tickers unwatched)
+        """
+        if confirm:
+            self.confirm_watches()
+        target = set(target_set)
+        removed = self.unwatch_many(sorted(self.watching - target))
+        added = self.watch_many(sorted(target - self.watching))
+        log.info(f"watchlist synced, {len(added)} watched {len(removed)} unwatched {len(self.watching)} total")
+        return added, removed
+
+    def confirm_watches(self, timeout: float = 5.0) -> Optional[Set[str]]:
+        """What IQFeed says is watched, also made the watchlist. None if this connection can't tell"""
+        return None
+
     @abc.abstractmethod
     def subscribe(self, *args, **kwargs):
         pass
 
     @classmethod
-    def create(cls, iqsubscription: IQFeedSubscription):
+    def create(cls, iqsubscription: IQFeedSubscription, **kwargs):
         if iqsubscription == IQFeedSubscription.QUOTES_TRADES:
-            return RMConnection(QuoteConn(name="red_moose-lvl1"))
+            return RMConnection(QuoteConn(name="red_moose-lvl1"), **kwargs)
         elif iqsubscription == IQFeedSubscription.BARS:
-            return RMBarConnection(BarConn(name="red_moose-interval-bars"))
+            return RMBarConnection(BarConn(name="red_moose-interval-bars"), **kwargs)
         elif iqsubscription == IQFeedSubscription.TRADES:
-            return RMTradeConnection(QuoteConn(name="red_moose-lvl1"))
+            return RMTradeConnection(QuoteConn(name="red_moose-lvl1"), **kwargs)
+        elif iqsubscription == IQFeedSubscription.LOCAL_BARS:
+            return RMLocalBarConnection(QuoteConn(name="red_moose-lvl1"), **kwargs)
 
     def watchlist(self):
         return self.watching
 
 
+class _WatchesListener(SilentQuoteListener):
+    """Catches the answer to request_watches for confirm_watches"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.symbols = None
+        self.received = threading.Event()
+
+    def process_watched_symbols(self, symbols):
+        self.symbols = {symbol for symbol in symbols if symbol}
+        self.received.set()
+
+
 class RMConnection(RMBaseConnection):
+    _watches_listener = None
+    _watches_lock = threading.Lock()
+
     def watch(self, ticker, **kwargs):
-        self.conn.watch(ticker, **kwargs)
-        for w in self.watching:
-            self.conn.refresh(w)
-        self.watching.add(ticker)
+        """Watch ticker, or refresh it if it is already watched so the caller gets a fresh summary"""
+        if ticker in self.watching:
+            self.conn.refresh(ticker)
+        else:
+            self.watch_many([ticker])
+
+    def _send_watches(self, tickers: List[str]):
+        self.conn.watch_many(tickers)
+
+    def confirm_watches(self, timeout: float = 5.0) -> Optional[Set[str]]:
+        """Ask IQFeed what is watched with request_watches and make that the watchlist
+
+        Waits for the answer, so don't call it from the thread reading the connection.
+        Returns None, leaving the watchlist alone, if there is no answer in timeout seconds.
+        """
+        with self._watches_lock:
+            if self._watches_listener is None:
+                self._watches_listener = _WatchesListener("red_moose-watches")
+                self.conn.add_listener(self._watches_listener)
+            listener = self._watches_listener
+            listener.received.clear()
+            self.conn.request_watches()
+            if not listener.received.wait(timeout):
+                log.warning(f"no answer to request_watches in {timeout}s, keeping watchlist of {len(self.watching)}")
+                return None
+        symbols = listener.symbols
+        missing = self.watching - symbols
+        if missing:
+            log.warning(f"IQFeed is not watching {sorted(missing)}")
+        self.watching = set(symbols)
+        return symbols
 
     def subscribe(self, iqclient: IQFeedClient, tickers, relay: Union[SilentQuoteListener, SilentBarListener]):
         iqclient.get_level_1_quotes_and_trades(self.conn, tickers, self.run_for, relay)
@@ -52,12 +159,14 @@ class RMConnection(RMBaseConnection):
 
 class RMBarConnection(RMBaseConnection):
     def watch(self, ticker, **kwargs):
-        self.conn.watch(**dict(symbol=ticker,
-                               interval_len=5,
-                               interval_type='s',
-                               update=1,
-                               lookback_bars=10))
-        self.watching.add(ticker)
+        self.watch_many([ticker])
+
+    def _send_watches(self, tickers: List[str]):
+        self.conn.watch_many(tickers,
+                             interval_len=5,
+                             interval_type='s',
+                             update=1,
+                             lookback_bars=10)
 
     def subscribe(self, iqclient: IQFeedClient, tickers, relay: Union[SilentQuoteListener, SilentBarListener]):
         iqclient.get_live_interval_bars(self.conn, tickers, 10, self.run_for, relay)
@@ -65,8 +174,30 @@ class RMBarConnection(RMBaseConnection):
 
 class RMTradeConnection(RMConnection):
     def watch(self, ticker, **kwargs):
-        self.conn.trades_watch(ticker)
-        self.watching.add(ticker)
+        self.watch_many([ticker])
+
+    def _send_watches(self, tickers: List[str]):
+        self.conn.trades_watch_many(tickers)
 
     def subscribe(self, iqclient: IQFeedClient, tickers, relay: Union[SilentQuoteListener, SilentBarListener]):
         iqclient.get_trades_only(self.conn, tickers, self.run_for, relay)
+
+
+class RMLocalBarConnection(RMTradeConnection):
+    def __init__(self, feedCon: QuoteConn, **kwargs):
+        """ Bars built from the trade stream instead of a BarConn watch per symbol per interval
+        Args:
+            feedCon:
+            intervals: (interval_len, interval_type) of the bars to build, default 5 second bars
+            update: seconds between latest bar updates, default 1 like RMBarConnection
+        """
+        super().__init__(feedCon, **kwargs)
+        self.bar_builder = BarBuilder("red_moose-local-bars",
+                                      kwargs.get('intervals', [(5, 's')]),
+                                      update=kwargs.get('update', 1))
+        self.bar_builder.set_batch_mode(kwargs.get('batch_mode', False))
+
+    def subscribe(self, iqclient: IQFeedClient, tickers, relay: Union[SilentQuoteListener, SilentBarListener]):
+        self.bar_builder.add_listener(relay)
+        iqclient.get_trades_only(self.conn, tickers, self.run_for, self.bar_builder,
+                                 fields=BarBuilder.update_fields)
@@ -13,6 +13,9 @@ log = logging.getLogger(__name__)
 class IQFeedSymbolRequests(SimpleConsumer):
     """
     consume/handle messages from commands exchange, IQFEED_TICKER_REQ
+
+    body is a ticker to watch, a list of tickers to watch, or
+    {'watchlist': [tickers]} to watch exactly those, unwatching the rest
     """
 
     def __init__(self, quote_conn: RMBaseConnection, conn: Connection, exchange: Exchange, queue: Queue):
@@ -34,7 +37,12 @@ class IQFeedSymbolRequests(SimpleConsumer):
         log.info(message)
         log.info(body)
         try:
-            self.quote_conn.watch(body)
+            if isinstance(body, dict):
+                self.quote_conn.sync_watchlist(body['watchlist'], confirm=body.get('confirm', False))
+            elif isinstance(body, list):
+                self.quote_conn.watch_many(body)
+            else:
+                self.quote_conn.watch(body)
         except Exception as e:
             log.exception(e)
         super().on_message(body, message)
@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import typing
+
+from ib_insync import Contract
+from red_moose.iqfeed.client import IQFeedClient
+from red_moose.rm_types import ContractId, Symbol
+
+log = logging.getLogger(__name__)
+
+
+class SymbologyIndex:
+    """IB conId <-> IQFeed symbol maps, kept on disk so they are warm at startup
+
+    iq_symbol(contract) is a dict lookup by conId. Only a contract not seen
+    before goes through IQFeedClient.get_iq_ticker, and the answer is kept in
+    both directions. New entries are written to disk at most every
+    save_interval seconds from the hot path, and on save().
+
+    The file is JSON, {"version": 1, "iq_by_conid": {"756733": "SPY", ...}}.
+    """
+    version = 1
+
+    def __init__(self, path: str = None, save_interval: float = 60.0):
+        """
+        Args:
+            path: file to keep the index in. Default $REDMOOSE_SYMBOLOGY
+                or ~/.red_moose/symbology.json
+            save_interval: least seconds between saves of new entries made by lookups
+        """
+        self.path = path or os.getenv(
+            'REDMOOSE_SYMBOLOGY',
+            os.path.join(os.path.expanduser('~'), '.red_moose', 'symbology.json'))
+        self.save_interval = save_interval
+        self._iq_by_conid: typing.Dict[ContractId, Symbol] = {}
+        self._conid_by_iq: typing.Dict[Symbol, ContractId] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._iq_by_conid)
+
+    def __contains__(self, con_id: ContractId) -> bool:
+        return con_id in self._iq_by_conid
+
+    @classmethod
+    def warm(cls, contracts: typing.Iterable[Contract] = (), **kwargs) -> 'SymbologyIndex':
+        """Index loaded from disk with contracts, e.g. the portfolio, added and saved"""
+        index = cls(**kwargs)
+        index.load()
+        if index.add_contracts(contracts):
+            index.save()
+        return index
+
+    def iq_symbol(self, contract: Contract) -> Symbol:
+        """IQFeed symbol of contract, O(1) once its conId has been seen"""
+        symbol = self._iq_by_conid.get(contract.conId)
+        if symbol is not None:
+            return symbol
+        symbol = IQFeedClient.get_iq_ticker(contract)
+        if contract.conId:
+            self.misses += 1
+            self._add(contract.conId, symbol)
+            if time.monotonic() - self._saved_at > self.save_interval:
+                self.save()
+        return symbol
+
+    def con_id(self, symbol: Symbol) -> typing.Optional[ContractId]:
+        """IB conId of an IQFeed symbol, None if no contract with it has been indexed"""
+        return self._conid_by_iq.get(symbol)
+
+    def add_contracts(self, contracts: typing.Iterable[Contract]) -> int:
+        """Index contracts not indexed yet. Returns how many were new
+
+        Contracts without a conId (not qualified) or that IQFeed symbology
+        doesn't cover are skipped.
+        """
+        added = 0
+        for contract in contracts:
+            if not contract.conId or contract.conId in self._iq_by_conid:
+                continue
+            try:
+                self._add(contract.conId, IQFeedClient.get_iq_ticker(contract))
+                added += 1
+            except Exception as e:
+                log.warning(f"no IQFeed symbol for {contract}: {e}")
+        return added
+
+    def to_iq(self, contracts: typing.Iterable[Contract]) -> typing.Dict[ContractId, Symbol]:
+        """conId -> IQFeed symbol for a whole portfolio, like IQFeedClient.ibconid_IQ_ticker_map"""
+        return {contract.conId: self.iq_symbol(contract) for contract in contracts}
+
+    def to_con_ids(self, symbols: typing.Iterable[Symbol]) -> typing.Dict[Symbol, typing.Optional[ContractId]]:
+        """IQFeed symbol -> conId, None for symbols not indexed"""
+        conid_by_iq = self._conid_by_iq
+        return {symbol: conid_by_iq.get(symbol) for symbol in symbols}
+
+    def _add(self, con_id: ContractId, symbol: Symbol):
+        with self._lock:
+            self._iq_by_conid[con_id] = symbol
+            self._conid_by_iq[symbol] = con_id
+            self._dirty = True
+
+    def load(self) -> bool:
+        """Add what is in path. False if there is no usable file"""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return False
+        except ValueError as e:
+            log.warning(f"ignoring unreadable symbology index {self.path}: {e}")
+            return False
+        if saved.get('version') != self.version:
+            log.warning(f"ignoring symbology index {self.path} version {saved.get('version')}")
+            return False
+        with self._lock:
+            for con_id, symbol in saved['iq_by_conid'].items():
+                self._iq_by_conid[int(con_id)] = symbol
+                self._conid_by_iq[symbol] = int(con_id)
+        log.info(f"loaded {len(self)} symbols from {self.path}")
+        return True
+
+    def save(self):
+        """Write the index to path if anything was added since it was loaded or saved"""
+        with self._lock:
+            self._saved_at = time.monotonic()
+            if not self._dirty:
+                return
+            data = json.dumps({'version': self.version,
+                               'iq_by_conid': {str(k): v for k, v in self._iq_by_conid.items()}},
+                              sort_keys=True)
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(data)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            self._dirty = True
+            log.warning(f"could not save symbology index {self.path}: {e}")
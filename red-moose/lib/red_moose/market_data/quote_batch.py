@@ -0,0 +1,179 @@
+import logging
+import typing
+
+import ib_insync
+import numpy as np
+import pyiqfeed as iq
+from red_moose.common import Quote
+from red_moose.messaging.wire import INT_NULL, QUOTE_DTYPE, quotes_to_records, records_to_quotes
+
+log = logging.getLogger(__name__)
+
+# Quote field -> QuoteConn update fields it can come from, first one present wins
+_IQFEED_FIELDS = {'Symbol': ('Symbol',),
+                  'Bid': ('Bid',),
+                  'Ask': ('Ask',),
+                  'Last': ('Last', 'Most Recent Trade'),
+                  'Open': ('Open',),
+                  'High': ('High',),
+                  'Low': ('Low',),
+                  'BidSize': ('Bid Size',),
+                  'AskSize': ('Ask Size',),
+                  'LastSize': ('Last Size', 'Most Recent Trade Size'),
+                  'BidTime': ('Bid Time',),
+                  'AskTime': ('Ask Time',),
+                  'LastTime': ('Last Time', 'Most Recent Trade Time'),
+                  'VWAP': ('VWAP',),
+                  'TotalVolume': ('Total Volume',)}
+
+
+class QuoteBatch:
+    """Many quotes as one numpy structured array with Quote's field names
+
+    For code that handles quotes a batch at a time, instead of making a Quote
+    (and running its converters) for every tick. Columns are batch['Bid'] etc,
+    Mid and bid_ask_changed work on whole columns and latest() keeps the last
+    quote of each symbol, so Quote objects are only made, if at all, once per
+    symbol with to_quotes().
+
+    A batch from a QuoteConn update is a view of the update array with its
+    fields renamed, nothing is copied. It only has the Quote fields the
+    QuoteConn was asked for, and in compact mode Symbol is the id from
+    symbols, the QuoteConn's symbol_table(). Other batches have every field of
+    QUOTE_DTYPE with NaN / INT_NULL for missing values, as on the wire.
+    """
+    __slots__ = ('records', 'symbols')
+
+    # view dtypes by QuoteConn update dtype
+    _views: typing.Dict[np.dtype, np.dtype] = {}
+
+    def __init__(self, records: np.ndarray, symbols: iq.SymbolTable = None):
+        """
+        Args:
+            records: structured array whose field names are Quote field names
+            symbols: table mapping the Symbol column to names if it holds ids
+        """
+        self.records = records
+        self.symbols = symbols
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, item):
+        """batch['Bid'] is a column, batch[mask] or batch[1:3] another QuoteBatch"""
+        if isinstance(item, str):
+            return self.records[item]
+        return QuoteBatch(self.records[item], self.symbols)
+
+    def __repr__(self):
+        return f"QuoteBatch({len(self)} quotes, fields={self.records.dtype.names})"
+
+    @classmethod
+    def from_update(cls, updates: np.ndarray, symbols: iq.SymbolTable = None) -> 'QuoteBatch':
+        """View of a QuoteConn update or update batch array, no copy
+
+        Args:
+            updates: array of a QuoteConn's update dtype, normal or compact
+            symbols: QuoteConn.symbol_table(), needed for compact updates
+        """
+        view = cls._views.get(updates.dtype)
+        if view is None:
+            fields = updates.dtype.fields
+            names, formats, offsets = [], [], []
+            for name, candidates in _IQFEED_FIELDS.items():
+                for candidate in candidates:
+                    if candidate in fields:
+                        names.append(name)
+                        formats.append(fields[candidate][0])
+                        offsets.append(fields[candidate][1])
+                        break
+            view = np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                             'itemsize': updates.dtype.itemsize})
+            cls._views[updates.dtype] = view
+        return cls(updates.view(view), symbols)
+
+    @classmethod
+    def from_tickers(cls, tickers: typing.Iterable[ib_insync.Ticker],
+                     symbols: typing.Sequence[str] = None) -> 'QuoteBatch':
+        """QUOTE_DTYPE batch from ib_insync Tickers, filled a column at a time
+
+        Args:
+            tickers: e.g. the set pendingTickersEvent sends
+            symbols: symbol of each ticker, default its contract's localSymbol,
+                like the ticker_symbol of Quote.from_Ticker
+        """
+        tickers = list(tickers)
+        n = len(tickers)
+        records = np.empty(n, dtype=QUOTE_DTYPE)
+        records['Symbol'] = symbols if symbols is not None else [t.contract.localSymbol for t in tickers]
+        for name, attr_name in (('Bid', 'bid'), ('Ask', 'ask'), ('Last', 'last'),
+                                ('Open', 'open'), ('High', 'high'), ('Low', 'low'), ('VWAP', 'vwap')):
+            records[name] = np.fromiter((getattr(t, attr_name) for t in tickers), dtype='f8', count=n)
+        for name, attr_name in (('BidSize', 'bidSize'), ('AskSize', 'askSize'), ('LastSize', 'lastSize')):
+            column = np.fromiter((getattr(t, attr_name) for t in tickers), dtype='f8', count=n)
+            records[name] = np.nan_to_num(column, nan=0)
+        volume = np.fromiter((t.volume for t in tickers), dtype='f8', count=n)
+        records['TotalVolume'] = np.where(np.isnan(volume), INT_NULL, volume)
+        records['BidTime'] = records['AskTime'] = records['LastTime'] = INT_NULL
+        records['contract_id'] = np.fromiter((t.contract.conId for t in tickers), dtype='i8', count=n)
+        records['exchange'] = [t.contract.exchange for t in tickers]
+        records['timestamp'] = np.fromiter((t.time.timestamp() if t.time else 0 for t in tickers),
+                                           dtype='f8', count=n)
+        return cls(records)
+
+    @classmethod
+    def from_quotes(cls, quotes: typing.Sequence[Quote]) -> 'QuoteBatch':
+        return cls(quotes_to_records(quotes))
+
+    @property
+    def Mid(self) -> np.ndarray:
+        return (self.records['Bid'] + self.records['Ask']) / 2.0
+
+    def bid_ask_changed(self, other: 'QuoteBatch') -> np.ndarray:
+        """Mask of quotes whose Bid or Ask differs from the quote in the same row of other"""
+        return (self.records['Bid'] != other.records['Bid']) | (self.records['Ask'] != other.records['Ask'])
+
+    def symbol_names(self) -> typing.List[str]:
+        column = self.records['Symbol']
+        if self.symbols is not None and column.dtype.kind == 'u':
+            return self.symbols.names(column)
+        return np.char.decode(column).tolist()
+
+    def latest(self) -> 'QuoteBatch':
+        """Last quote of each symbol, in the order of those last quotes"""
+        symbols = self.records['Symbol']
+        if len(symbols) < 2:
+            return self
+        _, first_from_end = np.unique(symbols[::-1], return_index=True)
+        rows = np.sort(len(symbols) - 1 - first_from_end)
+        if len(rows) == len(symbols):
+            return self
+        return QuoteBatch(self.records[rows], self.symbols)
+
+    def to_records(self) -> np.ndarray:
+        """As QUOTE_DTYPE records, e.g. for wire.encode. Views are copied"""
+        if self.records.dtype == QUOTE_DTYPE:
+            return self.records
+        records = np.zeros(len(self), dtype=QUOTE_DTYPE)
+        for name in ('Open', 'High', 'Low', 'VWAP', 'timestamp'):
+            records[name] = np.nan
+        for name in ('BidTime', 'AskTime', 'LastTime', 'TotalVolume', 'contract_id'):
+            records[name] = INT_NULL
+        for name in self.records.dtype.names:
+            if name == 'Symbol' and self.records[name].dtype.kind == 'u':
+                records[name] = self.symbol_names()
+            else:
+                records[name] = self.records[name]
+        return records
+
+    def to_quotes(self) -> typing.List[Quote]:
+        """A Quote per row, for code that still wants them"""
+        if self.records.dtype == QUOTE_DTYPE:
+            return records_to_quotes(self.records)
+        names = self.records.dtype.names
+        symbol = names.index('Symbol')
+        rows = self.records.tolist()
+        if self.symbols is not None and self.records['Symbol'].dtype.kind == 'u':
+            symbol_names = self.symbol_names()
+            rows = [row[:symbol] + (name,) + row[symbol + 1:] for row, name in zip(rows, symbol_names)]
+        return [Quote(**dict(zip(names, row))) for row in rows]
@@ -1,12 +1,14 @@
 import logging
 import random
 
+import numpy as np
 from kombu import Connection, Exchange, Queue, binding
 from typing import Set
 from red_moose.common import AppContext, Quote
 from red_moose.market_data.top_of_book import TopOfBook
 from red_moose.messaging.rabbit_consumer import SimpleConsumer
-from red_moose.iqfeed.client import IQFeedClient
+from red_moose.messaging.wire import records_to_quotes
+from red_moose.iqfeed.symbology import SymbologyIndex
 from red_moose.rm_enums import IBMarketDataTypes
 
 log = logging.getLogger(__name__)
@@ -17,9 +19,20 @@ class TWSQuotes(SimpleConsumer):
     MARKETDATATYPES = {IBMarketDataTypes.LIVE, IBMarketDataTypes.DELAYED}
 
     def __init__(self, conn: Connection, exchange: Exchange, queue: Queue, **kwargs):
+        """
+        Args:
+            kwargs:
+                marketDataType: IBMarketDataTypes to keep
+                symbology: SymbologyIndex mapping conIds to IQFeed tickers, default
+                    SymbologyIndex.warm() from its default file
+        """
         # tob is IQfeed ticker -> Quote
         self.tob = TopOfBook()
         self.marketDataType: Set[IBMarketDataTypes] = kwargs.get('marketDataType', TWSQuotes.MARKETDATATYPES)
+        # an empty index is falsy, only None means use the default
+        self.symbology: SymbologyIndex = kwargs.get('symbology')
+        if self.symbology is None:
+            self.symbology = SymbologyIndex.warm()
         super().__init__(conn, exchange, queue)
 
     @property
@@ -38,14 +51,14 @@ class TWSQuotes(SimpleConsumer):
                       durable=False,
                       exclusive=True)
         marketDataType: Set[IBMarketDataTypes] = kwargs.get('marketDataType', TWSQuotes.MARKETDATATYPES)
-        return cls(conn, exchange, queue, marketDataType=marketDataType)
+        return cls(conn, exchange, queue, marketDataType=marketDataType, symbology=kwargs.get('symbology'))
 
     def on_message(self, body, message):
         # this is a pickle autodecoded from ib_insync.Ticker
         # convert to Quote object and add to top of book
         if body.marketDataType in self.marketDataType:
             log.info(body)
-            symbol = IQFeedClient.get_iq_ticker(body.contract)
+            symbol = self.symbology.iq_symbol(body.contract)
             self.tob.addQuote(Quote.from_Ticker(body, symbol))
         super().on_message(body, message)
 
@@ -77,8 +90,17 @@ class IQFeedQuotes(SimpleConsumer):
 
     def on_message(self, body, message):
         log.info(body)
-        # this is a decoded json ie Dict body from Quote
-        self.tob.addQuote(Quote.from_dict(body))
+        # this is a decoded json ie Dict body from Quote, or a list of them
+        # from the relay's coalescing publisher, or QUOTE_DTYPE records when
+        # the relay publishes binary
+        if isinstance(body, np.ndarray):
+            for quote in records_to_quotes(body):
+                self.tob.addQuote(quote)
+        elif isinstance(body, list):
+            for quote in body:
+                self.tob.addQuote(Quote.from_dict(quote))
+        else:
+            self.tob.addQuote(Quote.from_dict(body))
         super().on_message(body, message)
 
     def on_consume_ready(self, connection, channel, consumers, **kwargs):
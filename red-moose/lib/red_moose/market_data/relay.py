@@ -1,10 +1,12 @@
 import logging
 import threading
 
+import pyiqfeed as iq
 from red_moose.iqfeed.client import IQFeedClient
 from red_moose.iqfeed.listeners import IQFeedRelayListener
 from red_moose.iqfeed.rm_connection import RMBaseConnection
 from red_moose.iqfeed.symbol_request_consumer import IQFeedSymbolRequests
+from red_moose.persistence.tick_store import MemmapStore
 
 log = logging.getLogger(__name__)
 
@@ -12,21 +14,37 @@ log = logging.getLogger(__name__)
 class IQFeedRelay:
     tickers = ['VIX.XO', 'NDX.X', 'INDU.X', 'SPX.XO']
 
-    def __init__(self, quote_conn: RMBaseConnection):
+    def __init__(self, quote_conn: RMBaseConnection, bar_store: MemmapStore = None,
+                 dispatch: bool = False, binary: bool = False):
         """ IQFeedRelay connects to IQfeed, attaches listener, and subscribes to rabbitmq commands
         Args:
             quote_conn: implementation of RMBaseConnection
+            bar_store: optional MemmapStore to also append live bars to
+            dispatch: publish from a worker thread, keeping only the latest quote per
+                symbol while publishing falls behind, so the IQFeed socket is never stalled
+            binary: publish quotes as ContentType.RM_RECORDS instead of JSON
         """
-        self.relay = IQFeedRelayListener("Level 1 Listener", )
+        self.relay = IQFeedRelayListener("Level 1 Listener", bar_store=bar_store, binary=binary)
+        self.dispatcher = None
+        if dispatch:
+            self.dispatcher = iq.ConflatingDispatcher(self.relay)
+            self.dispatcher.start()
         self.i = IQFeedClient()
         self.quote_conn = quote_conn
         self.iqfeed_req_rabbitconsumer = IQFeedSymbolRequests.create(quote_conn)
 
     @staticmethod
-    def start(quote_conn: RMBaseConnection):
-        iq_relay = IQFeedRelay(quote_conn)
+    def start(quote_conn: RMBaseConnection, bar_store: MemmapStore = None, dispatch: bool = False,
+              binary: bool = False):
+        iq_relay = IQFeedRelay(quote_conn, bar_store, dispatch, binary)
         iqfeed_req_thread = threading.Thread(target=iq_relay.iqfeed_req_rabbitconsumer.run)
         iqfeed_req_thread.start()
         quote_conn.subscribe(iq_relay.i,
                              IQFeedRelay.tickers,
-                             iq_relay.relay)
+                             iq_relay.dispatcher or iq_relay.relay)
+        if iq_relay.dispatcher is not None:
+            iq_relay.dispatcher.stop()
+            log.info("Relay dispatch: %s", iq_relay.dispatcher.stats())
+        iq_relay.relay.close()
+        log.info("Relay publisher: %s", iq_relay.relay.coalescer.stats())
+        log.info("Relay fan-out: %s", iq_relay.relay.fanout.stats())
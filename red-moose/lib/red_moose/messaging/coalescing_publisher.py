@@ -0,0 +1,132 @@
+import json
+import logging
+import threading
+import time
+import typing
+
+import attr
+from red_moose.common import NpEncoder, Quote
+
+log = logging.getLogger(__name__)
+
+
+def quotes_to_json(quotes: typing.Sequence[Quote]) -> str:
+    """One JSON message for many quotes, a list of what Quote.to_json makes"""
+    return json.dumps([attr.asdict(q) for q in quotes], cls=NpEncoder)
+
+
+class CoalescingPublisher:
+    """Keeps the latest quote per symbol and publishes them in batches
+
+    add() only stores the quote, so the IQFeed reader thread never waits for
+    the broker. A flush thread publishes every symbol with a new quote since
+    the last flush as one batch every flush_interval seconds, or as soon as
+    max_batch symbols are waiting. Quotes for a symbol that arrive between
+    flushes replace each other, so when quotes arrive faster than they can
+    be published the extra ones are shed instead of queueing up, and the
+    number of messages sent is bounded by the cadence, not the tick rate.
+    """
+
+    def __init__(self, publish: typing.Callable[[typing.List[Quote]], None],
+                 flush_interval: float = 0.05, max_batch: int = 500, name: str = "quote-coalescer"):
+        """
+        Args:
+            publish: called on the flush thread with each batch, in the order
+                symbols were first updated since the last flush
+            flush_interval: seconds between flushes
+            max_batch: flush early once this many symbols are waiting
+            name: name of the flush thread
+        """
+        self.publish = publish
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: typing.Dict[str, Quote] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.received = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.published = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def add(self, quote: Quote) -> None:
+        with self._lock:
+            pending = self._pending
+            if quote.Symbol in pending:
+                self.coalesced += 1
+            pending[quote.Symbol] = quote
+            self.received += 1
+            full = len(pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def add_many(self, quotes: typing.Iterable[Quote]) -> None:
+        with self._lock:
+            pending = self._pending
+            for quote in quotes:
+                if quote.Symbol in pending:
+                    self.coalesced += 1
+                pending[quote.Symbol] = quote
+                self.received += 1
+            full = len(pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def add_batch(self, batch) -> None:
+        """Add a QuoteBatch, making a Quote only for the last quote of each symbol in it"""
+        latest = batch.latest()
+        quotes = latest.to_quotes()
+        with self._lock:
+            pending = self._pending
+            self.coalesced += len(batch) - len(latest)
+            for quote in quotes:
+                if quote.Symbol in pending:
+                    self.coalesced += 1
+                pending[quote.Symbol] = quote
+            self.received += len(batch)
+            full = len(pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Publish what is waiting now. Returns the number of quotes published"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = list(self._pending.values())
+            self._pending = {}
+        try:
+            self.publish(batch)
+        except Exception as e:
+            self.errors += 1
+            log.exception(e)
+            return 0
+        self.batches += 1
+        self.published += len(batch)
+        return len(batch)
+
+    def close(self, timeout: float = 5) -> None:
+        """Stop the flush thread after a last flush"""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {'received': self.received,
+                'coalesced': self.coalesced,
+                'batches': self.batches,
+                'published': self.published,
+                'errors': self.errors,
+                'pending': len(self._pending)}
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            self._wake.wait(max(next_flush - time.monotonic(), 0))
+            self._wake.clear()
+            self.flush()
+            next_flush = time.monotonic() + self.flush_interval
+        self.flush()
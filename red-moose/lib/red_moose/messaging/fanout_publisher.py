@@ -0,0 +1,181 @@
+import collections
+import logging
+import threading
+import time
+import typing
+
+import attr
+
+log = logging.getLogger(__name__)
+
+
+@attr.s(auto_attribs=True, slots=True)
+class FanoutTarget:
+    """One broker the FanoutPublisher sends every message to
+
+    Attributes:
+        name: for logs and stats, e.g. 'prod'
+        producer: anything with publish(message, **kwargs), usually a
+            SimpleProducer made with confirm_publish=True so publish returns
+            once the broker has the message
+        priority: targets with priority >= FanoutPublisher.critical_priority
+            send every message, dropping the oldest only when max_pending is
+            reached; while their broker is failing they hold their queue and
+            retry. Lower priority targets degrade once they are more than
+            half full, skipping to the newest message, and drop what comes
+            in while their broker is failing.
+        max_pending: most messages waiting for this target
+    """
+    name: str
+    producer: typing.Any
+    priority: int = 0
+    max_pending: int = 10000
+
+
+class _TargetWorker:
+    """Queue and thread for one FanoutTarget"""
+
+    def __init__(self, target: FanoutTarget, critical: bool, kwargs: dict):
+        self.target = target
+        self.critical = critical
+        self.kwargs = kwargs
+        self.pending = collections.deque()
+        self.cond = threading.Condition()
+        self.stop = False
+        self.busy = False
+        self.sent = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.failed = 0
+        self.last_error = None
+        self.retry_at = 0.0
+        self.backoff = 0.0
+        self.thread = threading.Thread(target=self.run, name="fanout-%s" % target.name, daemon=True)
+
+    def put(self, message) -> None:
+        with self.cond:
+            if len(self.pending) >= self.target.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            self.pending.append(message)
+            self.cond.notify()
+
+    def run(self) -> None:
+        while True:
+            with self.cond:
+                while True:
+                    if not self.pending:
+                        if self.stop:
+                            return
+                        self.cond.wait()
+                        continue
+                    backing_off = self.retry_at - time.monotonic()
+                    if self.critical and backing_off > 0:
+                        # keep the queue as it is until the broker is retried
+                        self.cond.wait(backing_off)
+                        continue
+                    break
+                if not self.critical and len(self.pending) > self.target.max_pending // 2:
+                    # behind, only the newest message is worth sending
+                    self.skipped += len(self.pending) - 1
+                    last = self.pending.pop()
+                    self.pending.clear()
+                    self.pending.append(last)
+                message = self.pending.popleft()
+                self.busy = True
+            sent = False
+            try:
+                sent = self.send(message)
+            finally:
+                with self.cond:
+                    if not sent and self.critical:
+                        # retried first, unless it is the oldest of a full queue
+                        if len(self.pending) < self.target.max_pending:
+                            self.pending.appendleft(message)
+                        else:
+                            self.dropped += 1
+                    self.busy = False
+                    self.cond.notify_all()
+
+    def send(self, message) -> bool:
+        """Publish message. False if it wasn't sent"""
+        now = time.monotonic()
+        if now < self.retry_at:
+            # broker is failing, don't hold the queue up retrying every message
+            self.failed += 1
+            time.sleep(min(self.retry_at - now, 0.1))
+            return False
+        try:
+            self.target.producer.publish(message, **self.kwargs)
+            self.sent += 1
+            self.backoff = 0.0
+            return True
+        except Exception as e:
+            self.failed += 1
+            self.last_error = e
+            self.backoff = min(max(self.backoff * 2, 0.1), 30.0)
+            self.retry_at = time.monotonic() + self.backoff
+            log.error("publish to %s failed, backing off %.1fs: %s", self.target.name, self.backoff, e)
+            return False
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {'sent': self.sent,
+                'dropped': self.dropped,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'pending': len(self.pending)}
+
+
+class FanoutPublisher:
+    """Publishes each message to several brokers without them waiting on each other
+
+    Every target has its own bounded queue and thread, so publish() returns as
+    soon as the message is queued and a slow or broken staging broker only
+    delays, and eventually drops, staging's own messages. With producers that
+    use publisher confirms a message only counts as sent once the broker has
+    acknowledged it. Failures back the target off for a while: a critical
+    target then retries the failed message with its queue intact, others
+    drop messages until the back off is over instead of holding up their
+    queue.
+    """
+    critical_priority = 10
+
+    def __init__(self, targets: typing.Sequence[FanoutTarget], **publish_kwargs):
+        """
+        Args:
+            targets: brokers to publish to
+            publish_kwargs: passed to every producer.publish, e.g. content_type
+        """
+        self._workers = [_TargetWorker(target, target.priority >= self.critical_priority, publish_kwargs)
+                         for target in targets]
+        for worker in self._workers:
+            worker.thread.start()
+
+    def publish(self, message) -> None:
+        """Queue message for every target"""
+        for worker in self._workers:
+            worker.put(message)
+
+    def drain(self, timeout: float = None) -> bool:
+        """Wait until every target's queue is empty. False if it timed out"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            with worker.cond:
+                while worker.pending or worker.busy:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    worker.cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5) -> None:
+        """Send what is queued, then stop the threads"""
+        for worker in self._workers:
+            with worker.cond:
+                worker.stop = True
+                worker.cond.notify()
+        for worker in self._workers:
+            worker.thread.join(timeout)
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, int]]:
+        return {worker.target.name: worker.stats() for worker in self._workers}
@@ -3,6 +3,7 @@ import abc
 from kombu import Connection, Exchange, Queue
 from kombu.mixins import ConsumerMixin
 from kombu.mixins import ConsumerProducerMixin
+from red_moose.messaging import wire  # noqa: F401 registers the rm_records serializer
 from red_moose.rm_enums import ContentType
 
 
@@ -21,7 +22,8 @@ class SimpleConsumer(ConsumerMixin, abc.ABC):
 
     def get_consumers(self, consumer, channel):
         return [
-            consumer(queues=[self.q], callbacks=[self.on_message], accept={'json', 'pickle'}, prefetch_count=10),
+            consumer(queues=[self.q], callbacks=[self.on_message], accept={'json', 'pickle', wire.SERIALIZER},
+                     prefetch_count=10),
         ]
 
     @abc.abstractmethod
@@ -7,9 +7,18 @@ log = logging.getLogger(__name__)
 
 class SimpleProducer:
     def __init__(self, **kwargs):
+        """
+        Args:
+            kwargs:
+                connection_url: broker url
+                exchange: default fanout exchange 'iqfeed'
+                confirm_publish: wait for the broker to confirm each message,
+                    publish raises if it is rejected
+        """
         rabbit_url = kwargs.get('connection_url')
         log.info(rabbit_url)
-        conn = Connection(rabbit_url)
+        transport_options = {'confirm_publish': True} if kwargs.get('confirm_publish') else {}
+        conn = Connection(rabbit_url, transport_options=transport_options)
         channel = conn.channel()
         exchange = kwargs.get('exchange', Exchange("iqfeed", type="fanout"))
         self.producer = Producer(exchange=exchange, channel=channel)
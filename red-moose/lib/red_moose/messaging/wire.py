@@ -0,0 +1,164 @@
+import datetime
+import logging
+import struct
+import typing
+
+import numpy as np
+from kombu import serialization
+from red_moose.common import Bar, Quote
+from red_moose.rm_enums import ContentType
+
+log = logging.getLogger(__name__)
+
+# kombu serializer name, publish(records, serializer=SERIALIZER) or send
+# encode(...) bytes with content_type=ContentType.RM_RECORDS.value
+SERIALIZER = 'rm_records'
+
+# ints that are None in the attrs object
+INT_NULL = np.iinfo(np.int64).min
+
+# fields in the same order as the attrs classes so a record lines up with Quote(*fields)
+QUOTE_DTYPE = np.dtype([('Symbol', 'S32'),
+                        ('Bid', '<f8'), ('Ask', '<f8'), ('Last', '<f8'),
+                        ('Open', '<f8'), ('High', '<f8'), ('Low', '<f8'),
+                        ('BidSize', '<i8'), ('AskSize', '<i8'), ('LastSize', '<i8'),
+                        ('BidTime', '<i8'), ('AskTime', '<i8'), ('LastTime', '<i8'),
+                        ('VWAP', '<f8'), ('TotalVolume', '<i8'),
+                        ('contract_id', '<i8'), ('exchange', 'S8'), ('timestamp', '<f8')])
+
+BAR_DTYPE = np.dtype([('Symbol', 'S32'), ('Date', '<M8[D]'), ('Time', '<f8'),
+                      ('Open', '<f8'), ('High', '<f8'), ('Low', '<f8'), ('Close', '<f8'),
+                      ('TotalVolume', '<i8'), ('PeriodVolume', '<i8'), ('NumTrades', '<i8')])
+
+# magic, version, kind, spare. 8 bytes so the records after it stay aligned
+_HEADER = struct.Struct('<4sBBH')
+_MAGIC = b'RMWR'
+_VERSION = 1
+_KINDS = {1: QUOTE_DTYPE, 2: BAR_DTYPE}
+_KIND_OF = {QUOTE_DTYPE: 1, BAR_DTYPE: 2}
+
+# Quote fields that default to None, sent as NaN or INT_NULL
+_QUOTE_OPTIONAL = ('Open', 'High', 'Low', 'BidTime', 'AskTime', 'LastTime', 'VWAP', 'TotalVolume',
+                   'contract_id', 'timestamp')
+
+
+def _seconds(value) -> float:
+    """Quote.timestamp is epoch seconds from TWS but a bar time from live bars"""
+    if value is None:
+        return np.nan
+    if isinstance(value, np.timedelta64):
+        return value.item().total_seconds()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return value
+
+
+def _ints(values: typing.Sequence) -> typing.List[int]:
+    return [INT_NULL if v is None else v for v in values]
+
+
+def quotes_to_records(quotes: typing.Sequence[Quote]) -> np.ndarray:
+    """Structured array of QUOTE_DTYPE, one record per quote. None becomes NaN or INT_NULL"""
+    records = np.zeros(len(quotes), dtype=QUOTE_DTYPE)
+    if not quotes:
+        return records
+    columns = zip(*[(q.Symbol, q.Bid, q.Ask, q.Last, q.Open, q.High, q.Low,
+                     q.BidSize, q.AskSize, q.LastSize, q.BidTime, q.AskTime, q.LastTime,
+                     q.VWAP, q.TotalVolume, q.contract_id, q.exchange or '', _seconds(q.timestamp))
+                    for q in quotes])
+    for name, column in zip(QUOTE_DTYPE.names, columns):
+        if QUOTE_DTYPE[name].kind == 'i':
+            column = _ints(column)
+        records[name] = column
+    return records
+
+
+def bars_to_records(bars: typing.Sequence[Bar]) -> np.ndarray:
+    """Structured array of BAR_DTYPE, one record per bar"""
+    records = np.zeros(len(bars), dtype=BAR_DTYPE)
+    if not bars:
+        return records
+    columns = zip(*[(b.Symbol, b.Date, _seconds(b.Time), b.Open, b.High, b.Low, b.Close,
+                     b.TotalVolume, b.PeriodVolume, b.NumTrades)
+                    for b in bars])
+    for name, column in zip(BAR_DTYPE.names, columns):
+        records[name] = column
+    return records
+
+
+def interval_data_to_records(bar_data: np.ndarray) -> np.ndarray:
+    """BAR_DTYPE records straight from a BarConn interval array, without making Bar objects
+
+    Args:
+        bar_data: array of BarConn.interval_data_type, time in us since midnight
+    """
+    records = np.zeros(len(bar_data), dtype=BAR_DTYPE)
+    records['Symbol'] = bar_data['symbol']
+    records['Date'] = bar_data['date']
+    records['Time'] = bar_data['time'] / 1e6
+    records['Open'] = bar_data['open_p']
+    records['High'] = bar_data['high_p']
+    records['Low'] = bar_data['low_p']
+    records['Close'] = bar_data['close_p']
+    records['TotalVolume'] = bar_data['tot_vlm']
+    records['PeriodVolume'] = bar_data['prd_vlm']
+    records['NumTrades'] = bar_data['num_trds']
+    return records
+
+
+def records_to_quotes(records: np.ndarray) -> typing.List[Quote]:
+    """Quote objects back from QUOTE_DTYPE records, NaN and INT_NULL in optional fields become None"""
+    rows = records.tolist()
+    optional = [QUOTE_DTYPE.names.index(name) for name in _QUOTE_OPTIONAL]
+    exchange = QUOTE_DTYPE.names.index('exchange')
+    quotes = []
+    for row in rows:
+        for i in optional:
+            v = row[i]
+            if v is not None and (v != v or v == INT_NULL):
+                row = row[:i] + (None,) + row[i + 1:]
+        quotes.append(Quote(*row[:exchange], exchange=row[exchange].decode() or None,
+                            timestamp=row[exchange + 1]))
+    return quotes
+
+
+def records_to_bars(records: np.ndarray) -> typing.List[Bar]:
+    """Bar objects back from BAR_DTYPE records, Date as an ISO date string like the JSON path"""
+    dates = np.datetime_as_string(records['Date'], unit='D').tolist()
+    return [Bar(row[0], date, *row[2:]) for row, date in zip(records.tolist(), dates)]
+
+
+def encode(obj) -> bytes:
+    """Header and records for a Quote, a Bar, a sequence of either or an array of QUOTE_DTYPE or BAR_DTYPE"""
+    if isinstance(obj, np.ndarray):
+        records = obj
+    elif isinstance(obj, Quote):
+        records = quotes_to_records([obj])
+    elif isinstance(obj, Bar):
+        records = bars_to_records([obj])
+    elif obj and isinstance(obj[0], Bar):
+        records = bars_to_records(obj)
+    else:
+        records = quotes_to_records(obj)
+    kind = _KIND_OF.get(records.dtype)
+    if kind is None:
+        raise TypeError(f"can't encode records of {records.dtype}")
+    return _HEADER.pack(_MAGIC, _VERSION, kind, 0) + np.ascontiguousarray(records).tobytes()
+
+
+def decode(data: bytes) -> np.ndarray:
+    """Read only QUOTE_DTYPE or BAR_DTYPE array viewing data, no Python object per field"""
+    magic, version, kind, _ = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION or kind not in _KINDS:
+        raise ValueError(f"not red moose records: {magic} version {version} kind {kind}")
+    return np.frombuffer(data, dtype=_KINDS[kind], offset=_HEADER.size)
+
+
+def register():
+    """Make kombu encode and decode ContentType.RM_RECORDS. Done on import"""
+    serialization.register(SERIALIZER, encode, decode,
+                           content_type=ContentType.RM_RECORDS.value,
+                           content_encoding='binary')
+
+
+register()
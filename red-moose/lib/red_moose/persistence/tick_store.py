@@ -0,0 +1,275 @@
+import datetime
+import logging
+import os
+import re
+import typing
+from collections import OrderedDict
+
+import numpy as np
+import pyiqfeed as iq
+from red_moose.rm_types import Symbol
+
+log = logging.getLogger(__name__)
+
+
+def to_h5(data: np.array, h5_dtype: np.dtype) -> np.array:
+    """Convert HistoryConn/BarConn records to the matching *_h5_type.
+
+    date (M8[D]) becomes days since 1970-01-01 and time (m8[us] or u8) us
+    since midnight, both int64. Fields h5_dtype doesn't have are dropped.
+    """
+    out = np.zeros(len(data), dtype=h5_dtype)
+    for name in h5_dtype.names:
+        col = data[name]
+        if col.dtype.kind in 'mM':
+            col = col.astype(np.int64)
+        out[name] = col
+    return out
+
+
+def from_h5(data: np.array, dtype: np.dtype) -> np.array:
+    """Inverse of to_h5"""
+    out = np.zeros(len(data), dtype=dtype)
+    for name in data.dtype.names:
+        out[name] = data[name].astype(dtype[name]) \
+            if dtype[name].kind in 'mM' else data[name]
+    return out
+
+
+class MemmapStore:
+    """Append-only store of fixed width records, one file per symbol per day.
+
+    Records are HistoryConn's tick_h5_type / bar_h5_type / daily_h5_type
+    written back to back with no header to
+
+        root/kind/SYMBOL/CCYY-MM-DD.dat
+
+    so the number of complete records is the file size // itemsize and any
+    process can np.memmap the file and slice it without copying. Only whole
+    records are ever written, in one write, so a reader sees a consistent
+    prefix even while a writer is appending.
+
+    Records in a file must be in time order. Every index_every-th record's
+    time is also appended to CCYY-MM-DD.idx (after the data is written, so
+    the index never points past the data). A time range read binary searches
+    that small index and then only the block or two of the mapped file the
+    range starts and ends in, so reads don't have to touch the whole day.
+
+    Daily data is not split by day, each symbol has a single all.dat keyed
+    by date.
+
+    Opening a newer day for a symbol closes its older days' files, and at
+    most max_open pairs of files are kept open (least recently used closed
+    first, reopened on the next append), so a long running writer of many
+    symbols doesn't run out of file descriptors.
+    """
+
+    def __init__(self, root: str, kind: str, dtype: np.dtype,
+                 key: str = 'time', by_day: bool = True,
+                 index_every: int = 1024, max_open: int = 256):
+        """
+        Args:
+            root: directory for the store
+            kind: sub directory, e.g. ticks or bars_60s
+            dtype: record dtype, one of the HistoryConn *_h5_type
+            key: int64 field records are ordered by
+            by_day: one file per day, else one file per symbol
+            index_every: records between index entries
+            max_open: (symbol, day) pairs to keep files open for
+        """
+        assert dtype[key] == np.dtype('i8')
+        self.root = root
+        self.kind = kind
+        self.dtype = dtype
+        self.key = key
+        self.by_day = by_day
+        self.index_every = index_every
+        self.max_open = max_open
+        self._files = OrderedDict()
+
+    @classmethod
+    def ticks(cls, root: str, **kwargs):
+        return cls(root, "ticks", iq.HistoryConn.tick_h5_type, **kwargs)
+
+    @classmethod
+    def bars(cls, root: str, interval_len: int, interval_type: str = 's',
+             **kwargs):
+        return cls(root, "bars_%d%s" % (interval_len, interval_type),
+                   iq.HistoryConn.bar_h5_type, **kwargs)
+
+    @classmethod
+    def daily(cls, root: str, **kwargs):
+        return cls(root, "daily", iq.HistoryConn.daily_h5_type, key='date',
+                   by_day=False, **kwargs)
+
+    def _dir(self, symbol: Symbol) -> str:
+        return os.path.join(self.root, self.kind,
+                            re.sub(r'[^\w.@#+-]', '_', symbol))
+
+    def _base(self, symbol: Symbol, day: typing.Optional[str]) -> str:
+        return os.path.join(self._dir(symbol), day if self.by_day else "all")
+
+    def days(self, symbol: Symbol) -> typing.List[str]:
+        """Days there is data for, CCYY-MM-DD, oldest first"""
+        if not self.by_day or not os.path.isdir(self._dir(symbol)):
+            return []
+        return sorted(f[:-4] for f in os.listdir(self._dir(symbol))
+                      if f.endswith(".dat"))
+
+    # writing
+
+    def append(self, symbol: Symbol, records: np.array):
+        """Append records for symbol.
+
+        records can be in self.dtype or in the HistoryConn/BarConn dtype it
+        was made from. They must not be older than what is already stored.
+        """
+        if len(records) == 0:
+            return
+        if records.dtype != self.dtype:
+            records = to_h5(records, self.dtype)
+        if not self.by_day:
+            self._append_file(symbol, None, records)
+            return
+        dates = records['date']
+        bounds = np.flatnonzero(np.diff(dates)) + 1
+        for part in np.split(records, bounds):
+            day = str(np.datetime64(int(part['date'][0]), 'D'))
+            self._append_file(symbol, day, part)
+
+    def _open(self, symbol: Symbol, day: typing.Optional[str]):
+        """[data file, index file, num records, last key] for writing"""
+        name = (symbol, day)
+        if name in self._files:
+            self._files.move_to_end(name)
+        else:
+            if day is not None:
+                # Appends are in time order, older days won't be written again.
+                for old in [n for n in self._files
+                            if n[0] == symbol and n[1] < day]:
+                    self._close_file(old)
+            while len(self._files) >= self.max_open:
+                self._close_file(next(iter(self._files)))
+            base = self._base(symbol, day)
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            data_f = open(base + ".dat", 'ab')
+            num_recs = data_f.tell() // self.dtype.itemsize
+            if data_f.tell() % self.dtype.itemsize:
+                # Torn write from a crash, drop the partial record.
+                data_f.truncate(num_recs * self.dtype.itemsize)
+                data_f.seek(0, os.SEEK_END)
+            last = None
+            if num_recs:
+                last = self._map(base, num_recs)[self.key][-1]
+            index_f = open(base + ".idx", 'ab')
+            num_idx = index_f.tell() // 8
+            want_idx = -(-num_recs // self.index_every)
+            if num_idx != want_idx:
+                index_f.truncate(0)
+                keys = self._map(base, num_recs)[self.key]
+                index_f.write(np.ascontiguousarray(
+                    keys[::self.index_every], dtype=np.int64).tobytes())
+                index_f.flush()
+            self._files[name] = [data_f, index_f, num_recs, last]
+        return self._files[name]
+
+    def _append_file(self, symbol: Symbol, day: typing.Optional[str],
+                     records: np.array):
+        state = self._open(symbol, day)
+        data_f, index_f, num_recs, last = state
+        keys = records[self.key]
+        if np.any(np.diff(keys) < 0) or (last is not None and keys[0] < last):
+            raise ValueError("%s %s: records must be appended in %s order" % (
+                symbol, day, self.key))
+        data_f.write(records.tobytes())
+        data_f.flush()
+        first_idx = -(-num_recs // self.index_every) * self.index_every
+        index_f.write(np.ascontiguousarray(
+            keys[first_idx - num_recs::self.index_every],
+            dtype=np.int64).tobytes())
+        index_f.flush()
+        state[2] = num_recs + len(records)
+        state[3] = keys[-1]
+
+    def _close_file(self, name: typing.Tuple[Symbol, typing.Optional[str]]):
+        data_f, index_f, _, _ = self._files.pop(name)
+        data_f.close()
+        index_f.close()
+
+    def close(self):
+        for name in list(self._files):
+            self._close_file(name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # reading
+
+    def _map(self, base: str, num_recs: int) -> np.memmap:
+        if num_recs == 0:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(base + ".dat", dtype=self.dtype, mode='r',
+                         shape=(num_recs,))
+
+    def read(self, symbol: Symbol, day: str = None, bgn: int = None,
+             end: int = None) -> np.array:
+        """Records of one file with bgn <= key <= end, as a read only view
+        of the mapped file (no copy).
+
+        Args:
+            day: CCYY-MM-DD, ignored for stores not split by day
+            bgn: first key (us since midnight for ticks and bars, days since
+                1970-01-01 for daily) or None for the start
+            end: last key or None for the end
+        """
+        base = self._base(symbol, day)
+        if not os.path.exists(base + ".dat"):
+            return np.zeros(0, dtype=self.dtype)
+        # Index first, so every entry in it refers to data already written.
+        index = np.zeros(0, np.int64)
+        if os.path.exists(base + ".idx"):
+            with open(base + ".idx", 'rb') as f:
+                raw = f.read()
+            index = np.frombuffer(raw[:len(raw) - len(raw) % 8], np.int64)
+        num_recs = os.path.getsize(base + ".dat") // self.dtype.itemsize
+        data = self._map(base, num_recs)
+        index = index[:-(-num_recs // self.index_every)]
+        lo = 0 if bgn is None else self._search(data, index, bgn, 'left')
+        hi = num_recs if end is None else self._search(data, index, end,
+                                                       'right')
+        return data[lo:hi]
+
+    def _search(self, data: np.array, index: np.array, value: int,
+                side: str) -> int:
+        """searchsorted on data[key] looking only at the block value is in"""
+        block = np.searchsorted(index, value, side=side)
+        lo = max(block - 1, 0) * self.index_every
+        hi = min(block * self.index_every, len(data)) \
+            if block < len(index) else len(data)
+        return lo + int(np.searchsorted(data[self.key][lo:hi], value,
+                                        side=side))
+
+    def read_period(self, symbol: Symbol, bgn_prd: datetime.datetime,
+                    end_prd: datetime.datetime) -> typing.List[np.array]:
+        """Views of every day file covering bgn_prd to end_prd, oldest first"""
+        def us(dt):
+            return ((dt.hour * 3600 + dt.minute * 60 + dt.second) * 1000000 +
+                    dt.microsecond)
+        if not self.by_day:
+            epoch = datetime.date(1970, 1, 1)
+            return [self.read(symbol, None, (bgn_prd.date() - epoch).days,
+                              (end_prd.date() - epoch).days)]
+        views = []
+        for day in self.days(symbol):
+            day_dt = datetime.date.fromisoformat(day)
+            if day_dt < bgn_prd.date() or day_dt > end_prd.date():
+                continue
+            view = self.read(symbol, day,
+                             us(bgn_prd) if day_dt == bgn_prd.date() else None,
+                             us(end_prd) if day_dt == end_prd.date() else None)
+            if len(view):
+                views.append(view)
+        return views
@@ -5,6 +5,7 @@ class IQFeedSubscription(enum.Enum):
     QUOTES_TRADES = enum.auto()
     TRADES = enum.auto()
     BARS = enum.auto()
+    LOCAL_BARS = enum.auto()
 
 
 class WriterType(enum.Enum):
@@ -34,6 +35,8 @@ class IBMarketDataTypes(enum.Enum):
 class ContentType(enum.Enum):
     JSON = "application/json"
     PYTHON_SERIALIZE = 'application/x-python-serialize'
+    # fixed layout numpy records, see red_moose.messaging.wire
+    RM_RECORDS = 'application/x-redmoose-records'
 
 
 class IBSecType(enum.Enum):
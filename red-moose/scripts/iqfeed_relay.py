@@ -17,9 +17,10 @@ Relay IQFeed to rabbitmq
 
 parser = argparse.ArgumentParser(description=desc, formatter_class=argparse.RawTextHelpFormatter)
 parser.add_argument("-s", "--subscription", choices=[i.name for i in IQFeedSubscription], help="IQFeedSubscription")
+parser.add_argument("--batch", action="store_true", help="dispatch runs of updates/bars to the relay in batches")
 args = parser.parse_args()
 
 log.info(f"Arguments: {args}")
 
-iq_conn = RMBaseConnection.create(IQFeedSubscription[args.subscription])
+iq_conn = RMBaseConnection.create(IQFeedSubscription[args.subscription], batch_mode=args.batch)
 IQFeedRelay.start(iq_conn)
@@ -0,0 +1,24 @@
+"""Helpers shared by the pyiqfeed tests"""
+import time
+
+
+def quote_line(symbol, last):
+    """A QuoteConn update message for symbol trading at last"""
+    return ("Q,%s,%.2f,100,09:30:00.000001,11,1000,%.2f,10,%.2f,10,"
+            "1.0,2.0,0.5,1.5,Cbasob,3D87,\r\n" % (symbol, last, last - 0.01,
+                                                 last + 0.01))
+
+
+def feed(conn, lines):
+    """Process lines as if conn had read them from its socket"""
+    conn._recv_buf.feed("".join(lines).encode('latin-1'))
+    conn._process_messages()
+
+
+def wait_for(cond, timeout=5):
+    """Poll cond until it is true, failing the test after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.001)
+    return True
@@ -0,0 +1,59 @@
+import pypath
+import json
+import threading
+import time
+
+from red_moose.common import Quote
+from red_moose.messaging.coalescing_publisher import CoalescingPublisher, quotes_to_json
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+        self.published = threading.Event()
+
+    def __call__(self, quotes):
+        self.batches.append([(q.Symbol, q.Last) for q in quotes])
+        self.published.set()
+
+
+def quote(symbol, last):
+    return Quote(Symbol=symbol, Bid=last - 0.01, Ask=last + 0.01, Last=last)
+
+
+def test_keeps_latest_quote_per_symbol():
+    recorder = Recorder()
+    publisher = CoalescingPublisher(recorder, flush_interval=60)
+    publisher.add(quote("SPY", 100))
+    publisher.add_many([quote("QQQ", 200), quote("SPY", 101)])
+    assert publisher.flush() == 2
+    assert publisher.flush() == 0
+    publisher.close()
+    assert recorder.batches == [[("SPY", 101), ("QQQ", 200)]]
+    assert publisher.stats() == {'received': 3, 'coalesced': 1, 'batches': 1,
+                                 'published': 2, 'errors': 0, 'pending': 0}
+
+
+def test_flushes_on_size_and_cadence():
+    recorder = Recorder()
+    publisher = CoalescingPublisher(recorder, flush_interval=60, max_batch=2)
+    publisher.add(quote("SPY", 100))
+    time.sleep(0.05)
+    assert not recorder.batches
+    publisher.add(quote("QQQ", 200))
+    assert recorder.published.wait(5)
+    publisher.close()
+
+    recorder = Recorder()
+    publisher = CoalescingPublisher(recorder, flush_interval=0.01)
+    publisher.add(quote("IWM", 150))
+    assert recorder.published.wait(5)
+    publisher.add(quote("TLT", 120))
+    publisher.close()
+    assert recorder.batches == [[("IWM", 150)], [("TLT", 120)]]
+
+
+def test_batch_json_round_trip():
+    quotes = [quote("SPY", 100), quote("QQQ", 200)]
+    body = json.loads(quotes_to_json(quotes))
+    assert [Quote.from_dict(d) for d in body] == quotes
@@ -0,0 +1,106 @@
+import pypath
+import threading
+import time
+
+from red_moose.messaging.fanout_publisher import FanoutPublisher, FanoutTarget
+
+
+class FakeProducer:
+    def __init__(self, delay=0.0, fail=0):
+        self.messages = []
+        self.kwargs = []
+        self.delay = delay
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def publish(self, message, **kwargs):
+        self.release.wait()
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("broker down")
+        time.sleep(self.delay)
+        self.messages.append(message)
+        self.kwargs.append(kwargs)
+
+
+def test_publishes_to_every_target():
+    prod, dev = FakeProducer(), FakeProducer()
+    publisher = FanoutPublisher([FanoutTarget('prod', prod, priority=FanoutPublisher.critical_priority),
+                                 FanoutTarget('dev', dev)],
+                                content_type='application/json')
+    for i in range(5):
+        publisher.publish(i)
+    assert publisher.drain(5)
+    publisher.close()
+    assert prod.messages == dev.messages == [0, 1, 2, 3, 4]
+    assert prod.kwargs[0] == {'content_type': 'application/json'}
+    assert publisher.stats()['prod'] == {'sent': 5, 'dropped': 0, 'skipped': 0, 'failed': 0, 'pending': 0}
+
+
+def test_slow_target_does_not_hold_up_others():
+    prod, staging = FakeProducer(), FakeProducer()
+    staging.release.clear()
+    publisher = FanoutPublisher([FanoutTarget('prod', prod, priority=FanoutPublisher.critical_priority),
+                                 FanoutTarget('staging', staging, max_pending=10)])
+    start = time.monotonic()
+    for i in range(100):
+        publisher.publish(i)
+    assert time.monotonic() - start < 1
+    deadline = time.monotonic() + 5
+    while len(prod.messages) < 100 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert prod.messages == list(range(100))
+    assert staging.messages == []
+
+    staging.release.set()
+    assert publisher.drain(5)
+    publisher.close()
+    stats = publisher.stats()['staging']
+    # the first message was in flight, after that the queue was full and then skipped to the newest
+    assert staging.messages[-1] == 99
+    assert stats['sent'] == len(staging.messages) < 10
+    assert stats['dropped'] > 0
+    assert stats['skipped'] > 0
+    assert stats['sent'] + stats['dropped'] + stats['skipped'] == 100
+
+
+def test_critical_target_keeps_every_message_until_full():
+    prod = FakeProducer()
+    prod.release.clear()
+    publisher = FanoutPublisher([FanoutTarget('prod', prod, priority=FanoutPublisher.critical_priority,
+                                              max_pending=50)])
+    for i in range(40):
+        publisher.publish(i)
+    prod.release.set()
+    assert publisher.drain(5)
+    publisher.close()
+    assert prod.messages == list(range(40))
+    assert publisher.stats()['prod']['skipped'] == 0
+
+
+def test_failing_target_backs_off():
+    dev = FakeProducer(fail=1)
+    publisher = FanoutPublisher([FanoutTarget('dev', dev)])
+    publisher.publish('lost')
+    publisher.publish('also lost')
+    assert publisher.drain(5)
+    time.sleep(0.15)
+    publisher.publish('sent')
+    assert publisher.drain(5)
+    publisher.close()
+    assert dev.messages == ['sent']
+    stats = publisher.stats()['dev']
+    assert stats['failed'] == 2
+    assert stats['sent'] == 1
+
+
+def test_critical_target_retries_failed_messages():
+    prod = FakeProducer(fail=2)
+    publisher = FanoutPublisher([FanoutTarget('prod', prod, priority=FanoutPublisher.critical_priority)])
+    for i in range(3):
+        publisher.publish(i)
+    assert publisher.drain(5)
+    publisher.close()
+    assert prod.messages == [0, 1, 2]
+    assert publisher.stats()['prod'] == {'sent': 3, 'dropped': 0, 'skipped': 0, 'failed': 2, 'pending': 0}
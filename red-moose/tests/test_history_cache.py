@@ -0,0 +1,108 @@
+import pypath
+import datetime
+import numpy as np
+import pytest
+import pyiqfeed as iq
+from red_moose.iqfeed.history_cache import HistoryCache, add_span, subtract_spans
+
+
+class FakeHistoryConn:
+    """Serves one bar a minute, every minute, and records what was asked for"""
+
+    def __init__(self):
+        self.requests = []
+        self.volume = 100
+
+    def request_bars_in_period(self, ticker, interval_len, interval_type,
+                               bgn_prd, end_prd, ascend):
+        self.requests.append((bgn_prd, end_prd))
+        first = bgn_prd.replace(second=0, microsecond=0)
+        if first < bgn_prd:
+            first += datetime.timedelta(minutes=1)
+        stamps = np.arange(np.datetime64(first, 'us'),
+                           np.datetime64(end_prd, 'us') + 1,
+                           np.timedelta64(1, 'm'))
+        if len(stamps) == 0:
+            raise iq.NoDataError("!NO_DATA!")
+        bars = np.zeros(len(stamps), dtype=iq.HistoryConn.bar_type)
+        bars['date'] = stamps.astype('M8[D]')
+        bars['time'] = stamps - stamps.astype('M8[D]')
+        bars['close_p'] = np.arange(len(stamps))
+        bars['prd_vlm'] = self.volume
+        return bars
+
+
+def dt(day, hour, minute=0):
+    return datetime.datetime(2020, 10, day, hour, minute)
+
+
+def make_cache(tmpdir):
+    return HistoryCache(root=str(tmpdir), now=lambda: dt(20, 12))
+
+
+def test_spans():
+    assert subtract_spans((0, 100), [(10, 20), (50, 60)]) == [
+        (0, 9), (21, 49), (61, 100)]
+    assert subtract_spans((15, 55), [(10, 20), (50, 60)]) == [(21, 49)]
+    assert subtract_spans((10, 20), [(0, 30)]) == []
+    assert add_span([(0, 9), (30, 40)], (10, 29)) == [(0, 40)]
+    assert add_span([(0, 9)], (20, 29)) == [(0, 9), (20, 29)]
+
+
+def test_only_fetches_gaps(tmpdir):
+    conn = FakeHistoryConn()
+    cache = make_cache(tmpdir)
+    first = cache.bars_in_period(conn, "SPY", 60, 's', dt(13, 10), dt(13, 11))
+    assert len(first) == 61
+    again = cache.bars_in_period(conn, "SPY", 60, 's', dt(13, 10), dt(13, 11))
+    assert np.array_equal(first, again)
+    assert len(conn.requests) == 1
+
+    wider = cache.bars_in_period(conn, "SPY", 60, 's', dt(13, 9), dt(13, 12))
+    assert len(wider) == 181
+    assert conn.requests[1:] == [
+        (dt(13, 9), dt(13, 10)),
+        (dt(13, 11) + datetime.timedelta(microseconds=1), dt(13, 12))]
+    assert np.all(np.diff(wider['time'].astype(np.int64)) == 60000000)
+    assert cache.is_covered("bars_60s", "SPY", dt(13, 9), dt(13, 12))
+
+
+def test_spans_days(tmpdir):
+    conn = FakeHistoryConn()
+    cache = make_cache(tmpdir)
+    bars = cache.bars_in_period(conn, "SPY", 60, 's', dt(13, 23, 58), dt(14, 0, 2))
+    assert len(bars) == 5
+    assert list(bars['date']) == [np.datetime64('2020-10-13')] * 2 + \
+        [np.datetime64('2020-10-14')] * 3
+    assert len(conn.requests) == 1
+    assert cache.is_covered("bars_60s", "SPY", dt(14, 0), dt(14, 0, 1))
+
+
+def test_recent_data_is_not_covered(tmpdir):
+    conn = FakeHistoryConn()
+    cache = make_cache(tmpdir)
+    cache.bars_in_period(conn, "SPY", 60, 's', dt(20, 11), dt(20, 13))
+    assert cache.is_covered("bars_60s", "SPY", dt(20, 11), dt(20, 11, 45))
+    assert not cache.is_covered("bars_60s", "SPY", dt(20, 11), dt(20, 12))
+
+
+def test_unsettled_bars_are_replaced(tmpdir):
+    conn = FakeHistoryConn()
+    cache = make_cache(tmpdir)
+    cache.bars_in_period(conn, "SPY", 60, 's', dt(20, 11, 40), dt(20, 12))
+    conn.volume = 999
+    bars = cache.bars_in_period(conn, "SPY", 60, 's', dt(20, 11, 40), dt(20, 12))
+    assert len(conn.requests) == 2
+    assert bars['prd_vlm'][0] == 100
+    assert bars['prd_vlm'][-1] == 999
+    assert len(bars) == 21
+
+
+def test_errors_leave_coverage_alone(tmpdir):
+    class Broken:
+        def request_bars_in_period(self, **kwargs):
+            raise RuntimeError("Invalid symbol.")
+    cache = make_cache(tmpdir)
+    with pytest.raises(RuntimeError):
+        cache.bars_in_period(Broken(), "XXX", 60, 's', dt(13, 10), dt(13, 11))
+    assert cache.coverage("bars_60s", "XXX") == {}
@@ -0,0 +1,90 @@
+import pypath
+import datetime
+import threading
+import time
+import numpy as np
+import pyiqfeed as iq
+from red_moose.iqfeed.option_chains import OptionChainService
+
+TODAY = datetime.date.today()
+NEAR = TODAY + datetime.timedelta(days=3)
+FAR = TODAY + datetime.timedelta(days=200)
+
+
+def opt_symbol(root, expiry, right, strike):
+    letters = iq.LookupConn.call_month_letters if right == 'C' else iq.LookupConn.put_month_letters
+    return "%s%.2d%.2d%s%s" % (root, expiry.year % 100, expiry.day, letters[expiry.month - 1], strike)
+
+
+class FakeLookupConn:
+    """Answers option chain requests from a list of (expiry, right, strike)"""
+
+    def __init__(self, options):
+        self.options = options
+        self.requests = []
+
+    def request_equity_option_chain(self, symbol, opt_type, month_codes, near_months, include_binary, timeout):
+        self.requests.append(near_months)
+        options = [o for o in self.options if near_months is None or o[0] <= NEAR]
+        return {'c': [opt_symbol(symbol, e, r, k) for e, r, k in options if r == 'C'],
+                'p': [opt_symbol(symbol, e, r, k) for e, r, k in options if r == 'P']}
+
+
+def test_read_option_symbols():
+    options = iq.LookupConn.read_option_symbols(["SPY2116L400", "SPY2116X400.5", "SPXW2231C4000", "BINARY"])
+    assert list(options['symbol']) == [b"SPY2116L400", b"SPY2116X400.5", b"SPXW2231C4000"]
+    assert list(options['expiry']) == [np.datetime64('2021-12-16'), np.datetime64('2021-12-16'),
+                                       np.datetime64('2022-03-31')]
+    assert list(options['strike']) == [400, 400.5, 4000]
+    assert list(options['right']) == [b'C', b'P', b'C']
+
+
+def test_chain_lookups_and_incremental_refresh():
+    conn = FakeLookupConn([(FAR, 'C', 410), (NEAR, 'P', 400), (NEAR, 'C', 405), (NEAR, 'C', 395)])
+    service = OptionChainService(conn, ttl=0, full_ttl=3600)
+    chain = service.chain("SPY")
+    assert len(chain) == 4
+    assert list(chain.expiries()) == [np.datetime64(NEAR), np.datetime64(FAR)]
+    assert list(chain.strikes(NEAR, 'C')) == [395, 405]
+    assert chain.symbol(NEAR, 405, 'c') == opt_symbol("SPY", NEAR, 'C', 405)
+    assert chain.symbol(NEAR, 400, 'C') is None
+    assert chain.nearest_strike(NEAR, 'C', 401) == 405
+    conn.options.append((NEAR, 'C', 400))
+    chain = service.chain("SPY")
+    assert conn.requests == [None, 1]
+    assert list(chain.strikes(NEAR, 'C')) == [395, 400, 405]
+    assert list(chain.strikes(FAR, 'C')) == [410]
+    service.ttl = 3600
+    assert service.chain("SPY") is chain
+    service.invalidate("SPY")
+    service.chain("SPY")
+    assert conn.requests == [None, 1, None]
+
+
+def test_slow_request_does_not_block_other_underlyings():
+    class SlowLookupConn(FakeLookupConn):
+        def __init__(self, options):
+            super().__init__(options)
+            self.started = threading.Event()
+            self.release = threading.Event()
+
+        def request_equity_option_chain(self, symbol, *args, **kwargs):
+            if symbol == "SLOW":
+                self.started.set()
+                self.release.wait(5)
+            return super().request_equity_option_chain(symbol, *args, **kwargs)
+
+    conn = SlowLookupConn([(NEAR, 'C', 400)])
+    service = OptionChainService(conn, ttl=3600)
+    spy = service.chain("SPY")
+    slow = threading.Thread(target=service.chain, args=("SLOW",))
+    slow.start()
+    assert conn.started.wait(5)
+    start = time.monotonic()
+    assert service.chain("SPY") is spy
+    assert len(service.chain("QQQ")) == 1
+    assert time.monotonic() - start < 1
+    conn.release.set()
+    slow.join(5)
+    assert service.chain("SLOW") is service.chain("SLOW")
+    assert conn.requests == [None, None, None]
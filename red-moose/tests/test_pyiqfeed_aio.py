@@ -0,0 +1,123 @@
+import pypath
+import asyncio
+import pytest
+import pyiqfeed as iq
+
+
+class FakeIQFeed:
+    """Local server answering a few IQFeed commands the way IQFeed does."""
+
+    def __init__(self):
+        self.commands = []
+        self.clients = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for writer in self.clients:
+            writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def serve(self, reader, writer):
+        self.clients.append(writer)
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            cmd = line.decode('latin-1').strip()
+            self.commands.append(cmd)
+            fields = cmd.split(',')
+            if fields[0] == "HIX":
+                await self.answer_bars(writer, fields[1], fields[5])
+            elif fields[0] == "BW":
+                writer.write(
+                    b"B-SPY,BH,SPY,2020-10-13 09:30:00,1,2,0.5,1.5,90,10,3,\r\n"
+                    b"B-SPY,BU,SPY,2020-10-13 09:31:00,1,2,0.5,1.5,95,5,1,\r\n"
+                    b"B-SPY,BC,SPY,2020-10-13 09:31:00,1,2,0.5,1.5,100,10,3,\r\n"
+                    b"B-SPY,BC,SPY,2020-10-13 09:32:00,1,2,0.5,1.7,110,10,3,\r\n")
+
+    async def answer_bars(self, writer, ticker, req_id):
+        if ticker == "NONE":
+            writer.write(("%s,E,!NO_DATA!,\r\n" % req_id).encode())
+        elif ticker == "SLOW":
+            await asyncio.sleep(0.1)
+        for num in range(len(ticker) if ticker != "NONE" else 0):
+            writer.write(("%s,2020-10-13 09:%.2d:00,2,0.5,1,1.5,%d,10,3,\r\n" % (
+                req_id, 31 + num, num)).encode())
+        writer.write(("%s,!ENDMSG!,\r\n" % req_id).encode())
+        await writer.drain()
+
+
+def run(test):
+    async def main():
+        fake = FakeIQFeed()
+        port = await fake.start()
+        try:
+            await asyncio.wait_for(test(fake, port), 5)
+        finally:
+            await fake.stop()
+    asyncio.run(main())
+
+
+def test_concurrent_history_requests():
+    async def test(fake, port):
+        conn = iq.AsyncHistoryConn(name="test", port=port)
+        await conn.connect()
+        slow, fast = await asyncio.gather(
+            conn.request_bars("SLOW", 60, 's', 10),
+            conn.request_bars("SPY", 60, 's', 10))
+        assert len(slow) == 4 and len(fast) == 3
+        assert list(fast['tot_vlm']) == [0, 1, 2]
+        with pytest.raises(iq.NoDataError):
+            await conn.request_bars("NONE", 60, 's', 10)
+        many = await conn.request_bars_many(["A", "BB", "NONE"], 60, 's',
+                                            max_bars=10, max_in_flight=2)
+        assert {key: len(data) for key, data in many.items()} == {
+            "A": 1, "BB": 2, "NONE": 0}
+        assert not conn._req_buf and not conn._req_done
+        assert fake.commands[0] == "S,SET PROTOCOL,6.0"
+        await conn.disconnect()
+        assert not conn.reader_running()
+    run(test)
+
+
+def test_bar_stream():
+    async def test(fake, port):
+        conn = iq.AsyncBarConn(name="test", port=port)
+        conn.set_batch_mode(True)
+        await conn.connect()
+        async with conn.bars() as bars:
+            conn.watch("SPY", 60, "s", lookback_bars=1)
+            got = []
+            async for bar_data in bars:
+                got.extend(bar_data['close_p'])
+                if len(got) == 3:
+                    break
+        assert got == [1.5, 1.5, 1.7]
+        assert not conn._listeners
+        await conn.disconnect()
+    run(test)
+
+
+def test_stream_ends_when_feed_closes():
+    async def test(fake, port):
+        conn = iq.AsyncQuoteConn(name="test", port=port)
+        await conn.connect()
+        updates = conn.updates()
+        await fake.stop()
+        with pytest.raises(ConnectionError):
+            async for _ in updates:
+                pass
+        await conn.disconnect()
+    run(test)
+
+
+def test_blocking_history_methods_point_to_coroutines():
+    conn = iq.AsyncHistoryConn(name="test")
+    with pytest.raises(RuntimeError, match="request_ticks_in_period"):
+        conn.iter_ticks_in_period("SPY", None, None)
+    with pytest.raises(RuntimeError, match="request_bars_many"):
+        conn.iter_bars_many(["SPY"], 60, 's')
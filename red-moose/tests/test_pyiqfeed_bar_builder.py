@@ -0,0 +1,88 @@
+import pypath
+import numpy as np
+import pyiqfeed as iq
+from pyiqfeed.column_readers import FieldsetParser
+
+
+class BarCollector(iq.SilentBarListener):
+    def __init__(self, name):
+        super().__init__(name)
+        self.bars = []
+        self.latest = []
+
+    def process_live_bar(self, bar_data):
+        self.bars.extend(bar_data.copy())
+
+    def process_bar_batch(self, bar_data):
+        self.bars.extend(bar_data.copy())
+
+    def process_latest_bar_update(self, bar_data):
+        self.latest.extend(bar_data.copy())
+
+
+def updates(lines):
+    parser = FieldsetParser([iq.QuoteConn.quote_msg_map[f]
+                             for f in iq.BarBuilder.update_fields])
+    return parser.parse_many([line.split(',') for line in lines])
+
+
+LINES = ["Q,SPY,10,100,09:30:01.000000,10/13/2020,1100,C,",
+         "Q,SPY,11,200,09:30:30.000000,10/13/2020,1300,C,",
+         "Q,QQQ,5,300,09:30:40.000000,10/13/2020,300,Cb,",
+         "Q,SPY,9,300,09:31:05.000000,10/13/2020,1600,C,",
+         "Q,SPY,99,300,09:31:06.000000,10/13/2020,1600,b,"]
+
+
+def build(batch_mode):
+    builder = iq.BarBuilder("test", [(60, 's'), (2, 't'), (250, 'v')],
+                            update=0)
+    builder.set_batch_mode(batch_mode)
+    listeners = {}
+    for interval in builder.intervals():
+        listeners[interval] = BarCollector(str(interval))
+        builder.add_listener(listeners[interval], *interval)
+    data = updates(LINES)
+    builder.process_update_batch(data[:2])
+    builder.process_update_batch(data[2:])
+    return builder, listeners
+
+
+def summary(bars):
+    return [(bar['symbol'], int(bar['time']), bar['open_p'], bar['high_p'],
+             bar['low_p'], bar['close_p'], int(bar['prd_vlm']),
+             int(bar['num_trds'])) for bar in bars]
+
+
+def test_time_tick_and_volume_bars():
+    for batch_mode in [False, True]:
+        builder, listeners = build(batch_mode)
+        assert summary(listeners[(60, 's')].bars) == [
+            (b'SPY', 34260000000, 10, 11, 10, 11, 300, 2)]
+        assert summary(listeners[(2, 't')].bars) == [
+            (b'SPY', 34230000000, 10, 11, 10, 11, 300, 2)]
+        assert summary(listeners[(250, 'v')].bars) == [
+            (b'SPY', 34230000000, 10, 11, 10, 11, 300, 2),
+            (b'SPY', 34265000000, 9, 9, 9, 9, 300, 1),
+            (b'QQQ', 34240000000, 5, 5, 5, 5, 300, 1)]
+        assert len(listeners[(60, 's')].latest) == 3
+        assert len(builder.current_bar("SPY", 250, 'v')) == 0
+        assert builder.current_bar("SPY", 2, 't')['close_p'][0] == 9
+
+
+def test_timestamp_completes_time_bars():
+    builder, listeners = build(False)
+    minute = listeners[(60, 's')]
+    builder.process_timestamp(iq.FeedConn.TimeStampMsg(
+        date=np.datetime64('2020-10-13'), time=34300000000))
+    assert summary(minute.bars[1:]) == [
+        (b'QQQ', 34260000000, 5, 5, 5, 5, 300, 1)]
+    builder.process_timestamp(iq.FeedConn.TimeStampMsg(
+        date=np.datetime64('2020-10-13'), time=34320000000))
+    assert summary(minute.bars[2:]) == [
+        (b'SPY', 34320000000, 9, 9, 9, 9, 300, 1)]
+    assert all(bar['date'] == np.datetime64('2020-10-13')
+               for bar in minute.bars)
+    # A late trade for a finished bar goes into the next one.
+    builder.process_update_batch(updates(
+        ["Q,SPY,8,10,09:31:59.000000,10/13/2020,1610,C,"]))
+    assert builder.current_bar("SPY", 60, 's')['time'][0] == 34380000000
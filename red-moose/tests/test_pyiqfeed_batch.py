@@ -0,0 +1,60 @@
+import pypath
+import pyiqfeed as iq
+from pyiqfeed_helpers import feed, quote_line
+
+
+class RecordingListener(iq.SilentQuoteListener, iq.SilentBarListener):
+    def __init__(self, name):
+        super().__init__(name)
+        self.calls = []
+
+    def process_update_batch(self, updates):
+        self.calls.append(('batch', [u['Symbol'].decode() for u in updates]))
+
+    def process_update(self, update):
+        self.calls.append(('update', update[0]['Symbol'].decode()))
+
+    def process_timestamp(self, time_val):
+        self.calls.append(('timestamp', None))
+
+    def process_live_bar(self, bar_data):
+        self.calls.append(('bar', bar_data[0]['symbol'].decode()))
+
+    def process_latest_bar_update(self, bar_data):
+        self.calls.append(('latest', bar_data[0]['symbol'].decode()))
+
+
+def test_quote_batches_keep_order():
+    conn = iq.QuoteConn(name="test")
+    listener = RecordingListener("test")
+    conn.add_listener(listener)
+    conn.set_batch_mode(True)
+    feed(conn, [quote_line("AAPL", 100), quote_line("MSFT", 200),
+                "T,20201013 09:30:00\r\n", quote_line("SPY", 300)])
+    assert listener.calls == [('batch', ['AAPL', 'MSFT']),
+                              ('timestamp', None),
+                              ('batch', ['SPY'])]
+
+
+def test_default_batch_falls_back_to_rows():
+    conn = iq.QuoteConn(name="test")
+    listener = iq.SilentQuoteListener("test")
+    seen = []
+    listener.process_update = lambda update: seen.append(
+        (update.shape, update[0]['Most Recent Trade']))
+    conn.add_listener(listener)
+    conn.set_batch_mode(True)
+    feed(conn, [quote_line("AAPL", 100), quote_line("MSFT", 200)])
+    assert seen == [((1,), 100.0), ((1,), 200.0)]
+
+
+def test_bar_batches():
+    conn = iq.BarConn(name="test")
+    listener = RecordingListener("test")
+    conn.add_listener(listener)
+    conn.set_batch_mode(True)
+    feed(conn, ["B-SPY,BC,SPY,2020-10-13 09:31:00,1,2,0.5,1.5,100,10,3,\r\n",
+                "B-QQQ,BC,QQQ,2020-10-13 09:31:00,1,2,0.5,1.5,100,10,3,\r\n",
+                "B-SPY,BU,SPY,2020-10-13 09:32:00,1,2,0.5,1.5,110,10,1,\r\n"])
+    assert listener.calls == [('bar', 'SPY'), ('bar', 'QQQ'),
+                              ('latest', 'SPY')]
@@ -0,0 +1,39 @@
+import pypath
+import socket
+from pyiqfeed.buffers import RingBuffer
+
+
+def test_partial_lines():
+    buf = RingBuffer(16)
+    buf.feed(b"Q,AAPL,1.0\r\nQ,MS")
+    assert buf.pop_lines() == ["Q,AAPL,1.0"]
+    assert len(buf) == 4
+    assert buf.pop_lines() == []
+    buf.feed(b"FT,2.0\r\n\r\n")
+    assert buf.pop_lines() == ["Q,MSFT,2.0"]
+    assert len(buf) == 0
+
+
+def test_grows_for_long_lines():
+    buf = RingBuffer(8)
+    line = b"S," + b"X" * 100
+    buf.feed(line[:50])
+    buf.feed(line[50:] + b"\r\n")
+    assert buf.capacity() >= len(line)
+    assert buf.pop_lines() == [line.decode('latin-1')]
+
+
+def test_recv_into():
+    rsock, wsock = socket.socketpair()
+    try:
+        buf = RingBuffer(32)
+        lines = ["T,20201013 09:30:%.2d" % i for i in range(20)]
+        wsock.sendall("".join(l + "\r\n" for l in lines).encode('latin-1'))
+        wsock.shutdown(socket.SHUT_WR)
+        received = []
+        while buf.recv_into(rsock, 10) > 0:
+            received.extend(buf.pop_lines())
+        assert received == lines
+    finally:
+        rsock.close()
+        wsock.close()
@@ -0,0 +1,112 @@
+import pypath
+import numpy as np
+import pytest
+import pyiqfeed as iq
+from pyiqfeed import column_readers as cr
+
+
+FIELDS = ["Symbol", "Most Recent Trade", "Most Recent Trade Size",
+          "Most Recent Trade Time", "Most Recent Trade Market Center",
+          "Total Volume", "Bid", "Ask", "Message Contents", "Tick"]
+
+
+def rows():
+    lines = ["Q,AAPL,116.97,100,09:30:00.000001,11,1000,116.96,116.98,Cba,173,",
+             "Q,MSFT,,,,,,,,,,",
+             "Q,SPY,350.45,5,15:59:59.999999,5,71614932,350.44,350.46,C,175,",
+             "Q,QQQ,290.1,12,10:15:30.250000,19,12,290.09,290.11,b,183,",
+             "Q,IWM,160.2,1,12:00:00.000000,3,7,160.19,160.21,a,,"]
+    return [line.split(',') for line in lines]
+
+
+def parser():
+    return cr.FieldsetParser([iq.QuoteConn.quote_msg_map[f] for f in FIELDS])
+
+
+def test_columns_match_rows():
+    p = parser()
+    by_row = np.concatenate([p.parse_one(fields) for fields in rows()])
+    by_col = p.parse_many(rows())
+    assert by_col.dtype == by_row.dtype
+    for name in by_col.dtype.names:
+        np.testing.assert_array_equal(by_col[name], by_row[name])
+    assert by_col['Most Recent Trade Time'][2] == 57599999999
+    assert np.isnan(by_col['Bid'][1])
+
+
+def test_bad_time_falls_back_to_field_reader():
+    col = ("09:30:00.000001", "09:30:00.5")
+    assert list(cr.read_hhmmssus_column(col)) == [
+        iq.field_readers.read_hhmmssus(f) for f in col]
+
+
+def test_updates_own_their_memory():
+    conn = iq.QuoteConn(name="test")
+    conn._set_current_update_structs(FIELDS)
+    first = conn._create_update(rows()[0])
+    second = conn._create_update(rows()[2])
+    assert first['Symbol'][0] == b'AAPL'
+    assert second['Symbol'][0] == b'SPY'
+
+
+def test_decode_ticks():
+    lines = ["H_1,2020-10-13 09:30:00.000001,350.45,100,1000,350.44,350.46,"
+             "7,O,11,3D87,",
+             "H_1,2020-10-13 15:59:59.999999,350.5,5,1005,350.49,350.51,"
+             "8,E,5,,",
+             "H_1,2020-10-14 09:30:01.5,350.6,1,1006,350.59,350.61,"
+             "9,O,19,3D8,"]
+    ticks = iq.HistoryConn._decode_ticks([line.split(',') for line in lines])
+    assert list(ticks['date']) == [np.datetime64('2020-10-13'),
+                                   np.datetime64('2020-10-13'),
+                                   np.datetime64('2020-10-14')]
+    assert list(ticks['time'].astype(np.int64)) == [
+        34200000001, 57599999999, 34201000005]
+    assert list(ticks['last_type']) == [b'O', b'E', b'O']
+    assert list(ticks['tot_vlm']) == [1000, 1005, 1006]
+    assert list(ticks['cond1']) == [0x3D, 0, 0x3D]
+    assert list(ticks['cond2']) == [0x87, 0, 8]
+    assert list(ticks['cond3']) == [0, 0, 0]
+
+
+def test_decode_bars_and_daily():
+    bars = iq.HistoryConn._decode_bars(
+        ["H_2,2020-10-13 09:31:00,2.0,0.5,1.0,1.5,100,10,3,".split(',')])
+    assert bars['date'][0] == np.datetime64('2020-10-13')
+    assert bars['time'][0] == np.timedelta64(34260000000, 'us')
+    assert (bars['high_p'][0], bars['low_p'][0]) == (2.0, 0.5)
+    daily = iq.HistoryConn._decode_daily(
+        ["H_3,2020-02-29,2.0,0.5,1.0,1.5,100,0,".split(',')])
+    assert daily['date'][0] == np.datetime64('2020-02-29')
+    assert daily['prd_vlm'][0] == 100
+    assert len(iq.HistoryConn._decode_ticks([])) == 0
+
+
+def test_field_readers_return_plain_python_values():
+    fr = iq.field_readers
+    assert type(fr.read_uint64("71614932")) is int
+    assert type(fr.read_float64("350.45")) is float
+    assert np.isnan(fr.read_float64(""))
+    with pytest.raises(OverflowError, match="out of bounds for uint8"):
+        fr.read_uint8("300")
+    assert fr.read_tick_direction("175") == -1
+    with pytest.raises(iq.UnexpectedField):
+        fr.read_tick_direction("12")
+    assert fr.read_hhmmssus("09:30:00.000001") == 34200000001
+    assert fr.read_hhmmssus("09:30:00.5") == 34200000005
+    assert fr.read_mmddccyy("02/29/2020") == np.datetime64('2020-02-29')
+    assert fr.read_posix_ts_us("2020-10-13 09:30:00.000002") == (
+        np.datetime64('2020-10-13'), 34200000002)
+
+
+def test_column_readers_with_blanks():
+    assert list(cr.read_uint64_column(("5", "", "7"))) == [5, 0, 7]
+    floats = cr.read_float64_column(("1.5", "", "2"))
+    assert floats[0] == 1.5 and np.isnan(floats[1])
+    dates = cr.read_mmddccyy_column(("10/13/2020", "", "10/13/2020"))
+    assert list(dates) == [np.datetime64('2020-10-13'),
+                           np.datetime64('0001-01-01'),
+                           np.datetime64('2020-10-13')]
+    assert list(cr.read_tick_direction_column(("173", "", "175"))) == [
+        1, 0, -1]
+    assert list(cr.read_hex_column(("1A", "", "ff"))) == [26, 0, 255]
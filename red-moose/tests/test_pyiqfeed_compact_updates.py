@@ -0,0 +1,54 @@
+import pypath
+import numpy as np
+import pyiqfeed as iq
+
+
+def lines():
+    return ["Q,SPY,350.45,5,15:59:59.999999,5,71614932,350.44,10,350.46,20,"
+            "349,351,348,349.5,C,3D,",
+            "Q,AAPL,116.97,100,09:30:00.000001,11,1000,116.96,1,116.98,2,"
+            "116,117,115,116.5,Cba,,",
+            "Q,SPY,350.5,1,15:59:59.999999,5,71614933,350.49,1,350.51,2,"
+            "349,351,348,349.5,C,,"]
+
+
+def test_symbol_table():
+    table = iq.SymbolTable()
+    assert [table.intern(s) for s in ["SPY", "QQQ", "SPY"]] == [0, 1, 0]
+    assert list(table.intern_column(["IWM", "QQQ"])) == [2, 1]
+    assert table.names([2, 0]) == ["IWM", "SPY"]
+    assert table.id_of("TLT") is None and "IWM" in table
+    assert len(table) == 3
+
+
+def test_compact_updates_match_normal_ones():
+    conn = iq.QuoteConn(name="test")
+    rows = [line.split(',') for line in lines()]
+    normal = conn._create_update_batch(rows)
+    conn.set_compact_updates()
+    assert conn.compact_updates()
+    compact = conn._create_update_batch(rows)
+    one = conn._create_update(rows[1])
+    assert compact.dtype.itemsize < normal.dtype.itemsize / 2
+    assert compact['Bid'].dtype == np.float32
+    assert list(compact['Symbol']) == [0, 1, 0]
+    assert one['Symbol'][0] == 1
+    table = conn.symbol_table()
+    assert table.names(compact['Symbol']) == [
+        s.decode() for s in normal['Symbol']]
+    np.testing.assert_allclose(compact['Bid'], normal['Bid'], rtol=1e-7)
+    for name in ['Total Volume', 'Most Recent Trade Time']:
+        np.testing.assert_array_equal(compact[name], normal[name])
+
+
+def test_compact_regional_quotes():
+    conn = iq.QuoteConn(name="test")
+    conn.set_compact_updates(float_dtype='f8')
+    got = []
+    listener = iq.SilentQuoteListener("test")
+    listener.process_regional_rgn_quote = lambda q: got.append(q.copy())
+    conn.add_listener(listener)
+    conn._process_regional_quote(
+        "R,SPY,,350.44,10,09:30:00,350.46,20,09:30:01,11,2,4,".split(','))
+    assert conn.symbol_table().name(got[0]['Symbol'][0]) == "SPY"
+    assert got[0]['Regional Bid'][0] == 350.44
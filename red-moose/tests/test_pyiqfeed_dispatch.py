@@ -0,0 +1,86 @@
+import pypath
+import threading
+import time
+import pyiqfeed as iq
+from pyiqfeed_helpers import feed, quote_line
+
+
+class SlowListener(iq.SilentQuoteListener):
+    """Records what it is given and blocks until released."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.release = threading.Event()
+        self.calls = []
+
+    def process_update_batch(self, updates):
+        self.release.wait(5)
+        self.calls.append([(u['Symbol'].decode(), float(u['Most Recent Trade']))
+                           for u in updates])
+
+    def process_timestamp(self, time_val):
+        self.calls.append('timestamp')
+
+
+def test_conflates_while_listener_is_busy():
+    conn = iq.QuoteConn(name="test")
+    listener = SlowListener("test")
+    dispatcher = iq.ConflatingDispatcher(listener)
+    conn.add_listener(dispatcher)
+    conn.set_batch_mode(True)
+    dispatcher.start()
+    feed(conn, [quote_line("SPY", 100)])
+    # The worker is now stuck in the listener with SPY, these pile up.
+    while dispatcher.pending():
+        time.sleep(0.001)
+    feed(conn, [quote_line("SPY", 101), quote_line("QQQ", 200),
+                quote_line("SPY", 102)])
+    feed(conn, ["T,20201013 09:30:00\r\n"])
+    listener.release.set()
+    assert dispatcher.drain(timeout=5)
+    dispatcher.stop()
+    assert listener.calls == [[('SPY', 100.0)], 'timestamp',
+                              [('SPY', 102.0), ('QQQ', 200.0)]]
+    assert dispatcher.stats() == {"received": 5, "delivered": 4,
+                                  "conflated": 1, "dropped": 0, "errors": 0,
+                                  "pending": 0}
+
+
+def test_drops_when_full_and_survives_errors():
+    conn = iq.QuoteConn(name="test")
+    listener = iq.SilentQuoteListener("test")
+    seen = []
+
+    def process_update(update):
+        seen.append(update[0]['Symbol'].decode())
+        raise ValueError("bad listener")
+    listener.process_update = process_update
+    dispatcher = iq.ConflatingDispatcher(listener, max_symbols=2,
+                                         deliver_batches=False)
+    conn.add_listener(dispatcher)
+    feed(conn, [quote_line(sym, 10) for sym in ("A", "B", "C", "A")])
+    dispatcher.start()
+    assert dispatcher.drain(timeout=5)
+    dispatcher.stop()
+    assert seen == ["A", "B"]
+    assert dispatcher.dropped == 1 and dispatcher.conflated == 1
+    assert dispatcher.errors == 2
+    assert isinstance(dispatcher.last_error, ValueError)
+
+
+def test_update_fields_changing_mid_stream():
+    conn = iq.QuoteConn(name="test")
+    listener = SlowListener("test")
+    listener.release.set()
+    dispatcher = iq.ConflatingDispatcher(listener)
+    conn.add_listener(dispatcher)
+    conn.set_batch_mode(True)
+    feed(conn, [quote_line("SPY", 100)])
+    feed(conn, ["S,CURRENT UPDATE FIELDNAMES,Symbol,Most Recent Trade\r\n",
+                "Q,QQQ,200.00,\r\n"])
+    dispatcher.start()
+    assert dispatcher.drain(timeout=5)
+    assert dispatcher._thread.is_alive()
+    dispatcher.stop()
+    assert listener.calls == [[('SPY', 100.0)], [('QQQ', 200.0)]]
+    assert dispatcher.errors == 0
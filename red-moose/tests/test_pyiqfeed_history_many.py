@@ -0,0 +1,99 @@
+import pypath
+import threading
+import time
+import pyiqfeed as iq
+from pyiqfeed_helpers import wait_for
+
+
+class FakeLookup:
+    """Records requests sent on HistoryConns and answers them on demand."""
+
+    def __init__(self, conns):
+        self.sent = []
+        for conn in conns:
+            conn._send_cmd = (
+                lambda cmd, conn=conn: self.sent.append((conn, cmd)))
+
+    @staticmethod
+    def answer(conn, cmd):
+        fields = cmd.strip().split(',')
+        ticker, req_id = fields[1], fields[5]
+        if ticker == "NONE":
+            lines = ["%s,E,!NO_DATA!," % req_id]
+        elif ticker == "BAD":
+            lines = ["%s,E,Invalid symbol.," % req_id]
+        else:
+            lines = ["%s,2020-10-13 09:31:00,2,0.5,1,1.5,%d,10,3," % (
+                req_id, len(ticker))]
+        lines.append("%s,!ENDMSG!," % req_id)
+        conn._recv_buf.feed("".join(
+            line + "\r\n" for line in lines).encode('latin-1'))
+        conn._process_messages()
+
+
+def run_in_thread(func):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(func()))
+    thread.start()
+    return thread, result
+
+
+def test_keeps_requests_in_flight():
+    conn = iq.HistoryConn(name="test")
+    fake = FakeLookup([conn])
+    tickers = ["A", "BB", "NONE", "BAD", "CCCCC", "DD"]
+    thread, result = run_in_thread(lambda: conn.request_bars_many(
+        tickers, 60, 's', max_bars=10, max_in_flight=3, timeout=5))
+    wait_for(lambda: len(fake.sent) == 3)
+    time.sleep(0.05)
+    assert len(fake.sent) == 3
+    for answered in range(len(tickers)):
+        fake.answer(*fake.sent[answered])
+        wait_for(lambda: len(fake.sent) == min(len(tickers),
+                                               answered + 4))
+    thread.join(timeout=5)
+    assert set(result) == set(tickers)
+    assert result["CCCCC"]['tot_vlm'][0] == 5
+    assert len(result["NONE"]) == 0
+    assert isinstance(result["BAD"], RuntimeError)
+    assert not conn._req_buf and not conn._req_event
+
+
+def test_pool_spreads_requests():
+    pool = iq.HistoryConnPool(num_conns=2, name="test")
+    fake = FakeLookup(pool.conns())
+    tickers = ["A", "B", "C", "D"]
+    thread, result = run_in_thread(lambda: pool.request_ticks_many(
+        tickers, max_ticks=10, max_in_flight=1, timeout=5))
+    wait_for(lambda: len(fake.sent) == 2)
+    assert {conn for conn, cmd in fake.sent} == set(pool.conns())
+    for cmd_num in range(len(tickers)):
+        wait_for(lambda: len(fake.sent) > cmd_num)
+        conn, cmd = fake.sent[cmd_num]
+        req_id = cmd.split(',')[4]
+        conn._recv_buf.feed(("%s,E,!NO_DATA!,\r\n%s,!ENDMSG!,\r\n" % (
+            req_id, req_id)).encode('latin-1'))
+        conn._process_messages()
+    thread.join(timeout=5)
+    assert sorted(result) == tickers
+    assert all(len(data) == 0 for data in result.values())
+
+
+def test_abandoned_requests_are_cleaned_up():
+    conn = iq.HistoryConn(name="test")
+    fake = FakeLookup([conn])
+    results = conn.iter_bars_many(["A", "B", "C"], 60, 's', max_bars=10,
+                                  max_in_flight=3, timeout=5)
+    thread, result = run_in_thread(lambda: {'first': next(results)})
+    wait_for(lambda: len(fake.sent) == 3)
+    fake.answer(*fake.sent[1])
+    thread.join(timeout=5)
+    assert result['first'][0] == "B"
+    results.close()
+    assert conn._req_cancelled == {cmd.split(',')[5]
+                                   for _, cmd in [fake.sent[0],
+                                                  fake.sent[2]]}
+    fake.answer(*fake.sent[0])
+    fake.answer(*fake.sent[2])
+    assert not conn._req_cancelled
+    assert not conn._req_buf and not conn._req_event
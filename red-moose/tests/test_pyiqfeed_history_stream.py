@@ -0,0 +1,87 @@
+import pypath
+import datetime
+import time
+import threading
+import pytest
+import pyiqfeed as iq
+
+
+REQ_ID = "H_0000000000"
+
+
+def tick_lines(num_ticks):
+    lines = ["%s,2020-10-13 09:30:%.2d.000001,350.45,100,%d,350.44,350.46,"
+             "%d,O,11,3D87,\r\n" % (REQ_ID, num % 60, 1000 + num, num)
+             for num in range(num_ticks)]
+    lines.append("%s,!ENDMSG!,\r\n" % REQ_ID)
+    return lines
+
+
+def make_conn(lines, max_chunks=1):
+    """
+    HistoryConn that, when the request is sent, starts feeding lines through
+    the reader path from another thread the way the reading thread does.
+    """
+    conn = iq.HistoryConn(name="test")
+    conn.stream_max_chunks = max_chunks
+
+    def reader():
+        for line in lines:
+            conn._recv_buf.feed(line.encode('latin-1'))
+            conn._process_messages()
+    conn.reader = threading.Thread(target=reader)
+    conn._send_cmd = lambda cmd: conn.reader.start()
+    return conn
+
+
+def period():
+    return (datetime.datetime(2020, 10, 13, 9, 30),
+            datetime.datetime(2020, 10, 13, 16, 0))
+
+
+def test_chunk_sizes():
+    conn = make_conn(tick_lines(25))
+    chunks = conn.iter_ticks_in_period("SPY", *period(), chunk_size=10,
+                                       timeout=5)
+    data = list(chunks)
+    conn.reader.join(timeout=5)
+    assert [len(chunk) for chunk in data] == [10, 10, 5]
+    assert [int(tick_id) for chunk in data
+            for tick_id in chunk['tick_id']] == list(range(25))
+    assert not conn._req_stream
+
+
+def test_no_data_raises():
+    conn = make_conn(["%s,E,!NO_DATA!,\r\n" % REQ_ID,
+                      "%s,!ENDMSG!,\r\n" % REQ_ID])
+    with pytest.raises(iq.NoDataError):
+        list(conn.iter_ticks_in_period("SPY", *period(), timeout=5))
+    conn.reader.join(timeout=5)
+    assert not conn._req_stream
+
+
+def test_closing_early_discards_the_rest():
+    conn = make_conn(tick_lines(100))
+    chunks = conn.iter_ticks_in_period("SPY", *period(), chunk_size=10,
+                                       timeout=5)
+    first = next(chunks)
+    chunks.close()
+    conn.reader.join(timeout=5)
+    assert len(first) == 10
+    assert not conn.reader.is_alive()
+    assert not conn._req_stream
+    assert not conn._req_cancelled
+
+
+def test_closing_with_the_end_pending_does_not_block_the_reader():
+    conn = make_conn(tick_lines(12))
+    chunks = conn.iter_ticks_in_period("SPY", *period(), chunk_size=5,
+                                       timeout=5)
+    next(chunks)
+    # Let the reader get to the end, with the last chunk and the end still
+    # to pass on when the consumer closes.
+    time.sleep(0.2)
+    chunks.close()
+    conn.reader.join(timeout=5)
+    assert not conn.reader.is_alive()
+    assert not conn._req_stream
@@ -0,0 +1,91 @@
+import pypath
+import threading
+import time
+import pytest
+import pyiqfeed as iq
+
+
+def headline_lines(req_id, num_headlines):
+    lines = ["%s,<news>" % req_id]
+    for num in range(num_headlines):
+        lines.append("%s,<news_headline><id>%d</id><source>DTN</source>"
+                     "<symbols>:SPY:QQQ:</symbols>"
+                     "<timestamp>20201013093000</timestamp>"
+                     "<text>Stocks rise, bonds fall %d</text>"
+                     "</news_headline>" % (req_id, num, num))
+    lines.append("%s,</news>" % req_id)
+    lines.append("%s,!ENDMSG!," % req_id)
+    return lines
+
+
+def make_conn(lines, story_cache=None):
+    """
+    NewsConn that, when a request is sent, feeds lines through the reader
+    path from another thread the way the reading thread does.
+    """
+    conn = iq.NewsConn(name="test", story_cache=story_cache)
+    conn.stream_max_chunks = 1
+    conn.sent = []
+
+    def reader():
+        for line in lines:
+            conn._recv_buf.feed((line + "\r\n").encode('latin-1'))
+            conn._process_messages()
+
+    def send_cmd(cmd):
+        conn.sent.append(cmd)
+        conn.reader = threading.Thread(target=reader)
+        conn.reader.start()
+    conn._send_cmd = send_cmd
+    return conn
+
+
+def test_headlines_stream_as_parsed():
+    conn = make_conn(headline_lines("N_0000000000", 25))
+    headlines = conn.iter_news_headlines(chunk_lines=4, timeout=5)
+    first = next(headlines)
+    assert first.story_id == "0" and first.symbol_list == ["SPY", "QQQ"]
+    # Commas inside the XML are kept.
+    assert first.headline == "Stocks rise, bonds fall 0"
+    rest = list(headlines)
+    assert [h.story_id for h in rest] == [str(n) for n in range(1, 25)]
+    assert not conn._req_stream
+
+
+def test_closing_early_does_not_block_the_reader():
+    conn = make_conn(headline_lines("N_0000000000", 12))
+    headlines = conn.iter_news_headlines(chunk_lines=5, timeout=5)
+    next(headlines)
+    # Let the reader get to the end, with the last chunk and the end still
+    # to pass on when the consumer closes.
+    time.sleep(0.2)
+    headlines.close()
+    conn.reader.join(timeout=5)
+    assert not conn.reader.is_alive()
+    assert not conn._req_stream
+
+
+def test_request_headlines_error():
+    conn = make_conn(["N_0000000000,E,!NO_DATA!,",
+                      "N_0000000000,!ENDMSG!,"])
+    with pytest.raises(RuntimeError):
+        conn.request_news_headlines(timeout=5)
+
+
+def test_story_cache(tmp_path):
+    cache = iq.StoryCache(max_stories=1, directory=str(tmp_path))
+    conn = make_conn(["N_0000000000,<news><news_story><is_link>N</is_link>"
+                      "<story_text>Body, with a comma</story_text>"
+                      "</news_story></news>",
+                      "N_0000000000,!ENDMSG!,"], story_cache=cache)
+    story = conn.request_news_story("42", timeout=5)
+    assert story.story == "Body, with a comma"
+    assert conn.request_news_story("42") == story
+    assert len(conn.sent) == 1
+
+    cache.put("43", "Other", "N")
+    assert len(cache) == 1
+    # Evicted from memory but still on disk.
+    assert cache.get("42") == ("Body, with a comma", "N")
+    assert iq.StoryCache(directory=str(tmp_path)).get("43") == ("Other", "N")
+    assert cache.get("44") is None
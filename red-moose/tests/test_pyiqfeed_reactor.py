@@ -0,0 +1,69 @@
+import pypath
+import socket
+import threading
+import pyiqfeed as iq
+from pyiqfeed_helpers import wait_for
+
+
+def attach(conn, reactor):
+    """Start conn on reactor over a socketpair, return the IQFeed end."""
+    conn._sock, feed_sock = socket.socketpair()
+    conn.set_reactor(reactor)
+    conn.start_runner()
+    return feed_sock
+
+
+def answer_bars(feed_sock, num_requests):
+    """Answer num_requests HIX requests with one bar each, like IQFeed."""
+    reader = feed_sock.makefile('r', encoding='latin-1', newline='\r\n')
+    for _ in range(num_requests):
+        fields = reader.readline().strip().split(',')
+        req_id = fields[5]
+        feed_sock.sendall(("%s,2020-10-13 09:31:00,2,0.5,1,1.5,%d,10,3,\r\n"
+                           "%s,!ENDMSG!,\r\n" % (req_id, len(fields[1]),
+                                                 req_id)).encode())
+
+
+def test_one_thread_reads_every_conn():
+    reactor = iq.FeedReactor(name="test-reactor")
+    conns = [iq.HistoryConn(name="test-%d" % num) for num in range(3)]
+    threads_before = threading.active_count()
+    feeds = [attach(conn, reactor) for conn in conns]
+    assert threading.active_count() == threads_before + 1
+    assert all(conn.reader_running() for conn in conns)
+    servers = [threading.Thread(target=answer_bars, args=(feed, 2))
+               for feed in feeds]
+    for server in servers:
+        server.start()
+    for conn in conns:
+        for ticker in ["A", "BBB"]:
+            bars = conn.request_bars(ticker, 60, 's', 1, timeout=5)
+            assert bars['tot_vlm'][0] == len(ticker)
+    for server in servers:
+        server.join(timeout=5)
+    conns[0].stop_runner()
+    assert not conns[0].reader_running()
+    assert sorted(c.name() for c in reactor.conns()) == ["test-1", "test-2"]
+    reactor.stop()
+    assert not reactor.running()
+    assert not any(conn.reader_running() for conn in conns)
+
+
+def test_bad_conn_is_dropped_alone():
+    reactor = iq.FeedReactor(name="test-reactor")
+    good, bad = iq.QuoteConn(name="good"), iq.QuoteConn(name="bad")
+    seen = []
+    listener = iq.SilentQuoteListener("test")
+    listener.process_timestamp = seen.append
+    good.add_listener(listener)
+    good_feed, bad_feed = attach(good, reactor), attach(bad, reactor)
+    bad_feed.sendall(b"Z,not a message\r\n")
+    wait_for(lambda: not bad.reader_running())
+    assert isinstance(reactor.errors()[bad], iq.UnexpectedMessage)
+    good_feed.sendall(b"T,20201013 09:30:00\r\n")
+    wait_for(lambda: len(seen) == 1)
+    assert good.reader_running()
+    good_feed.close()
+    wait_for(lambda: not good.reader_running())
+    assert isinstance(reactor.errors()[good], ConnectionError)
+    reactor.stop()
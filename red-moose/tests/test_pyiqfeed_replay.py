@@ -0,0 +1,73 @@
+import pypath
+import socket
+import pyiqfeed as iq
+from pyiqfeed.replay import write_recording
+from pyiqfeed_helpers import quote_line, wait_for
+
+
+class CountingListener(iq.SilentQuoteListener):
+    def __init__(self, name):
+        super().__init__(name)
+        self.symbols = []
+
+    def process_update(self, update):
+        self.symbols.append(update[0]['Symbol'].decode())
+
+
+def test_recorder_tees_socket_reads(tmp_path):
+    path = str(tmp_path / "quotes.rec")
+    conn = iq.QuoteConn(name="test")
+    conn._sock, feed = socket.socketpair()
+    with iq.FeedRecorder(path) as recorder:
+        conn.set_recorder(recorder)
+        feed.sendall(quote_line("SPY", 100).encode('latin-1'))
+        conn._recv_into_buffer()
+        feed.sendall(quote_line("QQQ", 200).encode('latin-1'))
+        conn._recv_into_buffer()
+    feed.close()
+    conn._sock.close()
+    records = list(iq.read_recording(path))
+    assert [data for _, data in records] == [
+        quote_line("SPY", 100).encode('latin-1'),
+        quote_line("QQQ", 200).encode('latin-1')]
+    assert records[0][0] <= records[1][0]
+
+
+def test_replay_quotes_and_history(tmp_path):
+    quotes = str(tmp_path / "quotes.rec")
+    write_recording(quotes, [quote_line("SYM%d" % (num % 3), 10 + num)
+                             for num in range(50)], lines_per_record=7)
+    ticks = str(tmp_path / "ticks.rec")
+    write_recording(ticks, [
+        "H_0000000000,2020-10-13 09:30:00.000001,350.45,100,%d,350.44,"
+        "350.46,%d,O,11,3D87,\r\n" % (1000 + num, num) for num in range(10)]
+        + ["H_0000000000,!ENDMSG!,\r\n"])
+    recordings = {iq.FeedConn.quote_port: quotes,
+                  iq.FeedConn.lookup_port: ticks}
+    # A reactor, unlike reader threads, doesn't wait for select to time out
+    # when disconnecting.
+    reactor = iq.FeedReactor(name="test-reactor")
+    with iq.ReplayServer(recordings, speed=None, free_ports=True) as server:
+        quote_conn = iq.QuoteConn(
+            name="test", port=server.port_for(iq.FeedConn.quote_port))
+        quote_conn.set_reactor(reactor)
+        listener = CountingListener("test")
+        quote_conn.add_listener(listener)
+        quote_conn.connect()
+        try:
+            wait_for(lambda: len(listener.symbols) == 50)
+        finally:
+            quote_conn.disconnect()
+        assert listener.symbols[:4] == ["SYM0", "SYM1", "SYM2", "SYM0"]
+
+        hist_conn = iq.HistoryConn(
+            name="test", port=server.port_for(iq.FeedConn.lookup_port))
+        hist_conn.set_reactor(reactor)
+        hist_conn.connect()
+        try:
+            data = hist_conn.request_ticks("SPY", max_ticks=10, timeout=5)
+        finally:
+            hist_conn.disconnect()
+        assert list(data['tick_id']) == list(range(10))
+        assert any(cmd.startswith("HTX,SPY,10") for cmd in server.commands)
+    reactor.stop()
@@ -0,0 +1,80 @@
+import pypath
+import socket
+import time
+import pyiqfeed as iq
+from pyiqfeed.stats import Histogram
+from pyiqfeed_helpers import quote_line
+
+
+class SlowListener(iq.SilentQuoteListener):
+    def __init__(self, name):
+        super().__init__(name)
+        self.feed_stats = []
+
+    def process_update(self, update):
+        time.sleep(0.002)
+
+    def process_feed_stats(self, stats):
+        self.feed_stats.append(stats)
+
+
+def test_histogram_percentiles():
+    hist = Histogram()
+    for value in [0, 1, 100, 1000, 1000, 1000, 5000]:
+        hist.record(value)
+    snap = hist.snapshot()
+    assert snap["count"] == 7 and snap["max"] == 5000
+    assert snap["mean"] == 8101 // 7
+    # 1000 is in the [512, 1024) bucket.
+    assert snap["p50"] == 1023 and snap["p99"] == 5000
+
+
+def test_conn_stats():
+    conn = iq.QuoteConn(name="test")
+    listener = SlowListener("test")
+    conn.add_listener(listener)
+    conn.set_stats_interval(0)
+    conn._sock, feed = socket.socketpair()
+    feed.sendall("".join([quote_line("SPY", 100), quote_line("QQQ", 200),
+                          "T,20201013 09:30:00\r\n"]).encode('latin-1'))
+    conn._recv_into_buffer()
+    conn._process_messages()
+    feed.close()
+    conn._sock.close()
+
+    stats = conn.stats()
+    assert stats["name"] == "test" and stats["reads"] == 1
+    assert stats["bytes_read"] > 100
+    assert stats["messages"] == {"update": 2, "timestamp": 1}
+    # 2 updates, a timestamp and process_feed_stats itself.
+    assert stats["dispatch_ns"]["count"] == 4
+    assert stats["dispatch_ns"]["max"] >= 2000000
+    # Time in the listener isn't counted as parsing.
+    assert stats["parse_ns"]["update"]["max"] < 2000000
+    assert stats["buffer_depth"]["max"] > 0
+    assert listener.feed_stats and (
+        listener.feed_stats[-1]["messages"]["update"] == 2)
+
+    conn.remove_listener(listener)
+    assert not conn._listeners
+    conn.reset_stats()
+    assert conn.stats()["messages"] == {}
+
+
+def test_reset_stats_keeps_timing_listeners():
+    conn = iq.QuoteConn(name="test")
+    conn.add_listener(SlowListener("test"))
+    conn._sock, feed = socket.socketpair()
+    for _ in range(2):
+        # The first pass makes the listener's timed callbacks.
+        conn.reset_stats()
+        feed.sendall(quote_line("SPY", 100).encode('latin-1'))
+        conn._recv_into_buffer()
+        conn._process_messages()
+    feed.close()
+    conn._sock.close()
+
+    stats = conn.stats()
+    assert stats["dispatch_ns"]["count"] == 1
+    assert stats["dispatch_ns"]["max"] >= 2000000
+    assert stats["parse_ns"]["update"]["max"] < 2000000
@@ -0,0 +1,53 @@
+import pypath
+import numpy as np
+import pyiqfeed as iq
+
+
+def filled_conn():
+    conn = iq.TableConn(name="test")
+    conn.markets = np.array([(7, b'NASDAQ', b'Nasdaq', 1, b'NASDAQ'),
+                             (11, b'NYSE', b'New York Stock Exchange', 7, b'NYSE')],
+                            dtype=iq.TableConn.mkt_type)
+    conn.security_types = np.array([(1, b'EQUITY', b'Equity')],
+                                   dtype=iq.TableConn.security_type)
+    conn.trade_conds = np.zeros(2, dtype=iq.TableConn.tcond_type)
+    conn.trade_conds['tcond_id'] = [1, 3]
+    conn.sics = np.zeros(1, dtype=iq.TableConn.sic_type)
+    conn.naics = np.zeros(1, dtype=iq.TableConn.naic_type)
+    conn._lookup_done = True
+    return conn
+
+
+def test_lookups():
+    conn = filled_conn()
+    assert conn.get_market(11)['short_name'] == b'NYSE'
+    assert conn.get_market(8) is None
+    assert conn.get_trade_condition(3) is not None
+    names = conn.market_names()
+    assert list(names[np.array([7, 11, 0])]) == [b'NASDAQ', b'NYSE', b'']
+    conn.markets = conn.markets[:1]
+    assert conn.get_market(11) is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    assert iq.TableConn.snapshot_age(str(tmp_path)) == float('inf')
+    filled_conn().save_snapshot(str(tmp_path))
+    assert iq.TableConn.snapshot_age(str(tmp_path)) < 60
+
+    conn = iq.TableConn(name="test")
+    assert not conn.is_loaded()
+    assert conn.load_snapshot(str(tmp_path))
+    assert conn.is_loaded()
+    assert isinstance(conn.get_markets(), np.memmap)
+    assert conn.get_market(7)['name'] == b'Nasdaq'
+    assert list(conn.get_trade_conditions()['tcond_id']) == [1, 3]
+
+
+def test_load_rejects_missing_or_old_snapshot(tmp_path):
+    conn = iq.TableConn(name="test")
+    assert not conn.load_snapshot(str(tmp_path))
+    filled_conn().save_snapshot(str(tmp_path))
+    snap_dir = tmp_path / ("v%d" % iq.TableConn.snapshot_version)
+    np.save(str(snap_dir / "sics.npy"), np.zeros(1, dtype='u8'))
+    assert not conn.load_snapshot(str(tmp_path))
+    assert not conn.is_loaded()
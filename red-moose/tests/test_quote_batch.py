@@ -0,0 +1,81 @@
+import pypath
+import datetime
+
+import numpy as np
+import pyiqfeed as iq
+from ib_insync import Stock, Ticker
+
+from red_moose.common import Quote
+from red_moose.market_data.quote_batch import QuoteBatch
+from red_moose.messaging import wire
+from red_moose.messaging.coalescing_publisher import CoalescingPublisher
+
+
+def rows():
+    lines = ["Q,SPY,350.45,5,15:59:59.999999,5,71614932,350.44,10,350.46,20,349,351,348,349.5,C,3D,",
+             "Q,AAPL,116.97,100,09:30:00.000001,11,1000,116.96,1,116.98,2,116,117,115,116.5,Cba,,",
+             "Q,SPY,350.5,1,15:59:59.999999,5,71614933,350.49,1,350.51,2,349,351,348,349.5,C,,"]
+    return [line.split(',') for line in lines]
+
+
+def test_from_update_is_a_view():
+    conn = iq.QuoteConn(name="test")
+    updates = conn._create_update_batch(rows())
+    batch = QuoteBatch.from_update(updates)
+    assert np.shares_memory(batch.records, updates)
+    assert batch['Last'].tolist() == [350.45, 116.97, 350.5]
+    assert batch['LastSize'].tolist() == [5, 100, 1]
+    assert batch['TotalVolume'].tolist() == [71614932, 1000, 71614933]
+    assert batch.Mid.tolist() == [350.45, 116.97, 350.5]
+    assert batch.symbol_names() == ["SPY", "AAPL", "SPY"]
+
+    latest = batch.latest()
+    assert latest.symbol_names() == ["AAPL", "SPY"]
+    quotes = latest.to_quotes()
+    assert quotes[1] == Quote(Symbol="SPY", Bid=350.49, Ask=350.51, Last=350.5, Open=349.0, High=351.0,
+                              Low=348.0, BidSize=1, AskSize=2, LastSize=1, LastTime=57599999999,
+                              TotalVolume=71614933)
+
+
+def test_compact_updates():
+    conn = iq.QuoteConn(name="test")
+    conn.set_compact_updates()
+    batch = QuoteBatch.from_update(conn._create_update_batch(rows()), conn.symbol_table())
+    assert batch.symbol_names() == ["SPY", "AAPL", "SPY"]
+    assert [q.Symbol for q in batch.latest().to_quotes()] == ["AAPL", "SPY"]
+    records = batch.to_records()
+    assert records.dtype == wire.QUOTE_DTYPE
+    assert records['Symbol'].tolist() == [b"SPY", b"AAPL", b"SPY"]
+    assert records['contract_id'].tolist() == [wire.INT_NULL] * 3
+    np.testing.assert_allclose(records['Bid'], [350.44, 116.96, 350.49], rtol=1e-7)
+
+
+def test_bid_ask_changed():
+    before = QuoteBatch.from_quotes([Quote("SPY", 1.0, 2.0, 1.5), Quote("QQQ", 3.0, 4.0, 3.5)])
+    after = QuoteBatch.from_quotes([Quote("SPY", 1.0, 2.0, 1.6), Quote("QQQ", 3.0, 4.5, 3.5)])
+    assert after.bid_ask_changed(before).tolist() == [False, True]
+    assert after[after.bid_ask_changed(before)].symbol_names() == ["QQQ"]
+
+
+def test_from_tickers():
+    when = datetime.datetime(2020, 10, 13, 14, 30, tzinfo=datetime.timezone.utc)
+    tickers = [Ticker(contract=Stock(conId=756733, symbol='SPY', exchange='SMART', localSymbol='SPY'),
+                      time=when, bid=350.44, bidSize=10, ask=350.46, askSize=20, last=350.45, lastSize=5),
+               Ticker(contract=Stock(conId=265598, symbol='AAPL', exchange='SMART', localSymbol='AAPL'))]
+    batch = QuoteBatch.from_tickers(tickers)
+    quotes = batch.to_quotes()
+    assert quotes[0] == Quote.from_Ticker(tickers[0])
+    assert quotes[1].Symbol == "AAPL" and quotes[1].BidSize == 0 and np.isnan(quotes[1].Bid)
+    assert quotes[1].TotalVolume is None and quotes[1].timestamp == 0
+
+
+def test_coalescer_add_batch():
+    published = []
+    publisher = CoalescingPublisher(published.append, flush_interval=60)
+    publisher.add(Quote("AAPL", 1.0, 2.0, 1.5))
+    publisher.add_batch(QuoteBatch.from_update(iq.QuoteConn(name="test")._create_update_batch(rows())))
+    publisher.flush()
+    publisher.close()
+    assert [(q.Symbol, q.Last) for q in published[0]] == [("AAPL", 116.97), ("SPY", 350.5)]
+    assert publisher.stats()['received'] == 4
+    assert publisher.stats()['coalesced'] == 2
@@ -0,0 +1,88 @@
+import pypath
+import socket
+import threading
+
+import pyiqfeed as iq
+from red_moose.iqfeed.rm_connection import RMBarConnection, RMConnection
+
+
+def connect(feed_conn):
+    """Point feed_conn's socket at one end of a socketpair, return the other"""
+    ours, theirs = socket.socketpair()
+    feed_conn._sock = ours
+    theirs.settimeout(2)
+    return theirs
+
+
+def read_cmds(sock, num_cmds):
+    data = b""
+    while data.count(b"\r\n") < num_cmds:
+        data += sock.recv(1 << 20)
+    return data.decode().split("\r\n")[:-1]
+
+
+def test_watch_many_batches_commands():
+    rm_conn = RMConnection(iq.QuoteConn(name="test"))
+    iqfeed = connect(rm_conn.conn)
+    tickers = ["SYM%d" % i for i in range(1000)]
+    writes = []
+    send_cmds = rm_conn.conn._send_cmds
+    rm_conn.conn._send_cmds = lambda cmds: writes.append(send_cmds(cmds))
+
+    assert rm_conn.watch_many(tickers + ["SYM0"]) == tickers
+    assert read_cmds(iqfeed, 1000) == ["w" + t for t in tickers]
+    assert writes == [1]
+    # already watched, nothing is sent
+    assert rm_conn.watch_many(tickers[:10]) == []
+    rm_conn.watch("SYM5")
+    rm_conn.watch("NEW")
+    assert read_cmds(iqfeed, 2) == ["fSYM5", "wNEW"]
+
+
+def test_sync_watchlist_only_sends_the_difference():
+    rm_conn = RMConnection(iq.QuoteConn(name="test"))
+    iqfeed = connect(rm_conn.conn)
+    rm_conn.watch_many(["SPY", "QQQ", "IWM"])
+    read_cmds(iqfeed, 3)
+    added, removed = rm_conn.sync_watchlist({"SPY", "TLT", "GLD"})
+    assert (added, removed) == (["GLD", "TLT"], ["IWM", "QQQ"])
+    assert read_cmds(iqfeed, 4) == ["rIWM", "rQQQ", "wGLD", "wTLT"]
+    assert rm_conn.watchlist() == {"SPY", "TLT", "GLD"}
+    assert rm_conn.sync_watchlist(["SPY", "TLT", "GLD"]) == ([], [])
+
+
+def test_confirm_watches_uses_iqfeed_state():
+    rm_conn = RMConnection(iq.QuoteConn(name="test"))
+    iqfeed = connect(rm_conn.conn)
+    rm_conn.watch_many(["SPY", "QQQ"])
+    read_cmds(iqfeed, 2)
+
+    def answer():
+        assert read_cmds(iqfeed, 1) == ["S,REQUEST WATCHES"]
+        rm_conn.conn._process_watches(["S", "WATCHES", "SPY", "IWM", ""])
+
+    iqfeed_thread = threading.Thread(target=answer)
+    iqfeed_thread.start()
+    added, removed = rm_conn.sync_watchlist({"SPY", "QQQ"}, confirm=True)
+    iqfeed_thread.join()
+    assert (added, removed) == (["QQQ"], ["IWM"])
+    assert read_cmds(iqfeed, 2) == ["rIWM", "wQQQ"]
+
+
+def test_confirm_watches_times_out():
+    rm_conn = RMConnection(iq.QuoteConn(name="test"))
+    iqfeed = connect(rm_conn.conn)
+    rm_conn.watch_many(["SPY"])
+    assert rm_conn.confirm_watches(timeout=0.01) is None
+    assert rm_conn.watchlist() == {"SPY"}
+    assert read_cmds(iqfeed, 2) == ["wSPY", "S,REQUEST WATCHES"]
+
+
+def test_bar_watch_many():
+    rm_conn = RMBarConnection(iq.BarConn(name="test"))
+    iqfeed = connect(rm_conn.conn)
+    rm_conn.watch_many(["SPY", "QQQ"])
+    rm_conn.unwatch_many(["QQQ", "IWM"])
+    assert read_cmds(iqfeed, 3) == ["BW,SPY,5,,,10,,,B-SPY-0005-s,s,'',1",
+                                    "BW,QQQ,5,,,10,,,B-QQQ-0005-s,s,'',1",
+                                    "BR,QQQ"]
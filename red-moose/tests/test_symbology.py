@@ -0,0 +1,57 @@
+import pypath
+import json
+import os
+
+from ib_insync import Contract, Future, Option, Stock
+
+from red_moose.iqfeed.client import IQFeedClient
+from red_moose.iqfeed.symbology import SymbologyIndex
+
+
+def portfolio():
+    return [Stock(conId=756733, symbol='SPY', exchange='SMART', currency='USD'),
+            Future(conId=396871200, symbol='CL', localSymbol='CLZ0', exchange='NYMEX'),
+            Option(conId=439398131, symbol='AMZN', lastTradeDateOrContractMonth='20121020',
+                   strike=19, right='P', exchange='SMART')]
+
+
+def test_matches_get_iq_ticker(tmp_path):
+    index = SymbologyIndex(str(tmp_path / "symbology.json"))
+    contracts = portfolio()
+    assert index.add_contracts(contracts) == 3
+    assert index.to_iq(contracts) == {c.conId: IQFeedClient.get_iq_ticker(c) for c in contracts}
+    assert index.to_iq(contracts)[439398131] == 'AMZN1220V19'
+    assert index.con_id('QCLZ20') == 396871200
+    assert index.to_con_ids(['SPY', 'QQQ']) == {'SPY': 756733, 'QQQ': None}
+    assert index.misses == 0
+
+
+def test_persisted_and_warmed(tmp_path):
+    path = str(tmp_path / "sub" / "symbology.json")
+    SymbologyIndex.warm(portfolio(), path=path)
+    assert json.load(open(path))['iq_by_conid']['756733'] == 'SPY'
+
+    index = SymbologyIndex.warm(path=path)
+    assert len(index) == 3
+    assert index.iq_symbol(Contract(conId=756733)) == 'SPY'
+    assert index.misses == 0
+
+
+def test_lookup_miss_is_indexed(tmp_path):
+    path = str(tmp_path / "symbology.json")
+    index = SymbologyIndex(path, save_interval=0)
+    assert index.iq_symbol(Stock(conId=320227571, symbol='QQQ')) == 'QQQ'
+    assert index.iq_symbol(Stock(conId=320227571, symbol='QQQ')) == 'QQQ'
+    assert index.misses == 1
+    assert 320227571 in index and os.path.exists(path)
+    # unqualified contracts are converted but not kept
+    assert index.iq_symbol(Stock(symbol='IWM')) == 'IWM'
+    assert len(index) == 1
+
+
+def test_bad_file_is_ignored(tmp_path):
+    path = tmp_path / "symbology.json"
+    path.write_text("not json")
+    index = SymbologyIndex(str(path))
+    assert not index.load()
+    assert len(index) == 0
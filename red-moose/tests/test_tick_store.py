@@ -0,0 +1,94 @@
+import pypath
+import datetime
+import numpy as np
+import pytest
+import pyiqfeed as iq
+from red_moose.persistence.tick_store import MemmapStore, from_h5, to_h5
+
+
+def make_ticks(day, first_id, times_s):
+    ticks = np.zeros(len(times_s), dtype=iq.HistoryConn.tick_type)
+    ticks['tick_id'] = np.arange(first_id, first_id + len(times_s))
+    ticks['date'] = np.datetime64(day)
+    ticks['time'] = np.array(times_s, dtype=np.int64) * 1000000
+    ticks['last'] = 350.0 + np.arange(len(times_s)) / 100
+    return ticks
+
+
+def test_round_trips_history_records():
+    ticks = make_ticks('2020-10-13', 0, [1, 2, 3])
+    h5 = to_h5(ticks, iq.HistoryConn.tick_h5_type)
+    assert h5['date'][0] == 18548
+    assert np.array_equal(from_h5(h5, iq.HistoryConn.tick_type), ticks)
+
+
+def test_range_reads_use_index(tmpdir):
+    store = MemmapStore.ticks(str(tmpdir), index_every=8)
+    times = np.repeat(np.arange(50), 2)
+    with store:
+        store.append("SPY", make_ticks('2020-10-13', 0, times[:33]))
+        store.append("SPY", make_ticks('2020-10-13', 33, times[33:]))
+    assert len(np.fromfile(str(tmpdir.join("ticks", "SPY", "2020-10-13.idx")),
+                           dtype=np.int64)) == 13
+    for bgn, end in [(0, 49), (3, 3), (7, 8), (15, 40), (-5, 0), (49, 60),
+                     (60, 70)]:
+        got = store.read("SPY", '2020-10-13', bgn * 1000000, end * 1000000)
+        want = np.flatnonzero((times >= bgn) & (times <= end))
+        assert list(got['tick_id']) == list(want)
+    assert isinstance(store.read("SPY", '2020-10-13'), np.memmap)
+
+
+def test_splits_days_and_rejects_out_of_order(tmpdir):
+    store = MemmapStore.ticks(str(tmpdir))
+    ticks = np.concatenate([make_ticks('2020-10-13', 0, [86398, 86399]),
+                            make_ticks('2020-10-14', 2, [0, 1, 2])])
+    store.append("SPY", ticks)
+    assert store.days("SPY") == ['2020-10-13', '2020-10-14']
+    views = store.read_period("SPY", datetime.datetime(2020, 10, 13, 23, 59, 59),
+                              datetime.datetime(2020, 10, 14, 0, 0, 1))
+    assert [list(view['tick_id']) for view in views] == [[1], [2, 3]]
+    with pytest.raises(ValueError):
+        store.append("SPY", make_ticks('2020-10-14', 5, [1]))
+    store.close()
+
+
+def test_reader_sees_appends(tmpdir):
+    writer = MemmapStore.bars(str(tmpdir), 60, index_every=4)
+    reader = MemmapStore.bars(str(tmpdir), 60, index_every=4)
+    bars = np.zeros(10, dtype=iq.BarConn.interval_data_type)
+    bars['symbol'] = b'SPY'
+    bars['date'] = np.datetime64('2020-10-13')
+    bars['time'] = np.arange(10) * 60000000
+    bars['close_p'] = np.arange(10)
+    writer.append("SPY", bars[:5])
+    assert list(reader.read("SPY", '2020-10-13')['close_p']) == [0, 1, 2, 3, 4]
+    writer.append("SPY", bars[5:])
+    assert list(reader.read("SPY", '2020-10-13', 300000000)['close_p']) == [
+        5, 6, 7, 8, 9]
+    writer.close()
+
+    # A new writer picks up where the last one stopped.
+    again = MemmapStore.bars(str(tmpdir), 60, index_every=4)
+    with pytest.raises(ValueError):
+        again.append("SPY", bars[:1])
+    again.close()
+
+
+def test_closes_old_and_least_recently_used_files(tmpdir):
+    store = MemmapStore.ticks(str(tmpdir), max_open=2)
+    store.append("SPY", make_ticks('2020-10-13', 0, [1, 2]))
+    data_f, index_f, _, _ = store._files[("SPY", '2020-10-13')]
+    store.append("SPY", make_ticks('2020-10-14', 2, [1]))
+    assert data_f.closed and index_f.closed
+    assert list(store._files) == [("SPY", '2020-10-14')]
+
+    store.append("QQQ", make_ticks('2020-10-14', 0, [1]))
+    store.append("IWM", make_ticks('2020-10-14', 0, [1]))
+    assert list(store._files) == [("QQQ", '2020-10-14'), ("IWM", '2020-10-14')]
+    # Reopening picks up the last key and keeps appending.
+    with pytest.raises(ValueError):
+        store.append("SPY", make_ticks('2020-10-14', 3, [0]))
+    store.append("SPY", make_ticks('2020-10-14', 3, [2]))
+    store.close()
+    assert list(store.read("SPY", '2020-10-14')['tick_id']) == [2, 3]
+    assert list(store.read("SPY", '2020-10-13')['tick_id']) == [0, 1]
@@ -0,0 +1,63 @@
+import pypath
+import numpy as np
+import pytest
+from kombu import serialization
+
+from red_moose.common import Bar, Quote
+from red_moose.messaging import wire
+from red_moose.rm_enums import ContentType
+
+
+def test_quotes_round_trip():
+    quotes = [Quote(Symbol="SPY", Bid=350.1, Ask=350.2, Last=350.15, BidSize=100, AskSize=200,
+                    LastSize=5, BidTime=34200000000, TotalVolume=1000),
+              Quote(Symbol=b"QQQ", Bid=280.0, Ask=280.05, Last=np.nan, contract_id=320227571,
+                    exchange="SMART", timestamp=1602597600.5)]
+    records = wire.decode(wire.encode(quotes))
+    assert records.dtype == wire.QUOTE_DTYPE
+    assert records['Symbol'].tolist() == [b"SPY", b"QQQ"]
+    assert records['Bid'].tolist() == [350.1, 280.0]
+    decoded = wire.records_to_quotes(records)
+    assert decoded[0] == quotes[0]
+    assert decoded[1].Symbol == "QQQ"
+    assert np.isnan(decoded[1].Last)
+    assert (decoded[1].contract_id, decoded[1].exchange, decoded[1].timestamp) == (320227571, "SMART", 1602597600.5)
+    assert decoded[1].Open is None and decoded[1].BidTime is None
+
+
+def test_bars_round_trip():
+    bars = [Bar(Symbol="SPY", Date=np.datetime64("2020-10-13"), Time=np.timedelta64(59465000000, 'us'),
+                Open=350.45, High=350.5, Low=350.4, Close=350.45, TotalVolume=71614932,
+                PeriodVolume=800, NumTrades=3)]
+    records = wire.decode(wire.encode(bars))
+    assert records.dtype == wire.BAR_DTYPE
+    assert wire.records_to_bars(records) == [Bar("SPY", "2020-10-13", 59465.0, 350.45, 350.5, 350.4, 350.45,
+                                                 71614932, 800, 3)]
+
+
+def test_interval_data_to_records():
+    dtype = np.dtype([('symbol', 'S64'), ('date', 'M8[D]'), ('time', 'u8'),
+                      ('open_p', 'f8'), ('high_p', 'f8'), ('low_p', 'f8'),
+                      ('close_p', 'f8'), ('tot_vlm', 'u8'), ('prd_vlm', 'u8'), ('num_trds', 'u8')])
+    bar_data = np.array([(b"SPY", "2020-10-13", 59465000000, 350.45, 350.5, 350.4, 350.45, 71614932, 800, 3)],
+                        dtype=dtype)
+    records = wire.interval_data_to_records(bar_data)
+    assert records[0]['Time'] == 59465.0
+    assert wire.records_to_bars(records)[0].Date == "2020-10-13"
+
+
+def test_kombu_serializer():
+    quotes = [Quote(Symbol="SPY", Bid=1.0, Ask=2.0, Last=1.5)]
+    content_type, content_encoding, payload = serialization.dumps(quotes, serializer=wire.SERIALIZER)
+    assert (content_type, content_encoding) == (ContentType.RM_RECORDS.value, 'binary')
+    records = serialization.loads(payload, content_type, content_encoding,
+                                  accept=serialization.prepare_accept_content({wire.SERIALIZER}))
+    assert isinstance(records, np.ndarray)
+    assert records['Ask'].tolist() == [2.0]
+
+
+def test_decode_rejects_other_data():
+    with pytest.raises(ValueError):
+        wire.decode(b"not records at all")
+    with pytest.raises(TypeError):
+        wire.encode(np.zeros(2))